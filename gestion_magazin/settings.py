@@ -89,6 +89,8 @@ INSTALLED_APPS = [
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
     'whitenoise.middleware.WhiteNoiseMiddleware',  # Servir fichiers statiques
+    'inventory.middleware.PerformanceMiddleware',  # Métriques latence / SQL par vue
+    'inventory.middleware.RoutageBaseMiddleware',  # Réplique de lecture: collant après écriture
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -123,16 +125,52 @@ WSGI_APPLICATION = 'gestion_magazin.wsgi.application'
 # https://docs.djangoproject.com/en/5.2/ref/settings/#databases
 
 # Utiliser PostgreSQL en production, SQLite en développement
+# Connexions PostgreSQL (DB_POOL_MODE):
+# - 'persistent' (défaut): une connexion persistante par thread, recyclée après DB_CONN_MAX_AGE secondes
+# - 'psycopg': pool natif Django 5.1+ (psycopg[pool] >= 3.2), taille par rôle de processus
+# - 'pgbouncer': pooler externe en mode transaction (DB_POOLER_URL), curseurs serveur désactivés
+# PROCESS_ROLE (web | asgi | celery) est fixé dans le Procfile pour borner les connexions par processus.
+# Sous ASGI (daphne), chaque requête synchrone tourne dans son propre thread: une connexion persistante
+# par thread fuirait. Le rôle asgi passe donc par le pool natif (sauf pgbouncer), et n'a jamais
+# CONN_MAX_AGE > 0.
+PROCESS_ROLE = os.environ.get('PROCESS_ROLE', 'web')
+DB_POOL_MODE = os.environ.get('DB_POOL_MODE', 'persistent')
+if PROCESS_ROLE == 'asgi' and DB_POOL_MODE == 'persistent':
+    DB_POOL_MODE = 'psycopg'
+DB_CONN_MAX_AGE = 0 if PROCESS_ROLE == 'asgi' else int(os.environ.get('DB_CONN_MAX_AGE', 60))
+DB_POOL_SIZES = {
+    # rôle: (min_size, max_size) — max_size × nb de conteneurs doit rester sous la limite du plan Postgres
+    'web': (2, 8),
+    'asgi': (2, 8),
+    'celery': (1, 2),
+}
+
 if os.environ.get('DATABASE_URL'):
     # Production : PostgreSQL via Scalingo
     import dj_database_url
+    _db_url = os.environ.get('DATABASE_URL')
+    if DB_POOL_MODE == 'pgbouncer':
+        _db_url = os.environ.get('DB_POOLER_URL', _db_url)
     DATABASES = {
-        'default': dj_database_url.config(
-            default=os.environ.get('DATABASE_URL'),
-            conn_max_age=int(os.environ.get('DB_CONN_MAX_AGE', 0)),
-            conn_health_checks=True,
+        'default': dj_database_url.parse(
+            _db_url,
+            # Le pool natif gère lui-même la durée de vie des connexions (CONN_MAX_AGE doit valoir 0)
+            conn_max_age=0 if DB_POOL_MODE == 'psycopg' else DB_CONN_MAX_AGE,
+            conn_health_checks=DB_POOL_MODE != 'psycopg',
         )
     }
+    if DB_POOL_MODE == 'psycopg':
+        _pool_min, _pool_max = DB_POOL_SIZES.get(PROCESS_ROLE, DB_POOL_SIZES['web'])
+        DATABASES['default'].setdefault('OPTIONS', {})['pool'] = {
+            'min_size': int(os.environ.get('DB_POOL_MIN_SIZE', _pool_min)),
+            'max_size': int(os.environ.get('DB_POOL_MAX_SIZE', _pool_max)),
+            'timeout': int(os.environ.get('DB_POOL_TIMEOUT', 10)),  # attente max d'une connexion libre
+            'max_idle': 300,
+            'name': PROCESS_ROLE,
+        }
+    elif DB_POOL_MODE == 'pgbouncer':
+        # Mode transaction: un curseur serveur ne survit pas à la fin de transaction (.iterator())
+        DATABASES['default']['DISABLE_SERVER_SIDE_CURSORS'] = True
 else:
     # Développement : SQLite
     DATABASES = {
@@ -145,6 +183,26 @@ else:
         }
     }
 
+# Réplique en lecture pour les rapports (inventory/routage_bdd.py): vues marquées @lecture_replique.
+# Sans REPORTING_DATABASE_URL, tout reste sur 'default'. En test, l'alias pointe sur la base de test principale.
+if os.environ.get('REPORTING_DATABASE_URL'):
+    import dj_database_url
+    DATABASES['reporting'] = dj_database_url.parse(
+        os.environ['REPORTING_DATABASE_URL'],
+        conn_max_age=DB_CONN_MAX_AGE,
+        conn_health_checks=True,
+    )
+    DATABASES['reporting']['TEST'] = {'MIRROR': 'default'}
+DATABASE_ROUTERS = ['inventory.routage_bdd.RouteurReporting']
+
+# PostgreSQL: MouvementStock / NotificationStock partitionnées par mois (inventory/services/partitions.py).
+# Conversion à la migration 0069 si True, sinon: python manage.py partitions_mensuelles --convertir.
+# La conversion réécrit la table sous verrou exclusif: True uniquement pour un déploiement en maintenance.
+PARTITIONNEMENT_MENSUEL = os.environ.get('PARTITIONNEMENT_MENSUEL', 'False') == 'True'
+# purge_mouvements_stock supprime les mouvements plus anciens: au-delà, le journal d'un article
+# n'est plus complet et reconcilier_stock refuse de corriger son stock (services/reconciliation.py).
+RETENTION_MOUVEMENTS_STOCK_JOURS = int(os.environ.get('RETENTION_MOUVEMENTS_STOCK_JOURS', 90))
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
@@ -195,6 +253,10 @@ STATICFILES_STORAGE = 'whitenoise.storage.CompressedManifestStaticFilesStorage'
 # Media files (User uploaded files)
 MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / 'media'
+# True si le worker Celery lit et écrit les mêmes médias que le web (volume MEDIA_ROOT partagé).
+# Un stockage objet (STORAGES['default'] non local) est toujours partagé. Sinon, les miniatures
+# sont générées par le processus web après commit (services/images.py).
+MEDIAS_PARTAGES = os.environ.get('MEDIAS_PARTAGES', 'False') == 'True'
 
 # REST Framework configuration
 REST_FRAMEWORK = {
@@ -261,6 +323,14 @@ else:
 
 # NOTE: Sessions restent en base de données pour stabilité
 
+# Instrumentation des vues (inventory.middleware.PerformanceMiddleware)
+PERF_METRICS_ENABLED = os.environ.get('PERF_METRICS_ENABLED', 'True') == 'True'
+PERF_METRICS_SAMPLE_RATE = float(os.environ.get('PERF_METRICS_SAMPLE_RATE', '1.0'))  # 0.1 = 10% des requêtes
+PERF_METRICS_FLUSH_INTERVAL = int(os.environ.get('PERF_METRICS_FLUSH_INTERVAL', 60))  # secondes
+PERF_METRICS_SLOW_SQL_MS = int(os.environ.get('PERF_METRICS_SLOW_SQL_MS', 100))
+PERF_METRICS_TOP_SQL = 20
+PERF_METRICS_FILE = os.environ.get('PERF_METRICS_FILE', '')  # Export JSON local optionnel
+
 # Timeout de connexion DB
 DATA_UPLOAD_MAX_MEMORY_SIZE = 10485760  # 10 MB
 DATA_UPLOAD_MAX_NUMBER_FIELDS = 5000
@@ -294,6 +364,8 @@ else:
 # Celery Configuration
 CELERY_BROKER_URL = _REDIS_URL or 'redis://127.0.0.1:6379/0'
 CELERY_RESULT_BACKEND = _REDIS_URL or 'redis://127.0.0.1:6379/0'
+# Sans Redis (développement local), les tâches s'exécutent sur place au lieu d'attendre un broker absent
+CELERY_TASK_ALWAYS_EAGER = not _REDIS_URL
 CELERY_ACCEPT_CONTENT = ['json']
 CELERY_TASK_SERIALIZER = 'json'
 CELERY_RESULT_SERIALIZER = 'json'
@@ -304,25 +376,67 @@ CELERY_TASK_SOFT_TIME_LIMIT = 25 * 60  # Avertissement à 25 minutes
 CELERY_WORKER_PREFETCH_MULTIPLIER = 4  # Nombre de tâches à précharger
 CELERY_WORKER_MAX_TASKS_PER_CHILD = 1000  # Redémarrer worker après 1000 tâches
 CELERY_BROKER_CONNECTION_RETRY_ON_STARTUP = True
+# Tâches périodiques (process beat du Procfile, un seul conteneur: scalingo scale beat:1)
+CELERY_BEAT_SCHEDULE = {
+    'maintenir-partitions': {
+        'task': 'inventory.tasks.maintenir_partitions',
+        'schedule': 24 * 60 * 60,  # quotidien
+    },
+    'reporter-variations-stock': {
+        'task': 'inventory.tasks.reporter_variations_stock',
+        'schedule': 5 * 60,  # filet de sécurité: le report se fait normalement après chaque vente
+    },
+}
+
+# Logging
+# - inventory.api: une ligne de synthèse par appel POS (voir inventory/api_logging.py)
+# - LOG_FORMAT=json pour des lignes JSON exploitables par l'agrégateur de logs
+# - INVENTORY_LOG_LEVEL=DEBUG pour réactiver le détail par vente/ligne
+LOG_FORMAT = os.getenv('LOG_FORMAT', 'text')
+API_LOG_LEVEL = os.getenv('API_LOG_LEVEL', 'INFO')
+INVENTORY_LOG_LEVEL = os.getenv('INVENTORY_LOG_LEVEL', '')
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'formatters': {
+        'text': {
+            'format': '%(asctime)s %(levelname)s %(name)s %(message)s',
+        },
+        'json': {
+            '()': 'inventory.api_logging.JsonFormatter',
+        },
+    },
+    'handlers': {
+        'console': {
+            'class': 'logging.StreamHandler',
+            'formatter': 'json' if LOG_FORMAT == 'json' else 'text',
+        },
+    },
+    'loggers': {
+        'inventory.api': {
+            'level': API_LOG_LEVEL,
+            'handlers': ['console'],
+            'propagate': False,
+        },
+    },
+}
+
+if INVENTORY_LOG_LEVEL:
+    LOGGING['loggers']['inventory'] = {
+        'level': INVENTORY_LOG_LEVEL,
+        'handlers': ['console'],
+    }
 
 # Logging pour identifier les requêtes lentes (en dev uniquement)
 if DEBUG:
-    LOGGING = {
-        'version': 1,
-        'disable_existing_loggers': False,
-        'handlers': {
-            'console': {
-                'class': 'logging.StreamHandler',
-            },
+    LOGGING['loggers'].update({
+        'django.db.backends': {
+            'level': 'WARNING',  # Mettre DEBUG pour voir toutes les requêtes SQL
+            'handlers': ['console'],
         },
-        'loggers': {
-            'django.db.backends': {
-                'level': 'WARNING',  # Mettre DEBUG pour voir toutes les requêtes SQL
-                'handlers': ['console'],
-            },
-            'celery': {
-                'level': 'INFO',
-                'handlers': ['console'],
-            },
+        'celery': {
+            'level': 'INFO',
+            'handlers': ['console'],
         },
-    }
\ No newline at end of file
+    })
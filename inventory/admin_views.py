@@ -8,6 +8,7 @@ from django.core.paginator import Paginator
 from django.db.models import Count, Sum
 from .models import Client, Commercant, Boutique, Article, Vente, LigneVente, VenteRejetee
 from .forms import ClientForm, CommercantForm
+from .routage_bdd import lecture_replique
 import logging
 import secrets
 import string
@@ -292,6 +293,7 @@ def diagnostic_api(request):
 
 @login_required
 @user_passes_test(is_superuser)
+@lecture_replique
 def statistiques_systeme(request):
     """Statistiques système détaillées - Base de données, RAM, Performance."""
     
@@ -412,6 +414,45 @@ def statistiques_systeme(request):
     return render(request, 'inventory/admin/statistiques_systeme.html', context)
 
 
+@login_required
+@user_passes_test(is_superuser)
+def performance_systeme(request):
+    """Métriques de performance par vue (latence, requêtes SQL, requêtes lentes)."""
+    from django.conf import settings
+    from . import instrumentation
+
+    if request.method == 'POST':
+        action = request.POST.get('action')
+        if action == 'reset':
+            instrumentation.reinitialiser()
+            messages.success(request, "Métriques réinitialisées.")
+        elif action == 'taux':
+            valeur = request.POST.get('taux', '').strip()
+            try:
+                instrumentation.definir_taux_echantillonnage(float(valeur) if valeur else None)
+                messages.success(request, "Taux d'échantillonnage mis à jour.")
+            except ValueError:
+                messages.error(request, "Taux invalide (valeur entre 0 et 1 attendue).")
+        elif action == 'flush':
+            instrumentation.metriques.flush()
+        return redirect('inventory:admin_performance_systeme')
+
+    snapshots = instrumentation.lire_snapshots()
+    vues, plus_lentes = instrumentation.fusionner_snapshots(snapshots)
+
+    context = {
+        'vues': vues,
+        'plus_lentes': plus_lentes,
+        'processus': sorted(snapshots, key=lambda s: s['processus']),
+        'base': instrumentation.etat_serveur_db(),
+        'taux': instrumentation.taux_echantillonnage(),
+        'taux_defaut': getattr(settings, 'PERF_METRICS_SAMPLE_RATE', 1.0),
+        'actif': getattr(settings, 'PERF_METRICS_ENABLED', True),
+        'seuil_sql_ms': getattr(settings, 'PERF_METRICS_SLOW_SQL_MS', 100),
+    }
+    return render(request, 'inventory/admin/performance_systeme.html', context)
+
+
 # ===== GESTION DES ERREURS DE TRANSACTION =====
 
 @login_required
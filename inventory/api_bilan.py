@@ -11,6 +11,7 @@ import logging
 
 from .models import Commercant, Boutique, Vente, Article, MouvementStock, RapportCaisse
 from .models_bilan import BilanGeneral, IndicateurPerformance
+from .routage_bdd import lecture_replique
 
 logger = logging.getLogger(__name__)
 
@@ -397,6 +398,7 @@ def rafraichir_indicateurs_api(request):
 
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
+@lecture_replique
 def statistiques_temps_reel_api(request):
     """API pour les statistiques en temps réel"""
     try:
@@ -426,6 +428,7 @@ def statistiques_temps_reel_api(request):
 
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
+@lecture_replique
 def ventes_par_jour_api(request):
     """API pour les ventes par jour (pour graphiques)"""
     try:
@@ -481,6 +484,7 @@ def ventes_par_jour_api(request):
 
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
+@lecture_replique
 def top_articles_api(request):
     """API pour les articles les plus vendus"""
     try:
@@ -537,6 +541,7 @@ def top_articles_api(request):
 
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
+@lecture_replique
 def performance_categories_api(request):
     """API pour la performance par catégorie"""
     try:
@@ -0,0 +1,186 @@
+"""
+Clés d'idempotence des endpoints d'écriture de l'API POS.
+
+Les réseaux mobiles instables font rejouer les requêtes par MAUI: chaque reprise
+relançait toute la validation avant d'être rejetée comme doublon. Avec @idempotent,
+la première réponse réussie (2xx) est conservée et les reprises la reçoivent telle
+quelle, sans retraitement (en-tête Idempotent-Replayed: true).
+
+- Lots de ventes: une réponse 2xx contenant des ventes rejetées n'est pas conservée;
+  la reprise retraite le lot (ventes acceptées reconnues comme doublons, rejets et
+  stock_updates recalculés) au lieu de recevoir des rejets périmés.
+
+- Clé: en-tête Idempotency-Key (ou X-Idempotency-Key) fourni par le client, sinon
+  dérivée de la requête (numéro de facture / UID de vente), toujours préfixée par le
+  numéro de série du terminal (corps puis en-têtes); sans numéro de série, la requête
+  est traitée sans idempotence.
+- Stockage: cache (Redis en production) pour la relecture en O(1), table
+  ReponseIdempotente (contrainte unique endpoint + clé) comme référence durable.
+- Deux reprises simultanées peuvent encore s'exécuter toutes les deux: les contraintes
+  métier (numéro de facture unique) restent le dernier rempart.
+- Purge: python manage.py purge_reponses_idempotentes
+"""
+import hashlib
+import json
+from functools import wraps
+
+from django.core.cache import cache
+from django.core.serializers.json import DjangoJSONEncoder
+from rest_framework.response import Response
+
+DUREE_CACHE = 60 * 60 * 24
+ENTETES_CLE = ('Idempotency-Key', 'X-Idempotency-Key')
+
+
+def corps_json(request):
+    """Corps JSON brut de la requête ({} s'il est absent ou invalide)."""
+    # request.body est mis en mémoire: la vue peut encore lire request.data / request.body
+    try:
+        return json.loads(request.body or b'{}')
+    except (ValueError, UnicodeDecodeError):
+        return {}
+
+
+def _numero_serie(request, donnees):
+    """Terminal émetteur, même priorité que create_vente_simple: corps puis en-têtes."""
+    return (
+        (donnees.get('numero_serie') if isinstance(donnees, dict) else None)
+        or request.headers.get('X-Device-Serial')
+        or request.headers.get('Device-Serial')
+        or request.headers.get('Serial-Number')
+        or ''
+    )
+
+
+def _cle(endpoint, numero_serie, cle):
+    empreinte = hashlib.sha256(f"{numero_serie}:{cle}".encode('utf-8')).hexdigest()
+    return empreinte, f"idempotence:{endpoint}:{empreinte}"
+
+
+def _rejouer(request, statut, reponse):
+    resume = getattr(request, 'resume_api', None)
+    if resume is not None:
+        resume.ajouter(rejoue=True)
+    return Response(reponse, status=statut, headers={'Idempotent-Replayed': 'true'})
+
+
+def _entierement_acceptee(reponse):
+    """Faux si la réponse signale au moins une vente rejetée (sync ou ingestion).
+    Un doublon (vente déjà enregistrée) est un résultat définitif, pas un rejet."""
+    if not isinstance(reponse, dict):
+        return True
+    if any(isinstance(r, dict) and r.get('reason') != 'DUPLICATE' for r in reponse.get('rejected') or []):
+        return False
+    return not any(
+        isinstance(r, dict) and r.get('status') == 'rejected' for r in reponse.get('resultats') or []
+    )
+
+
+def _boutique_id(reponse):
+    """Boutique de la réponse: boutique_id à plat ou boutique.id imbriqué."""
+    if not isinstance(reponse, dict):
+        return None
+    if reponse.get('boutique_id') is not None:
+        return reponse['boutique_id']
+    boutique = reponse.get('boutique')
+    return boutique.get('id') if isinstance(boutique, dict) else None
+
+
+def reponse_enregistree(endpoint, numero_serie, cle):
+    """(statut_http, reponse) déjà servie pour cette clé, ou None."""
+    from inventory.models import ReponseIdempotente
+
+    empreinte, cle_cache = _cle(endpoint, numero_serie, cle)
+    en_cache = cache.get(cle_cache)
+    if en_cache is not None:
+        return en_cache
+    ligne = ReponseIdempotente.objects.filter(endpoint=endpoint, cle=empreinte).values_list(
+        'statut_http', 'reponse'
+    ).first()
+    if ligne is not None:
+        cache.set(cle_cache, ligne, DUREE_CACHE)
+    return ligne
+
+
+def enregistrer_reponse(endpoint, numero_serie, cle, statut, reponse, boutique_id=None):
+    """Conserve une réponse réussie (sans erreur si une reprise concurrente l'a déjà fait)."""
+    from inventory.models import ReponseIdempotente
+
+    empreinte, cle_cache = _cle(endpoint, numero_serie, cle)
+    reponse = json.loads(json.dumps(reponse, cls=DjangoJSONEncoder))
+    ReponseIdempotente.objects.bulk_create([
+        ReponseIdempotente(
+            endpoint=endpoint, cle=empreinte, numero_serie=numero_serie[:100],
+            boutique_id=boutique_id, statut_http=statut, reponse=reponse,
+        )
+    ], ignore_conflicts=True)
+    cache.set(cle_cache, (statut, reponse), DUREE_CACHE)
+
+
+def idempotent(endpoint, deriver_cle=None):
+    """
+    Décorateur de vue POS: rejoue la réponse d'une requête déjà traitée.
+    deriver_cle(donnees) -> str | None: clé à utiliser sans en-tête Idempotency-Key.
+    À placer sous @resume_api.
+    """
+    def decorateur(view_func):
+        @wraps(view_func)
+        def wrapper(request, *args, **kwargs):
+            donnees = corps_json(request)
+            cle = next((request.headers.get(h) for h in ENTETES_CLE if request.headers.get(h)), None)
+            if not cle and deriver_cle is not None:
+                cle = deriver_cle(donnees)
+            numero_serie = _numero_serie(request, donnees)
+            if not cle or not numero_serie:
+                # Sans terminal identifié, deux caisses partageraient les mêmes clés
+                return view_func(request, *args, **kwargs)
+
+            deja_servie = reponse_enregistree(endpoint, numero_serie, cle)
+            if deja_servie is not None:
+                return _rejouer(request, *deja_servie)
+
+            response = view_func(request, *args, **kwargs)
+            if 200 <= response.status_code < 300 and _entierement_acceptee(response.data):
+                enregistrer_reponse(
+                    endpoint, numero_serie, cle, response.status_code, response.data, _boutique_id(response.data)
+                )
+            return response
+        return wrapper
+    return decorateur
+
+
+def cle_vente(donnees):
+    """Vente unitaire: numéro de facture (UID de vente MAUI)."""
+    if isinstance(donnees, dict):
+        numero = donnees.get('numero_facture') or donnees.get('NumeroFacture') or donnees.get('reference')
+        return f"vente:{numero}" if numero else None
+    return None
+
+
+def cle_lot_ventes(donnees):
+    """Lot de synchronisation: UID de toutes les ventes du lot (ordre indifférent)."""
+    if isinstance(donnees, dict):
+        donnees = donnees.get('Ventes') or donnees.get('ventes') or []
+    if not isinstance(donnees, list) or not donnees:
+        return None
+    uids = [
+        v.get('VenteUid') or v.get('vente_uid') or v.get('numero_facture')
+        for v in donnees if isinstance(v, dict)
+    ]
+    if len(uids) != len(donnees) or not all(uids):
+        return None
+    return "lot:" + ",".join(sorted(str(uid) for uid in uids))
+
+
+def cle_operation(donnees):
+    """Négociation / retour: l'opération horodatée par le terminal est son propre identifiant."""
+    if not isinstance(donnees, dict) or not donnees.get('date_operation'):
+        return None
+    return "operation:" + json.dumps(donnees, sort_keys=True, default=str)
+
+
+def cle_lot_comptage(donnees):
+    """Lot de comptages d'inventaire: identifiant du lot généré par le terminal."""
+    if isinstance(donnees, dict) and donnees.get('lot_uid'):
+        return f"comptage:{donnees.get('inventaire_id')}:{donnees['lot_uid']}"
+    return None
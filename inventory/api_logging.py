@@ -0,0 +1,110 @@
+"""
+Journalisation structurée de l'API POS.
+
+Chaque appel décoré par @resume_api produit UN seul enregistrement de synthèse
+(logger 'inventory.api') avec statut, durée et compteurs (ventes, lignes, codes
+d'erreur). Le détail par vente/ligne reste au niveau DEBUG dans le logger du module,
+avec formatage paresseux (%s) pour ne rien coûter quand DEBUG est désactivé.
+
+Format JSON: LOG_FORMAT=json (voir LOGGING dans settings).
+"""
+import json
+import logging
+import time
+from collections import Counter
+from functools import wraps
+
+api_logger = logging.getLogger('inventory.api')
+
+# Attributs standards d'un LogRecord (exclus des champs JSON supplémentaires)
+_ATTRIBUTS_STANDARDS = set(vars(logging.makeLogRecord({}))) | {'message', 'asctime'}
+
+
+class JsonFormatter(logging.Formatter):
+    """Formatte chaque enregistrement en une ligne JSON (champs `extra` inclus)."""
+
+    def format(self, record):
+        data = {
+            'ts': self.formatTime(record, '%Y-%m-%dT%H:%M:%S'),
+            'niveau': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+        }
+        for cle, valeur in record.__dict__.items():
+            if cle not in _ATTRIBUTS_STANDARDS and not cle.startswith('_'):
+                data[cle] = valeur
+        if record.exc_info:
+            data['exception'] = self.formatException(record.exc_info)
+        return json.dumps(data, default=str, ensure_ascii=False)
+
+
+class _Details:
+    """Rendu `cle=valeur` calculé seulement si l'enregistrement est émis."""
+
+    def __init__(self, donnees):
+        self.donnees = donnees
+
+    def __str__(self):
+        return ' '.join(f'{cle}={valeur}' for cle, valeur in self.donnees.items())
+
+
+class ResumeRequete:
+    """Compteurs d'un appel API, émis en un seul enregistrement de synthèse."""
+
+    def __init__(self, endpoint):
+        self.endpoint = endpoint
+        self.debut = time.perf_counter()
+        self.contexte = {}
+        self.compteurs = Counter()
+        self.erreurs = Counter()
+
+    def ajouter(self, **contexte):
+        self.contexte.update(contexte)
+
+    def incr(self, compteur, n=1):
+        self.compteurs[compteur] += n
+
+    def erreur(self, code):
+        self.erreurs[code or 'OTHER'] += 1
+
+    def emettre(self, statut=None):
+        if statut is None or statut >= 500:
+            niveau = logging.ERROR
+        elif statut >= 400:
+            niveau = logging.WARNING
+        else:
+            niveau = logging.INFO
+        if not api_logger.isEnabledFor(niveau):
+            return
+
+        donnees = dict(self.contexte)
+        donnees.update(self.compteurs)
+        if self.erreurs:
+            donnees['erreurs'] = dict(self.erreurs)
+        duree_ms = round((time.perf_counter() - self.debut) * 1000, 1)
+        api_logger.log(
+            niveau, '%s statut=%s duree_ms=%s %s', self.endpoint, statut, duree_ms, _Details(donnees),
+            extra={'endpoint': self.endpoint, 'statut': statut, 'duree_ms': duree_ms, 'donnees': donnees},
+        )
+
+
+def resume_api(endpoint):
+    """
+    Décorateur de vue: attache request.resume_api (ResumeRequete) et émet la synthèse
+    à la fin de l'appel, y compris sur les retours anticipés et les exceptions.
+    À placer sous @api_view / @permission_classes.
+    """
+    def decorateur(view_func):
+        @wraps(view_func)
+        def wrapper(request, *args, **kwargs):
+            resume = ResumeRequete(endpoint)
+            request.resume_api = resume
+            try:
+                response = view_func(request, *args, **kwargs)
+            except Exception:
+                resume.emettre(statut=None)
+                raise
+            resume.emettre(statut=getattr(response, 'status_code', None))
+            return response
+        return wrapper
+    return decorateur
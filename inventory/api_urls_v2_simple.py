@@ -44,6 +44,8 @@ urlpatterns = [
     path('ventes/', api_views_v2_simple.create_vente_simple, name='create_vente'),
     path('ventes/sync', api_views_v2_simple.sync_ventes_simple, name='sync_ventes_no_slash'),  # Sans slash pour MAUI
     path('ventes/sync/', api_views_v2_simple.sync_ventes_simple, name='sync_ventes'),
+    path('ventes/ingestion', api_views_v2_simple.ingestion_ventes_simple, name='ingestion_ventes_no_slash'),
+    path('ventes/ingestion/', api_views_v2_simple.ingestion_ventes_simple, name='ingestion_ventes'),
     path('ventes/historique/', api_views_v2_simple.historique_ventes_simple, name='historique_ventes'),
     path('ventes/reconciliation/', api_views_v2_simple.reconcilier_ventes, name='reconcilier_ventes'),
     path('ventes/annuler', api_views_v2_simple.annuler_vente_simple, name='annuler_vente_no_slash'),  # Sans slash pour MAUI
@@ -57,6 +59,11 @@ urlpatterns = [
     path('analyse/regulariser', api_views_v2_simple.regulariser_alerte_stock_simple, name='regulariser_alerte_no_slash'),
     path('analyse/regulariser/', api_views_v2_simple.regulariser_alerte_stock_simple, name='regulariser_alerte'),
 
+    # ===== INVENTAIRE (scanners) =====
+    path('inventaire/en-cours/', api_views_v2_simple.inventaire_en_cours_simple, name='inventaire_en_cours'),
+    path('inventaire/comptages', api_views_v2_simple.envoyer_comptages_simple, name='envoyer_comptages_no_slash'),
+    path('inventaire/comptages/', api_views_v2_simple.envoyer_comptages_simple, name='envoyer_comptages'),
+
     # ===== RAPPORTS DE CAISSE =====
     path('rapports-caisse/', RapportCaisseListCreateView.as_view(), name='rapports_caisse_simple'),
     
@@ -9,11 +9,12 @@ from datetime import datetime, timedelta
 from decimal import Decimal, InvalidOperation
 import threading
 from django.core.exceptions import ObjectDoesNotExist
-from django.db import transaction
+from django.db import connection, transaction
 from django.db import models
 from django.utils import timezone
 from django.utils.dateparse import parse_datetime
 from .models import Article, Categorie, Vente, Client, SessionClientMaui, LigneVente, MouvementStock, VarianteArticle
+from .services.stock import decrementer_stocks
 from .serializers import (
     ArticleSerializer, 
     CategorieSerializer,
@@ -379,66 +380,63 @@ def _post_process_vente_stock_async(vente_id):
 
         terminal = vente.client_maui
         utilisateur = getattr(terminal, 'numero_serie', '') or 'POS'
+        lignes = list(vente.lignes.select_related('article', 'variante'))
+        if not lignes:
+            return
 
-        for ligne in vente.lignes.all():
-            try:
-                with transaction.atomic():
-                    # ⭐ TOUJOURS décrémenter le stock de l'article PARENT (même pour les variantes)
-                    article = Article.objects.select_for_update().get(id=ligne.article_id)
-                    stock_avant = int(article.quantite_stock or 0)
-                    quantite = int(ligne.quantite or 0)
-                    stock_apres = stock_avant - quantite
+        try:
+            with transaction.atomic():
+                # ⭐ TOUJOURS décrémenter le stock de l'article PARENT (même pour les variantes),
+                # en un seul UPDATE pour toute la vente; le stock ne descend pas sous 0
+                resultats = decrementer_stocks(
+                    [(ligne.article_id, int(ligne.quantite or 0)) for ligne in lignes],
+                    plancher_zero=True,
+                )
 
-                    anomalie_stock = False
-                    if stock_apres < 0:
-                        anomalie_stock = True
-                        stock_apres = 0
+                for ligne, (stock_avant, stock_apres) in zip(lignes, resultats):
+                    quantite = int(ligne.quantite or 0)
+                    anomalie_stock = stock_avant - quantite < 0
 
-                    article.quantite_stock = stock_apres
-                    article.save(update_fields=['quantite_stock'])
-                    
                     # Info variante pour le commentaire
-                    variante_info = ""
-                    variante_id = getattr(ligne, 'variante_id', None)
-                    if variante_id:
-                        from inventory.models import VarianteArticle
-                        try:
-                            variante = VarianteArticle.objects.get(id=variante_id)
-                            variante_info = f" (variante: {variante.nom_variante})"
-                        except VarianteArticle.DoesNotExist:
-                            pass
-
-                    try:
-                        MouvementStock.objects.create(
-                            article=article,
-                            type_mouvement='VENTE',
-                            quantite=-quantite,
-                            stock_avant=stock_avant,
-                            stock_apres=stock_apres,
-                            reference_document=vente.numero_facture,
-                            utilisateur=utilisateur,
-                            commentaire=f"SYNC_VENTE_OFFLINE{variante_info} (anomalie_stock={anomalie_stock})",
-                        )
-                    except Exception as e:
-                        logger.warning(f"Impossible de créer mouvement de stock pour vente {vente.numero_facture}: {e}")
+                    variante_info = f" (variante: {ligne.variante.nom_variante})" if ligne.variante else ""
+
+                    # Pas de try/except: un mouvement non journalisé annule toute la vente (stock compris)
+                    MouvementStock.objects.create(
+                        article=ligne.article,
+                        variante=ligne.variante,
+                        type_mouvement='VENTE',
+                        quantite=-quantite,
+                        stock_avant=stock_avant,
+                        stock_apres=stock_apres,
+                        reference_document=vente.numero_facture,
+                        utilisateur=utilisateur,
+                        commentaire=f"SYNC_VENTE_OFFLINE{variante_info} (anomalie_stock={anomalie_stock})",
+                    )
 
-                    logger.info(f"📦 Stock PARENT {article.nom}{variante_info}: {stock_avant} → {stock_apres}")
+                    logger.info(f"📦 Stock PARENT {ligne.article.nom}{variante_info}: {stock_avant} → {stock_apres}")
 
                     if anomalie_stock:
                         logger.warning(
-                            f"Anomalie stock non bloquante - Vente={vente.numero_facture} Article={article.id} "
+                            f"Anomalie stock non bloquante - Vente={vente.numero_facture} Article={ligne.article_id} "
                             f"StockAvant={stock_avant} Quantite={quantite} StockApres=0"
                         )
 
-            except Article.DoesNotExist:
-                logger.warning(
-                    f"Anomalie non bloquante - Article introuvable pendant post-traitement stock: "
-                    f"vente={vente.numero_facture} article_id={ligne.article_id}"
-                )
-            except Exception as e:
-                logger.error(f"Erreur post-traitement stock vente={vente.numero_facture}: {e}")
+        except Article.DoesNotExist as e:
+            logger.warning(
+                f"Anomalie non bloquante - Article introuvable pendant post-traitement stock: "
+                f"vente={vente.numero_facture} ({e})"
+            )
+        except Exception as e:
+            logger.error(f"Erreur post-traitement stock vente={vente.numero_facture}: {e}")
+
+    def _run_et_liberer():
+        try:
+            _run()
+        finally:
+            # Thread hors cycle requête: Django ne ferme pas sa connexion (ni ne la rend au pool)
+            connection.close()
 
-    threading.Thread(target=_run, daemon=True).start()
+    threading.Thread(target=_run_et_liberer, daemon=True).start()
 
 
 @api_view(['POST'])
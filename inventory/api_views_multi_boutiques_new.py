@@ -287,7 +287,7 @@ class VenteMultiBoutiquesViewSet(viewsets.ModelViewSet):
     
     def get_queryset(self):
         """
-        Filtre les ventes par boutique via le client_maui.
+        Filtre les ventes par boutique (Vente.boutique).
         """
         boutique_id = self.request.query_params.get('boutique_id')
         
@@ -296,9 +296,7 @@ class VenteMultiBoutiquesViewSet(viewsets.ModelViewSet):
         
         try:
             boutique = Boutique.objects.get(id=boutique_id, est_active=True)
-            return Vente.objects.filter(
-                client_maui__boutique=boutique
-            ).select_related('client_maui').prefetch_related('lignes__article').order_by('-date_vente')
+            return Vente.objects.de_boutique(boutique).select_related('client_maui').prefetch_related('lignes__article').order_by('-date_vente')
             
         except Boutique.DoesNotExist:
             return Vente.objects.none()
@@ -6,10 +6,11 @@ Version simplifiée pour tests et développement initial.
 L'authentification sera ajoutée plus tard.
 """
 
-from rest_framework.decorators import api_view, permission_classes
+from rest_framework.decorators import api_view, permission_classes, renderer_classes
 from rest_framework.permissions import AllowAny
 from rest_framework.response import Response
 from rest_framework import status
+from rest_framework.settings import api_settings
 from django.shortcuts import get_object_or_404
 from django.utils import timezone
 from django.utils.dateparse import parse_datetime
@@ -21,9 +22,24 @@ import logging
 from decimal import Decimal, InvalidOperation
 
 from django.db.models import Prefetch
-from .models import Client, Boutique, Article, Categorie, Vente, LigneVente, MouvementStock, ArticleNegocie, RetourArticle, VenteRejetee, VarianteArticle, AlerteStock, JournalValeurStock
+from .models import Client, Boutique, Article, Categorie, Vente, LigneVente, MouvementStock, ArticleNegocie, RetourArticle, VenteRejetee, VarianteArticle, AlerteStock, JournalValeurStock, Inventaire
 from .serializers import ArticleSerializer, ArticleAvecVariantesSerializer, CategorieSerializer, VenteSerializer, ArticleNegocieSerializer, RetourArticleSerializer
 from .websocket_utils import notify_stock_updated, notify_article_updated, notify_article_created, notify_dashboard_stats
+from .api_logging import resume_api
+from .api_idempotence import idempotent, cle_lot_comptage, cle_lot_ventes, cle_operation, cle_vente
+from .services.stock import (
+    cles_sortie_journalisee, enregistrer_sorties_vente, notifier_stocks_apres_commit, reporter_variations_variantes,
+    sortie_deja_journalisee,
+)
+from .services.analyse_mouvements import analyser_mouvements, invalider_analyse
+from .services.parametres import parametres_boutique
+from .services.catalogue import catalogue_colonnes
+from .services.reconciliation import journal_complet, limite_retention, stock_ouverture, totaux_journal
+from .services.comptage_inventaire import TAILLE_MAX_LOT, InventaireFerme, appliquer_comptages, instantane
+from .services.ingestion_ventes import TAILLE_MAX_LOT as TAILLE_MAX_LOT_VENTES
+from .services.ingestion_ventes import convertir_vente_maui, date_vente_corrigee, detecter_negociation, ingerer_ventes
+from .renderers import CATALOGUE_RENDERERS
+from .routage_bdd import lecture_replique
 
 logger = logging.getLogger(__name__)
 
@@ -51,15 +67,15 @@ def _compute_dashboard_stats(boutique):
     today = timezone.now().date()
     premier_jour_mois = today.replace(day=1)
 
-    ventes_base = Q(paye=True, est_annulee=False) & (Q(boutique=boutique) | Q(client_maui__boutique=boutique))
-    ventes_jour = Vente.objects.filter(ventes_base, date_vente__date=today).distinct()
+    ventes_base = Vente.objects.de_boutique(boutique).filter(paye=True, est_annulee=False)
+    ventes_jour = ventes_base.filter(date_vente__date=today)
     ca_jour_brut = ventes_jour.filter(devise='CDF').aggregate(total=Sum('montant_total'))['total'] or 0
     ca_jour_usd = ventes_jour.filter(devise='USD').aggregate(total=Sum('montant_total'))['total'] or 0
     depenses_jour = RapportCaisse.objects.filter(
         boutique=boutique, date_rapport__date=today, depense_appliquee=True
     ).aggregate(total=Sum('depense'))['total'] or 0
 
-    ventes_mois = Vente.objects.filter(ventes_base, date_vente__date__gte=premier_jour_mois).distinct()
+    ventes_mois = ventes_base.filter(date_vente__date__gte=premier_jour_mois)
     ca_mois_brut = ventes_mois.filter(devise='CDF').aggregate(total=Sum('montant_total'))['total'] or 0
     ca_mois_usd = ventes_mois.filter(devise='USD').aggregate(total=Sum('montant_total'))['total'] or 0
     depenses_mois = RapportCaisse.objects.filter(
@@ -76,26 +92,55 @@ def _compute_dashboard_stats(boutique):
     }
 
 
+def sorties_deja_journalisees(numero_facture):
+    """
+    Sorties VENTE déjà journalisées pour une facture (une seule requête par vente):
+    clés de services.stock.cles_sortie_journalisee. Une facture supprimée puis renvoyée
+    ne décrémente pas le stock une seconde fois.
+    """
+    deja = set()
+    for ligne in MouvementStock.objects.filter(
+        reference_document=numero_facture, type_mouvement='VENTE'
+    ).values_list('article_id', 'variante_id', 'commentaire'):
+        deja |= cles_sortie_journalisee(*ligne)
+    return deja
+
+
 def recalculer_stock_depuis_journal(article):
     """
-    Recalcule quantite_stock depuis la somme des MouvementStock.
-    Corrige toute divergence entre le champ stocké et le journal.
+    Recalcule quantite_stock depuis la somme des variations MouvementStock
+    (même calcul que services.reconciliation, commande reconcilier_stock).
+    Corrige toute divergence entre le champ stocké et le journal, sauf si le journal
+    de l'article a été tronqué par purge_mouvements_stock (services.reconciliation.journal_complet).
     Retourne (stock_calcule, stock_avant, a_diverge).
     """
-    stock_journal = MouvementStock.objects.filter(
-        article=article
-    ).aggregate(total=Sum('quantite'))['total'] or 0
+    # Ventes de variantes pas encore reportées sur le parent: reportées avant comparaison
+    if reporter_variations_variantes([article.id]):
+        article.refresh_from_db(fields=['quantite_stock'])
+    stock_journal = totaux_journal([article.id]).get(article.id, 0)
 
     stock_avant = article.quantite_stock
     a_diverge = stock_journal != stock_avant
 
-    if a_diverge:
+    if a_diverge and not journal_complet(
+        article.date_creation,
+        Article.objects.filter(pk=article.pk).annotate(ouverture=stock_ouverture()).values_list('ouverture', flat=True).first(),
+        limite_retention(),
+    ):
+        # Mouvements anciens purgés: la somme du journal n'est pas le stock réel
+        logger.warning(
+            f"⚠️ Divergence stock pour {article.code} — stocké={stock_avant}, journal={stock_journal} "
+            f"(journal incomplet, non corrigé)"
+        )
+    elif a_diverge:
         logger.warning(
             f"🔧 Divergence stock détectée pour {article.code} — "
             f"stocké={stock_avant}, journal={stock_journal} → correction"
         )
         article.quantite_stock = stock_journal
-        article.save(update_fields=['quantite_stock'])
+        # Article.save() incrémente version (stock modifié): la correction part aux terminaux
+        # qui synchronisent par version, comme celles de reconciliation._corriger
+        article.save(update_fields=['quantite_stock', 'version', 'last_updated'])
 
     return stock_journal, stock_avant, a_diverge
 
@@ -178,16 +223,16 @@ def pos_status_simple(request):
             request.META.get('HTTP_DEVICE_SERIAL')
         )
     boutique = None
-    terminal = None
     try:
+        # Réglages de la boutique depuis le cache des paramètres (pas de requête en régime établi)
         if boutique_id:
-            boutique = get_object_or_404(Boutique, id=boutique_id)
+            boutique = parametres_boutique(boutique_id)
         elif numero_serie:
-            terminal = Client.objects.select_related('boutique').filter(
+            terminal_boutique_id = Client.objects.filter(
                 numero_serie=numero_serie
-            ).first()
-            if terminal and terminal.boutique:
-                boutique = terminal.boutique
+            ).values_list('boutique_id', flat=True).first()
+            if terminal_boutique_id:
+                boutique = parametres_boutique(terminal_boutique_id)
         if not boutique:
             return Response({
                 'success': False,
@@ -321,7 +366,7 @@ def articles_by_serial_simple(request, numero_serie):
             'count': articles.count(),
             'boutique_id': boutique.id,
             'boutique_nom': boutique.nom,
-            'taux_dollar': str(boutique.commercant.taux_dollar),
+            'taux_dollar': str(parametres_boutique(boutique.id).taux_dollar_commercant),
             'terminal': {
                 'numero_serie': terminal.numero_serie,
                 'nom_terminal': terminal.nom_terminal
@@ -341,6 +386,7 @@ def articles_by_serial_simple(request, numero_serie):
 
 @api_view(['GET'])
 @permission_classes([AllowAny])
+@renderer_classes(list(api_settings.DEFAULT_RENDERER_CLASSES) + CATALOGUE_RENDERERS)
 def articles_list_simple(request):
     """
     Liste des articles d'une boutique (sans authentification)
@@ -351,6 +397,10 @@ def articles_list_simple(request):
     Synchronisation incrémentale:
     - ?since=2026-03-14T10:00:00 : Retourne uniquement les articles modifiés depuis cette date
     - ?version=5 : Retourne uniquement les articles avec version > 5
+
+    Format compact (faible débit), via l'en-tête Accept:
+    - application/vnd.gestion.catalogue+json ou +msgpack : colonnes (services/catalogue.py),
+      compressées gzip/brotli selon Accept-Encoding
     """
     boutique_id = request.GET.get('boutique_id')
     since = request.GET.get('since')  # ✨ NOUVEAU: Sync incrémentale par date
@@ -404,8 +454,6 @@ def articles_list_simple(request):
             boutique=boutique,
             est_actif=True,
             est_valide_client=True  # Seuls les articles validés sont disponibles à la vente
-        ).select_related('categorie').prefetch_related(
-            Prefetch('variantes', queryset=VarianteArticle.objects.filter(est_actif=True))
         )
         
         # ✨ SYNC INCRÉMENTALE: Filtrer par date de modification
@@ -429,17 +477,31 @@ def articles_list_simple(request):
         
         articles = articles.order_by('nom')
         
-        # Sérialiser les articles avec variantes (code-barres inclus pour le scan)
-        articles_data = ArticleAvecVariantesSerializer(articles, many=True, context={'request': request}).data
+        if isinstance(request.accepted_renderer, tuple(CATALOGUE_RENDERERS)):
+            # Format compact: colonnes + dictionnaires, prix numériques
+            variantes = VarianteArticle.objects.filter(
+                article_parent__in=articles.values('id'), est_actif=True
+            ).order_by('article_parent_id', 'id')
+            contenu = catalogue_colonnes(articles, variantes, request)
+            nb_articles = contenu['articles']['lignes']
+            taux_dollar = float(parametres_boutique(boutique.id).taux_dollar_commercant)
+        else:
+            # Sérialiser les articles avec variantes (code-barres inclus pour le scan)
+            articles = articles.select_related('categorie').prefetch_related(
+                Prefetch('variantes', queryset=VarianteArticle.objects.filter(est_actif=True))
+            )
+            contenu = {'articles': ArticleAvecVariantesSerializer(articles, many=True, context={'request': request}).data}
+            nb_articles = articles.count()
+            taux_dollar = str(parametres_boutique(boutique.id).taux_dollar_commercant)
         
         # Enrichir la réponse avec métadonnées de sync
         response_data = {
             'success': True,
-            'count': articles.count(),
+            'count': nb_articles,
             'boutique_id': boutique.id,
             'boutique_nom': boutique.nom,
-            'taux_dollar': str(boutique.commercant.taux_dollar),
-            'articles': articles_data,
+            'taux_dollar': taux_dollar,
+            **contenu,
             'sync_metadata': {
                 'is_incremental': bool(since or version_min),
                 'since': since,
@@ -557,6 +619,7 @@ def articles_pending_validation(request):
 
 @api_view(['POST'])
 @permission_classes([AllowAny])
+@resume_api('valider_article')
 def valider_article(request):
     """
     Valider un article depuis le client MAUI
@@ -570,7 +633,8 @@ def valider_article(request):
     }
     """
     data = request.data
-    logger.info(f"📋 Validation article - raw data: {dict(data) if hasattr(data, 'items') else data}, content_type={request.content_type}")
+    resume = request.resume_api
+    logger.debug("📋 Validation article - raw data: %s, content_type=%s", data, request.content_type)
     
     # Accepter snake_case ET camelCase
     article_id = data.get('article_id') or data.get('articleId')
@@ -607,9 +671,9 @@ def valider_article(request):
                 if terminal and terminal.boutique:
                     boutique_id = terminal.boutique.id
             except Exception as e:
-                logger.error(f"Erreur recherche terminal: {str(e)}")
+                logger.error("Erreur recherche terminal: %s", e)
     
-    logger.info(f"📋 Validation article: article_id={article_id}, quantite={quantite_validee}, boutique_id={boutique_id} (raw={raw_boutique_id})")
+    resume.ajouter(article_id=article_id, quantite=quantite_validee, boutique_id=boutique_id)
     
     if not article_id:
         return Response({
@@ -633,7 +697,7 @@ def valider_article(request):
         # ⚠️ PROTECTION CONTRE VALIDATION MULTIPLE
         # Si l'article est déjà validé ET pas de quantité en attente, ignorer silencieusement
         if article.est_valide_client and article.quantite_envoyee == 0:
-            logger.warning(f"⚠️ Tentative de re-validation ignorée pour article {article.code} (déjà validé)")
+            resume.ajouter(deja_valide=True)
             return Response({
                 'success': True,
                 'message': f'Article "{article.nom}" déjà validé',
@@ -657,7 +721,8 @@ def valider_article(request):
         # Si MAUI a envoyé une quantité différente, logger pour debug mais utiliser la valeur serveur
         qte_maui = int(quantite_validee) if quantite_validee else 0
         if qte_maui != qte_a_ajouter and qte_a_ajouter > 0:
-            logger.warning(f"⚠️ Différence quantité: MAUI={qte_maui}, Serveur={qte_a_ajouter} - Utilisation valeur serveur")
+            resume.ajouter(quantite_maui=qte_maui)
+            logger.warning("⚠️ Différence quantité: MAUI=%s, Serveur=%s - Utilisation valeur serveur", qte_maui, qte_a_ajouter)
         
         # Ajouter la quantité en attente au stock (pas la valeur MAUI)
         article.quantite_stock += qte_a_ajouter
@@ -680,7 +745,7 @@ def valider_article(request):
                 commentaire=f"Validation client: {qte_a_ajouter} unités reçues"
             )
         
-        logger.info(f"✅ Article {article.code} validé - Quantité ajoutée: {qte_a_ajouter}, Stock: {stock_avant} → {article.quantite_stock}")
+        resume.ajouter(quantite_ajoutee=qte_a_ajouter, stock_avant=stock_avant, stock_apres=article.quantite_stock)
 
         # 🔔 WebSocket: notifier tous les POS que l'article est validé et dispo
         notify_article_updated(article.boutique.id, article)
@@ -704,7 +769,7 @@ def valider_article(request):
             'code': 'ARTICLE_NOT_FOUND'
         }, status=status.HTTP_404_NOT_FOUND)
     except Exception as e:
-        logger.error(f"Erreur validation article: {str(e)}")
+        logger.exception("Erreur validation article: %s", e)
         return Response({
             'error': 'Erreur interne du serveur',
             'code': 'INTERNAL_ERROR'
@@ -1080,6 +1145,8 @@ def categories_list_simple(request):
 
 @api_view(['POST'])
 @permission_classes([AllowAny])
+@resume_api('create_vente_simple')
+@idempotent('create_vente_simple', cle_vente)
 def create_vente_simple(request):
     """
     Créer une vente (sans authentification)
@@ -1087,9 +1154,8 @@ def create_vente_simple(request):
     1. Par boutique_id + numero_serie dans le body
     2. Par numéro de série dans le header X-Device-Serial
     """
-    # Logs de debug
-    logger.info(f"🔍 Création vente - Headers: {dict(request.headers)}")
-    logger.info(f"🔍 Création vente - Body: {request.data}")
+    resume = request.resume_api
+    logger.debug("🔍 Création vente - Headers: %s Body: %s", request.headers, request.data)
     
     boutique_id = request.data.get('boutique_id')
     numero_serie = request.data.get('numero_serie')
@@ -1103,12 +1169,10 @@ def create_vente_simple(request):
             request.META.get('HTTP_X_DEVICE_SERIAL') or
             request.META.get('HTTP_DEVICE_SERIAL')
         )
-        logger.info(f"🔍 Numéro série détecté dans headers: {numero_serie}")
-    else:
-        logger.info(f"🔍 Numéro série dans body: {numero_serie}")
+    resume.ajouter(terminal=numero_serie)
     
     if not numero_serie:
-        logger.warning(f"⚠️ Aucun numéro de série trouvé - Headers: {list(request.headers.keys())}")
+        logger.warning("⚠️ Aucun numéro de série trouvé - Headers: %s", list(request.headers.keys()))
         return Response({
             'error': 'Paramètre numero_serie requis (body ou header)',
             'code': 'MISSING_SERIAL',
@@ -1132,7 +1196,6 @@ def create_vente_simple(request):
             
             if terminal and terminal.boutique:
                 boutique_id = terminal.boutique.id
-                logger.info(f"✅ Boutique détectée automatiquement: {boutique_id} pour terminal {numero_serie}")
             else:
                 return Response({
                     'error': 'Terminal non trouvé ou sans boutique',
@@ -1173,7 +1236,8 @@ def create_vente_simple(request):
             from datetime import datetime
             timestamp = datetime.now().strftime('%Y%m%d%H%M%S')
             numero_facture = f"VENTE-{boutique.id}-{timestamp}"
-            logger.info(f"📝 Numéro de facture généré automatiquement: {numero_facture}")
+            logger.debug("📝 Numéro de facture généré automatiquement: %s", numero_facture)
+        resume.ajouter(boutique_id=boutique.id, numero_facture=numero_facture)
         
         # ⭐ TRANSACTION ATOMIQUE : Tout ou rien
         with transaction.atomic():
@@ -1208,9 +1272,9 @@ def create_vente_simple(request):
                 date_vente = now_check
             elif date_vente.date() != now_check.date() and ecart_minutes < -60:
                 jours_ecart = (now_check.date() - date_vente.date()).days
-                logger.info(
-                    f"📅 SYNC RETARDÉE: Vente {numero_facture} datée du {date_vente.strftime('%d/%m/%Y %H:%M')} "
-                    f"(synchro {jours_ecart} jour(s) après) — date de vente conservée")
+                logger.debug(
+                    "📅 SYNC RETARDÉE: Vente %s datée du %s (synchro %s jour(s) après) — date de vente conservée",
+                    numero_facture, date_vente, jours_ecart)
             
             # Déterminer la devise de la vente
             devise_vente = vente_data.get('devise', 'CDF')
@@ -1228,27 +1292,35 @@ def create_vente_simple(request):
                 adresse_ip_client=request.META.get('REMOTE_ADDR'),
                 version_app_maui=terminal.version_app_maui
             )
-            logger.info(f"✅ Vente créée avec boutique: {boutique.nom} (ID: {boutique.id})")
+            logger.debug("✅ Vente %s créée (boutique %s)", numero_facture, boutique.id)
             
             montant_total = 0
             montant_total_usd = 0
             lignes_creees = []
+            lignes_data = vente_data.get('lignes', [])
+
+            # Articles de la vente en une requête, sans verrou: le stock est décrémenté
+            # après la boucle en un seul UPDATE atomique (services.stock)
+            articles = {
+                str(a.id): a for a in Article.objects.filter(
+                    id__in=[l.get('article_id') for l in lignes_data if l.get('article_id')],
+                    boutique=boutique,
+                    est_actif=True
+                )
+            }
+            sorties = []
+            deja_sortis = sorties_deja_journalisees(numero_facture)
             
             # Traiter chaque ligne de vente
-            for ligne_data in vente_data.get('lignes', []):
+            for ligne_data in lignes_data:
                 article_id = ligne_data.get('article_id')
                 variante_id = ligne_data.get('variante_id')
                 quantite = ligne_data.get('quantite', 1)
+                resume.incr('lignes')
                 
                 # Vérifier que l'article appartient à la boutique
-                # ⭐ select_for_update() : verrouille la ligne pendant la transaction (anti race-condition)
-                try:
-                    article = Article.objects.select_for_update().get(
-                        id=article_id,
-                        boutique=boutique,
-                        est_actif=True
-                    )
-                except Article.DoesNotExist:
+                article = articles.get(str(article_id))
+                if article is None:
                     raise Exception(f'Article {article_id} non trouvé dans cette boutique')
                 
                 # 🏷️ Récupérer la variante si spécifiée
@@ -1260,15 +1332,11 @@ def create_vente_simple(request):
                             article_parent=article,
                             est_actif=True
                         )
-                        logger.info(f"🏷️ Variante trouvée: {variante.nom_complet} (stock parent: {article.quantite_stock})")
+                        logger.debug("🏷️ Variante trouvée: %s (stock parent: %s)", variante.nom_complet, article.quantite_stock)
                     except VarianteArticle.DoesNotExist:
-                        logger.warning(f"⚠️ Variante {variante_id} non trouvée pour article {article.nom}, vente sur article parent")
+                        logger.warning("⚠️ Variante %s non trouvée pour article %s, vente sur article parent", variante_id, article.nom)
                 
-                # Vérifier le stock (avertissement seulement — la vente est toujours enregistrée)
                 nom_article = variante.nom_complet if variante else article.nom
-                stock_sera_negatif = article.quantite_stock < quantite
-                if stock_sera_negatif:
-                    logger.warning(f"⚠️ Stock insuffisant: {nom_article} dispo={article.quantite_stock} demandé={quantite} → stock négatif accepté")
 
                 # Créer la ligne de vente avec support USD
                 devise_ligne = ligne_data.get('devise', devise_vente)
@@ -1284,7 +1352,7 @@ def create_vente_simple(request):
                         0
                     )
                     prix_unitaire = 0  # Pas de CDF pour vente USD
-                    logger.info(f"💵 Ligne USD: prix_unitaire_usd={prix_unitaire_usd}")
+                    logger.debug("💵 Ligne USD: prix_unitaire_usd=%s", prix_unitaire_usd)
                 else:
                     # Pour vente CDF: utiliser prix_unitaire comme prix principal
                     prix_unitaire = ligne_data.get('prix_unitaire') or article.prix_vente
@@ -1305,7 +1373,7 @@ def create_vente_simple(request):
                     prix_unit_decimal = float(prix_unitaire if devise_ligne != 'USD' else prix_unitaire_usd)
                     if abs(prix_orig_decimal - prix_unit_decimal) > 0.01:
                         est_negocie = True
-                        logger.info(f"💰 RÉDUCTION DÉTECTÉE: {article.nom} - Original: {prix_orig_decimal} → Vendu: {prix_unit_decimal}")
+                        logger.debug("💰 RÉDUCTION DÉTECTÉE: %s - Original: %s → Vendu: %s", article.nom, prix_orig_decimal, prix_unit_decimal)
                 except (ValueError, TypeError):
                     pass
                 
@@ -1349,63 +1417,27 @@ def create_vente_simple(request):
 
                 # ⭐ JOURNAL: Dedup — évite double réduction de stock (idempotence)
                 # NOTE: montant_total est déjà accumulé ci-dessus, on ne saute que le stock
-                # ⭐ FIX: Inclure commentaire variante pour distinguer 2 variantes du même parent
-                commentaire_stock_prefix = f"Vente #{vente.numero_facture} - Variante: {variante.nom_variante}" if variante else f"Vente #{vente.numero_facture} - Prix:"
-                dedup_filter = {
-                    'reference_document': vente.numero_facture,
-                    'article': article,
-                    'type_mouvement': 'VENTE',
-                }
-                if variante:
-                    dedup_filter['commentaire__contains'] = f"Variante: {variante.nom_variante}"
-                if MouvementStock.objects.filter(**dedup_filter).exists():
-                    logger.warning(f"⚠️ Doublon MouvementStock: {vente.numero_facture} / {article.nom} (variante: {variante.nom_variante if variante else 'N/A'}) — skip stock only")
+                # Variante distinguée par son id: 2 variantes du même parent = 2 sorties
+                cle_sortie = (article.id, variante.id) if variante else article.id
+                if sortie_deja_journalisee(deja_sortis, article, variante):
+                    resume.incr('doublons_mouvement')
+                    logger.debug("⚠️ Doublon MouvementStock: %s / %s — skip stock only", vente.numero_facture, nom_article)
                     continue
 
-                # Stock TOUJOURS sur le parent (variants = identifiants uniquement)
-                stock_avant = article.quantite_stock
-                article.quantite_stock -= quantite
-                article.save(update_fields=['quantite_stock'])
-
-                # Log avec info variant si applicable
                 if variante:
-                    logger.info(f"🏷️ Vente variant {variante.nom_complet}: Stock parent {stock_avant} → {article.quantite_stock}")
                     commentaire_stock = f"Vente #{vente.numero_facture} - Variante: {variante.nom_variante} - Prix: {prix_affiche} {symbole_devise}"
                 else:
                     commentaire_stock = f"Vente #{vente.numero_facture} - Prix: {prix_affiche} {symbole_devise}"
+                deja_sortis.update({article.id, cle_sortie})
+                sorties.append({
+                    'article': article,
+                    'variante': variante,
+                    'quantite': quantite,
+                    'commentaire': commentaire_stock,
+                })
 
-                MouvementStock.objects.create(
-                    article=article,
-                    type_mouvement='VENTE',
-                    quantite=-quantite,
-                    stock_avant=stock_avant,
-                    stock_apres=article.quantite_stock,
-                    reference_document=vente.numero_facture,
-                    utilisateur=terminal.nom_terminal,
-                    commentaire=commentaire_stock
-                )
-
-                # 🔔 WebSocket: notifier tous les POS du nouveau stock
-                notify_stock_updated(boutique.id, article.id, article.quantite_stock)
-
-                # ⚠️ AlerteStock si le stock est devenu négatif
-                if stock_sera_negatif:
-                    AlerteStock.objects.create(
-                        vente=vente,
-                        boutique=boutique,
-                        terminal=terminal,
-                        article=article,
-                        variante=variante,
-                        quantite_vendue=quantite,
-                        stock_serveur_avant=stock_avant,
-                        stock_serveur_apres=article.quantite_stock,
-                        ecart=stock_avant - quantite,
-                        numero_facture=vente.numero_facture
-                    )
-                    logger.warning(f"🚨 ALERTE STOCK: {nom_article} stock={article.quantite_stock}")
-            
             # Mettre à jour le montant total de la vente
-            logger.info(f"💰 Montant total calculé: {montant_total} CDF / {montant_total_usd} USD (devise: {devise_vente})")
+            logger.debug("💰 Montant total calculé: %s CDF / %s USD (devise: %s)", montant_total, montant_total_usd, devise_vente)
             vente.montant_total = montant_total
             
             # ⭐ Toujours sauvegarder montant_total_usd pour ventes USD
@@ -1419,11 +1451,20 @@ def create_vente_simple(request):
                     vente.save(update_fields=['montant_total', 'montant_total_usd'])
                 else:
                     vente.save(update_fields=['montant_total'])
-            logger.info(f"✅ Montant sauvegardé: {vente.montant_total} {vente.devise}")
-            
-            # Vérification de sécurité - Recharger depuis la base
-            vente.refresh_from_db()
-            logger.info(f"🔍 Vérification après reload: {vente.montant_total} CDF")
+            resume.ajouter(montant_total=str(montant_total), devise=devise_vente)
+            logger.debug("✅ Montant sauvegardé: %s %s", vente.montant_total, vente.devise)
+
+            # ⭐ Stock TOUJOURS sur le parent (variants = identifiants uniquement), écrit en dernier:
+            # l'UPDATE verrouille le parent jusqu'au commit. Un seul UPDATE pour toute la vente,
+            # puis MouvementStock + AlerteStock (stock négatif accepté)
+            enregistrer_sorties_vente(vente, sorties, terminal.nom_terminal, boutique=boutique, terminal=terminal)
+            for sortie in sorties:
+                if sortie['stock_avant'] < sortie['quantite']:
+                    resume.incr('stock_negatif')
+                    logger.debug("🚨 ALERTE STOCK: %s stock=%s", sortie['article'].nom, sortie['stock_apres'])
+
+            # 🔔 WebSocket après commit (hors verrou): notifier tous les POS du nouveau stock
+            notifier_stocks_apres_commit(boutique.id, sorties)
         
         # Retourner le stock réel après vente pour que le POS synchronise son SQLite
         articles_vendus_ids = {ligne.get('article_id') for ligne in lignes_creees if ligne.get('article_id')}
@@ -1464,7 +1505,8 @@ def create_vente_simple(request):
         numero_facture = request.data.get('numero_facture')
         vente_existante = Vente.objects.filter(numero_facture=numero_facture).first()
         if vente_existante:
-            logger.info(f"✅ Vente {numero_facture} déjà enregistrée (doublon idempotent) → 200")
+            resume.ajouter(deja_presente=True)
+            logger.debug("✅ Vente %s déjà enregistrée (doublon idempotent) → 200", numero_facture)
             return Response({
                 'success': True,
                 'already_exists': True,
@@ -1482,11 +1524,9 @@ def create_vente_simple(request):
         }, status=status.HTTP_409_CONFLICT)
 
     except Exception as e:
-        import traceback
-        error_details = traceback.format_exc()
-        logger.error(f"❌ Erreur lors de la création de la vente: {str(e)}")
-        logger.error(f"❌ Traceback complet:\n{error_details}")
-        logger.error(f"❌ Données reçues: {request.data}")
+        resume.erreur('INTERNAL_ERROR')
+        logger.exception("❌ Erreur lors de la création de la vente: %s", e)
+        logger.debug("❌ Données reçues: %s", request.data)
         
         return Response({
             'error': f'Erreur lors de la création de la vente: {str(e)}',
@@ -1653,7 +1693,7 @@ def statistiques_boutique_simple(request):
 
         # ⭐ Recette jour/mois via _compute_dashboard_stats :
         #    - filtre paye=True, est_annulee=False
-        #    - inclut boutique ET client_maui__boutique (ventes MAUI)
+        #    - Vente.boutique (toujours renseignée, y compris ventes MAUI)
         #    - timezone-aware
         #    - déduit les dépenses du RapportCaisse
         dashboard = _compute_dashboard_stats(boutique)
@@ -1661,15 +1701,9 @@ def statistiques_boutique_simple(request):
         # Nombre de ventes jour/mois (paye=True, non annulées, boutique + MAUI)
         aujourd_hui = timezone.now().date()
         debut_mois = aujourd_hui.replace(day=1)
-        ventes_base = Q(paye=True, est_annulee=False) & (
-            Q(boutique=boutique) | Q(client_maui__boutique=boutique)
-        )
-        nb_ventes_jour = Vente.objects.filter(
-            ventes_base, date_vente__date=aujourd_hui
-        ).distinct().count()
-        nb_ventes_mois = Vente.objects.filter(
-            ventes_base, date_vente__date__gte=debut_mois
-        ).distinct().count()
+        ventes_base = Vente.objects.de_boutique(boutique).filter(paye=True, est_annulee=False)
+        nb_ventes_jour = ventes_base.filter(date_vente__date=aujourd_hui).count()
+        nb_ventes_mois = ventes_base.filter(date_vente__date__gte=debut_mois).count()
 
         # Articles en stock bas
         articles_stock_bas = Article.objects.filter(
@@ -1833,6 +1867,8 @@ def update_stock_simple(request, article_id):
 
 @api_view(['POST'])
 @permission_classes([AllowAny])
+@resume_api('sync_ventes_simple')
+@idempotent('sync_ventes_simple', cle_lot_ventes)
 def sync_ventes_simple(request):
     """
     Synchronisation de plusieurs ventes depuis MAUI (sans authentification)
@@ -1854,35 +1890,30 @@ def sync_ventes_simple(request):
         }
     ]
     """
+    resume = request.resume_api
     try:
         # ⭐ CORRECTION CHUNKED ENCODING: Lire le body brut si request.data est vide
         # Django runserver ne gère pas bien Transfer-Encoding: chunked
         raw_body = request.body
+        resume.ajouter(octets=len(raw_body) if raw_body else 0)
         
-        # Logging conditionnel (seulement en mode DEBUG)
-        from django.conf import settings
-        if settings.DEBUG:
-            logger.debug(f"🔍 === SYNC VENTES ===")
-            logger.debug(f"🔍 Content-Type: {request.content_type}")
-            logger.debug(f"🔍 Body length: {len(raw_body) if raw_body else 0} bytes")
-            if raw_body and len(raw_body) < 2000:
-                logger.debug(f"🔍 Body: {raw_body.decode('utf-8', errors='ignore')}")
+        # Détail du payload uniquement en DEBUG (formatage paresseux)
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("🔍 SYNC VENTES Content-Type=%s body=%.2000s",
+                         request.content_type, raw_body.decode('utf-8', errors='ignore') if raw_body else '')
         
         # Parser le JSON depuis le body brut si request.data est vide
         import json
         if raw_body and (not request.data or (isinstance(request.data, dict) and len(request.data) == 0)):
             try:
                 parsed_data = json.loads(raw_body.decode('utf-8'))
-                logger.info(f"✅ Body parsé manuellement: {type(parsed_data)}")
-                logger.info(f"✅ Clés trouvées: {list(parsed_data.keys()) if isinstance(parsed_data, dict) else 'list'}")
+                logger.debug("✅ Body parsé manuellement: %s", type(parsed_data))
             except json.JSONDecodeError as e:
                 logger.error(f"❌ Erreur parsing JSON: {e}")
                 parsed_data = request.data
         else:
             parsed_data = request.data
-            
-        logger.info(f"🔍 Data type final: {type(parsed_data)}")
-        logger.info(f"🔍 Data preview: {str(parsed_data)[:500] if parsed_data else 'EMPTY'}")
+
         
         # Récupérer le numéro de série du terminal depuis les headers
         numero_serie = (
@@ -1893,7 +1924,7 @@ def sync_ventes_simple(request):
             request.META.get('HTTP_DEVICE_SERIAL')
         )
         
-        logger.info(f"🔍 Numéro de série détecté: {numero_serie}")
+        resume.ajouter(terminal=numero_serie)
         
         if not numero_serie:
             logger.warning("⚠️ Tentative de synchronisation sans numéro de série")
@@ -1919,7 +1950,7 @@ def sync_ventes_simple(request):
                     'code': 'NO_BOUTIQUE'
                 }, status=status.HTTP_400_BAD_REQUEST)
                 
-            logger.info(f"🔄 Synchronisation ventes pour boutique: {boutique.nom} (Terminal: {terminal.nom_terminal})")
+            resume.ajouter(boutique_id=boutique.id)
             
         except Client.DoesNotExist:
             logger.error(f"❌ Terminal non trouvé: {numero_serie}")
@@ -1951,36 +1982,10 @@ def sync_ventes_simple(request):
         if ventes_key:
             # Format MAUI: extraire le tableau de ventes et convertir les champs
             pos_id = raw_data.get(pos_id_key) or raw_data.get('PosId') or raw_data.get('pos_id', 'N/A')
-            logger.info(f"📱 Format MAUI détecté (pos_id: {pos_id}, clé: {ventes_key})")
+            resume.ajouter(pos_id=pos_id, format='maui')
             ventes_maui = raw_data.get(ventes_key, [])
-            ventes_data = []
-            for v in ventes_maui:
-                # ⭐ Accepter PascalCase et snake_case pour chaque champ
-                vente_convertie = {
-                    'numero_facture': v.get('VenteUid') or v.get('vente_uid') or v.get('numero_facture'),
-                    'date_vente': v.get('Date') or v.get('date') or v.get('date_vente'),
-                    'montant_total': v.get('Total') or v.get('total') or v.get('montant_total'),
-                    'montant_total_usd': v.get('TotalUsd') or v.get('total_usd') or v.get('montant_total_usd'),
-                    'devise': v.get('Devise') or v.get('devise', 'CDF'),
-                    'mode_paiement': v.get('ModePaiement') or v.get('mode_paiement', 'CASH'),
-                    'paye': v.get('Paye') if 'Paye' in v else v.get('paye', True),
-                    'lignes': v.get('Items') or v.get('items') or v.get('lignes', [])
-                }
-                # ⭐ Convertir aussi les lignes (Items) en format Django
-                lignes_converties = []
-                for item in vente_convertie.get('lignes', []):
-                    ligne_convertie = {
-                        'article_id': item.get('ArticleId') if item.get('ArticleId') is not None else item.get('article_id'),
-                        'variante_id': item.get('VarianteId') if item.get('VarianteId') is not None else item.get('variante_id'),
-                        'quantite': item.get('Quantite') if item.get('Quantite') is not None else item.get('quantite'),
-                        'prix_unitaire': item.get('PrixUnitaire') if item.get('PrixUnitaire') is not None else item.get('prix_unitaire'),
-                        'prix_unitaire_usd': item.get('PrixUnitaireUsd') if item.get('PrixUnitaireUsd') is not None else item.get('prix_unitaire_usd'),
-                        'devise': item.get('Devise') or item.get('devise') or vente_convertie.get('devise', 'CDF')
-                    }
-                    lignes_converties.append(ligne_convertie)
-                vente_convertie['lignes'] = lignes_converties
-                ventes_data.append(vente_convertie)
-            logger.info(f"📱 {len(ventes_data)} ventes MAUI converties")
+            # ⭐ Accepter PascalCase et snake_case pour chaque champ (vente et lignes)
+            ventes_data = [convertir_vente_maui(v) for v in ventes_maui]
         elif isinstance(raw_data, list):
             # Format Django standard
             ventes_data = raw_data
@@ -1997,7 +2002,7 @@ def sync_ventes_simple(request):
                 'code': 'EMPTY_DATA'
             }, status=status.HTTP_400_BAD_REQUEST)
         
-        logger.info(f"📦 Nombre de ventes à synchroniser: {len(ventes_data)}")
+        resume.incr('ventes_recues', len(ventes_data))
         
         # Traiter chaque vente
         ventes_creees = []
@@ -2007,7 +2012,7 @@ def sync_ventes_simple(request):
             try:
                 # ⭐ TRANSACTION ATOMIQUE : Chaque vente est tout ou rien
                 with transaction.atomic():
-                    logger.info(f"🔄 Traitement vente {index + 1}/{len(ventes_data)}")
+                    logger.debug("🔄 Traitement vente %d/%d", index + 1, len(ventes_data))
                     
                     # ⭐ VALIDATION CRITIQUE: Vérifier le boutique_id si fourni
                     boutique_id_recu = vente_data.get('boutique_id')
@@ -2015,17 +2020,14 @@ def sync_ventes_simple(request):
                     if boutique_id_recu:
                         # Si boutique_id est fourni, vérifier qu'il correspond à la boutique du terminal
                         if int(boutique_id_recu) != boutique.id:
-                            logger.error(f"❌ SÉCURITÉ: Tentative d'accès à une autre boutique!")
-                            logger.error(f"   Terminal boutique: {boutique.id}, Demandé: {boutique_id_recu}")
+                            logger.error("❌ SÉCURITÉ: Tentative d'accès à une autre boutique (terminal=%s, demandé=%s)",
+                                         boutique.id, boutique_id_recu)
                             ventes_erreurs.append({
                                 'numero_facture': vente_data.get('numero_facture', f'vente_{index}'),
                                 'erreur': 'Accès refusé: boutique non autorisée',
                                 'code': 'BOUTIQUE_MISMATCH'
                             })
                             continue
-                        logger.info(f"✅ Boutique ID validé: {boutique_id_recu}")
-                    else:
-                        logger.info(f"ℹ️ Boutique ID non fourni, utilisation de la boutique du terminal: {boutique.id}")
                     
                     # Générer le numéro de facture si absent
                     numero_facture = vente_data.get('numero_facture')
@@ -2033,7 +2035,7 @@ def sync_ventes_simple(request):
                         from datetime import datetime
                         timestamp = datetime.now().strftime('%Y%m%d%H%M%S')
                         numero_facture = f"VENTE-{boutique.id}-{timestamp}-{index}"
-                        logger.info(f"📝 Numéro de facture généré: {numero_facture}")
+                        logger.debug("📝 Numéro de facture généré: %s", numero_facture)
                     
                     # ⭐ Vérifier si la vente existe déjà GLOBALEMENT (contrainte unique)
                     vente_existante = Vente.objects.filter(
@@ -2041,7 +2043,8 @@ def sync_ventes_simple(request):
                     ).first()
                     
                     if vente_existante:
-                        logger.warning(f"⚠️ Vente {numero_facture} existe déjà (ID: {vente_existante.id}, boutique: {vente_existante.boutique_id})")
+                        logger.warning("⚠️ Vente %s existe déjà (ID: %s, boutique: %s)",
+                                       numero_facture, vente_existante.id, vente_existante.boutique_id)
                         ventes_erreurs.append({
                             'numero_facture': numero_facture,
                             'erreur': 'Vente déjà existante',
@@ -2053,41 +2056,8 @@ def sync_ventes_simple(request):
                     # ⭐ CRÉER LA VENTE AVEC ISOLATION STRICTE
                     # La date utilisée est celle de la VENTE (envoyée par MAUI), PAS la date de synchronisation.
                     # Cela permet de synchroniser des ventes faites J-1 ou J-2 avec la bonne date.
-                    date_str = vente_data.get('date_vente') or vente_data.get('date')
-                    if date_str:
-                        date_vente = parse_datetime(date_str)
-                        if date_vente is None:
-                            logger.warning(f"⚠️ Date invalide reçue: '{date_str}' → fallback timezone.now()")
-                            date_vente = timezone.now()
-                        elif timezone.is_naive(date_vente):
-                            # Interpréter la date naïve comme étant dans le timezone de Django (Africa/Kinshasa)
-                            date_vente = timezone.make_aware(date_vente)
-                        else:
-                            # Si la date est déjà aware, s'assurer qu'elle est dans le bon timezone
-                            date_vente = date_vente.astimezone(timezone.get_current_timezone())
-                    else:
-                        logger.warning(f"⚠️ Aucune date fournie pour vente {numero_facture} → fallback timezone.now()")
-                        date_vente = timezone.now()
-                    
-                    # ⭐ AUTO-CORRECTION HORLOGE: Si date_vente est dans le futur (>30min),
-                    # c'est un décalage d'horloge de l'appareil → corriger avec l'heure serveur.
-                    # Si date_vente est dans le passé, c'est une sync retardée légitime → conserver.
-                    now = timezone.now()
-                    ecart_minutes = (date_vente - now).total_seconds() / 60
-                    
-                    if ecart_minutes > 30:
-                        # Date dans le futur = horloge appareil en avance
-                        logger.warning(
-                            f"⏰ HORLOGE DÉCALÉE: Vente {numero_facture} datée {date_vente.strftime('%d/%m/%Y %H:%M')} "
-                            f"mais serveur={now.strftime('%d/%m/%Y %H:%M')} (décalage +{ecart_minutes:.0f}min) "
-                            f"→ AUTO-CORRECTION à {now.strftime('%H:%M')}")
-                        date_vente = now
-                    elif date_vente.date() != now.date() and ecart_minutes < -60:
-                        # Date dans le passé (>1h) = sync retardée légitime
-                        jours_ecart = (now.date() - date_vente.date()).days
-                        logger.info(
-                            f"📅 SYNC RETARDÉE: Vente {numero_facture} datée du {date_vente.strftime('%d/%m/%Y %H:%M')} "
-                            f"(synchro {jours_ecart} jour(s) après) — date de vente conservée")
+                    # (horloge de l'appareil en avance > 30 min: corrigée à l'heure serveur)
+                    date_vente = date_vente_corrigee(vente_data, numero_facture)
                     
                     # Déterminer la devise de la vente
                     devise_vente = vente_data.get('devise', 'CDF')
@@ -2105,27 +2075,34 @@ def sync_ventes_simple(request):
                         adresse_ip_client=request.META.get('REMOTE_ADDR'),
                         version_app_maui=terminal.version_app_maui
                     )
-                    logger.info(f"✅ Vente créée: {numero_facture} (ID: {vente.id}) → Boutique {boutique.nom} (ID: {boutique.id}) - Devise: {devise_vente}")
+                    logger.debug("✅ Vente créée: %s (ID: %s) - Devise: %s", numero_facture, vente.id, devise_vente)
                     
                     montant_total = 0
                     montant_total_usd = 0
                     lignes_creees = []
+                    lignes_data = vente_data.get('lignes', [])
+
+                    # Articles de la vente en une requête, sans verrou: le stock est décrémenté
+                    # après la boucle en un seul UPDATE atomique (services.stock)
+                    articles = {
+                        str(a.id): a for a in Article.objects.filter(
+                            id__in=[l.get('article_id') for l in lignes_data if l.get('article_id')],
+                            boutique=boutique,
+                            est_actif=True
+                        )
+                    }
+                    sorties = []
+                    deja_sortis = sorties_deja_journalisees(numero_facture)
                     
                     # Traiter chaque ligne de vente
-                    for ligne_data in vente_data.get('lignes', []):
+                    for ligne_data in lignes_data:
                         article_id = ligne_data.get('article_id')
                         variante_id = ligne_data.get('variante_id')
                         quantite = ligne_data.get('quantite', 1)
                         
                         # Vérifier que l'article appartient à la boutique
-                        # ⭐ select_for_update() : verrouille la ligne pendant la transaction (anti race-condition)
-                        try:
-                            article = Article.objects.select_for_update().get(
-                                id=article_id,
-                                boutique=boutique,
-                                est_actif=True
-                            )
-                        except Article.DoesNotExist:
+                        article = articles.get(str(article_id))
+                        if article is None:
                             raise ValueError(f'ARTICLE_NOT_FOUND|{article_id}||0|0|Article {article_id} non trouvé dans cette boutique')
                         
                         # 🏷️ Récupérer la variante si spécifiée
@@ -2137,40 +2114,19 @@ def sync_ventes_simple(request):
                                     article_parent=article,
                                     est_actif=True
                                 )
-                                logger.info(f"🏷️ Variante trouvée: {variante.nom_complet} (stock parent: {article.quantite_stock})")
+                                logger.debug("🏷️ Variante trouvée: %s (stock parent: %s)", variante, article.quantite_stock)
                             except VarianteArticle.DoesNotExist:
-                                logger.warning(f"⚠️ Variante {variante_id} non trouvée pour article {article.nom}, vente sur article parent")
+                                logger.warning("⚠️ Variante %s non trouvée pour article %s, vente sur article parent", variante_id, article.id)
                         
-                        # ⭐ Vérifier le stock (avertissement seulement — la vente est toujours enregistrée)
-                        nom_article_vente = variante.nom_complet if variante else article.nom
-                        stock_sera_negatif = article.quantite_stock < quantite
-                        if stock_sera_negatif:
-                            logger.warning(f"⚠️ Stock insuffisant: {nom_article_vente} dispo={article.quantite_stock} demandé={quantite} → stock négatif accepté")
-
                         # Créer la ligne de vente avec support USD
                         prix_unitaire = ligne_data.get('prix_unitaire', article.prix_vente)
                         prix_unitaire_usd = ligne_data.get('prix_unitaire_usd') or article.prix_vente_usd
                         devise_ligne = ligne_data.get('devise', devise_vente)
                         
-                        # 💰 Gérer les négociations
-                        prix_original = ligne_data.get('prix_original') or ligne_data.get('prixOriginal')
-                        est_negocie = ligne_data.get('est_negocie') or ligne_data.get('estNegocie', False)
-                        motif_reduction = ligne_data.get('motif_reduction') or ligne_data.get('motifReduction') or ''
-                        
-                        # 🔍 Auto-détection: si prix_original non fourni, utiliser le prix de l'article
-                        if not prix_original:
-                            prix_original = float(article.prix_vente)
-                        
-                        # Auto-détection si prix négocié (prix différent du prix original)
-                        try:
-                            prix_orig_decimal = float(prix_original)
-                            prix_unit_decimal = float(prix_unitaire)
-                            if abs(prix_orig_decimal - prix_unit_decimal) > 0.01:
-                                est_negocie = True
-                                logger.info(f"💰 RÉDUCTION DÉTECTÉE: {article.nom} - Original: {prix_orig_decimal} → Vendu: {prix_unit_decimal}")
-                        except (ValueError, TypeError):
-                            pass
+                        # 💰 Gérer les négociations (auto-détection si prix différent du prix article)
+                        prix_original, est_negocie, motif_reduction = detecter_negociation(ligne_data, article, prix_unitaire)
                         
+                        resume.incr('lignes')
                         ligne_vente = LigneVente.objects.create(
                             vente=vente,
                             article=article,
@@ -2200,57 +2156,26 @@ def sync_ventes_simple(request):
 
                         # ⭐ JOURNAL: Dedup — évite double réduction de stock (idempotence)
                         # NOTE: montant_total est déjà accumulé ci-dessus, on ne saute que le stock
-                        # ⭐ FIX: Inclure commentaire variante pour distinguer 2 variantes du même parent
-                        dedup_filter = {
-                            'reference_document': vente.numero_facture,
-                            'article': article,
-                            'type_mouvement': 'VENTE',
-                        }
-                        if variante:
-                            dedup_filter['commentaire__contains'] = f"Variante: {variante.nom_variante}"
-                        if MouvementStock.objects.filter(**dedup_filter).exists():
-                            logger.warning(f"⚠️ Doublon MouvementStock: {vente.numero_facture} / {article.nom} (variante: {variante.nom_variante if variante else 'N/A'}) — skip stock only")
+                        # Variante distinguée par son id: 2 variantes du même parent = 2 sorties
+                        cle_sortie = (article.id, variante.id) if variante else article.id
+                        if sortie_deja_journalisee(deja_sortis, article, variante):
+                            resume.incr('doublons_mouvement')
+                            logger.warning("⚠️ Doublon MouvementStock: %s / article %s (variante: %s) — skip stock only",
+                                           vente.numero_facture, article.id, variante_id or 'N/A')
                             continue
 
-                        stock_avant = article.quantite_stock
-                        article.quantite_stock -= quantite
-                        article.save(update_fields=['quantite_stock'])
-
                         if variante:
                             commentaire_stock = f"Vente #{vente.numero_facture} - Variante: {variante.nom_variante} - Prix: {prix_unitaire} CDF"
                         else:
                             commentaire_stock = f"Vente #{vente.numero_facture} - Prix: {prix_unitaire} CDF"
+                        deja_sortis.update({article.id, cle_sortie})
+                        sorties.append({
+                            'article': article,
+                            'variante': variante,
+                            'quantite': quantite,
+                            'commentaire': commentaire_stock,
+                        })
 
-                        MouvementStock.objects.create(
-                            article=article,
-                            type_mouvement='VENTE',
-                            quantite=-quantite,
-                            stock_avant=stock_avant,
-                            stock_apres=article.quantite_stock,
-                            reference_document=vente.numero_facture,
-                            utilisateur=terminal.nom_terminal,
-                            commentaire=commentaire_stock
-                        )
-
-                        # 🔔 WebSocket: notifier tous les POS du nouveau stock
-                        notify_stock_updated(boutique.id, article.id, article.quantite_stock)
-
-                        # ⚠️ AlerteStock si le stock est devenu négatif
-                        if stock_sera_negatif:
-                            AlerteStock.objects.create(
-                                vente=vente,
-                                boutique=boutique,
-                                terminal=terminal,
-                                article=article,
-                                variante=variante,
-                                quantite_vendue=quantite,
-                                stock_serveur_avant=stock_avant,
-                                stock_serveur_apres=article.quantite_stock,
-                                ecart=stock_avant - quantite,
-                                numero_facture=vente.numero_facture
-                            )
-                            logger.warning(f"🚨 ALERTE STOCK: {nom_article_vente} stock={article.quantite_stock}")
-                    
                     # Mettre à jour le montant total de la vente
                     # ⭐ FIX CAUSE 3: Comparer le total recalculé avec le Total envoyé par MAUI
                     montant_maui = vente_data.get('montant_total')
@@ -2262,24 +2187,33 @@ def sync_ventes_simple(request):
                     if montant_maui and montant_maui > 0:
                         ecart = abs(montant_total - montant_maui)
                         if ecart > 1:  # Tolérance de 1 unité pour les arrondis
+                            resume.incr('ecarts_montant')
                             logger.warning(
-                                f"⚠️ ÉCART MONTANT: Vente {numero_facture} — "
-                                f"MAUI={montant_maui} vs Recalculé={montant_total} (écart={ecart}) "
-                                f"→ On utilise le Total MAUI (correct au moment de la vente)"
+                                "⚠️ ÉCART MONTANT: Vente %s — MAUI=%s vs Recalculé=%s (écart=%s) "
+                                "→ On utilise le Total MAUI (correct au moment de la vente)",
+                                numero_facture, montant_maui, montant_total, ecart
                             )
                             montant_total = montant_maui
-                        else:
-                            logger.info(f"💰 SYNC - Montants cohérents: MAUI={montant_maui}, Recalculé={montant_total}")
                     
-                    logger.info(f"💰 SYNC - Montant total final: {montant_total} {devise_vente} / USD: {montant_total_usd}")
                     vente.montant_total = montant_total
                     if devise_vente == 'USD' and montant_total_usd:
                         vente.montant_total_usd = montant_total_usd
                         vente.save(update_fields=['montant_total', 'montant_total_usd'])
                     else:
                         vente.save(update_fields=['montant_total'])
-                    logger.info(f"✅ SYNC - Montant sauvegardé: {vente.montant_total} {vente.devise}")
                     
+                    # ⭐ Stock en dernier: l'UPDATE verrouille les articles parents (partagés par
+                    # toutes leurs variantes) jusqu'au commit. Un seul UPDATE pour toute la vente,
+                    # puis MouvementStock + AlerteStock (avertissement seulement, stock négatif accepté)
+                    enregistrer_sorties_vente(vente, sorties, terminal.nom_terminal, boutique=boutique, terminal=terminal)
+                    for sortie in sorties:
+                        if sortie['stock_avant'] < sortie['quantite']:
+                            resume.incr('stock_negatif')
+                            logger.warning("🚨 ALERTE STOCK: article %s stock=%s", sortie['article'].id, sortie['stock_apres'])
+
+                    # 🔔 WebSocket après commit (hors verrou): notifier tous les POS du nouveau stock
+                    notifier_stocks_apres_commit(boutique.id, sorties)
+
                     ventes_creees.append({
                         'numero_facture': vente.numero_facture,
                         'status': 'created',
@@ -2291,10 +2225,9 @@ def sync_ventes_simple(request):
                         'lignes': lignes_creees
                     })
                     
-                    logger.info(f"✅ Vente {numero_facture} synchronisée:")
-                    logger.info(f"   - Boutique: {boutique.id} ({boutique.nom})")
-                    logger.info(f"   - Lignes: {len(lignes_creees)}")
-                    logger.info(f"   - Montant: {montant_total} CDF")
+                    resume.incr('ventes_creees')
+                    logger.debug("✅ Vente %s synchronisée: %d ligne(s), montant=%s %s",
+                                 numero_facture, len(lignes_creees), montant_total, devise_vente)
                 
             except ValueError as ve:
                 # Erreur de validation enrichie (format: RAISON|article_id|article_nom|stock_demande|stock_dispo|message)
@@ -2316,7 +2249,7 @@ def sync_ventes_simple(request):
                     stock_dispo = None
                     message_err = error_str
                 
-                logger.error(f"❌ Erreur validation vente {index + 1}: {message_err}")
+                logger.error("❌ Erreur validation vente %d: %s", index + 1, message_err)
                 
                 # Sauvegarder dans VenteRejetee pour traçabilité
                 try:
@@ -2334,7 +2267,7 @@ def sync_ventes_simple(request):
                         stock_disponible=stock_dispo,
                         action_requise='NOTIFY_USER'
                     )
-                    logger.info(f"📝 Vente rejetée enregistrée: {vente_data.get('numero_facture', 'N/A')}")
+                    logger.debug("📝 Vente rejetée enregistrée: %s", vente_data.get('numero_facture', 'N/A'))
                 except Exception as save_err:
                     logger.warning(f"⚠️ Impossible de sauvegarder le rejet: {save_err}")
                 
@@ -2352,14 +2285,15 @@ def sync_ventes_simple(request):
                 
             except IntegrityError as ie:
                 # ⭐ Erreur de duplication (contrainte unique)
-                logger.warning(f"⚠️ IntegrityError pour vente {index + 1}: {str(ie)}")
+                logger.warning("⚠️ IntegrityError pour vente %d: %s", index + 1, ie)
                 
                 # Vérifier si c'est un doublon de numero_facture
                 numero_facture = vente_data.get('numero_facture', f'UNKNOWN_{index}')
                 vente_existante = Vente.objects.filter(numero_facture=numero_facture).first()
                 
                 if vente_existante:
-                    logger.info(f"✅ Vente {numero_facture} existe déjà (ID: {vente_existante.id}) - considérée comme succès")
+                    resume.incr('ventes_deja_presentes')
+                    logger.debug("✅ Vente %s existe déjà (ID: %s) - considérée comme succès", numero_facture, vente_existante.id)
                     # Traiter comme un succès (la vente existe déjà)
                     ventes_creees.append({
                         'numero_facture': numero_facture,
@@ -2379,7 +2313,7 @@ def sync_ventes_simple(request):
                 
             except Exception as e:
                 # Autres erreurs non prévues
-                logger.error(f"❌ Erreur création vente {index + 1}: {str(e)}")
+                logger.error("❌ Erreur création vente %d: %s", index + 1, e)
                 
                 # Sauvegarder dans VenteRejetee
                 try:
@@ -2402,10 +2336,9 @@ def sync_ventes_simple(request):
                     'code': 'OTHER'
                 })
         
-        # Retourner le résumé avec informations d'isolation
-        logger.info(f"✅ Synchronisation terminée:")
-        logger.info(f"   - Créées: {len(ventes_creees)}")
-        logger.info(f"   - Erreurs: {len(ventes_erreurs)}")
+        # Retourner le résumé avec informations d'isolation (synthèse émise par @resume_api)
+        for erreur_vente in ventes_erreurs:
+            resume.erreur(erreur_vente.get('code'))
         
         # ⭐ COMPATIBILITÉ MAUI: Inclure les champs "accepted" et "rejected" attendus par MAUI
         accepted_list = [v['numero_facture'] for v in ventes_creees]
@@ -2495,9 +2428,7 @@ def sync_ventes_simple(request):
         }, status=status.HTTP_201_CREATED)
         
     except Exception as e:
-        logger.error(f"❌ Erreur synchronisation ventes: {str(e)}")
-        import traceback
-        logger.error(f"❌ Traceback complet:\n{traceback.format_exc()}")
+        logger.exception("❌ Erreur synchronisation ventes: %s", e)
         
         return Response({
             'error': 'Erreur interne du serveur',
@@ -2508,6 +2439,66 @@ def sync_ventes_simple(request):
 
 @api_view(['POST'])
 @permission_classes([AllowAny])
+@resume_api('ingestion_ventes_simple')
+@idempotent('ingestion_ventes_simple', cle_lot_ventes)
+def ingestion_ventes_simple(request):
+    """
+    Lot de ventes de plusieurs boutiques du même commerçant (dépôt, réintégration):
+    {"ventes": [{"boutique_id", "numero_facture", "date_vente", "lignes": [...]}, ...]}
+    (format de sync_ventes_simple, ou MAUI avec BoutiqueId). boutique_id absent = boutique du terminal.
+    Tout le lot est validé avant écriture, puis chaque boutique est enregistrée dans sa transaction
+    (services/ingestion_ventes.py). Réponse: un résultat par vente, dans l'ordre du lot.
+    """
+    resume = request.resume_api
+    terminal, erreur = _terminal_inventaire(request)
+    if erreur:
+        return erreur
+
+    donnees = request.data
+    ventes = donnees if isinstance(donnees, list) else (donnees.get('ventes') or donnees.get('Ventes'))
+    if not isinstance(ventes, list) or not ventes:
+        return Response({'error': 'ventes requises (liste)', 'code': 'EMPTY_DATA'},
+                        status=status.HTTP_400_BAD_REQUEST)
+    if len(ventes) > TAILLE_MAX_LOT_VENTES:
+        return Response({
+            'error': f'Lot trop grand: {len(ventes)} ventes (maximum {TAILLE_MAX_LOT_VENTES})',
+            'code': 'LOT_TROP_GRAND'
+        }, status=status.HTTP_400_BAD_REQUEST)
+    resume.ajouter(terminal=terminal.numero_serie, boutique_id=terminal.boutique_id)
+    resume.incr('ventes_recues', len(ventes))
+
+    resultat = ingerer_ventes(
+        ventes,
+        commercant_id=terminal.boutique.commercant_id,
+        terminal=terminal,
+        adresse_ip=request.META.get('REMOTE_ADDR'),
+    )
+    stats = resultat['stats']
+    resume.ajouter(boutiques=stats['boutiques'], ventes_creees=stats.get('created', 0),
+                   ventes_deja_presentes=stats.get('already_exists', 0))
+    for r in resultat['resultats']:
+        if r['status'] == 'rejected':
+            resume.erreur(r['code'])
+
+    # Push stats temps réel vers le dashboard de chaque boutique modifiée
+    boutiques_modifiees = {r['boutique_id'] for r in resultat['resultats'] if r['status'] == 'created'}
+    for boutique in Boutique.objects.filter(id__in=boutiques_modifiees):
+        try:
+            notify_dashboard_stats(boutique.id, _compute_dashboard_stats(boutique))
+        except Exception as ws_err:
+            logger.warning(f"⚠️ Push dashboard stats (ingestion) ignoré: {ws_err}")
+
+    return Response({
+        'success': True,
+        'resultats': resultat['resultats'],
+        'stock_updates': resultat['stock_updates'],
+        'statistiques': stats,
+    }, status=status.HTTP_200_OK)
+
+
+@api_view(['POST'])
+@permission_classes([AllowAny])
+@idempotent('creer_article_negocie_simple', cle_operation)
 def creer_article_negocie_simple(request):
     numero_serie = (
         request.headers.get('X-Device-Serial')
@@ -2588,6 +2579,7 @@ def creer_article_negocie_simple(request):
 
 @api_view(['POST'])
 @permission_classes([AllowAny])
+@idempotent('creer_retour_article_simple', cle_operation)
 def creer_retour_article_simple(request):
     numero_serie = (
         request.headers.get('X-Device-Serial')
@@ -2908,6 +2900,7 @@ def reconcilier_ventes(request):
 
 @api_view(['POST'])
 @permission_classes([AllowAny])
+@idempotent('annuler_vente_simple', cle_vente)
 def annuler_vente_simple(request):
     """
     Annule une vente et restaure le stock des articles concernés.
@@ -3194,8 +3187,7 @@ def analyse_mouvements_simple(request):
       fin     : YYYY-MM-DD  (défaut: aujourd'hui)
       mode    : 'resume' | 'complet'  (défaut: resume)
     """
-    from datetime import datetime, timedelta
-    from django.db.models import Count, F, Q, ExpressionWrapper, DecimalField
+    from datetime import datetime
 
     try:
         # --- Terminal & Boutique ---
@@ -3215,379 +3207,68 @@ def analyse_mouvements_simple(request):
             return Response({'error': 'Terminal non trouvé', 'code': 'TERMINAL_NOT_FOUND'},
                             status=status.HTTP_404_NOT_FOUND)
 
-        # --- Plage de dates ---
-        maintenant = timezone.now()
-        debut_mois = maintenant.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+        # --- Plage de dates (jours locaux) ---
+        aujourd_hui = timezone.localdate()
 
-        def parse_date_param(param, defaut, heure_fin=False):
+        def parse_date_param(param, defaut):
             val = request.GET.get(param)
             if val:
                 try:
-                    dt = datetime.strptime(val, '%Y-%m-%d')
-                    if heure_fin:
-                        dt = dt.replace(hour=23, minute=59, second=59)
-                    return timezone.make_aware(dt)
+                    return datetime.strptime(val, '%Y-%m-%d').date()
                 except ValueError:
                     pass
             return defaut
 
-        debut = parse_date_param('debut', debut_mois)
-        fin = parse_date_param('fin', maintenant, heure_fin=True)
-        nb_jours = max(1, (fin - debut).days + 1)
+        debut = parse_date_param('debut', aujourd_hui.replace(day=1))
+        fin = parse_date_param('fin', aujourd_hui)
         mode = request.GET.get('mode', 'resume')
 
-        # --- QuerySets de base ---
-        articles_qs = Article.objects.filter(boutique=boutique, est_actif=True)
-        mouvements_qs = MouvementStock.objects.filter(
-            article__boutique=boutique,
-            date_mouvement__gte=debut,
-            date_mouvement__lte=fin
-        )
-        ventes_qs = Vente.objects.filter(
-            boutique=boutique,
-            date_vente__gte=debut,
-            date_vente__lte=fin,
-            est_annulee=False
-        )
-        alertes_qs = AlerteStock.objects.filter(boutique=boutique, statut='EN_ATTENTE')
-
-        # ================================================================
-        # 1. RÉSUMÉ FINANCIER — source de vérité : LigneVente
-        # ================================================================
-        lignes_cdf = LigneVente.objects.filter(
-            vente__boutique=boutique,
-            vente__date_vente__gte=debut,
-            vente__date_vente__lte=fin,
-            vente__est_annulee=False,
-            devise='CDF'
-        )
-        lignes_usd = LigneVente.objects.filter(
-            vente__boutique=boutique,
-            vente__date_vente__gte=debut,
-            vente__date_vente__lte=fin,
-            vente__est_annulee=False,
-            devise='USD'
-        )
-
-        agg_cdf = lignes_cdf.aggregate(
-            ca=Sum(ExpressionWrapper(F('quantite') * F('prix_unitaire'),
-                                     output_field=DecimalField())),
-            ca_negocie=Sum(ExpressionWrapper(F('quantite') * F('prix_unitaire'),
-                                              output_field=DecimalField()),
-                           filter=Q(est_negocie=True)),
-            nb_lignes=Count('id')
-        )
-        agg_usd = lignes_usd.aggregate(
-            ca=Sum(ExpressionWrapper(F('quantite') * F('prix_unitaire'),
-                                     output_field=DecimalField()))
-        )
-
-        ca_cdf = float(agg_cdf['ca'] or 0)
-        ca_usd = float(agg_usd['ca'] or 0)
-        ca_negocie_cdf = float(agg_cdf['ca_negocie'] or 0)
-        nb_lignes_total = agg_cdf['nb_lignes'] or 0
-
-        # Valeur du stock restant (prix vente et coût)
-        agg_stock = articles_qs.aggregate(
-            valeur_vente=Sum(ExpressionWrapper(F('quantite_stock') * F('prix_vente'),
-                                               output_field=DecimalField())),
-            valeur_cout=Sum(ExpressionWrapper(F('quantite_stock') * F('prix_achat'),
-                                              output_field=DecimalField()))
-        )
-        stock_valeur_vente = float(agg_stock['valeur_vente'] or 0)
-        stock_valeur_cout = float(agg_stock['valeur_cout'] or 0)
-
-        # ================================================================
-        # 2. RÉSUMÉ MOUVEMENTS par type
-        # ================================================================
-        mouv_agg = mouvements_qs.values('type_mouvement').annotate(
-            nb=Count('id'),
-            total_qte=Sum('quantite')
-        )
-        mouv = {m['type_mouvement']: m for m in mouv_agg}
-
-        def get_mouv(typ, absval=False):
-            d = mouv.get(typ, {})
-            q = d.get('total_qte', 0) or 0
-            return {'nb': d.get('nb', 0) or 0, 'total_qte': abs(q) if absval else q}
-
-        # ================================================================
-        # 3. ALERTES & ARTICLES À RISQUE
-        # ================================================================
-        articles_negatifs = list(
-            articles_qs.filter(quantite_stock__lt=0)
-            .values('id', 'nom', 'code', 'quantite_stock', 'prix_vente', 'prix_achat', 'devise')
-            .order_by('quantite_stock')[:30]
-        )
-
-        # Regrouper alertes EN_ATTENTE par article
-        alertes_list = list(
-            alertes_qs.select_related('article').values(
-                'article__id', 'article__nom', 'article__code',
-                'article__quantite_stock', 'article__prix_achat',
-                'quantite_vendue', 'ecart', 'numero_facture', 'date_creation'
-            ).order_by('-date_creation')[:100]
-        )
-        alertes_par_art = {}
-        for a in alertes_list:
-            aid = a['article__id']
-            if aid not in alertes_par_art:
-                alertes_par_art[aid] = {
-                    'article_id': aid,
-                    'nom': a['article__nom'],
-                    'code': a['article__code'],
-                    'stock_actuel': a['article__quantite_stock'],
-                    'qte_a_regulariser': 0,
-                    'nb_alertes': 0,
-                    'ventes': []
-                }
-            alertes_par_art[aid]['nb_alertes'] += 1
-            alertes_par_art[aid]['qte_a_regulariser'] += max(0, abs(a['ecart']))
-            if a['numero_facture'] not in alertes_par_art[aid]['ventes']:
-                alertes_par_art[aid]['ventes'].append(a['numero_facture'])
-
-        articles_a_regulariser = sorted(
-            alertes_par_art.values(), key=lambda x: x['nb_alertes'], reverse=True)[:20]
+        with lecture_replique():
+            analyse = analyser_mouvements(boutique, debut, fin, mode=mode)
 
-        pertes_estimees = sum(
-            abs(float(a['quantite_stock'])) * float(a['prix_achat'])
-            for a in articles_negatifs
-        )
-        nb_alertes_total = alertes_qs.count()
-
-        # ================================================================
-        # 4. TOP ARTICLES VENDUS
-        # ================================================================
-        top_articles = list(
-            LigneVente.objects.filter(
-                vente__boutique=boutique,
-                vente__date_vente__gte=debut,
-                vente__date_vente__lte=fin,
-                vente__est_annulee=False
-            )
-            .values('article__id', 'article__nom', 'article__code', 'article__devise')
-            .annotate(
-                total_qte=Sum('quantite'),
-                ca=Sum(ExpressionWrapper(F('quantite') * F('prix_unitaire'),
-                                         output_field=DecimalField())),
-                nb_ventes=Count('vente', distinct=True)
-            )
-            .order_by('-ca')[:10]
-        )
-
-        # ================================================================
-        # 5. ANALYSE IA — score + insights + recommandations + anomalies
-        # ================================================================
-        score = 100
-        insights = []
-        recommandations = []
-        anomalies = []
-
-        total_articles = articles_qs.count()
-        nb_negatifs = len(articles_negatifs)
-
-        # Pénalité articles négatifs (max -40)
-        if total_articles > 0:
-            pct_neg = nb_negatifs / total_articles * 100
-            score -= min(40, round(pct_neg * 2))
-
-        # Pénalité alertes non traitées (max -20)
-        score -= min(20, round(nb_alertes_total * 0.5))
-
-        # Rotation du stock
-        if stock_valeur_vente > 0 and ca_cdf > 0:
-            rotation = (ca_cdf / stock_valeur_vente) * (365 / nb_jours)
-            if rotation < 2:
-                score -= 10
-                insights.append({
-                    'type': 'ROTATION_FAIBLE',
-                    'niveau': 'WARNING',
-                    'message': (f"Rotation stock: {rotation:.1f}×/an — "
-                                f"la marchandise reste trop longtemps en stock."),
-                    'valeur': round(rotation, 2)
-                })
-            elif rotation >= 12:
-                insights.append({
-                    'type': 'ROTATION_ELEVEE',
-                    'niveau': 'INFO',
-                    'message': f"Excellente rotation: {rotation:.1f}×/an — stock bien géré.",
-                    'valeur': round(rotation, 2)
-                })
-        else:
-            rotation = 0
-
-        score = max(0, min(100, score))
-
-        # Insight stocks négatifs
-        if nb_negatifs > 0:
-            deficit_total = sum(abs(a['quantite_stock']) for a in articles_negatifs)
-            insights.append({
-                'type': 'STOCK_NEGATIF',
-                'niveau': 'CRITIQUE' if nb_negatifs > 5 else 'ALERTE',
-                'message': (f"{nb_negatifs} article(s) en stock négatif "
-                            f"— déficit total: {deficit_total} unités "
-                            f"— perte estimée: {round(pertes_estimees):,} CDF"),
-                'articles': [{'nom': a['nom'], 'stock': a['quantite_stock']}
-                             for a in articles_negatifs[:5]]
-            })
-            recommandations.append({
-                'priorite': 'HAUTE',
-                'action': 'REGULARISER_STOCK_NEGATIF',
-                'message': (f"Réapprovisionner ou ajuster manuellement "
-                            f"{nb_negatifs} article(s) en déficit."),
-                'articles': [a['nom'] for a in articles_negatifs[:5]]
-            })
-
-        # Insight prix négociés
-        if ca_negocie_cdf > 0 and ca_cdf > 0:
-            pct_neg_prix = ca_negocie_cdf / ca_cdf * 100
-            nb_neg = lignes_cdf.filter(est_negocie=True).count()
-            insights.append({
-                'type': 'PRIX_NEGOCIE',
-                'niveau': 'WARNING' if pct_neg_prix > 25 else 'INFO',
-                'message': (f"{nb_neg} ligne(s) à prix négocié = {pct_neg_prix:.1f}% du CA CDF "
-                            f"— écart avec le catalogue."),
-                'valeur': round(pct_neg_prix, 1)
-            })
-            if pct_neg_prix > 30:
-                recommandations.append({
-                    'priorite': 'MOYENNE',
-                    'action': 'VERIFIER_NEGOCIATIONS',
-                    'message': "Plus de 30% du CA vendu à prix réduit. Vérifier les autorisations."
-                })
-
-        # Insight alertes en attente
-        if nb_alertes_total > 0:
-            insights.append({
-                'type': 'ALERTES_EN_ATTENTE',
-                'niveau': 'ALERTE' if nb_alertes_total > 3 else 'INFO',
-                'message': f"{nb_alertes_total} alerte(s) de stock non régularisée(s).",
-            })
-            recommandations.append({
-                'priorite': 'HAUTE',
-                'action': 'TRAITER_ALERTES',
-                'message': f"Régulariser {nb_alertes_total} alerte(s) de sur-vente en attente."
-            })
-
-        # Anomalie : trop d'ajustements manuels
-        nb_ajust = mouv.get('AJUSTEMENT', {}).get('nb', 0) or 0
-        if nb_ajust > 10:
-            anomalies.append({
-                'type': 'AJUSTEMENTS_EXCESSIFS',
-                'niveau': 'WARNING',
-                'message': (f"{nb_ajust} ajustements manuels sur la période — "
-                            f"possible erreur de saisie ou incohérence de stock.")
-            })
-
-        # Anomalie : ventes sans mouvement de stock (incohérence)
-        nb_ventes_periode = ventes_qs.count()
-        nb_mouv_vente = mouv.get('VENTE', {}).get('nb', 0) or 0
-        if nb_ventes_periode > 0 and nb_mouv_vente == 0:
-            anomalies.append({
-                'type': 'VENTES_SANS_MOUVEMENT',
-                'niveau': 'ALERTE',
-                'message': (f"{nb_ventes_periode} vente(s) enregistrée(s) mais "
-                            f"0 mouvement de stock de type VENTE trouvé — incohérence à vérifier.")
-            })
-
-        # Trier recommandations par priorité
-        prio_order = {'HAUTE': 0, 'MOYENNE': 1, 'BASSE': 2}
-        recommandations.sort(key=lambda r: prio_order.get(r.get('priorite', 'BASSE'), 2))
-
-        # ================================================================
-        # 6. RÉPONSE
-        # ================================================================
         response_data = {
             'periode': {
                 'debut': debut.strftime('%Y-%m-%d'),
                 'fin': fin.strftime('%Y-%m-%d'),
-                'nb_jours': nb_jours
+                'nb_jours': analyse.nb_jours
             },
             'boutique': {'id': boutique.id, 'nom': boutique.nom},
             'resume_financier': {
-                'chiffre_affaires_cdf': round(ca_cdf, 2),
-                'chiffre_affaires_usd': round(ca_usd, 2),
-                'valeur_stock_prix_vente_cdf': round(stock_valeur_vente, 2),
-                'valeur_stock_prix_cout_cdf': round(stock_valeur_cout, 2),
-                'marge_potentielle_cdf': round(max(0, stock_valeur_vente - stock_valeur_cout), 2),
-                'nb_ventes': nb_ventes_periode,
-                'nb_lignes_vente': nb_lignes_total
+                'chiffre_affaires_cdf': round(analyse.ca_cdf, 2),
+                'chiffre_affaires_usd': round(analyse.ca_usd, 2),
+                'valeur_stock_prix_vente_cdf': round(analyse.stock_valeur_vente, 2),
+                'valeur_stock_prix_cout_cdf': round(analyse.stock_valeur_cout, 2),
+                'marge_potentielle_cdf': round(analyse.marge_potentielle, 2),
+                'nb_ventes': analyse.nb_ventes,
+                'nb_lignes_vente': analyse.nb_lignes_cdf
             },
             'mouvements_resume': {
-                'entrees': get_mouv('ENTREE'),
-                'sorties': get_mouv('SORTIE', absval=True),
-                'ventes': get_mouv('VENTE', absval=True),
-                'retours': get_mouv('RETOUR'),
-                'ajustements': get_mouv('AJUSTEMENT')
+                'entrees': analyse.mouvement('ENTREE'),
+                'sorties': analyse.mouvement('SORTIE', absval=True),
+                'ventes': analyse.mouvement('VENTE', absval=True),
+                'retours': analyse.mouvement('RETOUR'),
+                'ajustements': analyse.mouvement('AJUSTEMENT')
             },
             'alertes_stock': {
-                'total_en_attente': nb_alertes_total,
-                'articles_stock_negatif': articles_negatifs,
-                'articles_a_regulariser': articles_a_regulariser,
-                'pertes_estimees_cdf': round(pertes_estimees, 2)
+                'total_en_attente': analyse.nb_alertes_total,
+                'articles_stock_negatif': analyse.articles_negatifs,
+                'articles_a_regulariser': analyse.articles_a_regulariser,
+                'pertes_estimees_cdf': round(analyse.pertes_estimees, 2)
             },
             'analyse_ia': {
-                'score_sante_stock': score,
-                'niveau_sante': (
-                    'EXCELLENT' if score >= 85 else
-                    'BON' if score >= 70 else
-                    'MOYEN' if score >= 50 else
-                    'CRITIQUE'
-                ),
-                'rotation_stock_annuelle': round(rotation, 2),
-                'insights': insights,
-                'recommandations': recommandations,
-                'anomalies': anomalies
+                'score_sante_stock': analyse.score,
+                'niveau_sante': analyse.niveau_sante,
+                'rotation_stock_annuelle': round(analyse.rotation, 2),
+                'insights': analyse.insights,
+                'recommandations': analyse.recommandations,
+                'anomalies': analyse.anomalies
             },
-            'top_articles_vendus': [
-                {
-                    'article_id': a['article__id'],
-                    'nom': a['article__nom'],
-                    'code': a['article__code'],
-                    'devise': a['article__devise'],
-                    'qte_vendue': a['total_qte'],
-                    'ca': round(float(a['ca'] or 0), 2),
-                    'nb_ventes': a['nb_ventes']
-                }
-                for a in top_articles
-            ]
+            'top_articles_vendus': analyse.top_articles
         }
 
         # Mode complet : détail par article
         if mode == 'complet':
-            detail = []
-            for art in articles_qs.select_related('categorie').order_by('-quantite_stock')[:200]:
-                agg_art = MouvementStock.objects.filter(
-                    article=art,
-                    date_mouvement__gte=debut,
-                    date_mouvement__lte=fin
-                ).aggregate(
-                    qte_vendue=Sum('quantite', filter=Q(type_mouvement='VENTE')),
-                    qte_entree=Sum('quantite', filter=Q(type_mouvement='ENTREE')),
-                    qte_retour=Sum('quantite', filter=Q(type_mouvement='RETOUR')),
-                    nb_mouv=Count('id')
-                )
-                qte_vendue = abs(agg_art['qte_vendue'] or 0)
-                detail.append({
-                    'id': art.id,
-                    'code': art.code,
-                    'nom': art.nom,
-                    'categorie': art.categorie.nom if art.categorie else '',
-                    'devise': art.devise,
-                    'prix_vente': float(art.prix_vente),
-                    'prix_achat': float(art.prix_achat),
-                    'stock_actuel': art.quantite_stock,
-                    'valeur_stock_vente': round(art.quantite_stock * float(art.prix_vente), 2),
-                    'valeur_stock_cout': round(art.quantite_stock * float(art.prix_achat), 2),
-                    'qte_vendue_periode': qte_vendue,
-                    'ca_periode': round(qte_vendue * float(art.prix_vente), 2),
-                    'qte_entree_periode': agg_art['qte_entree'] or 0,
-                    'qte_retour_periode': agg_art['qte_retour'] or 0,
-                    'nb_mouvements': agg_art['nb_mouv'] or 0,
-                    'alerte_stock': art.quantite_stock < 0
-                })
-            response_data['detail_par_article'] = sorted(
-                detail, key=lambda x: x['ca_periode'], reverse=True)
+            response_data['detail_par_article'] = analyse.detail_par_article
 
         return Response(response_data, status=status.HTTP_200_OK)
 
@@ -3669,6 +3350,7 @@ def regulariser_alerte_stock_simple(request):
             )
 
         logger.info(f"✅ Régularisation: {article.nom} +{quantite_ajout} ({stock_avant} → {article.quantite_stock})")
+        invalider_analyse(boutique.id)
 
         return Response({
             'success': True,
@@ -3919,3 +3601,113 @@ def journal_valeur_stock_simple(request):
         'total': len(lignes),
         'journal': lignes,
     })
+
+
+# ===== INVENTAIRE (scanners MAUI, comptage hors ligne) =====
+
+def _terminal_inventaire(request):
+    """(terminal, None) ou (None, réponse d'erreur) depuis l'en-tête X-Device-Serial."""
+    numero_serie = (
+        request.headers.get('X-Device-Serial')
+        or request.headers.get('Device-Serial')
+        or request.headers.get('Serial-Number')
+    )
+    if not numero_serie:
+        return None, Response({
+            'error': 'Numéro de série du terminal requis dans les headers',
+            'code': 'MISSING_SERIAL'
+        }, status=status.HTTP_400_BAD_REQUEST)
+    terminal = Client.objects.select_related('boutique').filter(numero_serie=numero_serie, est_actif=True).first()
+    if not terminal or not terminal.boutique:
+        return None, Response({
+            'error': 'Terminal non trouvé ou sans boutique',
+            'code': 'TERMINAL_NOT_FOUND'
+        }, status=status.HTTP_404_NOT_FOUND)
+    return terminal, None
+
+
+@api_view(['GET'])
+@permission_classes([AllowAny])
+@renderer_classes(list(api_settings.DEFAULT_RENDERER_CLASSES) + CATALOGUE_RENDERERS)
+def inventaire_en_cours_simple(request):
+    """
+    Instantané en colonnes de l'inventaire EN_COURS de la boutique du terminal
+    (services/comptage_inventaire.py), à télécharger avant de compter hors ligne.
+    - ?inventaire_id=12 : inventaire précis (sinon le plus récent en cours)
+    - ?depuis=<genere_le du précédent instantané> : seulement les lignes saisies depuis
+    """
+    terminal, erreur = _terminal_inventaire(request)
+    if erreur:
+        return erreur
+
+    inventaires = Inventaire.objects.filter(boutique=terminal.boutique, statut='EN_COURS')
+    if request.GET.get('inventaire_id'):
+        inventaires = inventaires.filter(id=request.GET['inventaire_id'])
+    inventaire = inventaires.order_by('-date_creation').first()
+    if inventaire is None:
+        return Response({
+            'error': 'Aucun inventaire en cours pour cette boutique',
+            'code': 'NO_INVENTAIRE'
+        }, status=status.HTTP_404_NOT_FOUND)
+
+    depuis = parse_datetime(request.GET['depuis']) if request.GET.get('depuis') else None
+    return Response({'boutique_id': terminal.boutique.id, **instantane(inventaire, depuis)})
+
+
+@api_view(['POST'])
+@permission_classes([AllowAny])
+@resume_api('envoyer_comptages_simple')
+@idempotent('envoyer_comptages_simple', cle_lot_comptage)
+def envoyer_comptages_simple(request):
+    """
+    Lot de comptages d'un scanner: {"inventaire_id", "lot_uid", "comptages": [
+    {"ligne_id" | "article_id" | "code", "quantite", "mode": "REMPLACER"|"AJOUTER", "compte_le", "commentaire"}]}.
+    Comptages invalides ou périmés renvoyés dans "ignores" (index dans le lot), le reste est appliqué.
+    """
+    resume = request.resume_api
+    terminal, erreur = _terminal_inventaire(request)
+    if erreur:
+        return erreur
+
+    comptages = request.data.get('comptages')
+    if not isinstance(comptages, list) or not comptages:
+        return Response({'error': 'comptages requis (liste)', 'code': 'MISSING_COMPTAGES'},
+                        status=status.HTTP_400_BAD_REQUEST)
+    if len(comptages) > TAILLE_MAX_LOT:
+        return Response({
+            'error': f'Lot trop grand: {len(comptages)} comptages (maximum {TAILLE_MAX_LOT})',
+            'code': 'LOT_TROP_GRAND'
+        }, status=status.HTTP_400_BAD_REQUEST)
+
+    inventaire_id = str(request.data.get('inventaire_id') or '')
+    inventaire = None
+    if inventaire_id.isdigit():
+        inventaire = Inventaire.objects.filter(id=inventaire_id, boutique=terminal.boutique).first()
+    if inventaire is None:
+        return Response({'error': 'Inventaire non trouvé', 'code': 'INVENTAIRE_NOT_FOUND'},
+                        status=status.HTTP_404_NOT_FOUND)
+    resume.ajouter(terminal=terminal.numero_serie, inventaire=inventaire.reference, comptages=len(comptages))
+
+    try:
+        resultat = appliquer_comptages(
+            inventaire, comptages, numero_serie=terminal.numero_serie, nom=terminal.nom_terminal
+        )
+    except InventaireFerme:
+        return Response({
+            'error': f"L'inventaire {inventaire.reference} n'est plus en cours",
+            'code': 'INVENTAIRE_FERME'
+        }, status=status.HTTP_409_CONFLICT)
+    resume.ajouter(appliques=resultat['appliques'], ignores=len(resultat['ignores']))
+
+    inventaire.refresh_from_db(fields=['nb_ecarts', 'valeur_ecart_positif', 'valeur_ecart_negatif'])
+    return Response({
+        'boutique_id': terminal.boutique.id,
+        'inventaire_id': inventaire.id,
+        **resultat,
+        'statistiques': {
+            'nb_articles': inventaire.nb_articles,
+            'nb_ecarts': inventaire.nb_ecarts,
+            'valeur_ecart_positif': str(inventaire.valeur_ecart_positif),
+            'valeur_ecart_negatif': str(inventaire.valeur_ecart_negatif),
+        },
+    })
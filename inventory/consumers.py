@@ -273,3 +273,67 @@ class NotificationConsumer(AsyncWebsocketConsumer):
     def get_timestamp(self):
         from django.utils import timezone
         return timezone.now().isoformat()
+
+
+class CompteursJourConsumer(AsyncWebsocketConsumer):
+    """
+    Compteurs du jour d'une boutique (tuiles CA) pour le navigateur du commerçant.
+    Remplace le polling de api_ca_jour_boutique: l'état est poussé à chaque vente/annulation.
+    """
+
+    async def connect(self):
+        self.boutique_id = int(self.scope['url_route']['kwargs']['boutique_id'])
+        self.group_name = f'compteurs_{self.boutique_id}'
+
+        if not await self.check_authorization():
+            logger.warning(f"❌ Connexion compteurs refusée - Boutique {self.boutique_id}")
+            await self.close()
+            return
+
+        try:
+            await self.channel_layer.group_add(self.group_name, self.channel_name)
+        except Exception as e:
+            logger.error(f"Erreur group_add CompteursJourConsumer: {type(e).__name__}: {e}")
+            await self.close()
+            return
+
+        await self.accept()
+
+        # État initial: la page n'a pas à appeler l'endpoint de repli
+        await self.send(text_data=json.dumps({
+            'type': 'compteurs_jour',
+            'compteurs': await self.get_compteurs(),
+            'timestamp': self.get_timestamp()
+        }))
+
+    async def disconnect(self, close_code):
+        try:
+            await self.channel_layer.group_discard(self.group_name, self.channel_name)
+        except Exception:
+            pass
+
+    async def compteurs_jour(self, event):
+        await self.send(text_data=json.dumps({
+            'type': 'compteurs_jour',
+            'compteurs': event['compteurs'],
+            'timestamp': self.get_timestamp()
+        }))
+
+    @database_sync_to_async
+    def check_authorization(self):
+        """Commerçant propriétaire de la boutique ou collaborateur actif autorisé sur cette boutique"""
+        from inventory.services.parametres import acces_utilisateur, parametres_boutique
+
+        user = self.scope.get('user')
+        if not user or not user.is_authenticated:
+            return False
+        return acces_utilisateur(user.pk).peut_acceder_boutique(parametres_boutique(self.boutique_id))
+
+    @database_sync_to_async
+    def get_compteurs(self):
+        from inventory.services.compteurs_jour import compteurs
+        return compteurs(self.boutique_id)
+
+    def get_timestamp(self):
+        from django.utils import timezone
+        return timezone.now().isoformat()
@@ -1,11 +1,13 @@
 """
 Décorateurs pour les vues de bilan et gestion
 """
-from django.shortcuts import get_object_or_404, redirect
+from django.shortcuts import redirect
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
-from django.http import HttpResponseForbidden
-from .models import Commercant, Boutique
+from django.http import Http404, HttpResponseForbidden
+from django.utils.functional import SimpleLazyObject
+from .models import Boutique
+from .services.parametres import acces_utilisateur, parametres_boutique
 
 def commercant_required(view_func):
     """Décorateur pour vérifier que l'utilisateur est un commerçant"""
@@ -13,14 +15,14 @@ def commercant_required(view_func):
         if not request.user.is_authenticated:
             return redirect('inventory:login_commercant')
         
-        try:
-            commercant = request.user.profil_commercant
-            if not commercant.est_actif:
-                messages.error(request, "Votre compte commerçant est désactivé.")
-                return redirect('inventory:login_commercant')
-        except Commercant.DoesNotExist:
+        # Profil lu dans le cache des paramètres (aucune requête en régime établi)
+        acces = acces_utilisateur(request.user.pk, request.user)
+        if not acces.est_commercant:
             messages.error(request, "Vous n'avez pas de profil commerçant.")
             return redirect('inventory:login_commercant')
+        if not acces.actif:
+            messages.error(request, "Votre compte commerçant est désactivé.")
+            return redirect('inventory:login_commercant')
         
         return view_func(request, *args, **kwargs)
     return wrapper
@@ -28,11 +30,13 @@ def commercant_required(view_func):
 def boutique_required(view_func):
     """Décorateur pour vérifier l'accès à une boutique spécifique"""
     def wrapper(request, boutique_id, *args, **kwargs):
-        try:
-            commercant = request.user.profil_commercant
-            boutique = get_object_or_404(Boutique, id=boutique_id, commercant=commercant)
-            request.boutique = boutique  # Ajouter la boutique à la requête
-            return view_func(request, boutique_id, *args, **kwargs)
-        except Commercant.DoesNotExist:
+        acces = acces_utilisateur(request.user.pk, request.user)
+        if not acces.est_commercant:
             return HttpResponseForbidden("Accès non autorisé")
+        parametres = parametres_boutique(boutique_id)
+        if parametres is None or parametres.commercant_id != acces.commercant_id:
+            raise Http404("Boutique introuvable")
+        request.parametres_boutique = parametres
+        request.boutique = SimpleLazyObject(lambda: Boutique.objects.get(pk=parametres.id))  # Ajouter la boutique à la requête
+        return view_func(request, boutique_id, *args, **kwargs)
     return wrapper
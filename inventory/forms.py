@@ -1,5 +1,4 @@
 from django import forms
-import requests
 import json
 from django.conf import settings
 from django.contrib.auth.models import User
@@ -76,6 +75,8 @@ class ArticleForm(forms.ModelForm):
         :param code: Code de l'article à rechercher
         :return: Dictionnaire avec les détails de l'article ou None
         """
+        import requests  # importé à la demande (coûteux au démarrage du processus)
+
         try:
             # Construire l'URL de l'API
             base_url = settings.BASE_URL if hasattr(settings, 'BASE_URL') else 'http://localhost:8000'
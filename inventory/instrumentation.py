@@ -0,0 +1,328 @@
+"""
+Instrumentation des requêtes HTTP : latence par vue, nombre de requêtes SQL,
+temps SQL cumulé et requêtes les plus lentes.
+
+Les métriques sont agrégées en mémoire dans chaque processus puis publiées
+périodiquement dans le cache Django (Redis en production) et, si
+PERF_METRICS_FILE est défini, dans un fichier JSON local.
+Chaque processus publie sous un emplacement numéroté qu'il obtient une fois par
+cache.incr (atomique): aucun index partagé n'est relu puis réécrit, deux processus
+qui publient en même temps ne s'effacent pas.
+Consultation: page superadmin « Performance » (admin_views.performance_systeme).
+"""
+import json
+import logging
+import os
+import random
+import socket
+import threading
+import time
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connections
+
+logger = logging.getLogger(__name__)
+
+# Bornes supérieures des classes de l'histogramme de latence (ms)
+BUCKETS_MS = (10, 25, 50, 100, 250, 500, 1000, 2500, 5000, float('inf'))
+
+CACHE_PREFIX = 'perf_metrics'
+CACHE_COMPTEUR_KEY = f'{CACHE_PREFIX}:emplacements'
+CACHE_SAMPLE_RATE_KEY = f'{CACHE_PREFIX}:sample_rate'
+CACHE_TIMEOUT = 24 * 3600
+
+# Compteurs de la requête en cours (None si la requête n'est pas échantillonnée)
+_requete_courante = ContextVar('perf_requete_courante', default=None)
+
+
+def _reglage(nom, defaut):
+    return getattr(settings, nom, defaut)
+
+
+class MetriquesProcessus:
+    """Agrégat en mémoire des métriques du processus courant."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+        self.identifiant = f"{socket.gethostname()}:{os.getpid()}"
+        self.dernier_flush = time.monotonic()
+        self.cle_cache = None
+
+    def reset(self):
+        with self._lock:
+            self.vues = {}
+            self.plus_lentes = []
+            self.depuis = time.time()
+
+    def enregistrer(self, vue, duree_ms, nb_requetes, sql_ms, requetes_lentes):
+        with self._lock:
+            stats = self.vues.get(vue)
+            if stats is None:
+                stats = self.vues[vue] = {
+                    'count': 0, 'total_ms': 0.0, 'max_ms': 0.0,
+                    'queries': 0, 'max_queries': 0, 'sql_ms': 0.0,
+                    'buckets': [0] * len(BUCKETS_MS),
+                }
+            stats['count'] += 1
+            stats['total_ms'] += duree_ms
+            stats['max_ms'] = max(stats['max_ms'], duree_ms)
+            stats['queries'] += nb_requetes
+            stats['max_queries'] = max(stats['max_queries'], nb_requetes)
+            stats['sql_ms'] += sql_ms
+            for i, borne in enumerate(BUCKETS_MS):
+                if duree_ms <= borne:
+                    stats['buckets'][i] += 1
+                    break
+
+            if requetes_lentes:
+                limite = _reglage('PERF_METRICS_TOP_SQL', 20)
+                self.plus_lentes.extend(
+                    {'vue': vue, 'sql': sql, 'ms': round(ms, 2)} for sql, ms in requetes_lentes
+                )
+                self.plus_lentes.sort(key=lambda r: r['ms'], reverse=True)
+                del self.plus_lentes[limite:]
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                'processus': self.identifiant,
+                'role': _reglage('PROCESS_ROLE', 'web'),
+                'depuis': self.depuis,
+                'maj': time.time(),
+                'vues': json.loads(json.dumps(self.vues, default=str)),
+                'plus_lentes': list(self.plus_lentes),
+                'pool': stats_pool(),
+            }
+
+    def flush_si_necessaire(self):
+        intervalle = _reglage('PERF_METRICS_FLUSH_INTERVAL', 60)
+        if time.monotonic() - self.dernier_flush >= intervalle:
+            self.flush()
+
+    def flush(self):
+        """Publie le snapshot du processus dans le cache (et le fichier si configuré)."""
+        self.dernier_flush = time.monotonic()
+        data = self.snapshot()
+        try:
+            if self.cle_cache is None:
+                cache.add(CACHE_COMPTEUR_KEY, 0, None)
+                self.cle_cache = _cle_emplacement(cache.incr(CACHE_COMPTEUR_KEY))
+            cache.set(self.cle_cache, data, CACHE_TIMEOUT)
+        except Exception as e:
+            logger.warning(f"⚠️ Flush métriques (cache) ignoré: {e}")
+
+        chemin = _reglage('PERF_METRICS_FILE', '')
+        if chemin:
+            try:
+                with open(chemin, 'w', encoding='utf-8') as f:
+                    json.dump(data, f)
+            except OSError as e:
+                logger.warning(f"⚠️ Flush métriques (fichier) ignoré: {e}")
+
+
+def _cle_emplacement(numero):
+    return f'{CACHE_PREFIX}:emplacement:{numero}'
+
+
+def _cles_publiees():
+    """Clés de tous les emplacements attribués (expirés ou non)."""
+    return [_cle_emplacement(n) for n in range(1, (cache.get(CACHE_COMPTEUR_KEY) or 0) + 1)]
+
+
+metriques = MetriquesProcessus()
+
+
+# ===== ÉCHANTILLONNAGE =====
+
+_taux_cache = {'valeur': None, 'lu_a': 0.0}
+
+
+def taux_echantillonnage():
+    """Taux effectif: surcharge posée depuis la page admin, sinon PERF_METRICS_SAMPLE_RATE."""
+    maintenant = time.monotonic()
+    if maintenant - _taux_cache['lu_a'] > 10:
+        _taux_cache['lu_a'] = maintenant
+        try:
+            _taux_cache['valeur'] = cache.get(CACHE_SAMPLE_RATE_KEY)
+        except Exception:
+            _taux_cache['valeur'] = None
+    if _taux_cache['valeur'] is not None:
+        return _taux_cache['valeur']
+    return _reglage('PERF_METRICS_SAMPLE_RATE', 1.0)
+
+
+def definir_taux_echantillonnage(taux):
+    """Surcharge le taux pour tous les processus (None = retour au réglage)."""
+    if taux is None:
+        cache.delete(CACHE_SAMPLE_RATE_KEY)
+    else:
+        cache.set(CACHE_SAMPLE_RATE_KEY, max(0.0, min(1.0, float(taux))), None)
+    _taux_cache['lu_a'] = 0.0
+
+
+def doit_echantillonner():
+    if not _reglage('PERF_METRICS_ENABLED', True):
+        return False
+    taux = taux_echantillonnage()
+    return taux >= 1 or (taux > 0 and random.random() < taux)
+
+
+# ===== CAPTURE SQL =====
+
+def execute_wrapper(execute, sql, params, many, context):
+    """Wrapper connection.execute_wrapper: chronomètre chaque requête SQL."""
+    courante = _requete_courante.get()
+    if courante is None:
+        return execute(sql, params, many, context)
+    debut = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        ms = (time.perf_counter() - debut) * 1000
+        courante['queries'] += 1
+        courante['sql_ms'] += ms
+        if ms >= _reglage('PERF_METRICS_SLOW_SQL_MS', 100):
+            courante['lentes'].append((sql[:500], ms))
+
+
+def demarrer_requete():
+    return _requete_courante.set({'queries': 0, 'sql_ms': 0.0, 'lentes': []})
+
+
+def terminer_requete(jeton, vue, duree_ms):
+    courante = _requete_courante.get()
+    _requete_courante.reset(jeton)
+    if courante is not None:
+        metriques.enregistrer(vue, duree_ms, courante['queries'], courante['sql_ms'], courante['lentes'])
+        metriques.flush_si_necessaire()
+
+
+# ===== CONNEXIONS BASE DE DONNÉES =====
+
+_STATS_POOL = (
+    'pool_min', 'pool_max', 'pool_size', 'pool_available', 'requests_waiting',
+    'requests_num', 'requests_queued', 'requests_wait_ms', 'requests_errors',
+    'connections_num', 'connections_errors', 'connections_lost',
+)
+
+
+def stats_pool(alias='default'):
+    """Statistiques du pool psycopg du processus (None hors DB_POOL_MODE=psycopg)."""
+    wrapper = connections[alias]
+    # Lecture directe: la propriété wrapper.pool créerait le pool s'il n'existe pas encore
+    pool = getattr(wrapper, '_connection_pools', {}).get(alias)
+    if pool is None:
+        return None
+    stats = pool.get_stats()
+    return {cle: stats.get(cle, 0) for cle in _STATS_POOL}
+
+
+def etat_serveur_db(alias='default'):
+    """Connexions ouvertes côté serveur PostgreSQL par état, et limite max_connections."""
+    wrapper = connections[alias]
+    etat = {
+        'vendor': wrapper.vendor,
+        'mode': _reglage('DB_POOL_MODE', 'persistent'),
+        'conn_max_age': wrapper.settings_dict.get('CONN_MAX_AGE'),
+        'curseurs_serveur': not wrapper.settings_dict.get('DISABLE_SERVER_SIDE_CURSORS', False),
+    }
+    if wrapper.vendor != 'postgresql':
+        return etat
+    try:
+        with wrapper.cursor() as cursor:
+            cursor.execute("SHOW max_connections")
+            etat['max_connections'] = int(cursor.fetchone()[0])
+            cursor.execute(
+                "SELECT COALESCE(state, 'inconnu'), COUNT(*) FROM pg_stat_activity "
+                "WHERE datname = current_database() GROUP BY 1 ORDER BY 2 DESC"
+            )
+            etat['connexions'] = dict(cursor.fetchall())
+            etat['total'] = sum(etat['connexions'].values())
+    except Exception as e:
+        # Via pgbouncer, pg_stat_activity peut être restreint
+        logger.warning(f"⚠️ Lecture pg_stat_activity impossible: {e}")
+    return etat
+
+
+# ===== LECTURE (page admin) =====
+
+def percentile_histogramme(buckets, p):
+    """Borne supérieure de la classe contenant le p-ième percentile."""
+    total = sum(buckets)
+    if not total:
+        return None
+    seuil = total * p
+    cumul = 0
+    for borne, n in zip(BUCKETS_MS, buckets):
+        cumul += n
+        if cumul >= seuil:
+            return borne
+    return BUCKETS_MS[-1]
+
+
+def _borne_finie(borne):
+    return None if borne == float('inf') else borne
+
+
+def fusionner_snapshots(snapshots):
+    """Fusionne les snapshots de plusieurs processus en une vue globale triée par temps total."""
+    vues = {}
+    plus_lentes = []
+    for snap in snapshots:
+        for nom, s in snap.get('vues', {}).items():
+            cible = vues.setdefault(nom, {
+                'count': 0, 'total_ms': 0.0, 'max_ms': 0.0, 'queries': 0,
+                'max_queries': 0, 'sql_ms': 0.0, 'buckets': [0] * len(BUCKETS_MS),
+            })
+            for cle in ('count', 'total_ms', 'queries', 'sql_ms'):
+                cible[cle] += s[cle]
+            cible['max_ms'] = max(cible['max_ms'], s['max_ms'])
+            cible['max_queries'] = max(cible['max_queries'], s['max_queries'])
+            cible['buckets'] = [a + b for a, b in zip(cible['buckets'], s['buckets'])]
+        plus_lentes.extend(snap.get('plus_lentes', []))
+
+    lignes = []
+    for nom, s in vues.items():
+        count = s['count'] or 1
+        lignes.append({
+            'vue': nom,
+            'count': s['count'],
+            'moyenne_ms': round(s['total_ms'] / count, 1),
+            # None = au-delà de la dernière borne finie (> 5 s)
+            'p50_ms': _borne_finie(percentile_histogramme(s['buckets'], 0.5)),
+            'p95_ms': _borne_finie(percentile_histogramme(s['buckets'], 0.95)),
+            'max_ms': round(s['max_ms'], 1),
+            'requetes_moy': round(s['queries'] / count, 1),
+            'requetes_max': s['max_queries'],
+            'sql_ms_moy': round(s['sql_ms'] / count, 1),
+            'total_ms': round(s['total_ms'], 1),
+        })
+    lignes.sort(key=lambda l: l['total_ms'], reverse=True)
+    plus_lentes.sort(key=lambda r: r['ms'], reverse=True)
+    return lignes, plus_lentes[:_reglage('PERF_METRICS_TOP_SQL', 20)]
+
+
+def lire_snapshots():
+    """Snapshots publiés par tous les processus (plus celui du processus courant)."""
+    snapshots = {}
+    try:
+        for data in cache.get_many(_cles_publiees()).values():
+            snapshots[data['processus']] = data
+    except Exception as e:
+        logger.warning(f"⚠️ Lecture métriques (cache) impossible: {e}")
+    local = metriques.snapshot()
+    snapshots[local['processus']] = local
+    return list(snapshots.values())
+
+
+def reinitialiser():
+    """Vide les métriques locales et publiées."""
+    metriques.reset()
+    try:
+        # Le compteur est conservé: un processus en cours garde son emplacement
+        cache.delete_many(_cles_publiees())
+    except Exception as e:
+        logger.warning(f"⚠️ Réinitialisation métriques (cache) incomplète: {e}")
@@ -60,16 +60,10 @@ def _calculer_valeur_stock_reel(boutique):
     pour les articles actifs en CDF avec stock > 0.
     Correspond exactement à la valeur affichée sur le dashboard du point de vente.
     """
-    from .models import Article
-
-    articles = Article.objects.filter(
-        boutique=boutique, est_actif=True,
-        quantite_stock__gt=0, devise='CDF'
-    )
-    total = Decimal('0')
-    for art in articles.values_list('quantite_stock', 'prix_vente'):
-        total += Decimal(str(art[0])) * Decimal(str(art[1]))
-    return total
+    from .services.valeur_stock import valeur_stock
+
+    # Snapshot: toujours recalculé (une requête groupée), jamais lu dans le cache
+    return valeur_stock(boutique, utiliser_cache=False).vente('CDF')
 
 
 def _incrementer(boutique, champ, montant, date=None):
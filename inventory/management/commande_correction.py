@@ -0,0 +1,214 @@
+"""
+Base des commandes de correction de données en masse.
+
+Les anciennes corrections chargeaient tout le queryset puis enregistraient ligne par
+ligne dans une seule transaction: mémoire saturée et tables verrouillées en production.
+CommandeCorrection parcourt le queryset par lots (pagination par clé: pk > dernier pk),
+chaque lot dans sa propre transaction:
+
+- corriger_lot(lot) retourne les corrections [(objet, {champ: valeur})], de n'importe
+  quel modèle; seules les valeurs réellement différentes sont retenues puis écrites en
+  un bulk_update par modèle. Les signaux pre_save/post_save sont envoyés comme pour
+  save(update_fields=...) (compteurs du jour, journal de valeur...), sauf signaux = False.
+- apres_ecriture(lot, differences): écritures annexes du lot (suppressions, mouvements).
+- Reprise: le dernier pk traité est enregistré après chaque lot (--reprise); relancée
+  avec les mêmes options, la commande repart du lot suivant. Fichier supprimé à la fin.
+- --dry-run: différences affichées (« champ: avant → après »), rien n'est écrit.
+- --pause: attente entre deux lots pour laisser passer le trafic des caisses.
+"""
+import json
+import os
+import tempfile
+import time
+from collections import defaultdict
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models import Expression
+from django.db.models.signals import post_save, pre_save
+
+# Options propres au cadre, sans effet sur le résultat de la correction
+OPTIONS_CADRE = ('dry_run', 'taille_lot', 'pause', 'reprise', 'recommencer', 'verbosity', 'settings',
+                 'pythonpath', 'traceback', 'no_color', 'force_color', 'skip_checks')
+
+
+class CommandeCorrection(BaseCommand):
+    taille_lot = 500
+    pause = 0.0
+    signaux = True
+    # Drapeau qui déclenche l'écriture (ex: '--execute'): sans lui la commande simule.
+    # None: la commande écrit, --dry-run pour simuler.
+    drapeau_execution = None
+    # Différences affichées au maximum en simulation (le décompte reste complet)
+    max_differences = 200
+    # Champs de suivi de la sync (version, last_updated) écrits mais non affichés
+    champs_masques = ('version', 'last_updated')
+
+    def get_queryset(self, options):
+        raise NotImplementedError
+
+    def corriger_lot(self, lot, options):
+        """[(objet, {champ: nouvelle valeur})] pour les objets du lot à corriger."""
+        raise NotImplementedError
+
+    def apres_ecriture(self, lot, differences, options):
+        """Écritures annexes d'un lot corrigé, dans sa transaction (non appelé en simulation)."""
+
+    def libelle(self, objet):
+        return f"{objet._meta.model_name} #{objet.pk}"
+
+    def add_arguments(self, parser):
+        if self.drapeau_execution:
+            parser.add_argument(self.drapeau_execution, dest='execution', action='store_true',
+                                help='Appliquer les corrections (sans ce drapeau: simulation)')
+        else:
+            parser.add_argument('--dry-run', action='store_true', help='Afficher les corrections sans rien écrire')
+        parser.add_argument('--taille-lot', type=int, default=self.taille_lot, help='Objets par lot (et par transaction)')
+        parser.add_argument('--pause', type=float, default=self.pause, help='Secondes de pause entre deux lots')
+        parser.add_argument('--reprise', help='Fichier de reprise (défaut: répertoire temporaire)')
+        parser.add_argument('--recommencer', action='store_true', help='Ignorer le point de reprise existant')
+
+    def execute(self, *args, **options):
+        if self.drapeau_execution:
+            options['dry_run'] = not options.pop('execution', False)
+        return super().execute(*args, **options)
+
+    # --- Point de reprise -------------------------------------------------------
+
+    def _chemin_reprise(self, options):
+        nom = self.__class__.__module__.rsplit('.', 1)[-1]
+        return options['reprise'] or os.path.join(tempfile.gettempdir(), f'correction_{nom}.json')
+
+    def _signature(self, options):
+        return {cle: valeur for cle, valeur in sorted(options.items())
+                if cle not in OPTIONS_CADRE and isinstance(valeur, (str, int, float, bool, list, type(None)))}
+
+    def _lire_reprise(self, chemin, options):
+        if options['recommencer'] or not os.path.exists(chemin):
+            return None
+        with open(chemin, encoding='utf-8') as f:
+            reprise = json.load(f)
+        if reprise.get('options') != self._signature(options):
+            raise CommandError(
+                f"Point de reprise {chemin} créé avec d'autres options: relancer avec les mêmes options "
+                f"ou --recommencer"
+            )
+        return reprise
+
+    def _ecrire_reprise(self, chemin, etat, options):
+        temporaire = f"{chemin}.tmp"
+        with open(temporaire, 'w', encoding='utf-8') as f:
+            json.dump({**etat, 'options': self._signature(options)}, f)
+        os.replace(temporaire, chemin)
+
+    # --- Écriture -----------------------------------------------------------------
+
+    def _differences(self, corrections):
+        """Ne garde que les champs qui changent: [(objet, {champ: (avant, après)})]."""
+        retenues = []
+        for objet, valeurs in corrections:
+            diff = {
+                champ: (getattr(objet, champ), valeur) for champ, valeur in valeurs.items()
+                if isinstance(valeur, Expression) or getattr(objet, champ) != valeur
+            }
+            if diff:
+                retenues.append((objet, diff))
+        return retenues
+
+    def _ecrire(self, differences):
+        par_modele = defaultdict(lambda: (set(), []))
+        for objet, diff in differences:
+            champs, objets = par_modele[type(objet)]
+            champs.update(diff)
+            objets.append(objet)
+            for champ, (_, valeur) in diff.items():
+                setattr(objet, champ, valeur)
+
+        for modele, (champs, objets) in par_modele.items():
+            if self.signaux:
+                for objet in objets:
+                    pre_save.send(sender=modele, instance=objet, raw=False, using='default',
+                                  update_fields=frozenset(champs))
+            modele.objects.bulk_update(objets, sorted(champs))
+            if self.signaux:
+                for objet in objets:
+                    post_save.send(sender=modele, instance=objet, created=False, raw=False, using='default',
+                                   update_fields=frozenset(champs))
+
+    def _afficher(self, differences, deja_affichees):
+        for objet, diff in differences[:max(0, self.max_differences - deja_affichees)]:
+            details = ", ".join(
+                f"{champ}: {avant} → {apres}" for champ, (avant, apres) in diff.items() if champ not in self.champs_masques
+            )
+            self.stdout.write(f"   {self.libelle(objet)} | {details}")
+
+    # --- Boucle -------------------------------------------------------------------
+
+    def handle(self, *args, **options):
+        dry_run = options['dry_run']
+        taille = max(1, options['taille_lot'])
+        queryset = self.get_queryset(options).order_by('pk')
+        chemin = None if dry_run else self._chemin_reprise(options)
+
+        etat = {'dernier_pk': None, 'lots': 0, 'traites': 0, 'corriges': 0}
+        reprise = self._lire_reprise(chemin, options) if chemin else None
+        if reprise:
+            etat.update({cle: reprise[cle] for cle in etat})
+            self.stdout.write(f"↩️ Reprise après pk={etat['dernier_pk']} ({etat['traites']} déjà traités, {chemin})")
+
+        total = queryset.count() if etat['dernier_pk'] is None else queryset.filter(pk__gt=etat['dernier_pk']).count() + etat['traites']
+        mode = "🔍 SIMULATION" if dry_run else "🔧 CORRECTION"
+        self.stdout.write(f"{mode} — {total} objet(s), lots de {taille}")
+
+        debut = time.monotonic()
+        traites_session = 0
+        while True:
+            with transaction.atomic():
+                lot_qs = queryset if etat['dernier_pk'] is None else queryset.filter(pk__gt=etat['dernier_pk'])
+                lot = list(lot_qs[:taille])
+                if not lot:
+                    break
+                differences = self._differences(self.corriger_lot(lot, options))
+                if dry_run:
+                    self._afficher(differences, etat['corriges'])
+                elif differences:
+                    self._ecrire(differences)
+                    self.apres_ecriture(lot, differences, options)
+                    if options['verbosity'] >= 2:
+                        self._afficher(differences, 0)
+
+            etat['dernier_pk'] = lot[-1].pk
+            etat['lots'] += 1
+            etat['traites'] += len(lot)
+            etat['corriges'] += len(differences)
+            traites_session += len(lot)
+            if chemin:
+                self._ecrire_reprise(chemin, etat, options)
+
+            debit = traites_session / max(time.monotonic() - debut, 1e-6)
+            self.stdout.write(
+                f"   lot {etat['lots']}: {etat['traites']}/{total} ({etat['traites'] * 100 // max(total, 1)}%) — "
+                f"{etat['corriges']} à corriger — {debit:.0f} objets/s"
+            )
+            if len(lot) < taille:
+                break
+            if options['pause']:
+                time.sleep(options['pause'])
+
+        if chemin and os.path.exists(chemin):
+            os.remove(chemin)
+        if etat['corriges'] > self.max_differences and dry_run:
+            self.stdout.write(f"   … {etat['corriges'] - self.max_differences} autre(s) différence(s) non affichée(s)")
+        self.resume(etat, dry_run)
+        return None
+
+    def resume(self, etat, dry_run):
+        if dry_run:
+            relance = f"Relancer avec {self.drapeau_execution}" if self.drapeau_execution else "Relancer sans --dry-run"
+            self.stdout.write(self.style.WARNING(
+                f"\nSimulation: {etat['corriges']} correction(s) sur {etat['traites']} objet(s). {relance} pour appliquer."
+            ))
+        else:
+            self.stdout.write(self.style.SUCCESS(
+                f"\n✅ {etat['corriges']} objet(s) corrigé(s) sur {etat['traites']} en {etat['lots']} lot(s)"
+            ))
@@ -0,0 +1,274 @@
+"""
+Benchmark des endpoints critiques du POS (nombre de requêtes SQL, temps, mémoire).
+
+Les données sont générées à différentes échelles via peupler_volume (create_demo_data)
+dans une transaction annulée à la fin : la base n'est jamais modifiée.
+Fonctionne sur SQLite et PostgreSQL (selon DATABASE_URL).
+
+Exemples:
+    python manage.py benchmark_api --scale small
+    python manage.py benchmark_api --scale small medium --save-baseline
+    python manage.py benchmark_api --scale medium --threshold-time 0.3
+"""
+import json
+import os
+import random
+import statistics
+import time
+import tracemalloc
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test import Client as HttpClient
+from django.test.utils import CaptureQueriesContext, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from inventory.models import Commercant, Boutique
+from inventory.management.commands.create_demo_data import peupler_volume
+
+
+# Échelles: nombre d'articles, de terminaux, de ventes par jour et de jours d'historique
+SCALES = {
+    'small': {'articles': 50, 'terminaux': 2, 'ventes_par_jour': 20, 'jours': 7},
+    'medium': {'articles': 500, 'terminaux': 5, 'ventes_par_jour': 100, 'jours': 30},
+    'large': {'articles': 5000, 'terminaux': 10, 'ventes_par_jour': 300, 'jours': 90},
+}
+
+DEFAULT_BASELINE = os.path.join(settings.BASE_DIR, 'benchmarks', 'api_baseline.json')
+
+
+class _Rollback(Exception):
+    """Levée pour annuler la transaction du benchmark."""
+
+
+class Command(BaseCommand):
+    help = "Mesure requêtes SQL, temps et mémoire des endpoints POS et compare à une baseline"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--scale', nargs='+', choices=list(SCALES), default=['small'],
+                            help="Échelle(s) de données à générer")
+        parser.add_argument('--repeat', type=int, default=5,
+                            help="Nombre d'itérations par endpoint (médiane retenue)")
+        parser.add_argument('--batch', type=int, default=10,
+                            help="Nombre de ventes par appel à sync_ventes_simple")
+        parser.add_argument('--lignes', type=int, default=3,
+                            help="Nombre de lignes par vente")
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument('--baseline', default=DEFAULT_BASELINE,
+                            help="Fichier JSON des résultats de référence")
+        parser.add_argument('--save-baseline', action='store_true',
+                            help="Enregistre les résultats comme nouvelle baseline")
+        parser.add_argument('--threshold-queries', type=float, default=0.0,
+                            help="Hausse tolérée du nombre de requêtes (0.1 = +10%%)")
+        parser.add_argument('--threshold-time', type=float, default=0.5,
+                            help="Hausse tolérée du temps médian (0.5 = +50%%)")
+        parser.add_argument('--threshold-memory', type=float, default=0.5,
+                            help="Hausse tolérée du pic mémoire (0.5 = +50%%)")
+
+    def handle(self, *args, **options):
+        vendor = connection.vendor
+        self.stdout.write(f"🚀 Benchmark API POS ({vendor})")
+
+        resultats = {}
+        for scale in options['scale']:
+            self.stdout.write(f"\n📦 Échelle {scale}: {SCALES[scale]}")
+            resultats[f"{vendor}:{scale}"] = self._executer_echelle(scale, options)
+
+        baseline = {}
+        if os.path.exists(options['baseline']):
+            with open(options['baseline'], encoding='utf-8') as f:
+                baseline = json.load(f)
+
+        if options['save_baseline']:
+            baseline.update(resultats)
+            os.makedirs(os.path.dirname(options['baseline']), exist_ok=True)
+            with open(options['baseline'], 'w', encoding='utf-8') as f:
+                json.dump(baseline, f, indent=2, sort_keys=True)
+            self.stdout.write(self.style.SUCCESS(f"\n✅ Baseline enregistrée: {options['baseline']}"))
+            return
+
+        regressions = self._comparer(resultats, baseline, options)
+        if regressions:
+            for ligne in regressions:
+                self.stdout.write(self.style.ERROR(f"   ❌ {ligne}"))
+            raise CommandError(f"{len(regressions)} régression(s) détectée(s)")
+        self.stdout.write(self.style.SUCCESS("\n✅ Aucune régression par rapport à la baseline"))
+
+    # ------------------------------------------------------------------
+    # Exécution
+    # ------------------------------------------------------------------
+
+    def _executer_echelle(self, scale, options):
+        resultats = {}
+        try:
+            # Tout est annulé à la fin: les hooks on_commit (notifications différées) ne sont pas exécutés.
+            # Cache propre à l'échelle: les réponses idempotentes d'une échelle annulée (mêmes terminaux et
+            # numéros de facture) seraient sinon rejouées à la suivante, et le cache réel reste intact
+            cache_isole = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+                                       'LOCATION': f'benchmark-{scale}'}}
+            with transaction.atomic(), override_settings(ALLOWED_HOSTS=['*'], SECURE_SSL_REDIRECT=False,
+                                                         CACHES=cache_isole):
+                contexte = self._preparer_donnees(scale, options)
+                for nom, appel in self._scenarios(contexte, options):
+                    resultats[nom] = self._mesurer(appel, options['repeat'])
+                    self._afficher(nom, resultats[nom])
+                raise _Rollback()
+        except _Rollback:
+            pass
+        return resultats
+
+    def _preparer_donnees(self, scale, options):
+        params = SCALES[scale]
+        rng = random.Random(options['seed'])
+
+        user = User.objects.create_user(username=f'bench_{scale}', password='bench')
+        commercant = Commercant.objects.create(
+            nom_entreprise=f'Bench {scale}', nom_responsable='Bench',
+            email=f'bench_{scale}@example.com', user=user,
+        )
+        boutique = Boutique.objects.create(nom=f'Boutique bench {scale}', commercant=commercant)
+
+        debut = time.perf_counter()
+        terminaux, articles = peupler_volume(
+            boutique, params['articles'], params['terminaux'], params['ventes_par_jour'],
+            params['jours'], lignes_par_vente=options['lignes'], rng=rng, prefixe='BENCH',
+        )
+        self.stdout.write(f"   Données générées en {time.perf_counter() - debut:.1f}s")
+
+        client = HttpClient()
+        client.force_login(user)
+        return {
+            'client': client,
+            'rng': rng,
+            'serie': terminaux[0].numero_serie,
+            'articles': articles,
+            'factures': [],
+            'compteur': 0,
+        }
+
+    def _lignes(self, contexte, nb):
+        articles = contexte['rng'].sample(contexte['articles'], min(nb, len(contexte['articles'])))
+        return [
+            {'article_id': a.id, 'quantite': 1, 'prix_unitaire': int(a.prix_vente)}
+            for a in articles
+        ]
+
+    def _numero(self, contexte, prefixe):
+        contexte['compteur'] += 1
+        return f"{prefixe}-{timezone.now():%Y%m%d}-{contexte['compteur']:06d}"
+
+    def _scenarios(self, contexte, options):
+        client = contexte['client']
+        entetes = {'HTTP_X_DEVICE_SERIAL': contexte['serie']}
+
+        def articles_list():
+            return client.get(reverse('api_v2_simple:articles_list'), **entetes)
+
+        def sync_ventes():
+            ventes = []
+            for _ in range(options['batch']):
+                lignes = self._lignes(contexte, options['lignes'])
+                ventes.append({
+                    'numero_facture': self._numero(contexte, 'BSYNC'),
+                    'date_vente': timezone.now().isoformat(),
+                    'montant_total': sum(l['prix_unitaire'] for l in lignes),
+                    'mode_paiement': 'CASH',
+                    'paye': True,
+                    'lignes': lignes,
+                })
+            reponse = client.post(reverse('api_v2_simple:sync_ventes'), data=json.dumps(ventes),
+                                  content_type='application/json', **entetes)
+            # Une vente rejetée fausserait la mesure (chemin d'erreur plus court)
+            if reponse.status_code < 400 and reponse.json().get('ventes_erreurs'):
+                raise CommandError(f"Ventes rejetées: {reponse.json()['details']['erreurs'][:3]}")
+            return reponse
+
+        def create_vente():
+            numero = self._numero(contexte, 'BVENTE')
+            contexte['factures'].append(numero)
+            return client.post(reverse('api_v2_simple:create_vente'), data=json.dumps({
+                'numero_facture': numero,
+                'date_vente': timezone.now().isoformat(),
+                'lignes': self._lignes(contexte, options['lignes']),
+            }), content_type='application/json', **entetes)
+
+        def annuler_vente():
+            return client.post(reverse('api_v2_simple:annuler_vente'), data=json.dumps({
+                'numero_facture': contexte['factures'].pop(0),
+                'motif': 'Benchmark',
+            }), content_type='application/json', **entetes)
+
+        def dashboard():
+            return client.get(reverse('inventory:commercant_dashboard'))
+
+        # create_vente avant annuler_vente: chaque annulation consomme une vente créée
+        return [
+            ('articles_list_simple', articles_list),
+            ('sync_ventes_simple', sync_ventes),
+            ('create_vente_simple', create_vente),
+            ('annuler_vente_simple', annuler_vente),
+            ('dashboard_commercant', dashboard),
+        ]
+
+    def _mesurer(self, appel, repeat):
+        """Mesure `repeat` appels (temps, requêtes) puis un appel sous tracemalloc (pic mémoire)."""
+        durees = []
+        requetes = []
+        for _ in range(repeat):
+            with CaptureQueriesContext(connection) as ctx:
+                debut = time.perf_counter()
+                reponse = appel()
+                durees.append((time.perf_counter() - debut) * 1000)
+            if reponse.status_code >= 400:
+                raise CommandError(f"Réponse {reponse.status_code}: {reponse.content[:300]!r}")
+            requetes.append(len(ctx.captured_queries))
+
+        tracemalloc.start()
+        try:
+            appel()
+            _, pic = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+
+        return {
+            'queries': max(requetes),
+            'time_ms': round(statistics.median(durees), 2),
+            'peak_kb': round(pic / 1024, 1),
+        }
+
+    def _afficher(self, nom, mesure):
+        self.stdout.write(
+            f"   {nom:<24} {mesure['queries']:>5} requêtes  "
+            f"{mesure['time_ms']:>9.2f} ms  {mesure['peak_kb']:>9.1f} Ko"
+        )
+
+    # ------------------------------------------------------------------
+    # Comparaison à la baseline
+    # ------------------------------------------------------------------
+
+    def _comparer(self, resultats, baseline, options):
+        seuils = {
+            'queries': options['threshold_queries'],
+            'time_ms': options['threshold_time'],
+            'peak_kb': options['threshold_memory'],
+        }
+        regressions = []
+        for cle, endpoints in resultats.items():
+            reference = baseline.get(cle)
+            if not reference:
+                self.stdout.write(self.style.WARNING(f"\n⚠️ Pas de baseline pour {cle} (utiliser --save-baseline)"))
+                continue
+            for nom, mesure in endpoints.items():
+                ref = reference.get(nom)
+                if not ref:
+                    continue
+                for metrique, seuil in seuils.items():
+                    limite = ref[metrique] * (1 + seuil)
+                    if mesure[metrique] > limite:
+                        regressions.append(
+                            f"{cle} {nom} {metrique}: {mesure[metrique]} > {ref[metrique]} (+{seuil:.0%} toléré)"
+                        )
+        return regressions
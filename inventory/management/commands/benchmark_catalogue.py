@@ -0,0 +1,110 @@
+"""
+Compare le catalogue POS (articles_list_simple) en JSON actuel et en colonnes
+(JSON / MessagePack, brut / gzip / brotli): octets transférés et temps CPU serveur.
+
+Les données sont générées via peupler_volume dans une transaction annulée à la fin.
+Exemples:
+    python manage.py benchmark_catalogue --scale small
+    python manage.py benchmark_catalogue --scale medium --delta 0.05
+"""
+import random
+import statistics
+import time
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Value
+from django.db.models.functions import Concat
+from django.test import Client as HttpClient
+from django.test.utils import override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from inventory.models import Article, Boutique, Commercant, VarianteArticle
+from inventory.management.commands.benchmark_api import SCALES, _Rollback
+from inventory.management.commands.create_demo_data import peupler_volume
+from inventory.renderers import CatalogueJSONRenderer, CatalogueMsgpackRenderer, brotli, msgpack
+
+FORMATS = [
+    ('json actuel', 'application/json'),
+    ('colonnes json', CatalogueJSONRenderer.media_type),
+    ('colonnes msgpack', CatalogueMsgpackRenderer.media_type),
+]
+ENCODAGES = [('brut', ''), ('gzip', 'gzip'), ('brotli', 'br')]
+
+
+class Command(BaseCommand):
+    help = "Taille et coût CPU du catalogue POS: JSON actuel vs colonnes (JSON/MessagePack, gzip/brotli)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--scale', choices=list(SCALES), default='small')
+        parser.add_argument('--repeat', type=int, default=5, help="Appels par mesure (médiane retenue)")
+        parser.add_argument('--delta', type=float, default=0.1,
+                            help="Part des articles modifiés pour la sync incrémentale")
+        parser.add_argument('--seed', type=int, default=42)
+
+    def handle(self, *args, **options):
+        try:
+            with transaction.atomic(), override_settings(ALLOWED_HOSTS=['*'], SECURE_SSL_REDIRECT=False):
+                self._executer(options)
+                raise _Rollback()
+        except _Rollback:
+            pass
+
+    def _executer(self, options):
+        params = SCALES[options['scale']]
+        rng = random.Random(options['seed'])
+        user = User.objects.create_user(username='bench_catalogue', password='bench')
+        commercant = Commercant.objects.create(
+            nom_entreprise='Bench catalogue', nom_responsable='Bench', email='bench_catalogue@example.com', user=user,
+        )
+        boutique = Boutique.objects.create(nom='Boutique bench catalogue', commercant=commercant)
+        terminaux, articles = peupler_volume(
+            boutique, params['articles'], params['terminaux'], 0, 0, rng=rng, prefixe='BCAT',
+        )
+        # Catalogue réaliste: articles validés, une image sur deux, une variante sur cinq
+        Article.objects.filter(boutique=boutique).update(est_valide_client=True)
+        Article.objects.filter(id__in=[a.id for a in articles[::2]]).update(
+            image=Concat(Value('articles/'), 'code', Value('.jpg'))
+        )
+        VarianteArticle.objects.bulk_create([
+            VarianteArticle(article_parent=article, code_barre=f'{article.code}-{n}',
+                            nom_variante=f'Taille {n}', type_attribut='TAILLE')
+            for article in articles[::5] for n in range(3)
+        ])
+        client = HttpClient(HTTP_X_DEVICE_SERIAL=terminaux[0].numero_serie)
+
+        # Sync incrémentale: une part des articles modifiée après la dernière sync
+        depuis = timezone.now()
+        modifies = rng.sample([a.id for a in articles], max(1, int(len(articles) * options['delta'])))
+        Article.objects.filter(id__in=modifies).update(last_updated=timezone.now())
+
+        self.stdout.write(f"📦 Catalogue {options['scale']}: {len(articles)} articles, {len(modifies)} modifiés")
+        for sync, params_get in (('complète', {}), ('incrémentale', {'since': depuis.isoformat()})):
+            self.stdout.write(f"\n🔄 Sync {sync}")
+            self.stdout.write(f"   {'Format':<18} {'Encodage':<8} {'Octets':>10} {'Ratio':>7} {'CPU ms':>8}")
+            reference = None
+            for nom_format, accept in FORMATS:
+                if accept == CatalogueMsgpackRenderer.media_type and msgpack is None:
+                    self.stdout.write(self.style.WARNING("   colonnes msgpack: paquet msgpack non installé"))
+                    continue
+                for nom_encodage, accept_encoding in ENCODAGES:
+                    if accept_encoding == 'br' and brotli is None:
+                        continue
+                    if accept == 'application/json' and accept_encoding:
+                        continue  # le JSON actuel n'est pas compressé par l'application
+                    octets, cpu_ms = self._mesurer(client, params_get, accept, accept_encoding, options['repeat'])
+                    reference = reference or octets
+                    self.stdout.write(
+                        f"   {nom_format:<18} {nom_encodage:<8} {octets:>10,} {octets / reference:>7.1%} {cpu_ms:>8.2f}"
+                    )
+
+    def _mesurer(self, client, params_get, accept, accept_encoding, repeat):
+        url = reverse('api_v2_simple:articles_list')
+        cpu = []
+        for _ in range(repeat):
+            debut = time.process_time()
+            reponse = client.get(url, params_get, HTTP_ACCEPT=accept, HTTP_ACCEPT_ENCODING=accept_encoding)
+            cpu.append((time.process_time() - debut) * 1000)
+        return len(reponse.content), round(statistics.median(cpu), 2)
@@ -1,10 +1,96 @@
 from django.core.management.base import BaseCommand
 from django.contrib.auth.models import User
-from inventory.models import Commercant, Boutique, Client, Article, Categorie, Vente, LigneVente
+from inventory.models import Commercant, Boutique, Client, Article, Categorie, Vente, LigneVente, MouvementStock
 from django.db import transaction
+from django.utils import timezone
+from datetime import timedelta
 from decimal import Decimal
 import random
 
+
+def peupler_volume(boutique, nb_articles, nb_terminaux, ventes_par_jour, jours,
+                   lignes_par_vente=3, rng=None, prefixe='VOL'):
+    """
+    Génère un volume de données réaliste pour une boutique (articles, terminaux,
+    historique de ventes et mouvements) en bulk_create.
+    Utilisé par la commande benchmark_api pour les différentes échelles.
+    Retourne (terminaux, articles).
+    """
+    rng = rng or random.Random(42)
+    maintenant = timezone.now()
+
+    categories = [
+        Categorie(nom=f'{prefixe} Catégorie {i}', boutique=boutique)
+        for i in range(max(1, nb_articles // 50))
+    ]
+    Categorie.objects.bulk_create(categories)
+    categories = list(Categorie.objects.filter(boutique=boutique, nom__startswith=prefixe))
+
+    Article.objects.bulk_create([
+        Article(
+            code=f'{prefixe}{i:06d}',
+            nom=f'Article {prefixe} {i}',
+            prix_vente=Decimal(rng.randint(5, 500) * 100),
+            prix_achat=Decimal(rng.randint(2, 250) * 100),
+            categorie=rng.choice(categories),
+            boutique=boutique,
+            quantite_stock=1_000_000,
+        ) for i in range(nb_articles)
+    ], batch_size=500)
+    articles = list(Article.objects.filter(boutique=boutique, code__startswith=prefixe))
+
+    Client.objects.bulk_create([
+        Client(
+            compte_proprietaire=boutique.commercant.user,
+            boutique=boutique,
+            nom_terminal=f'Terminal {prefixe} {i}',
+            numero_serie=f'{prefixe}-{boutique.id}-{i:03d}',
+        ) for i in range(nb_terminaux)
+    ])
+    terminaux = list(Client.objects.filter(boutique=boutique, numero_serie__startswith=f'{prefixe}-{boutique.id}-'))
+
+    for jour in range(jours):
+        date_jour = maintenant - timedelta(days=jour + 1)
+        ventes = [
+            Vente(
+                numero_facture=f'{prefixe}-{boutique.id}-{jour:03d}-{n:05d}',
+                date_vente=date_jour,
+                montant_total=0,
+                paye=True,
+                boutique=boutique,
+                client_maui=rng.choice(terminaux) if terminaux else None,
+            ) for n in range(ventes_par_jour)
+        ]
+        Vente.objects.bulk_create(ventes, batch_size=500)
+        ventes = Vente.objects.filter(boutique=boutique, numero_facture__startswith=f'{prefixe}-{boutique.id}-{jour:03d}-')
+
+        lignes = []
+        mouvements = []
+        montants = {}
+        for vente in ventes:
+            for article in rng.sample(articles, min(lignes_par_vente, len(articles))):
+                quantite = rng.randint(1, 5)
+                lignes.append(LigneVente(vente=vente, article=article, quantite=quantite,
+                                         prix_unitaire=article.prix_vente))
+                mouvements.append(MouvementStock(
+                    article=article, boutique=boutique, type_mouvement='VENTE', quantite=-quantite,
+                    stock_avant=article.quantite_stock, stock_apres=article.quantite_stock - quantite,
+                    reference_document=vente.numero_facture, utilisateur='demo',
+                ))
+                montants[vente.pk] = montants.get(vente.pk, 0) + article.prix_vente * quantite
+        LigneVente.objects.bulk_create(lignes, batch_size=1000)
+        MouvementStock.objects.bulk_create(mouvements, batch_size=1000)
+        MouvementStock.objects.filter(
+            boutique=boutique,
+            reference_document__startswith=f'{prefixe}-{boutique.id}-{jour:03d}-',
+        ).update(date_mouvement=date_jour)
+        for vente in ventes:
+            vente.montant_total = montants.get(vente.pk, 0)
+        Vente.objects.bulk_update(ventes, ['montant_total'], batch_size=500)
+
+    return terminaux, articles
+
+
 class Command(BaseCommand):
     help = 'Créer des données de démonstration pour l\'architecture multi-commerçants'
 
@@ -7,7 +7,8 @@ seule la 1ère décrémentait le stock. Les suivantes étaient skippées.
 
 Ce script:
 1. Trouve toutes les LigneVente des N derniers jours avec une variante
-2. Vérifie si un MouvementStock correspondant existe (via commentaire contenant le nom variante)
+2. Vérifie si un MouvementStock correspondant existe (variante_id, sinon commentaire
+   contenant le nom variante) — une seule requête pour toutes les lignes
 3. Crée les MouvementStock manquants et corrige le stock du parent
 
 Usage:
@@ -73,25 +74,32 @@ class Command(BaseCommand):
             self.stdout.write(self.style.SUCCESS("✅ Aucune ligne avec variante — rien à corriger"))
             return
 
-        # 2. Pour chaque ligne, vérifier si MouvementStock existe
+        # 2. Mouvements VENTE déjà journalisés pour ces factures: une seule requête
+        #    (variante_id renseigné, sinon nom de variante dans le commentaire)
+        deja_journalises = set()
+        commentaires = {}
+        for facture, article_id, variante_id, commentaire in MouvementStock.objects.filter(
+            reference_document__in={l.vente.numero_facture for l in lignes_avec_variante},
+            type_mouvement='VENTE',
+        ).values_list('reference_document', 'article_id', 'variante_id', 'commentaire'):
+            if variante_id:
+                deja_journalises.add((facture, article_id, variante_id))
+            else:
+                commentaires.setdefault((facture, article_id), []).append(commentaire or '')
+
         lignes_manquantes = []
         lignes_ok = 0
 
         for ligne in lignes_avec_variante:
-            nom_variante = ligne.variante.nom_variante
-            # Chercher un MouvementStock qui correspond à cette variante spécifique
-            mouvement_existe = MouvementStock.objects.filter(
-                reference_document=ligne.vente.numero_facture,
-                article=ligne.article,
-                type_mouvement='VENTE',
-                commentaire__contains=f"Variante: {nom_variante}"
-            ).exists()
+            facture = ligne.vente.numero_facture
+            mouvement_existe = (facture, ligne.article_id, ligne.variante_id) in deja_journalises or any(
+                f"Variante: {ligne.variante.nom_variante}" in c
+                for c in commentaires.get((facture, ligne.article_id), ())
+            )
 
             if mouvement_existe:
                 lignes_ok += 1
             else:
-                # Vérifier aussi s'il existe un MouvementStock générique (sans variante dans commentaire)
-                # pour ce même article+vente — c'est le cas du bug (la 1ère variante a été enregistrée)
                 lignes_manquantes.append(ligne)
 
         self.stdout.write(f"✅ {lignes_ok} lignes déjà correctes (MouvementStock trouvé)")
@@ -172,6 +180,7 @@ class Command(BaseCommand):
 
                 MouvementStock.objects.create(
                     article=article,
+                    variante=variante,
                     type_mouvement='VENTE',
                     quantite=-quantite,
                     stock_avant=stock_avant,
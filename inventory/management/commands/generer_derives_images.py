@@ -0,0 +1,46 @@
+"""
+Génère les miniatures (inventory/services/images.py) des images d'articles et de variantes
+déjà envoyées, par lots (inventory/management/commande_correction.py: reprise, --dry-run, --pause).
+Usage:
+    python manage.py generer_derives_images --dry-run
+    python manage.py generer_derives_images --modele variante --pause 0.5
+    python manage.py generer_derives_images --forcer   # régénère aussi les dérivés à jour
+"""
+from inventory.management.commande_correction import CommandeCorrection
+from inventory.models import Article, VarianteArticle
+from inventory.services.images import champs_derives, derives_a_jour, derives_pour
+
+MODELES = {'article': Article, 'variante': VarianteArticle}
+
+
+class Command(CommandeCorrection):
+    help = "Génère les miniatures des images d'articles et de variantes existantes"
+    taille_lot = 100
+    # Seules image_derives / last_updated / version changent: pas de notifications de prix ni de stock
+    signaux = False
+
+    def add_arguments(self, parser):
+        super().add_arguments(parser)
+        parser.add_argument('--modele', choices=sorted(MODELES), default='article', help='Images à traiter')
+        parser.add_argument('--forcer', action='store_true',
+                            help='Régénérer même les dérivés à jour (ex: après un changement de tailles)')
+
+    def get_queryset(self, options):
+        return MODELES[options['modele']].objects.exclude(image='').exclude(image__isnull=True)
+
+    def libelle(self, objet):
+        return f"{objet._meta.model_name} #{objet.pk} {objet.image.name}"
+
+    def corriger_lot(self, lot, options):
+        a_generer = [objet for objet in lot if options['forcer'] or not derives_a_jour(objet)]
+        if options['dry_run']:
+            # Simulation: aucun fichier écrit, seules les images concernées sont listées
+            return [(objet, {'image_derives': 'à générer'}) for objet in a_generer]
+        corrections = []
+        for objet in a_generer:
+            try:
+                corrections.append((objet, champs_derives(objet, derives_pour(objet))))
+            except OSError as e:
+                # Original inaccessible: laissé tel quel, retraité au prochain passage
+                self.stdout.write(self.style.WARNING(f"⚠️ {self.libelle(objet)}: {e}"))
+        return corrections
@@ -0,0 +1,100 @@
+"""
+Ingestion d'un lot de ventes multi-boutiques (services/ingestion_ventes.py): tout le lot
+est validé avant écriture, puis chaque boutique est enregistrée dans sa transaction,
+en parallèle sur PostgreSQL.
+Remplace les scripts recover_ventes.py (une vente et une requête par ligne à la fois).
+Usage:
+    python manage.py ingerer_ventes --fichier lot.json
+    python manage.py ingerer_ventes --rejets --boutique "KMC KIMPESE 01" --depuis 2025-11-20
+    python manage.py ingerer_ventes --rejets --commercant 3 --workers 8
+"""
+import json
+from collections import defaultdict
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+from inventory.models import Boutique, VenteRejetee
+from inventory.services.ingestion_ventes import WORKERS, ingerer_ventes
+
+
+class Command(BaseCommand):
+    help = "Enregistre un lot de ventes de plusieurs boutiques (fichier JSON ou ventes rejetées non traitées)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--fichier', help='JSON: liste de ventes ou {"ventes": [...]}, chacune avec boutique_id')
+        parser.add_argument('--rejets', action='store_true', help='Réintégrer les ventes rejetées non traitées')
+        parser.add_argument('--boutique', action='append', default=[], help='ID ou nom de boutique (répétable, avec --rejets)')
+        parser.add_argument('--commercant', type=int, help='Seulement les boutiques de ce commerçant')
+        parser.add_argument('--depuis', help='Rejets tentés depuis cette date (AAAA-MM-JJ)')
+        parser.add_argument('--workers', type=int, default=WORKERS, help='Boutiques traitées en parallèle (1 = séquentiel)')
+
+    def _rejets(self, options):
+        rejets = VenteRejetee.objects.filter(traitee=False).order_by('date_tentative')
+        if options['boutique']:
+            ids = []
+            for valeur in options['boutique']:
+                boutique = Boutique.objects.filter(**({'id': int(valeur)} if valeur.isdigit() else {'nom__iexact': valeur})).first()
+                if not boutique:
+                    raise CommandError(f"Boutique introuvable: {valeur}")
+                ids.append(boutique.id)
+            rejets = rejets.filter(boutique_id__in=ids)
+        if options['commercant']:
+            rejets = rejets.filter(boutique__commercant_id=options['commercant'])
+        if options['depuis']:
+            depuis = parse_date(options['depuis'])
+            if depuis is None:
+                raise CommandError(f"Date invalide: {options['depuis']}")
+            rejets = rejets.filter(date_tentative__date__gte=depuis)
+        return list(rejets)
+
+    def handle(self, *args, **options):
+        if bool(options['fichier']) == options['rejets']:
+            raise CommandError("Préciser --fichier ou --rejets")
+
+        rejets = []
+        if options['fichier']:
+            with open(options['fichier'], encoding='utf-8') as f:
+                donnees = json.load(f)
+            ventes = donnees if isinstance(donnees, list) else (donnees.get('ventes') or donnees.get('Ventes') or [])
+        else:
+            rejets = self._rejets(options)
+            ventes = []
+            for r in rejets:
+                vente = dict(r.donnees_vente) if isinstance(r.donnees_vente, dict) else {}
+                vente.setdefault('numero_facture', r.vente_uid)
+                vente.update(boutique_id=r.boutique_id, terminal_id=r.terminal_id)
+                ventes.append(vente)
+        if not ventes:
+            self.stdout.write("Aucune vente à ingérer")
+            return
+
+        self.stdout.write(f"📦 {len(ventes)} vente(s), {options['workers']} worker(s)")
+        resultat = ingerer_ventes(ventes, commercant_id=options['commercant'], workers=options['workers'],
+                                  utilisateur='ingerer_ventes')
+
+        for r in resultat['resultats']:
+            if r['status'] == 'rejected':
+                self.stdout.write(self.style.WARNING(
+                    f"   ❌ #{r['index']} {r['numero_facture']} (boutique {r['boutique_id']}): {r['code']} — {r['message']}"
+                ))
+
+        if rejets:
+            # Un rejet par tentative: toutes les tentatives d'une facture enregistrée sont traitées
+            par_facture = defaultdict(list)
+            for r in rejets:
+                par_facture[r.vente_uid].append(r.id)
+            traites = [
+                rid for r in resultat['resultats'] if r['status'] in ('created', 'already_exists')
+                for rid in par_facture.get(r['numero_facture'], ())
+            ]
+            VenteRejetee.objects.filter(id__in=traites).update(
+                traitee=True, date_traitement=timezone.now(), notes_traitement='Réintégrée par ingerer_ventes'
+            )
+            self.stdout.write(f"📝 {len(traites)} rejet(s) marqué(s) traité(s)")
+
+        stats = resultat['stats']
+        self.stdout.write(self.style.SUCCESS(
+            f"✅ {stats.get('created', 0)} créée(s), {stats.get('already_exists', 0)} déjà présente(s), "
+            f"{stats.get('rejected', 0)} rejetée(s) sur {stats['boutiques']} boutique(s)"
+        ))
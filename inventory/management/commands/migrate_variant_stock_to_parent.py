@@ -5,120 +5,78 @@ Logique :
   - Le stock du PARENT est conservé tel quel (source fiable = achats/approvisionnements)
   - Tous les stocks des variantes sont remis à 0 (les variantes ne gèrent plus le stock)
   - Les ventes futures décrémentent uniquement le parent
+  - Traitement par lots, une transaction par lot, reprise après interruption
+    (inventory/management/commande_correction.py)
 
 Usage:
   python manage.py migrate_variant_stock_to_parent           # dry-run (aperçu sans modifier)
   python manage.py migrate_variant_stock_to_parent --execute  # applique la migration
 """
+from collections import defaultdict
 
-from django.core.management.base import BaseCommand
-from django.db import transaction
-from inventory.models import Article, VarianteArticle, MouvementStock
+from django.utils import timezone
+from inventory.management.commande_correction import CommandeCorrection
+from inventory.models import Article, MouvementStock, VarianteArticle
 
 
-class Command(BaseCommand):
+class Command(CommandeCorrection):
     help = "Remet les stocks variants à 0 — le parent devient la seule source de stock"
-
-    def add_arguments(self, parser):
-        parser.add_argument(
-            '--execute',
-            action='store_true',
-            help='Appliquer la migration (sans ce flag : affichage seulement)',
-        )
+    drapeau_execution = '--execute'
 
     def handle(self, *args, **options):
         try:
-            self._run(options)
+            return super().handle(*args, **options)
         except Exception as e:
             self.stderr.write(self.style.ERROR(
                 f"\n❌ Erreur inattendue dans migrate_variant_stock_to_parent : {type(e).__name__}: {e}\n"
                 f"La commande est ignorée pour ne pas bloquer le déploiement.\n"
             ))
 
-    def _run(self, options):
-        execute = options['execute']
-
-        if not execute:
-            self.stdout.write(self.style.WARNING(
-                "\n[DRY-RUN] Aperçu sans modification. Ajoutez --execute pour appliquer.\n"
-            ))
-        else:
-            self.stdout.write(self.style.SUCCESS("\n[EXECUTE] Migration en cours...\n"))
-
+    def get_queryset(self, options):
         # Articles ayant au moins une variante active
-        articles_avec_variantes = Article.objects.filter(
-            variantes__est_actif=True
-        ).distinct().order_by('boutique_id', 'nom')
-
-        total_articles = articles_avec_variantes.count()
-        nb_migres = 0
-        nb_deja_ok = 0
-
-        self.stdout.write(f"Articles concernés : {total_articles}\n")
-        self.stdout.write("-" * 70)
-
-        with transaction.atomic():
-            for article in articles_avec_variantes:
-                try:
-                    variantes_actives = article.variantes.filter(est_actif=True)
-                    somme_variantes = sum(v.quantite_stock for v in variantes_actives)
-                    stock_parent_actuel = article.quantite_stock
-
-                    variantes_non_nulles = [v for v in variantes_actives if v.quantite_stock != 0]
-
-                    if not variantes_non_nulles:
-                        statut = "DÉJÀ OK (variants=0)"
-                        nb_deja_ok += 1
-                    else:
-                        statut = (
-                            f"MIGRATION : variants=[{', '.join(f'{v.nom_variante}={v.quantite_stock}' for v in variantes_non_nulles)}]"
-                            f" → remis à 0 | parent conservé={stock_parent_actuel}"
-                        )
-                        nb_migres += 1
-
-                        if execute:
-                            for v in variantes_non_nulles:
-                                v.quantite_stock = 0
-                                v.save(update_fields=['quantite_stock'])
-
-                            MouvementStock.objects.create(
-                                article=article,
-                                type_mouvement='CORRECTION',
-                                quantite=0,
-                                stock_avant=stock_parent_actuel,
-                                stock_apres=stock_parent_actuel,
-                                reference_document='MIGRATION-VAR-PARENT',
-                                commentaire=(
-                                    f"Migration variants→parent: stocks variants remis à 0. "
-                                    f"Parent conservé={stock_parent_actuel}. "
-                                    f"Variants zeroed: {', '.join(f'{v.nom_variante}={v.quantite_stock}' for v in variantes_actives)}"
-                                )
-                            )
-
-                    self.stdout.write(
-                        f"  [{article.boutique_id}] {article.nom:<35} | {statut}"
-                    )
-                except Exception as e:
-                    self.stderr.write(self.style.WARNING(
-                        f"  ⚠️  [{article.boutique_id}] {article.nom} — ignoré ({type(e).__name__}: {e})"
-                    ))
-
-            if not execute:
-                transaction.set_rollback(True)
-
-        self.stdout.write("-" * 70)
-        self.stdout.write(self.style.SUCCESS(
-            f"\nRésumé ({'DRY-RUN' if not execute else 'EXÉCUTÉ'}):"
-        ))
-        self.stdout.write(f"  Total articles avec variantes : {total_articles}")
-        self.stdout.write(self.style.SUCCESS(f"  Variants remis à 0            : {nb_migres}"))
-        self.stdout.write(f"  Déjà corrects (variants=0)    : {nb_deja_ok}")
-
-        if not execute:
-            self.stdout.write(self.style.WARNING(
-                "\n→ Relancez avec --execute pour appliquer les changements.\n"
-            ))
-        else:
-            self.stdout.write(self.style.SUCCESS(
-                "\n✓ Migration terminée. Stocks variants remis à 0. Parent inchangé.\n"
-            ))
+        return Article.objects.filter(variantes__est_actif=True).distinct()
+
+    def libelle(self, objet):
+        return f"[{objet.article_parent_id}] {objet.nom_variante}"
+
+    def corriger_lot(self, articles, options):
+        variantes = defaultdict(list)
+        for v in VarianteArticle.objects.filter(article_parent__in=articles, est_actif=True):
+            variantes[v.article_parent_id].append(v)
+
+        corrections = []
+        maintenant = timezone.now()
+        for article in articles:
+            variantes_non_nulles = [v for v in variantes[article.id] if v.quantite_stock != 0]
+            if not variantes_non_nulles:
+                statut = "DÉJÀ OK (variants=0)"
+            else:
+                statut = (
+                    f"MIGRATION : variants=[{', '.join(f'{v.nom_variante}={v.quantite_stock}' for v in variantes_non_nulles)}]"
+                    f" → remis à 0 | parent conservé={article.quantite_stock}"
+                )
+                # bulk_update: last_updated explicite pour la sync incrémentale des terminaux
+                corrections += [(v, {'quantite_stock': 0, 'last_updated': maintenant}) for v in variantes_non_nulles]
+            self.stdout.write(f"  [{article.boutique_id}] {article.nom:<35} | {statut}")
+        return corrections
+
+    def apres_ecriture(self, articles, differences, options):
+        remises = defaultdict(list)
+        for variante, diff in differences:
+            remises[variante.article_parent_id].append(f"{variante.nom_variante}={diff['quantite_stock'][0]}")
+        for article in articles:
+            if article.id not in remises:
+                continue
+            MouvementStock.objects.create(
+                article=article,
+                type_mouvement='CORRECTION',
+                quantite=0,
+                stock_avant=article.quantite_stock,
+                stock_apres=article.quantite_stock,
+                reference_document='MIGRATION-VAR-PARENT',
+                commentaire=(
+                    f"Migration variants→parent: stocks variants remis à 0. "
+                    f"Parent conservé={article.quantite_stock}. "
+                    f"Variants zeroed: {', '.join(remises[article.id])}"
+                )
+            )
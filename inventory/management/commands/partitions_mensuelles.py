@@ -0,0 +1,43 @@
+"""
+Partitionnement mensuel PostgreSQL des journaux (voir inventory/services/partitions.py).
+Usage:
+    python manage.py partitions_mensuelles                 # crée les partitions à venir, liste l'état
+    python manage.py partitions_mensuelles --mois-avance 6
+    python manage.py partitions_mensuelles --convertir     # convertit les tables encore normales
+"""
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from inventory.services.partitions import (
+    MOIS_AVANCE, PARTITIONS, convertir, creer_partitions, est_partitionnee, partitions,
+)
+
+
+class Command(BaseCommand):
+    help = "Crée les partitions mensuelles à venir (et convertit les tables avec --convertir)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--table', choices=list(PARTITIONS), action='append', help='Table (défaut: toutes)')
+        parser.add_argument('--mois-avance', type=int, default=MOIS_AVANCE, help='Mois créés à l\'avance')
+        parser.add_argument('--convertir', action='store_true',
+                            help='Convertir les tables non partitionnées (verrou exclusif, copie des données)')
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'postgresql':
+            self.stdout.write(self.style.WARNING(f"⚠️ Base {connection.vendor}: tables non partitionnées, rien à faire."))
+            return
+        if options['mois_avance'] < 0:
+            raise CommandError("--mois-avance doit être positif")
+
+        for table in options['table'] or PARTITIONS:
+            if options['convertir'] and convertir(table):
+                self.stdout.write(self.style.SUCCESS(f"🗂️ {table}: convertie en table partitionnée"))
+            if not est_partitionnee(table):
+                self.stdout.write(f"➖ {table}: non partitionnée (--convertir pour la convertir)")
+                continue
+            creees = creer_partitions(table, mois_avance=options['mois_avance'])
+            existantes = partitions(table)
+            self.stdout.write(
+                f"🗂️ {table}: {len(existantes)} partition(s) "
+                f"({existantes[0][1]:%m/%Y} → {existantes[-1][1]:%m/%Y}), {len(creees)} créée(s)"
+            )
+        self.stdout.write(self.style.SUCCESS("✅ Partitions à jour"))
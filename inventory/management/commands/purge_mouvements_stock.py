@@ -1,11 +1,15 @@
+from django.conf import settings
 from django.core.management.base import BaseCommand
 from django.utils import timezone
 from datetime import timedelta
 from inventory.models import MouvementStock
+from inventory.services.partitions import supprimer_partitions
+
+TABLE = MouvementStock._meta.db_table
 
 
 class Command(BaseCommand):
-    help = "Supprime les mouvements de stock de plus de 3 mois"
+    help = "Supprime les mouvements de stock plus anciens que RETENTION_MOUVEMENTS_STOCK_JOURS (3 mois)"
 
     def add_arguments(self, parser):
         parser.add_argument(
@@ -15,7 +19,15 @@ class Command(BaseCommand):
         )
 
     def handle(self, *args, **options):
-        limite = timezone.now() - timedelta(days=90)
+        limite = timezone.now() - timedelta(days=settings.RETENTION_MOUVEMENTS_STOCK_JOURS)
+
+        # Table partitionnée (PostgreSQL): mois entiers supprimés par DROP de partition
+        partitions = supprimer_partitions(TABLE, limite, simuler=options['dry_run'])
+        if partitions:
+            verbe = "à supprimer" if options['dry_run'] else "supprimée(s)"
+            self.stdout.write(f"🗂️ Partition(s) {verbe} : {', '.join(partitions)}")
+
+        # Reste (mois partiellement échu, ou table non partitionnée): DELETE
         qs = MouvementStock.objects.filter(date_mouvement__lt=limite)
         total = qs.count()
 
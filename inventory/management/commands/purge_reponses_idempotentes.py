@@ -0,0 +1,34 @@
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from datetime import timedelta
+from inventory.models import ReponseIdempotente
+
+
+class Command(BaseCommand):
+    help = "Supprime les réponses idempotentes de l'API POS plus anciennes que --jours (30 par défaut)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--jours', type=int, default=30, help="Ancienneté minimale en jours")
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help="Affiche le nombre de lignes à supprimer sans rien supprimer",
+        )
+
+    def handle(self, *args, **options):
+        limite = timezone.now() - timedelta(days=options['jours'])
+        qs = ReponseIdempotente.objects.filter(date_creation__lt=limite)
+        total = qs.count()
+
+        if total == 0:
+            self.stdout.write(self.style.SUCCESS("Aucune réponse idempotente à purger."))
+            return
+
+        self.stdout.write(f"Réponses idempotentes antérieures au {limite.strftime('%d/%m/%Y')} : {total} ligne(s)")
+
+        if options['dry_run']:
+            self.stdout.write(self.style.WARNING("Mode --dry-run : aucune suppression effectuée."))
+            return
+
+        deleted, _ = qs.delete()
+        self.stdout.write(self.style.SUCCESS(f"{deleted} réponse(s) supprimée(s) avec succès."))
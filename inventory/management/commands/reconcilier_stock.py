@@ -0,0 +1,98 @@
+"""
+Réconcilie le stock des articles avec le journal MouvementStock (toutes les boutiques
+demandées, en parallèle) et affiche le rapport de dérive.
+Remplace l'ancien script verif_stock_lukala01.py (une requête par article).
+Rapport seul par défaut: les corrections exigent --appliquer, et ne touchent jamais un
+article dont le journal a été tronqué par purge_mouvements_stock.
+Usage:
+    python manage.py reconcilier_stock --boutique "LUKALA 01"
+    python manage.py reconcilier_stock --commercant 3 --processus 4 --appliquer
+    python manage.py reconcilier_stock --toutes --csv /tmp/derive.csv
+"""
+import csv
+import os
+
+from django.core.management.base import BaseCommand, CommandError
+from inventory.models import Boutique
+from inventory.services.reconciliation import reconcilier
+
+
+class Command(BaseCommand):
+    help = "Compare le stock de chaque article au journal des mouvements et corrige les écarts (bulk)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--boutique', action='append', default=[], help='ID ou nom de boutique (répétable)')
+        parser.add_argument('--commercant', type=int, help='ID du commerçant (toutes ses boutiques)')
+        parser.add_argument('--toutes', action='store_true', help='Toutes les boutiques actives')
+        parser.add_argument('--appliquer', action='store_true',
+                            help='Corrige les écarts (articles au journal complet uniquement)')
+        parser.add_argument('--dry-run', action='store_true', help='Rapport seulement (par défaut)')
+        parser.add_argument('--processus', type=int, default=min(4, os.cpu_count() or 1),
+                            help='Processus parallèles (1 = séquentiel)')
+        parser.add_argument('--details', type=int, default=20, help="Écarts détaillés par boutique (les plus forts)")
+        parser.add_argument('--csv', help='Exporter tous les écarts dans ce fichier CSV')
+
+    def _boutiques(self, options):
+        qs = Boutique.objects.order_by('id')
+        if options['toutes']:
+            return list(qs.filter(est_active=True))
+        if options['commercant']:
+            return list(qs.filter(commercant_id=options['commercant']))
+        boutiques = []
+        for valeur in options['boutique']:
+            boutique = (qs.filter(id=int(valeur)) if valeur.isdigit() else qs.filter(nom__iexact=valeur)).first()
+            if not boutique:
+                raise CommandError(f"Boutique introuvable: {valeur}")
+            boutiques.append(boutique)
+        if not boutiques:
+            raise CommandError("Préciser --boutique, --commercant ou --toutes")
+        return boutiques
+
+    def handle(self, *args, **options):
+        boutiques = {b.id: b for b in self._boutiques(options)}
+        if options['appliquer'] and options['dry_run']:
+            raise CommandError("--appliquer et --dry-run sont incompatibles")
+        appliquer = options['appliquer']
+        mode = "🔧 CORRECTION" if appliquer else "🔍 DRY-RUN"
+        self.stdout.write(f"{mode} — {len(boutiques)} boutique(s), {options['processus']} processus")
+
+        rapports = reconcilier(list(boutiques), appliquer=appliquer, processus=options['processus'])
+
+        total_ecarts = total_corriges = 0
+        for rapport in rapports:
+            nom = boutiques[rapport.boutique_id].nom
+            if rapport.erreur:
+                self.stdout.write(self.style.ERROR(f"\n❌ {nom}: {rapport.erreur}"))
+                continue
+            total_ecarts += len(rapport.ecarts)
+            total_corriges += rapport.nb_corriges
+            self.stdout.write(
+                f"\n📦 {nom} (id={rapport.boutique_id}): {rapport.nb_articles} articles, "
+                f"{rapport.nb_sans_journal} sans journal, {len(rapport.ecarts)} écart(s), "
+                f"dérive totale {rapport.derive_totale:+} unité(s)"
+                + (f", {rapport.nb_corriges} corrigé(s)" if appliquer else "")
+            )
+            if rapport.nb_journal_incomplet:
+                self.stdout.write(self.style.WARNING(
+                    f"   ⚠️ {rapport.nb_journal_incomplet} écart(s) sur journal incomplet (mouvements purgés): non corrigé(s)"
+                ))
+            for e in sorted(rapport.ecarts, key=lambda e: -abs(e.ecart))[:options['details']]:
+                self.stdout.write(
+                    f"   {e.nom[:35]:<35} stocké {e.stock:>8} journal {e.journal:>8} écart {e.ecart:>+8}"
+                    + ("" if e.journal_complet else "  (journal incomplet)")
+                )
+
+        if options['csv']:
+            with open(options['csv'], 'w', newline='', encoding='utf-8') as f:
+                writer = csv.writer(f)
+                writer.writerow(['boutique_id', 'boutique', 'article_id', 'code', 'nom', 'stock', 'journal', 'ecart',
+                                 'journal_complet'])
+                for rapport in rapports:
+                    for e in rapport.ecarts:
+                        writer.writerow([rapport.boutique_id, boutiques[rapport.boutique_id].nom,
+                                         e.article_id, e.code, e.nom, e.stock, e.journal, e.ecart,
+                                         e.journal_complet])
+            self.stdout.write(f"\n📄 Rapport CSV: {options['csv']}")
+
+        resume = f"{total_ecarts} écart(s)" + (f", {total_corriges} article(s) corrigé(s)" if appliquer else "")
+        self.stdout.write(self.style.SUCCESS(f"\n✅ Terminé: {resume}"))
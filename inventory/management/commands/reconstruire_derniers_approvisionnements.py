@@ -0,0 +1,27 @@
+"""
+Reconstruit la projection DernierApprovisionnement depuis l'historique des factures.
+Usage:
+    python manage.py reconstruire_derniers_approvisionnements
+    python manage.py reconstruire_derniers_approvisionnements --boutique 12
+"""
+from django.core.management.base import BaseCommand, CommandError
+from inventory.models import Boutique
+from inventory.services.approvisionnement import reconstruire
+
+
+class Command(BaseCommand):
+    help = "Reconstruit le dernier approvisionnement connu de chaque article (pré-remplissage des factures)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--boutique', type=int, help='ID de la boutique/dépôt (toutes par défaut)')
+
+    def handle(self, *args, **options):
+        boutique = None
+        if options['boutique']:
+            boutique = Boutique.objects.filter(id=options['boutique']).first()
+            if not boutique:
+                raise CommandError(f"Boutique introuvable: {options['boutique']}")
+
+        total = reconstruire(boutique)
+        portee = boutique.nom if boutique else 'toutes les boutiques'
+        self.stdout.write(self.style.SUCCESS(f"✅ {total} article(s) mis à jour ({portee})"))
@@ -0,0 +1,38 @@
+"""
+Régularise un inventaire TERMINE par lots (reprend une régularisation interrompue).
+Usage:
+    python manage.py regulariser_inventaire 123
+    python manage.py regulariser_inventaire INV-20260301-001 --lot 1000
+"""
+from django.core.management.base import BaseCommand, CommandError
+from inventory.models import Inventaire
+from inventory.services.inventaire import TAILLE_LOT, regulariser_par_lots
+
+
+class Command(BaseCommand):
+    help = "Régularise le stock selon un inventaire terminé, par lots (reprise possible)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('inventaire', help="ID ou référence de l'inventaire")
+        parser.add_argument('--lot', type=int, default=TAILLE_LOT, help='Lignes par transaction')
+
+    def handle(self, *args, **options):
+        ref = options['inventaire']
+        filtre = {'id': int(ref)} if ref.isdigit() else {'reference': ref}
+        inventaire = Inventaire.objects.select_related('boutique').filter(**filtre).first()
+        if not inventaire:
+            raise CommandError(f"Inventaire introuvable: {ref}")
+        if inventaire.statut != 'TERMINE':
+            raise CommandError(f"Inventaire {inventaire.reference} au statut {inventaire.statut} (TERMINE attendu)")
+
+        restantes = inventaire.lignes.filter(est_regularise=False).count()
+        self.stdout.write(f"📦 {inventaire.reference} ({inventaire.boutique.nom}): {restantes} ligne(s) à régulariser")
+
+        total = regulariser_par_lots(
+            inventaire,
+            taille_lot=options['lot'],
+            progression=lambda n: self.stdout.write(f"   … {n} article(s) ajusté(s)"),
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f"✅ {inventaire.reference}: {total} article(s) ajusté(s), statut {inventaire.statut}"
+        ))
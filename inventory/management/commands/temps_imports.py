@@ -0,0 +1,96 @@
+"""
+Temps d'import au démarrage d'un processus (django.setup() + chargement des URLs),
+mesuré dans un interpréteur neuf avec python -X importtime.
+
+Signale les dépendances lourdes censées être importées à la demande (PDF, Excel,
+images) si elles sont chargées dès le démarrage, et le dépassement du budget.
+Usage:
+    python manage.py temps_imports
+    python manage.py temps_imports --prefixe inventory --limite 40
+    python manage.py temps_imports --budget-ms 1500
+"""
+import json
+import os
+import subprocess
+import sys
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+# Importés uniquement dans les chemins d'export/import (voir inventory/vues_differees.py)
+MODULES_DIFFERES = ('reportlab', 'openpyxl', 'PIL', 'qrcode', 'barcode')
+
+SCRIPT = """
+import json, sys, time
+debut = time.perf_counter()
+import django
+django.setup()
+setup = time.perf_counter()
+from django.urls import get_resolver
+get_resolver().url_patterns
+fin = time.perf_counter()
+print(json.dumps({
+    'setup_ms': round((setup - debut) * 1000, 1),
+    'urls_ms': round((fin - setup) * 1000, 1),
+    'differes': sorted(m for m in %r if m in sys.modules),
+}))
+"""
+
+
+def lire_importtime(sortie):
+    """[(module, self_us, cumul_us, profondeur)] depuis la sortie de -X importtime."""
+    modules = []
+    for ligne in sortie.splitlines():
+        if not ligne.startswith('import time:') or 'imported package' in ligne:
+            continue
+        self_us, cumul_us, nom = ligne[len('import time:'):].split('|')
+        profondeur = (len(nom) - len(nom.lstrip(' ')) - 1) // 2
+        modules.append((nom.strip(), int(self_us), int(cumul_us), profondeur))
+    return modules
+
+
+class Command(BaseCommand):
+    help = "Temps d'import par module au démarrage (django.setup + URLs), dans un processus neuf"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--limite', type=int, default=25, help='Nombre de modules affichés')
+        parser.add_argument('--prefixe', help="Modules dont le nom commence par ce préfixe (ex: inventory), tous niveaux")
+        parser.add_argument('--budget-ms', type=float, help='Échec si setup + URLs dépasse ce temps')
+
+    def handle(self, *args, **options):
+        env = dict(os.environ, DJANGO_SETTINGS_MODULE=settings.SETTINGS_MODULE, PYTHONDONTWRITEBYTECODE='')
+        processus = subprocess.run(
+            [sys.executable, '-X', 'importtime', '-c', SCRIPT % (MODULES_DIFFERES,)],
+            cwd=settings.BASE_DIR, env=env, capture_output=True, text=True,
+        )
+        if processus.returncode != 0:
+            raise CommandError(f"Échec du démarrage mesuré:\n{processus.stderr[-2000:]}")
+        mesure = json.loads(processus.stdout.strip().splitlines()[-1])
+        modules = lire_importtime(processus.stderr)
+
+        if options['prefixe']:
+            selection = [m for m in modules if m[0].startswith(options['prefixe'])]
+            titre = f"Modules {options['prefixe']}*"
+        else:
+            selection = [m for m in modules if m[3] == 0]
+            titre = "Imports de premier niveau"
+        selection.sort(key=lambda m: -m[2])
+
+        total = mesure['setup_ms'] + mesure['urls_ms']
+        self.stdout.write(
+            f"⏱️ Démarrage: {total:.0f} ms (django.setup {mesure['setup_ms']:.0f} ms, URLs {mesure['urls_ms']:.0f} ms)"
+        )
+        self.stdout.write(f"\n{titre} (cumulé, ms):")
+        for nom, self_us, cumul_us, _ in selection[:options['limite']]:
+            self.stdout.write(f"   {cumul_us / 1000:>8.1f}  {self_us / 1000:>7.1f} propre  {nom}")
+
+        erreurs = []
+        if mesure['differes']:
+            erreurs.append(f"importés au démarrage (à importer à la demande): {', '.join(mesure['differes'])}")
+        if options['budget_ms'] is not None and total > options['budget_ms']:
+            erreurs.append(f"budget dépassé: {total:.0f} ms > {options['budget_ms']:.0f} ms")
+        for erreur in erreurs:
+            self.stdout.write(self.style.ERROR(f"❌ {erreur}"))
+        if erreurs:
+            raise CommandError(f"{len(erreurs)} régression(s) au démarrage")
+        self.stdout.write(self.style.SUCCESS("\n✅ Aucune dépendance lourde importée au démarrage"))
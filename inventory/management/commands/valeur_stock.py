@@ -0,0 +1,83 @@
+"""
+Valeur du stock d'une boutique ou de toutes les boutiques d'un commerçant (lecture seule).
+Remplace les scripts valeur_stock_min1550000.py et top_valeur_stock_lukala01.py.
+Usage:
+    python manage.py valeur_stock --boutique "LUKALA 01"
+    python manage.py valeur_stock --boutique 12 --par-categorie
+    python manage.py valeur_stock --commercant 3
+    python manage.py valeur_stock --boutique "LUKALA 01" --seuil 1000000
+    python manage.py valeur_stock --boutique "LUKALA 01" --top 50 --base achat
+"""
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand, CommandError
+from inventory.models import Boutique, Commercant
+from inventory.services.valeur_stock import articles_par_valeur, valeur_totale
+
+
+class Command(BaseCommand):
+    help = "Valeur du stock (prix d'achat et de vente, par devise) et articles les plus valorisés"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--boutique', help='ID ou nom de la boutique/dépôt')
+        parser.add_argument('--commercant', type=int, help='ID du commerçant (toutes ses boutiques)')
+        parser.add_argument('--par-categorie', action='store_true', help='Détail par catégorie')
+        parser.add_argument('--top', type=int, help='Afficher les N articles les plus valorisés')
+        parser.add_argument('--seuil', type=Decimal, help='Afficher les articles dont la valeur >= SEUIL')
+        parser.add_argument('--base', choices=['vente', 'achat'], default='vente',
+                            help="Valeur des articles: prix de vente (défaut) ou d'achat (prix de vente si achat = 0)")
+        parser.add_argument('--devise', choices=['CDF', 'USD'], help='Limiter la liste des articles à une devise')
+
+    def _boutiques(self, options):
+        if options['boutique']:
+            valeur = options['boutique']
+            qs = Boutique.objects.filter(id=int(valeur)) if valeur.isdigit() else Boutique.objects.filter(nom__iexact=valeur)
+            boutique = qs.first()
+            if not boutique:
+                raise CommandError(f"Boutique introuvable: {valeur}")
+            return [boutique], boutique.nom
+        if options['commercant']:
+            commercant = Commercant.objects.filter(id=options['commercant']).first()
+            if not commercant:
+                raise CommandError(f"Commerçant introuvable: {options['commercant']}")
+            return list(commercant.boutiques.all()), commercant.nom_entreprise
+        raise CommandError("Préciser --boutique ou --commercant")
+
+    def handle(self, *args, **options):
+        boutiques, portee = self._boutiques(options)
+        valorisation = valeur_totale(boutiques, utiliser_cache=False)
+
+        self.stdout.write(f"\n📦 Valeur du stock — {portee} ({len(boutiques)} boutique(s))")
+        for devise in sorted(valorisation.par_devise):
+            v = valorisation.par_devise[devise]
+            self.stdout.write(
+                f"  {devise}: {v.nb_articles} article(s), {v.quantite:,} unité(s) | "
+                f"achat {v.achat:,.0f} | vente {v.vente:,.0f} | marge potentielle {v.marge_potentielle:,.0f}"
+            )
+
+        if options['par_categorie']:
+            self.stdout.write("\n🗂️ Par catégorie")
+            categories = sorted(valorisation.par_categorie.values(), key=lambda c: c['nom'])
+            for categorie in categories:
+                for devise, v in sorted(categorie['par_devise'].items()):
+                    self.stdout.write(
+                        f"  {categorie['nom'][:30]:<30} {devise} {v.nb_articles:>5} art. "
+                        f"achat {v.achat:>15,.0f}  vente {v.vente:>15,.0f}"
+                    )
+
+        if options['top'] or options['seuil'] is not None:
+            articles = articles_par_valeur(
+                boutiques, base=options['base'], devise=options['devise'],
+                seuil=options['seuil'], limite=options['top'],
+            )
+            self.stdout.write(f"\n🏆 Articles par valeur ({options['base']})")
+            self.stdout.write(f"  {'Article':<40} {'Qte':>7} {'P.Achat':>10} {'P.Vente':>10} {'Valeur':>14} {'Cumul':>15}")
+            cumul = Decimal('0')
+            for a in articles:
+                cumul += a['valeur']
+                self.stdout.write(
+                    f"  {a['nom'][:39]:<40} {a['quantite_stock']:>7,} {a['prix_achat']:>10,.0f} "
+                    f"{a['prix_vente']:>10,.0f} {a['valeur']:>14,.0f} {cumul:>15,.0f} {a['devise']}"
+                )
+
+        self.stdout.write(self.style.SUCCESS("✅ Terminé (lecture seule)"))
@@ -2,10 +2,13 @@
 Middleware pour gérer correctement les fuseaux horaires entre MAUI et Django
 """
 
+from contextlib import ExitStack
+
 from django.utils import timezone
 from django.utils.dateparse import parse_datetime
 import json
 import re
+import time
 
 
 class TimezoneMiddleware:
@@ -73,3 +76,51 @@ class ForceTimezoneMiddleware:
         timezone.activate(timezone.get_current_timezone())
         response = self.get_response(request)
         return response
+
+
+class PerformanceMiddleware:
+    """
+    Mesure la latence de chaque vue ainsi que le nombre et la durée des requêtes SQL.
+    Activable par PERF_METRICS_ENABLED, échantillonné par PERF_METRICS_SAMPLE_RATE.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        from django.db import connections
+        from . import instrumentation
+
+        if not instrumentation.doit_echantillonner():
+            return self.get_response(request)
+
+        jeton = instrumentation.demarrer_requete()
+        debut = time.perf_counter()
+        try:
+            # Toutes les bases (default, reporting...): les lectures routées vers la réplique comptent aussi
+            with ExitStack() as wrappers:
+                for alias in connections:
+                    wrappers.enter_context(connections[alias].execute_wrapper(instrumentation.execute_wrapper))
+                response = self.get_response(request)
+        finally:
+            duree_ms = (time.perf_counter() - debut) * 1000
+            match = getattr(request, 'resolver_match', None)
+            vue = match.view_name if match else 'non_resolue'
+            instrumentation.terminer_requete(jeton, vue, duree_ms)
+        return response
+
+
+class RoutageBaseMiddleware:
+    """
+    Portée par requête du routage vers la réplique de lecture (inventory/routage_bdd.py):
+    une écriture pendant la requête ramène les lectures suivantes sur la base principale.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        from .routage_bdd import requete_routee
+
+        with requete_routee():
+            return self.get_response(request)
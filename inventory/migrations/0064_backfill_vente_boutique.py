@@ -0,0 +1,52 @@
+# Renseigne Vente.boutique sur les ventes historiques (avant le lien direct)
+
+from django.db import migrations, transaction
+
+TAILLE_LOT = 2000
+
+
+def renseigner_boutique_ventes(apps, schema_editor):
+    """
+    Copie client_maui.boutique dans Vente.boutique quand elle est vide, par lots de
+    TAILLE_LOT ventes, chaque lot dans sa propre transaction (pas de verrou long sur la table).
+    """
+    Vente = apps.get_model('inventory', 'Vente')
+    Client = apps.get_model('inventory', 'Client')
+
+    dernier_id = 0
+    while True:
+        lot = list(
+            Vente.objects.filter(id__gt=dernier_id, boutique__isnull=True, client_maui__isnull=False)
+            .order_by('id')
+            .values_list('id', 'client_maui_id')[:TAILLE_LOT]
+        )
+        if not lot:
+            break
+        dernier_id = lot[-1][0]
+
+        boutiques = dict(
+            Client.objects.filter(id__in={client_id for _, client_id in lot})
+            .values_list('id', 'boutique_id')
+        )
+        par_boutique = {}
+        for vente_id, client_id in lot:
+            boutique_id = boutiques.get(client_id)
+            if boutique_id is not None:
+                par_boutique.setdefault(boutique_id, []).append(vente_id)
+
+        with transaction.atomic():
+            for boutique_id, vente_ids in par_boutique.items():
+                Vente.objects.filter(id__in=vente_ids, boutique__isnull=True).update(boutique_id=boutique_id)
+
+
+class Migration(migrations.Migration):
+    # Un lot = une transaction (sinon toute la migration tourne dans une seule transaction sur PostgreSQL)
+    atomic = False
+
+    dependencies = [
+        ('inventory', '0063_fix_inventaire_ecart_prix_unitaire'),
+    ]
+
+    operations = [
+        migrations.RunPython(renseigner_boutique_ventes, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 5.2 on 2026-10-19 16:58
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0064_backfill_vente_boutique'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='mouvementstock',
+            name='boutique',
+            field=models.ForeignKey(blank=True, db_index=False, help_text="Boutique de l'article (renseignée automatiquement)", null=True, on_delete=django.db.models.deletion.CASCADE, related_name='mouvements_stock', to='inventory.boutique'),
+        ),
+        migrations.AddField(
+            model_name='mouvementstock',
+            name='variante',
+            field=models.ForeignKey(blank=True, help_text='Variante concernée (optionnel)', null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='mouvements', to='inventory.variantearticle'),
+        ),
+        migrations.AddIndex(
+            model_name='mouvementstock',
+            index=models.Index(fields=['boutique', 'date_mouvement'], name='mouvement_boutique_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='mouvementstock',
+            index=models.Index(fields=['boutique', 'type_mouvement', 'date_mouvement'], name='mouvement_btq_type_date_idx'),
+        ),
+    ]
@@ -0,0 +1,36 @@
+# Renseigne MouvementStock.boutique sur l'historique (boutique de l'article)
+
+from django.db import migrations, transaction
+from django.db.models import Max, OuterRef, Subquery
+
+TAILLE_LOT = 5000
+
+
+def renseigner_boutique_mouvements(apps, schema_editor):
+    """
+    Copie article.boutique dans MouvementStock.boutique par tranches d'id de TAILLE_LOT,
+    chaque tranche dans sa propre transaction (UPDATE ... SET boutique_id = (SELECT ...)).
+    """
+    MouvementStock = apps.get_model('inventory', 'MouvementStock')
+    Article = apps.get_model('inventory', 'Article')
+
+    dernier_id = MouvementStock.objects.aggregate(m=Max('id'))['m'] or 0
+    boutique_article = Subquery(Article.objects.filter(pk=OuterRef('article_id')).values('boutique_id')[:1])
+    for debut in range(0, dernier_id + 1, TAILLE_LOT):
+        with transaction.atomic():
+            MouvementStock.objects.filter(
+                id__gte=debut, id__lt=debut + TAILLE_LOT, boutique__isnull=True
+            ).update(boutique_id=boutique_article)
+
+
+class Migration(migrations.Migration):
+    # Une tranche = une transaction (pas de verrou long sur la table des mouvements)
+    atomic = False
+
+    dependencies = [
+        ('inventory', '0065_mouvementstock_boutique'),
+    ]
+
+    operations = [
+        migrations.RunPython(renseigner_boutique_mouvements, migrations.RunPython.noop),
+    ]
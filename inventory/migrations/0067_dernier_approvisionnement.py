@@ -0,0 +1,71 @@
+# Generated by Django 5.2 on 2026-10-19 17:05
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery
+
+
+def remplir_derniers_approvisionnements(apps, schema_editor):
+    """Projection initiale: ligne la plus récente de chaque article (DISTINCT ON sur PostgreSQL)."""
+    LigneApprovisionnement = apps.get_model('inventory', 'LigneApprovisionnement')
+    DernierApprovisionnement = apps.get_model('inventory', 'DernierApprovisionnement')
+
+    lignes = LigneApprovisionnement.objects.select_related('facture__fournisseur')
+    if schema_editor.connection.vendor == 'postgresql':
+        dernieres = lignes.order_by('article_id', '-date_creation', '-id').distinct('article_id')
+    else:
+        plus_recente = LigneApprovisionnement.objects.filter(
+            article_id=OuterRef('article_id')
+        ).order_by('-date_creation', '-id').values('id')[:1]
+        dernieres = lignes.filter(id=Subquery(plus_recente))
+
+    projections = [
+        DernierApprovisionnement(
+            article_id=ligne.article_id,
+            boutique_id=ligne.facture.depot_id,
+            ligne_id=ligne.id,
+            fournisseur_id=ligne.facture.fournisseur_id,
+            fournisseur_nom=ligne.facture.fournisseur.nom if ligne.facture.fournisseur_id else ligne.facture.fournisseur_nom,
+            type_quantite=ligne.type_quantite,
+            nombre_cartons=ligne.nombre_cartons,
+            pieces_par_carton=ligne.pieces_par_carton,
+            prix_achat_carton=ligne.prix_achat_carton,
+            prix_achat_unitaire=ligne.prix_achat_unitaire,
+            devise=ligne.facture.devise,
+            date_approvisionnement=ligne.date_creation,
+        )
+        for ligne in dernieres.iterator(chunk_size=1000)
+    ]
+    DernierApprovisionnement.objects.bulk_create(projections, batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0066_backfill_mouvementstock_boutique'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DernierApprovisionnement',
+            fields=[
+                ('article', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='dernier_approvisionnement', serialize=False, to='inventory.article')),
+                ('fournisseur_nom', models.CharField(blank=True, max_length=200)),
+                ('type_quantite', models.CharField(choices=[('UNITE', 'Unités'), ('CARTON', 'Cartons')], default='UNITE', max_length=10)),
+                ('nombre_cartons', models.IntegerField(default=0)),
+                ('pieces_par_carton', models.IntegerField(default=1)),
+                ('prix_achat_carton', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('prix_achat_unitaire', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('devise', models.CharField(choices=[('CDF', 'Franc Congolais'), ('USD', 'Dollar US')], default='CDF', max_length=3)),
+                ('date_approvisionnement', models.DateTimeField(help_text="Date de la ligne d'approvisionnement")),
+                ('boutique', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='derniers_approvisionnements', to='inventory.boutique')),
+                ('fournisseur', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='inventory.fournisseur')),
+                ('ligne', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='inventory.ligneapprovisionnement')),
+            ],
+            options={
+                'verbose_name': 'Dernier approvisionnement',
+                'verbose_name_plural': 'Derniers approvisionnements',
+            },
+        ),
+        migrations.RunPython(remplir_derniers_approvisionnements, migrations.RunPython.noop),
+    ]
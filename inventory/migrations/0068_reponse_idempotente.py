@@ -0,0 +1,33 @@
+# Generated by Django 5.2 on 2026-10-19 17:22
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0067_dernier_approvisionnement'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ReponseIdempotente',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('endpoint', models.CharField(max_length=50)),
+                ('cle', models.CharField(help_text="SHA-256 de numéro de série + clé d'idempotence", max_length=64)),
+                ('numero_serie', models.CharField(blank=True, max_length=100)),
+                ('statut_http', models.PositiveSmallIntegerField()),
+                ('reponse', models.JSONField()),
+                ('date_creation', models.DateTimeField(auto_now_add=True)),
+                ('boutique', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='reponses_idempotentes', to='inventory.boutique')),
+            ],
+            options={
+                'verbose_name': 'Réponse idempotente',
+                'verbose_name_plural': 'Réponses idempotentes',
+                'indexes': [models.Index(fields=['date_creation'], name='idempotence_date_idx')],
+                'constraints': [models.UniqueConstraint(fields=('endpoint', 'cle'), name='idempotence_endpoint_cle_uniq')],
+            },
+        ),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 5.2 on 2026-10-19 17:35
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+def partitionner(apps, schema_editor):
+    """PostgreSQL + PARTITIONNEMENT_MENSUEL=True: journaux convertis en tables partitionnées par mois."""
+    if schema_editor.connection.vendor != 'postgresql' or not getattr(settings, 'PARTITIONNEMENT_MENSUEL', False):
+        return
+    from inventory.services.partitions import PARTITIONS, convertir
+    for table in PARTITIONS:
+        convertir(table, connexion=schema_editor.connection)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0068_reponse_idempotente'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='notificationstock',
+            name='mouvement_stock',
+            field=models.ForeignKey(blank=True, db_constraint=False, help_text='Mouvement de stock associé', null=True, on_delete=django.db.models.deletion.CASCADE, related_name='notifications', to='inventory.mouvementstock'),
+        ),
+        migrations.RunPython(partitionner, migrations.RunPython.noop),
+    ]
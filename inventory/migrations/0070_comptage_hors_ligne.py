@@ -0,0 +1,28 @@
+# Generated by Django 5.2 on 2026-10-19 17:44
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0069_partitionnement_mensuel'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='historiquesaisieinventaire',
+            name='compte_le',
+            field=models.DateTimeField(blank=True, help_text='Heure du comptage sur le terminal', null=True),
+        ),
+        migrations.AddField(
+            model_name='historiquesaisieinventaire',
+            name='mode',
+            field=models.CharField(choices=[('REMPLACER', 'Comptage complet'), ('AJOUTER', 'Comptage partiel (ajouté)')], default='REMPLACER', max_length=10),
+        ),
+        migrations.AddField(
+            model_name='historiquesaisieinventaire',
+            name='numero_serie',
+            field=models.CharField(blank=True, help_text='Terminal MAUI ayant envoyé le comptage', max_length=50),
+        ),
+    ]
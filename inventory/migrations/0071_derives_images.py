@@ -0,0 +1,23 @@
+# Generated by Django 5.2 on 2026-10-19 18:09
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0070_comptage_hors_ligne'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='article',
+            name='image_derives',
+            field=models.JSONField(blank=True, default=dict, help_text="Miniatures de l'image (services/images.py)"),
+        ),
+        migrations.AddField(
+            model_name='variantearticle',
+            name='image_derives',
+            field=models.JSONField(blank=True, default=dict, help_text="Miniatures de l'image (services/images.py)"),
+        ),
+    ]
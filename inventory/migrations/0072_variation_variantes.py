@@ -0,0 +1,22 @@
+# Generated by Django 5.2 on 2026-10-19 18:52
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0071_derives_images'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='variantearticle',
+            name='variation_en_attente',
+            field=models.IntegerField(default=0, help_text='Variation du stock parent due aux ventes de cette variante, en attente de report'),
+        ),
+        migrations.AddIndex(
+            model_name='variantearticle',
+            index=models.Index(condition=models.Q(('variation_en_attente', 0), _negated=True), fields=['article_parent'], name='variante_attente_idx'),
+        ),
+    ]
@@ -127,6 +127,7 @@ class Article(models.Model):
     date_suppression = models.DateTimeField(null=True, blank=True, help_text="Date de désactivation/suppression pour sync MAUI")
     qr_code = models.ImageField(upload_to='qr_codes/', blank=True)
     image = models.ImageField(upload_to='articles/', blank=True, null=True)
+    image_derives = models.JSONField(default=dict, blank=True, help_text="Miniatures de l'image (services/images.py)")
     date_creation = models.DateTimeField(auto_now_add=True)
     date_mise_a_jour = models.DateTimeField(auto_now=True)
     
@@ -260,6 +261,12 @@ class VarianteArticle(models.Model):
         validators=[MinValueValidator(0)],
         help_text="Stock disponible pour cette variante"
     )
+    # Ventes de la variante pas encore reportées sur le stock du parent (services/stock.py):
+    # une vente ne verrouille que la ligne de la variante, le parent est mis à jour après commit
+    variation_en_attente = models.IntegerField(
+        default=0,
+        help_text="Variation du stock parent due aux ventes de cette variante, en attente de report"
+    )
     
     # Statut
     est_actif = models.BooleanField(default=True)
@@ -270,6 +277,7 @@ class VarianteArticle(models.Model):
     
     # Image spécifique à la variante (optionnel)
     image = models.ImageField(upload_to='variantes/', blank=True, null=True)
+    image_derives = models.JSONField(default=dict, blank=True, help_text="Miniatures de l'image (services/images.py)")
     
     @property
     def stock_disponible(self):
@@ -319,11 +327,30 @@ class VarianteArticle(models.Model):
         # Code-barres unique par article parent seulement (pas globalement)
         # L'unicité par boutique est gérée dans les vues
         unique_together = [['code_barre', 'article_parent']]
+        indexes = [
+            # Reports en attente (tâche reporter_variations_variantes): index partiel, quasi vide
+            models.Index(fields=['article_parent'], name='variante_attente_idx',
+                         condition=~models.Q(variation_en_attente=0)),
+        ]
+
+
+class VenteQuerySet(models.QuerySet):
+    def de_boutique(self, boutique):
+        """
+        Ventes d'une boutique (instance ou id) ou de plusieurs (liste/queryset).
+        Filtre direct sur Vente.boutique: parcours de l'index (boutique, date_vente),
+        sans jointure sur Client ni DISTINCT.
+        """
+        if isinstance(boutique, (list, tuple, set, models.QuerySet)):
+            return self.filter(boutique__in=boutique)
+        return self.filter(boutique=boutique)
 
 
 class Vente(models.Model):
     """Ventes."""
     
+    objects = VenteQuerySet.as_manager()
+    
     numero_facture = models.CharField(max_length=100, unique=True)
     date_vente = models.DateTimeField(default=timezone.now)
     montant_total = models.DecimalField(max_digits=12, decimal_places=2)
@@ -358,6 +385,15 @@ class Vente(models.Model):
     def __str__(self):
         return f"Vente {self.numero_facture} - {self.date_vente.strftime('%d/%m/%Y')}"
     
+    def save(self, *args, **kwargs):
+        # ⭐ ISOLATION: la boutique est toujours renseignée (déduite du terminal MAUI si absente)
+        if self.boutique_id is None and self.client_maui_id is not None:
+            self.boutique_id = Client.objects.filter(pk=self.client_maui_id).values_list('boutique_id', flat=True).first()
+            update_fields = kwargs.get('update_fields')
+            if update_fields is not None and 'boutique' not in update_fields:
+                kwargs['update_fields'] = [*update_fields, 'boutique']
+        super().save(*args, **kwargs)
+    
     class Meta:
         verbose_name = "Vente"
         verbose_name_plural = "Ventes"
@@ -458,6 +494,12 @@ class MouvementStock(models.Model):
     
     # Champs existants
     article = models.ForeignKey(Article, on_delete=models.CASCADE, related_name='mouvements')
+    # ⭐ ISOLATION: boutique de l'article, dénormalisée pour les analyses (sans jointure Article)
+    boutique = models.ForeignKey('Boutique', on_delete=models.CASCADE, related_name='mouvements_stock',
+                                 null=True, blank=True, db_index=False,
+                                 help_text="Boutique de l'article (renseignée automatiquement)")
+    variante = models.ForeignKey(VarianteArticle, on_delete=models.SET_NULL, null=True, blank=True,
+                                 related_name='mouvements', help_text="Variante concernée (optionnel)")
     type_mouvement = models.CharField(max_length=20, choices=TYPES)
     quantite = models.IntegerField(help_text="Négatif pour sortie, positif pour entrée")
     date_mouvement = models.DateTimeField(auto_now_add=True)
@@ -488,6 +530,11 @@ class MouvementStock(models.Model):
     def __str__(self):
         return f"{self.type_mouvement} - {self.article.nom} ({self.quantite})"
     
+    def save(self, *args, **kwargs):
+        if self.boutique_id is None and self.article_id is not None:
+            self.boutique_id = self.article.boutique_id
+        super().save(*args, **kwargs)
+    
     class Meta:
         ordering = ['-date_mouvement']
         verbose_name = "Mouvement de stock"
@@ -496,6 +543,8 @@ class MouvementStock(models.Model):
             models.Index(fields=['article', 'date_mouvement'], name='mouvement_article_date_idx'),
             models.Index(fields=['type_mouvement'], name='mouvement_type_idx'),
             models.Index(fields=['reference_document'], name='mouvement_ref_idx'),
+            models.Index(fields=['boutique', 'date_mouvement'], name='mouvement_boutique_date_idx'),
+            models.Index(fields=['boutique', 'type_mouvement', 'date_mouvement'], name='mouvement_btq_type_date_idx'),
         ]
 
 
@@ -545,11 +594,14 @@ class Collaborateur(models.Model):
         return f"{self.nom_complet} ({self.get_role_display()})"
     
     def peut_acceder_boutique(self, boutique):
-        """Vérifie si le collaborateur peut accéder à cette boutique"""
-        if not self.boutiques_autorisees.exists():
+        """Vérifie si le collaborateur peut accéder à cette boutique (paramètres en cache)"""
+        from .services.parametres import acces_utilisateur, parametres_boutique
+        autorisees = acces_utilisateur(self.user_id).boutiques_autorisees
+        if autorisees is None:
             # Si aucune boutique spécifiée, accès à toutes les boutiques du commerçant
-            return boutique.commercant == self.commercant
-        return self.boutiques_autorisees.filter(id=boutique.id).exists()
+            parametres = parametres_boutique(boutique.id)
+            return parametres is not None and parametres.commercant_id == self.commercant_id
+        return boutique.id in autorisees
     
     class Meta:
         verbose_name = "Collaborateur"
@@ -611,8 +663,10 @@ class Commercant(models.Model):
         return self.nombre_boutiques() < self.max_boutiques
     
     def save(self, *args, **kwargs):
+        from .services.parametres import invalider_commercant
         is_new = self.pk is None
         super().save(*args, **kwargs)
+        invalider_commercant(self)
         
         # Créer un dépôt par défaut pour les nouveaux commerçants
         if is_new:
@@ -711,6 +765,10 @@ class Boutique(models.Model):
             self.cle_api_boutique = str(uuid.uuid4())
             
         super().save(*args, **kwargs)
+        
+        # Paramètres en cache (décorateurs, API POS) périmés après le COMMIT
+        from .services.parametres import invalider_boutique
+        invalider_boutique(self.pk)
     
     def __str__(self):
         return f"{self.nom} ({self.commercant.nom_entreprise})"
@@ -723,8 +781,7 @@ class Boutique(models.Model):
         """Retourne le nombre de ventes d'aujourd'hui"""
         from django.utils import timezone
         aujourd_hui = timezone.now().date()
-        return Vente.objects.filter(
-            client_maui__boutique=self,
+        return Vente.objects.de_boutique(self).filter(
             date_vente__date=aujourd_hui
         ).count()
     
@@ -733,8 +790,7 @@ class Boutique(models.Model):
         from django.utils import timezone
         from django.db.models import Sum
         aujourd_hui = timezone.now().date()
-        result = Vente.objects.filter(
-            client_maui__boutique=self,
+        result = Vente.objects.de_boutique(self).filter(
             date_vente__date=aujourd_hui,
             paye=True
         ).aggregate(total=Sum('montant_total'))
@@ -1044,11 +1100,13 @@ class NotificationStock(models.Model):
         help_text="Message détaillé de la notification"
     )
     
+    # Sans contrainte en base: MouvementStock peut être partitionnée (services/partitions.py)
     mouvement_stock = models.ForeignKey(
         MouvementStock,
         on_delete=models.CASCADE,
         null=True,
         blank=True,
+        db_constraint=False,
         related_name='notifications',
         help_text="Mouvement de stock associé"
     )
@@ -1236,6 +1294,35 @@ class LigneApprovisionnement(models.Model):
         ordering = ['date_creation']
 
 
+class DernierApprovisionnement(models.Model):
+    """
+    Projection: dernier approvisionnement connu de chaque article (pré-remplissage des factures).
+    Tenue à jour par les signaux de LigneApprovisionnement (services/approvisionnement.py).
+    """
+    
+    article = models.OneToOneField(Article, on_delete=models.CASCADE, primary_key=True,
+                                   related_name='dernier_approvisionnement')
+    boutique = models.ForeignKey('Boutique', on_delete=models.CASCADE, related_name='derniers_approvisionnements')
+    ligne = models.ForeignKey(LigneApprovisionnement, on_delete=models.SET_NULL, null=True, blank=True,
+                              related_name='+')
+    fournisseur = models.ForeignKey(Fournisseur, on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+    fournisseur_nom = models.CharField(max_length=200, blank=True)
+    type_quantite = models.CharField(max_length=10, choices=LigneApprovisionnement.TYPE_QUANTITE_CHOICES, default='UNITE')
+    nombre_cartons = models.IntegerField(default=0)
+    pieces_par_carton = models.IntegerField(default=1)
+    prix_achat_carton = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    prix_achat_unitaire = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    devise = models.CharField(max_length=3, choices=[('CDF', 'Franc Congolais'), ('USD', 'Dollar US')], default='CDF')
+    date_approvisionnement = models.DateTimeField(help_text="Date de la ligne d'approvisionnement")
+    
+    def __str__(self):
+        return f"Dernier appro {self.article_id} ({self.date_approvisionnement:%d/%m/%Y})"
+    
+    class Meta:
+        verbose_name = "Dernier approvisionnement"
+        verbose_name_plural = "Derniers approvisionnements"
+
+
 class Inventaire(models.Model):
     """Modèle représentant un inventaire physique du stock."""
     
@@ -1275,12 +1362,17 @@ class Inventaire(models.Model):
         super().save(*args, **kwargs)
     
     def calculer_statistiques(self):
-        """Calcule les statistiques de l'inventaire."""
-        lignes = self.lignes.all()
-        self.nb_articles = lignes.count()
-        self.nb_ecarts = lignes.exclude(ecart=0).count()
-        self.valeur_ecart_positif = sum(l.valeur_ecart for l in lignes if l.ecart > 0)
-        self.valeur_ecart_negatif = abs(sum(l.valeur_ecart for l in lignes if l.ecart < 0))
+        """Recalcule les statistiques de l'inventaire (une agrégation sur les lignes)."""
+        stats = self.lignes.aggregate(
+            nb_articles=models.Count('id'),
+            nb_ecarts=models.Count('id', filter=~models.Q(ecart=0)),
+            positif=models.Sum('valeur_ecart', filter=models.Q(ecart__gt=0)),
+            negatif=models.Sum('valeur_ecart', filter=models.Q(ecart__lt=0)),
+        )
+        self.nb_articles = stats['nb_articles']
+        self.nb_ecarts = stats['nb_ecarts']
+        self.valeur_ecart_positif = stats['positif'] or 0
+        self.valeur_ecart_negatif = abs(stats['negatif'] or 0)
         self.save()
     
     def __str__(self):
@@ -1342,6 +1434,11 @@ class LigneInventaire(models.Model):
 class HistoriqueSaisieInventaire(models.Model):
     """Trace chaque saisie/modification de stock physique pendant un inventaire."""
     
+    MODE_CHOICES = [
+        ('REMPLACER', 'Comptage complet'),
+        ('AJOUTER', 'Comptage partiel (ajouté)'),
+    ]
+    
     ligne_inventaire = models.ForeignKey(
         LigneInventaire, on_delete=models.CASCADE, related_name='historique_saisies'
     )
@@ -1360,6 +1457,11 @@ class HistoriqueSaisieInventaire(models.Model):
     commentaire = models.TextField(blank=True)
     date_saisie = models.DateTimeField(auto_now_add=True)
     
+    # Comptage hors ligne (scanners MAUI)
+    mode = models.CharField(max_length=10, choices=MODE_CHOICES, default='REMPLACER')
+    compte_le = models.DateTimeField(null=True, blank=True, help_text="Heure du comptage sur le terminal")
+    numero_serie = models.CharField(max_length=50, blank=True, help_text="Terminal MAUI ayant envoyé le comptage")
+    
     def __str__(self):
         return f"{self.article.nom}: {self.stock_physique_saisi} le {self.date_saisie:%d/%m/%Y %H:%M}"
     
@@ -1985,3 +2087,31 @@ class TelechargementRapportMensuel(models.Model):
 
     def __str__(self):
         return f"Rapport {self.mois}/{self.annee} - {self.boutique.nom}"
+
+
+class ReponseIdempotente(models.Model):
+    """
+    Réponse déjà servie par un endpoint d'écriture POS pour une clé d'idempotence
+    (api_idempotence.py): les reprises du terminal la reçoivent sans retraitement.
+    """
+    endpoint = models.CharField(max_length=50)
+    cle = models.CharField(max_length=64, help_text="SHA-256 de numéro de série + clé d'idempotence")
+    numero_serie = models.CharField(max_length=100, blank=True)
+    boutique = models.ForeignKey('Boutique', on_delete=models.CASCADE, null=True, blank=True,
+                                 related_name='reponses_idempotentes')
+    statut_http = models.PositiveSmallIntegerField()
+    reponse = models.JSONField()
+    date_creation = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        verbose_name = "Réponse idempotente"
+        verbose_name_plural = "Réponses idempotentes"
+        constraints = [
+            models.UniqueConstraint(fields=['endpoint', 'cle'], name='idempotence_endpoint_cle_uniq'),
+        ]
+        indexes = [
+            models.Index(fields=['date_creation'], name='idempotence_date_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.endpoint} {self.cle[:12]} ({self.statut_http})"
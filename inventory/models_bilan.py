@@ -105,7 +105,8 @@ class BilanGeneral(models.Model):
     
     def generer_donnees(self):
         """Génère automatiquement les données du bilan selon les bonnes pratiques de gestion"""
-        from .models import Vente, LigneVente, Article, MouvementStock, RapportCaisse
+        from .models import Vente, LigneVente, MouvementStock, RapportCaisse
+        from .services.valeur_stock import valeur_stock_a_date, valeur_totale
         
         logger.info(f"Génération du bilan: {self.titre}")
         
@@ -117,7 +118,8 @@ class BilanGeneral(models.Model):
                 date_vente__lte=self.date_fin,
                 est_annulee=False
             )
-            articles_qs = Article.objects.filter(boutique=self.boutique, est_actif=True)
+            boutiques_stock = [self.boutique]
+            mouvements_qs = MouvementStock.objects.filter(boutique=self.boutique)
             rapports_qs = RapportCaisse.objects.filter(
                 boutique=self.boutique,
                 date_rapport__gte=self.date_debut,
@@ -131,7 +133,8 @@ class BilanGeneral(models.Model):
                 date_vente__lte=self.date_fin,
                 est_annulee=False
             )
-            articles_qs = Article.objects.filter(boutique__in=boutiques, est_actif=True)
+            boutiques_stock = boutiques
+            mouvements_qs = MouvementStock.objects.filter(boutique__in=boutiques)
             rapports_qs = RapportCaisse.objects.filter(
                 boutique__in=boutiques,
                 date_rapport__gte=self.date_debut,
@@ -193,33 +196,10 @@ class BilanGeneral(models.Model):
         self.resultat_operationnel = self.marge_brute - self.depenses_operationnelles
         self.resultat_net = self.resultat_operationnel  # Simplifié - pas d'impôts pour le moment
         
-        # 7. Valeur du stock
-        # Stock initial (début de période)
-        mouvements_entree_avant = MouvementStock.objects.filter(
-            article__in=articles_qs,
-            type_mouvement='ENTREE',
-            date_mouvement__lt=self.date_debut
-        )
-        mouvements_sortie_avant = MouvementStock.objects.filter(
-            article__in=articles_qs,
-            type_mouvement='SORTIE',
-            date_mouvement__lt=self.date_debut
-        )
-        
-        total_entree_avant = mouvements_entree_avant.aggregate(total=Sum('quantite'))['total'] or 0
-        total_sortie_avant = mouvements_sortie_avant.aggregate(total=Sum('quantite'))['total'] or 0
-        
-        # Calcul de la valeur du stock initial
-        self.valeur_stock_initiale = Decimal('0')
-        for article in articles_qs:
-            stock_initial = article.quantite_stock - (total_entree_avant - total_sortie_avant)
-            if stock_initial > 0 and article.prix_achat:
-                self.valeur_stock_initiale += stock_initial * article.prix_achat
-        
-        # Stock final (fin de période)
-        self.valeur_stock_finale = articles_qs.aggregate(
-            total=Sum(F('quantite_stock') * F('prix_achat'))
-        )['total'] or 0
+        # 7. Valeur du stock (prix d'achat, CDF)
+        # Stock initial reconstitué depuis le journal des mouvements, stock final actuel
+        self.valeur_stock_initiale = valeur_stock_a_date(boutiques_stock, self.date_debut).achat('CDF')
+        self.valeur_stock_finale = valeur_totale(boutiques_stock).achat('CDF')
         
         self.variation_stock = self.valeur_stock_finale - self.valeur_stock_initiale
         
@@ -228,7 +208,7 @@ class BilanGeneral(models.Model):
             'ventes_par_jour': self._get_ventes_par_jour(ventes_qs),
             'top_articles': self._get_top_articles(lignes_ventes),
             'categories_performance': self._get_categories_performance(lignes_ventes),
-            'mouvements_stock': self._get_mouvements_stock_resume(articles_qs, self.date_debut, self.date_fin),
+            'mouvements_stock': self._get_mouvements_stock_resume(mouvements_qs, self.date_debut, self.date_fin),
             'indicateurs_cles': {
                 'marge_par_vente': float(self.marge_brute / self.nombre_ventes) if self.nombre_ventes > 0 else 0,
                 'rotation_stock': self._calculer_rotation_stock(),
@@ -300,18 +280,19 @@ class BilanGeneral(models.Model):
             for c in categories_perf
         ]
     
-    def _get_mouvements_stock_resume(self, articles_qs, date_debut, date_fin):
-        """Retourne un résumé des mouvements de stock"""
-        from .models import MouvementStock
-        
-        mouvements = MouvementStock.objects.filter(
-            article__in=articles_qs,
+    def _get_mouvements_stock_resume(self, mouvements_qs, date_debut, date_fin):
+        """Retourne un résumé des mouvements de stock (mouvements_qs: déjà filtré par boutique)"""
+        totaux = mouvements_qs.filter(
             date_mouvement__gte=date_debut,
-            date_mouvement__lte=date_fin
+            date_mouvement__lte=date_fin,
+            type_mouvement__in=['ENTREE', 'SORTIE']
+        ).aggregate(
+            entrees=Sum('quantite', filter=Q(type_mouvement='ENTREE')),
+            sorties=Sum('quantite', filter=Q(type_mouvement='SORTIE'))
         )
         
-        entrees = mouvements.filter(type_mouvement='ENTREE').aggregate(total=Sum('quantite'))['total'] or 0
-        sorties = mouvements.filter(type_mouvement='SORTIE').aggregate(total=Sum('quantite'))['total'] or 0
+        entrees = totaux['entrees'] or 0
+        sorties = totaux['sorties'] or 0
         
         return {
             'entrees': entrees,
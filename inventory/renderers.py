@@ -0,0 +1,65 @@
+"""
+Rendus compacts du catalogue POS (services/catalogue.py), négociés par l'en-tête Accept:
+
+- application/vnd.gestion.catalogue+json     colonnes en JSON
+- application/vnd.gestion.catalogue+msgpack  colonnes en MessagePack (paquet msgpack)
+
+Le corps est compressé selon Accept-Encoding: brotli (paquet brotli, si installé) ou gzip.
+"""
+import gzip
+import json
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.utils.cache import patch_vary_headers
+from rest_framework.renderers import BaseRenderer
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+
+def _compresser(contenu, request, response):
+    encodages = request.META.get('HTTP_ACCEPT_ENCODING', '') if request is not None else ''
+    if response is not None:
+        patch_vary_headers(response, ('Accept', 'Accept-Encoding'))
+    if brotli is not None and 'br' in encodages:
+        encodage, contenu = 'br', brotli.compress(contenu, quality=5)
+    elif 'gzip' in encodages:
+        encodage, contenu = 'gzip', gzip.compress(contenu, compresslevel=6)
+    else:
+        return contenu
+    if response is not None:
+        response['Content-Encoding'] = encodage
+    return contenu
+
+
+class CatalogueJSONRenderer(BaseRenderer):
+    media_type = 'application/vnd.gestion.catalogue+json'
+    format = 'colonnes'
+    charset = 'utf-8'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        renderer_context = renderer_context or {}
+        contenu = json.dumps(data, cls=DjangoJSONEncoder, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+        return _compresser(contenu, renderer_context.get('request'), renderer_context.get('response'))
+
+
+class CatalogueMsgpackRenderer(BaseRenderer):
+    media_type = 'application/vnd.gestion.catalogue+msgpack'
+    format = 'msgpack'
+    charset = None
+    render_style = 'binary'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        renderer_context = renderer_context or {}
+        contenu = msgpack.packb(data, use_bin_type=True, default=str)
+        return _compresser(contenu, renderer_context.get('request'), renderer_context.get('response'))
+
+
+CATALOGUE_RENDERERS = [CatalogueJSONRenderer] + ([CatalogueMsgpackRenderer] if msgpack is not None else [])
@@ -0,0 +1,105 @@
+"""
+Routage des lectures de rapports vers une réplique PostgreSQL (alias 'reporting').
+
+Les rapports lourds (CA mensuel, exports PDF, analyse des mouvements, bilans,
+statistiques système) partageaient la base principale avec sync_ventes_simple:
+en fin de mois, les rapports ralentissaient la synchronisation des caisses.
+
+- Activation: REPORTING_DATABASE_URL (settings). Sans réplique configurée, tout reste
+  sur 'default'.
+- Opt-in explicite: @lecture_replique sur une vue (sous les décorateurs d'accès) ou
+  `with lecture_replique():` autour d'un calcul. Hors de ce contexte: 'default'.
+- Collant après écriture: dès qu'une écriture a lieu pendant la requête (middleware
+  RoutageBaseMiddleware) ou dans le contexte, les lectures suivantes repassent sur
+  'default' (la réplique n'a pas encore reçu l'écriture). Idem dans un bloc atomic.
+- La réplique peut être en retard de quelques secondes (réplication asynchrone):
+  la réserver aux lectures qui le tolèrent.
+"""
+from contextvars import ContextVar
+from functools import wraps
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+
+ALIAS = 'reporting'
+
+# État de la requête (ou du contexte) en cours: {'replique': bool, 'ecrit': bool}
+_etat = ContextVar('routage_bdd', default=None)
+
+
+def replique_configuree():
+    return ALIAS in settings.DATABASES
+
+
+def lecture_sur_replique():
+    """True si les lectures du contexte courant partent vers la réplique."""
+    etat = _etat.get()
+    return bool(
+        etat and etat['replique'] and not etat['ecrit'] and replique_configuree()
+        and not connections[DEFAULT_DB_ALIAS].in_atomic_block
+    )
+
+
+class _LectureReplique:
+    def __enter__(self):
+        etat = _etat.get()
+        if etat is None:
+            self._jeton = _etat.set({'replique': True, 'ecrit': False})
+        else:
+            self._jeton = None
+            self._precedent = etat['replique']
+            etat['replique'] = True
+        return self
+
+    def __exit__(self, *exc):
+        if self._jeton is not None:
+            _etat.reset(self._jeton)
+        else:
+            _etat.get()['replique'] = self._precedent
+        return False
+
+
+def lecture_replique(fonction=None):
+    """@lecture_replique sur une vue, ou `with lecture_replique():`: lectures ORM vers la réplique si elle existe."""
+    if fonction is None:
+        return _LectureReplique()
+
+    @wraps(fonction)
+    def wrapper(*args, **kwargs):
+        with _LectureReplique():
+            return fonction(*args, **kwargs)
+    return wrapper
+
+
+class requete_routee:
+    """Portée d'une requête HTTP: l'indicateur d'écriture repart de zéro (voir le middleware)."""
+
+    def __enter__(self):
+        self._jeton = _etat.set({'replique': False, 'ecrit': False})
+
+    def __exit__(self, *exc):
+        _etat.reset(self._jeton)
+        return False
+
+
+class RouteurReporting:
+    """DATABASE_ROUTERS: lectures opt-in vers 'reporting', écritures et migrations sur 'default'."""
+
+    # Alias explicites: sans réponse, Django suivrait l'instance (lue sur la réplique) pour écrire
+    def db_for_read(self, model, **hints):
+        return ALIAS if lecture_sur_replique() else DEFAULT_DB_ALIAS
+
+    def db_for_write(self, model, **hints):
+        etat = _etat.get()
+        if etat is not None:
+            etat['ecrit'] = True
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Mêmes données des deux côtés: un objet lu sur la réplique peut référencer un objet principal
+        if {obj1._state.db, obj2._state.db} <= {DEFAULT_DB_ALIAS, ALIAS}:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return False if db == ALIAS else None
@@ -13,4 +13,8 @@ websocket_urlpatterns = [
     # WebSocket pour les notifications d'une boutique
     # ws://serveur.com/ws/notifications/2/
     re_path(r'ws/notifications/(?P<boutique_id>\d+)/$', consumers.NotificationConsumer.as_asgi()),
+    
+    # WebSocket des compteurs du jour (tuiles CA du commerçant, session web)
+    # ws://serveur.com/ws/commercant/compteurs/2/
+    re_path(r'ws/commercant/compteurs/(?P<boutique_id>\d+)/$', consumers.CompteursJourConsumer.as_asgi()),
 ]
@@ -2,6 +2,7 @@ from rest_framework import serializers
 from django.db import transaction
 import decimal
 from .models import Article, Categorie, Vente, LigneVente, Client, SessionClientMaui, RapportCaisse, ArticleNegocie, RetourArticle, NotificationStock, VarianteArticle
+from .services.images import TAILLE_SYNC, url_image_sync
 
 class CategorieSerializer(serializers.ModelSerializer):
     class Meta:
@@ -17,6 +18,7 @@ class ArticleSerializer(serializers.ModelSerializer):
     categorie_nom = serializers.CharField(source='categorie.nom', read_only=True)
     categorie_backend_id = serializers.IntegerField(source='categorie.id', read_only=True, default=None)
     image_url = serializers.SerializerMethodField()
+    image_miniature_url = serializers.SerializerMethodField()
     full_details = serializers.SerializerMethodField()
     # ⭐ Stock effectif: somme variantes si article a variantes, sinon stock article
     quantite_stock = serializers.SerializerMethodField()
@@ -27,7 +29,7 @@ class ArticleSerializer(serializers.ModelSerializer):
         fields = [
             'id', 'code', 'nom', 'description', 'devise', 'prix_vente', 'prix_achat',
             'prix_vente_usd', 'prix_achat_usd',
-            'categorie_id', 'categorie_nom', 'categorie_backend_id', 'quantite_stock', 'image_url',
+            'categorie_id', 'categorie_nom', 'categorie_backend_id', 'quantite_stock', 'image_url', 'image_miniature_url',
             'full_details', 'has_variantes',
             'est_valide_client', 'quantite_envoyee', 'date_envoi', 'date_validation'
         ]
@@ -55,10 +57,13 @@ class ArticleSerializer(serializers.ModelSerializer):
         return details
 
     def get_image_url(self, obj):
+        # Dérivé redimensionné (services/images.py), l'original tant qu'il n'est pas généré
         request = self.context.get('request')
-        if obj.image and hasattr(obj.image, 'url') and request:
-            return request.build_absolute_uri(obj.image.url)
-        return None
+        return url_image_sync(obj, request) if request else None
+
+    def get_image_miniature_url(self, obj):
+        request = self.context.get('request')
+        return url_image_sync(obj, request, 'miniature') if request else None
 
 
 class VarianteArticleSerializer(serializers.ModelSerializer):
@@ -75,6 +80,7 @@ class VarianteArticleSerializer(serializers.ModelSerializer):
     devise = serializers.CharField(read_only=True)
     nom_complet = serializers.CharField(read_only=True)
     image_url = serializers.SerializerMethodField()
+    image_miniature_url = serializers.SerializerMethodField()
     
     class Meta:
         model = VarianteArticle
@@ -83,18 +89,22 @@ class VarianteArticleSerializer(serializers.ModelSerializer):
             'code_barre', 'nom_variante', 'type_attribut',
             'quantite_stock', 'est_actif',
             'prix_vente', 'prix_achat', 'devise', 'nom_complet',
-            'image_url', 'date_creation', 'date_mise_a_jour'
+            'image_url', 'image_miniature_url', 'date_creation', 'date_mise_a_jour'
         ]
         read_only_fields = ['date_creation', 'date_mise_a_jour']
     
-    def get_image_url(self, obj):
+    def get_image_url(self, obj, taille=TAILLE_SYNC):
+        # Dérivé redimensionné (services/images.py), l'original tant qu'il n'est pas généré
         request = self.context.get('request')
-        if obj.image and hasattr(obj.image, 'url') and request:
-            return request.build_absolute_uri(obj.image.url)
+        if not request:
+            return None
+        if obj.image:
+            return url_image_sync(obj, request, taille)
         # Fallback to parent article image
-        if obj.article_parent.image and hasattr(obj.article_parent.image, 'url') and request:
-            return request.build_absolute_uri(obj.article_parent.image.url)
-        return None
+        return url_image_sync(obj.article_parent, request, taille)
+
+    def get_image_miniature_url(self, obj):
+        return self.get_image_url(obj, 'miniature')
 
 
 class ArticleAvecVariantesSerializer(serializers.ModelSerializer):
@@ -106,6 +116,7 @@ class ArticleAvecVariantesSerializer(serializers.ModelSerializer):
     has_variantes = serializers.SerializerMethodField()
     stock_total_variantes = serializers.SerializerMethodField()
     image_url = serializers.SerializerMethodField()
+    image_miniature_url = serializers.SerializerMethodField()
     
     class Meta:
         model = Article
@@ -116,7 +127,7 @@ class ArticleAvecVariantesSerializer(serializers.ModelSerializer):
             'quantite_stock', 'est_actif', 'has_variantes',
             'stock_total_variantes', 'variantes',
             'est_valide_client', 'date_suppression',
-            'image_url',
+            'image_url', 'image_miniature_url',
         ]
     
     def get_variantes(self, obj):
@@ -136,10 +147,13 @@ class ArticleAvecVariantesSerializer(serializers.ModelSerializer):
         return obj.quantite_stock
 
     def get_image_url(self, obj):
+        # Dérivé redimensionné (services/images.py), l'original tant qu'il n'est pas généré
         request = self.context.get('request')
-        if obj.image and hasattr(obj.image, 'url') and request:
-            return request.build_absolute_uri(obj.image.url)
-        return None
+        return url_image_sync(obj, request) if request else None
+
+    def get_image_miniature_url(self, obj):
+        request = self.context.get('request')
+        return url_image_sync(obj, request, 'miniature') if request else None
 
 
 class LigneVenteSerializer(serializers.ModelSerializer):
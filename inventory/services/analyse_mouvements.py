@@ -0,0 +1,470 @@
+"""
+Analyse des mouvements de stock et de la performance d'une boutique.
+
+Moteur commun à analyse_mouvements_simple (API MAUI) et analyse_ia_mouvements (web).
+
+- Agrégats de période (CA, mouvements par type, ventes, articles vendus): calculés par
+  jour en quatre requêtes groupées (TruncDate), quel que soit le nombre de jours.
+  Les jours clos sont mis en cache individuellement: une vue mensuelle fusionne
+  ~30 jours en cache et ne recalcule que le jour en cours.
+- Instantané (valeur du stock, stocks négatifs, alertes): état courant, recalculé.
+- Le résultat complet est mis en cache DUREE_CACHE_RESULTAT secondes par
+  (boutique, période, mode); invalider_analyse() le périme après une régularisation.
+
+Une vente ou un mouvement enregistré, annulé ou supprimé sur un jour clos (sync hors-ligne)
+invalide le cache de ce jour via les signaux (invalider_jour), après commit. Calculés sur la réplique de lecture
+(routage_bdd), les jours clos ne sont gardés que DUREE_CACHE_JOUR_REPLIQUE secondes:
+une invalidation peut précéder l'arrivée de la vente sur la réplique.
+"""
+from dataclasses import dataclass, field
+from datetime import datetime, time, timedelta
+from decimal import Decimal
+
+from django.core.cache import cache
+from django.db.models import Count, DecimalField, ExpressionWrapper, F, Q, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from inventory.models import AlerteStock, Article, LigneVente, MouvementStock, Vente
+from inventory.routage_bdd import lecture_sur_replique
+from inventory.services.valeur_stock import valeur_stock
+
+DUREE_CACHE_JOUR = 60 * 60 * 24
+DUREE_CACHE_JOUR_REPLIQUE = 60 * 5
+DUREE_CACHE_RESULTAT = 120
+
+
+def _cle_jour(boutique_id, jour):
+    return f"analyse_mvt_jour:{boutique_id}:{jour.isoformat()}"
+
+
+def invalider_jour(boutique_id, jour):
+    """Oublie les agrégats en cache d'un jour clos (vente tardive ou annulée)."""
+    if boutique_id and jour < timezone.localdate():
+        cache.delete(_cle_jour(boutique_id, jour))
+
+
+def _cle_version(boutique_id):
+    return f"analyse_mvt_version:{boutique_id}"
+
+
+def invalider_analyse(boutique_id):
+    """Périme les résultats en cache de la boutique (ex: après une régularisation de stock)."""
+    try:
+        cache.incr(_cle_version(boutique_id))
+    except ValueError:
+        cache.set(_cle_version(boutique_id), 2, None)
+
+
+@dataclass
+class AgregatsJour:
+    """Agrégats additifs d'une journée (fusionnables d'un jour à l'autre)."""
+    ca_cdf: Decimal = Decimal('0')
+    ca_usd: Decimal = Decimal('0')
+    ca_negocie_cdf: Decimal = Decimal('0')
+    nb_lignes_cdf: int = 0
+    nb_lignes_negociees_cdf: int = 0
+    nb_ventes: int = 0
+    # type_mouvement -> [nb, quantité]
+    mouvements: dict = field(default_factory=dict)
+    # article_id -> [quantité, CA, nb ventes]
+    articles_vendus: dict = field(default_factory=dict)
+    # article_id -> [qté VENTE, qté ENTREE, qté RETOUR, nb mouvements]
+    mouvements_articles: dict = field(default_factory=dict)
+
+    def ajouter(self, autre):
+        self.ca_cdf += autre.ca_cdf
+        self.ca_usd += autre.ca_usd
+        self.ca_negocie_cdf += autre.ca_negocie_cdf
+        self.nb_lignes_cdf += autre.nb_lignes_cdf
+        self.nb_lignes_negociees_cdf += autre.nb_lignes_negociees_cdf
+        self.nb_ventes += autre.nb_ventes
+        for cible, source in ((self.mouvements, autre.mouvements),
+                              (self.articles_vendus, autre.articles_vendus),
+                              (self.mouvements_articles, autre.mouvements_articles)):
+            for cle, valeurs in source.items():
+                courant = cible.setdefault(cle, [0] * len(valeurs))
+                for i, v in enumerate(valeurs):
+                    courant[i] += v
+        return self
+
+
+@dataclass
+class AnalyseMouvements:
+    """Résultat de l'analyse d'une boutique sur une période."""
+    boutique_id: int
+    debut: object
+    fin: object
+    nb_jours: int
+    ca_cdf: float
+    ca_usd: float
+    ca_negocie_cdf: float
+    nb_lignes_cdf: int
+    nb_lignes_negociees_cdf: int
+    nb_ventes: int
+    stock_valeur_vente: float
+    stock_valeur_cout: float
+    mouvements: dict
+    articles_negatifs: list
+    articles_a_regulariser: list
+    pertes_estimees: float
+    nb_alertes_total: int
+    top_articles: list
+    score: int
+    rotation: float
+    insights: list
+    recommandations: list
+    anomalies: list
+    detail_par_article: list = None
+
+    @property
+    def marge_potentielle(self):
+        return max(0, self.stock_valeur_vente - self.stock_valeur_cout)
+
+    @property
+    def niveau_sante(self):
+        return ('EXCELLENT' if self.score >= 85 else 'BON' if self.score >= 70
+                else 'MOYEN' if self.score >= 50 else 'CRITIQUE')
+
+    def mouvement(self, type_mouvement, absval=False):
+        nb, qte = self.mouvements.get(type_mouvement, (0, 0))
+        return {'nb': nb, 'total_qte': abs(qte) if absval else qte}
+
+
+# ===== AGRÉGATS PAR JOUR =====
+
+def _bornes(debut, fin):
+    """[début du jour `debut`, début du lendemain de `fin`[ en heure locale."""
+    tz = timezone.get_current_timezone()
+    return (
+        timezone.make_aware(datetime.combine(debut, time.min), tz),
+        timezone.make_aware(datetime.combine(fin + timedelta(days=1), time.min), tz),
+    )
+
+
+def _calculer_jours(boutique, debut, fin):
+    """Agrégats de chaque jour de [debut, fin] en quatre requêtes groupées par jour."""
+    tz = timezone.get_current_timezone()
+    borne_min, borne_max = _bornes(debut, fin)
+    jours = {}
+
+    def jour(j):
+        return jours.setdefault(j, AgregatsJour())
+
+    montant = ExpressionWrapper(F('quantite') * F('prix_unitaire'), output_field=DecimalField())
+    lignes = LigneVente.objects.filter(
+        vente__boutique=boutique,
+        vente__date_vente__gte=borne_min,
+        vente__date_vente__lt=borne_max,
+        vente__est_annulee=False,
+    ).annotate(jour=TruncDate('vente__date_vente', tzinfo=tz))
+
+    for r in lignes.values('jour', 'devise').annotate(
+        ca=Sum(montant),
+        ca_negocie=Sum(montant, filter=Q(est_negocie=True)),
+        nb_lignes=Count('id'),
+        nb_negociees=Count('id', filter=Q(est_negocie=True)),
+    ).order_by():
+        agg = jour(r['jour'])
+        if r['devise'] == 'USD':
+            agg.ca_usd += r['ca'] or 0
+        else:
+            agg.ca_cdf += r['ca'] or 0
+            agg.ca_negocie_cdf += r['ca_negocie'] or 0
+            agg.nb_lignes_cdf += r['nb_lignes']
+            agg.nb_lignes_negociees_cdf += r['nb_negociees']
+
+    for r in lignes.values('jour', 'article_id').annotate(
+        qte=Sum('quantite'), ca=Sum(montant), nb_ventes=Count('vente', distinct=True)
+    ).order_by():
+        jour(r['jour']).articles_vendus[r['article_id']] = [r['qte'] or 0, r['ca'] or 0, r['nb_ventes']]
+
+    for r in Vente.objects.filter(
+        boutique=boutique, date_vente__gte=borne_min, date_vente__lt=borne_max, est_annulee=False
+    ).annotate(jour=TruncDate('date_vente', tzinfo=tz)).values('jour').annotate(nb=Count('id')).order_by():
+        jour(r['jour']).nb_ventes = r['nb']
+
+    for r in MouvementStock.objects.filter(
+        boutique=boutique, date_mouvement__gte=borne_min, date_mouvement__lt=borne_max
+    ).annotate(jour=TruncDate('date_mouvement', tzinfo=tz)).values(
+        'jour', 'article_id', 'type_mouvement'
+    ).annotate(nb=Count('id'), qte=Sum('quantite')).order_by():
+        agg = jour(r['jour'])
+        qte = r['qte'] or 0
+        par_type = agg.mouvements.setdefault(r['type_mouvement'], [0, 0])
+        par_type[0] += r['nb']
+        par_type[1] += qte
+        par_article = agg.mouvements_articles.setdefault(r['article_id'], [0, 0, 0, 0])
+        if r['type_mouvement'] in ('VENTE', 'ENTREE', 'RETOUR'):
+            par_article[('VENTE', 'ENTREE', 'RETOUR').index(r['type_mouvement'])] += qte
+        par_article[3] += r['nb']
+
+    return jours
+
+
+def agregats_periode(boutique, debut, fin):
+    """Fusion des agrégats journaliers de [debut, fin]; jours clos servis depuis le cache."""
+    aujourd_hui = timezone.localdate()
+    tous = [debut + timedelta(days=i) for i in range((fin - debut).days + 1)]
+    clos = [j for j in tous if j < aujourd_hui]
+
+    en_cache = cache.get_many([_cle_jour(boutique.id, j) for j in clos]) if clos else {}
+    resultats = {j: en_cache[_cle_jour(boutique.id, j)] for j in clos if _cle_jour(boutique.id, j) in en_cache}
+
+    a_calculer = [j for j in tous if j not in resultats and j <= aujourd_hui]
+    if a_calculer:
+        calcules = _calculer_jours(boutique, a_calculer[0], a_calculer[-1])
+        nouveaux = {}
+        for j in a_calculer:
+            resultats[j] = calcules.get(j, AgregatsJour())
+            if j < aujourd_hui:
+                nouveaux[_cle_jour(boutique.id, j)] = resultats[j]
+        if nouveaux:
+            cache.set_many(nouveaux, DUREE_CACHE_JOUR_REPLIQUE if lecture_sur_replique() else DUREE_CACHE_JOUR)
+
+    total = AgregatsJour()
+    for j in tous:
+        if j in resultats:
+            total.ajouter(resultats[j])
+    return total
+
+
+# ===== ANALYSE =====
+
+def analyser_mouvements(boutique, debut, fin, mode='resume'):
+    """
+    Analyse de la boutique du jour `debut` au jour `fin` inclus (dates locales).
+    mode='complet' ajoute le détail par article (200 articles au plus stockés).
+    """
+    version = cache.get_or_set(_cle_version(boutique.id), 1, None)
+    cle = f"analyse_mvt:{boutique.id}:v{version}:{debut.isoformat()}:{fin.isoformat()}:{mode}"
+    resultat = cache.get(cle)
+    if resultat is None:
+        resultat = _analyser(boutique, debut, fin, mode)
+        cache.set(cle, resultat, DUREE_CACHE_RESULTAT)
+    return resultat
+
+
+def _analyser(boutique, debut, fin, mode):
+    nb_jours = max(1, (fin - debut).days + 1)
+    periode = agregats_periode(boutique, debut, fin)
+    articles_qs = Article.objects.filter(boutique=boutique, est_actif=True)
+    alertes_qs = AlerteStock.objects.filter(boutique=boutique, statut='EN_ATTENTE')
+
+    # --- Instantané du stock (valorisation CDF partagée, en cache) ---
+    valorisation = valeur_stock(boutique)
+    stock_valeur_vente = float(valorisation.vente('CDF'))
+    stock_valeur_cout = float(valorisation.achat('CDF'))
+    total_articles = articles_qs.count()
+
+    articles_negatifs = list(
+        articles_qs.filter(quantite_stock__lt=0)
+        .values('id', 'nom', 'code', 'quantite_stock', 'prix_vente', 'prix_achat', 'devise')
+        .order_by('quantite_stock')[:30]
+    )
+    pertes_estimees = sum(abs(float(a['quantite_stock'])) * float(a['prix_achat']) for a in articles_negatifs)
+
+    # Alertes EN_ATTENTE regroupées par article
+    alertes_par_art = {}
+    for a in alertes_qs.values(
+        'article__id', 'article__nom', 'article__code', 'article__quantite_stock',
+        'ecart', 'numero_facture',
+    ).order_by('-date_creation')[:100]:
+        item = alertes_par_art.setdefault(a['article__id'], {
+            'article_id': a['article__id'],
+            'nom': a['article__nom'],
+            'code': a['article__code'],
+            'stock_actuel': a['article__quantite_stock'],
+            'qte_a_regulariser': 0,
+            'nb_alertes': 0,
+            'ventes': [],
+        })
+        item['nb_alertes'] += 1
+        item['qte_a_regulariser'] += abs(a['ecart'])
+        if a['numero_facture'] not in item['ventes']:
+            item['ventes'].append(a['numero_facture'])
+    articles_a_regulariser = sorted(alertes_par_art.values(), key=lambda x: x['nb_alertes'], reverse=True)[:20]
+    nb_alertes_total = alertes_qs.count()
+
+    # --- Top articles vendus ---
+    top = sorted(periode.articles_vendus.items(), key=lambda kv: kv[1][1], reverse=True)[:10]
+    infos = Article.objects.in_bulk([aid for aid, _ in top])
+    top_articles = [
+        {
+            'article_id': aid,
+            'nom': infos[aid].nom if aid in infos else '',
+            'code': infos[aid].code if aid in infos else '',
+            'devise': infos[aid].devise if aid in infos else 'CDF',
+            'qte_vendue': qte,
+            'ca': round(float(ca), 2),
+            'nb_ventes': nb,
+        }
+        for aid, (qte, ca, nb) in top
+    ]
+
+    ca_cdf = float(periode.ca_cdf)
+    ca_negocie_cdf = float(periode.ca_negocie_cdf)
+    score, rotation, insights, recommandations, anomalies = _diagnostic(
+        periode, ca_cdf, ca_negocie_cdf, stock_valeur_vente, nb_jours,
+        total_articles, articles_negatifs, pertes_estimees, nb_alertes_total,
+    )
+
+    resultat = AnalyseMouvements(
+        boutique_id=boutique.id,
+        debut=debut,
+        fin=fin,
+        nb_jours=nb_jours,
+        ca_cdf=ca_cdf,
+        ca_usd=float(periode.ca_usd),
+        ca_negocie_cdf=ca_negocie_cdf,
+        nb_lignes_cdf=periode.nb_lignes_cdf,
+        nb_lignes_negociees_cdf=periode.nb_lignes_negociees_cdf,
+        nb_ventes=periode.nb_ventes,
+        stock_valeur_vente=stock_valeur_vente,
+        stock_valeur_cout=stock_valeur_cout,
+        mouvements=periode.mouvements,
+        articles_negatifs=articles_negatifs,
+        articles_a_regulariser=articles_a_regulariser,
+        pertes_estimees=pertes_estimees,
+        nb_alertes_total=nb_alertes_total,
+        top_articles=top_articles,
+        score=score,
+        rotation=rotation,
+        insights=insights,
+        recommandations=recommandations,
+        anomalies=anomalies,
+    )
+    if mode == 'complet':
+        resultat.detail_par_article = _detail_par_article(articles_qs, periode)
+    return resultat
+
+
+def _diagnostic(periode, ca_cdf, ca_negocie_cdf, stock_valeur_vente, nb_jours,
+                total_articles, articles_negatifs, pertes_estimees, nb_alertes_total):
+    """Score de santé du stock, insights, recommandations et anomalies."""
+    score = 100
+    insights = []
+    recommandations = []
+    anomalies = []
+    nb_negatifs = len(articles_negatifs)
+
+    # Pénalité articles négatifs (max -40)
+    if total_articles > 0:
+        score -= min(40, round(nb_negatifs / total_articles * 100 * 2))
+    # Pénalité alertes non traitées (max -20)
+    score -= min(20, round(nb_alertes_total * 0.5))
+
+    rotation = 0
+    if stock_valeur_vente > 0 and ca_cdf > 0:
+        rotation = (ca_cdf / stock_valeur_vente) * (365 / nb_jours)
+        if rotation < 2:
+            score -= 10
+            insights.append({
+                'type': 'ROTATION_FAIBLE',
+                'niveau': 'WARNING',
+                'message': (f"Rotation stock: {rotation:.1f}×/an — "
+                            f"la marchandise reste trop longtemps en stock."),
+                'valeur': round(rotation, 2)
+            })
+        elif rotation >= 12:
+            insights.append({
+                'type': 'ROTATION_ELEVEE',
+                'niveau': 'INFO',
+                'message': f"Excellente rotation: {rotation:.1f}×/an — stock bien géré.",
+                'valeur': round(rotation, 2)
+            })
+    score = max(0, min(100, score))
+
+    if nb_negatifs > 0:
+        deficit_total = sum(abs(a['quantite_stock']) for a in articles_negatifs)
+        insights.append({
+            'type': 'STOCK_NEGATIF',
+            'niveau': 'CRITIQUE' if nb_negatifs > 5 else 'ALERTE',
+            'message': (f"{nb_negatifs} article(s) en stock négatif "
+                        f"— déficit total: {deficit_total} unités "
+                        f"— perte estimée: {round(pertes_estimees):,} CDF"),
+            'articles': [{'nom': a['nom'], 'stock': a['quantite_stock']} for a in articles_negatifs[:5]]
+        })
+        recommandations.append({
+            'priorite': 'HAUTE',
+            'action': 'REGULARISER_STOCK_NEGATIF',
+            'message': f"Réapprovisionner ou ajuster manuellement {nb_negatifs} article(s) en déficit.",
+            'articles': [a['nom'] for a in articles_negatifs[:5]]
+        })
+
+    if ca_negocie_cdf > 0 and ca_cdf > 0:
+        pct_neg_prix = ca_negocie_cdf / ca_cdf * 100
+        insights.append({
+            'type': 'PRIX_NEGOCIE',
+            'niveau': 'WARNING' if pct_neg_prix > 25 else 'INFO',
+            'message': (f"{periode.nb_lignes_negociees_cdf} ligne(s) à prix négocié = {pct_neg_prix:.1f}% "
+                        f"du CA CDF — écart avec le catalogue."),
+            'valeur': round(pct_neg_prix, 1)
+        })
+        if pct_neg_prix > 30:
+            recommandations.append({
+                'priorite': 'MOYENNE',
+                'action': 'VERIFIER_NEGOCIATIONS',
+                'message': "Plus de 30% du CA vendu à prix réduit. Vérifier les autorisations."
+            })
+
+    if nb_alertes_total > 0:
+        insights.append({
+            'type': 'ALERTES_EN_ATTENTE',
+            'niveau': 'ALERTE' if nb_alertes_total > 3 else 'INFO',
+            'message': f"{nb_alertes_total} alerte(s) de stock non régularisée(s).",
+        })
+        recommandations.append({
+            'priorite': 'HAUTE',
+            'action': 'TRAITER_ALERTES',
+            'message': f"Régulariser {nb_alertes_total} alerte(s) de sur-vente en attente."
+        })
+
+    nb_ajust = periode.mouvements.get('AJUSTEMENT', (0, 0))[0]
+    if nb_ajust > 10:
+        anomalies.append({
+            'type': 'AJUSTEMENTS_EXCESSIFS',
+            'niveau': 'WARNING',
+            'message': (f"{nb_ajust} ajustements manuels sur la période — "
+                        f"possible erreur de saisie ou incohérence de stock.")
+        })
+
+    nb_mouv_vente = periode.mouvements.get('VENTE', (0, 0))[0]
+    if periode.nb_ventes > 0 and nb_mouv_vente == 0:
+        anomalies.append({
+            'type': 'VENTES_SANS_MOUVEMENT',
+            'niveau': 'ALERTE',
+            'message': (f"{periode.nb_ventes} vente(s) enregistrée(s) mais "
+                        f"0 mouvement de stock de type VENTE trouvé — incohérence à vérifier.")
+        })
+
+    prio_order = {'HAUTE': 0, 'MOYENNE': 1, 'BASSE': 2}
+    recommandations.sort(key=lambda r: prio_order.get(r.get('priorite', 'BASSE'), 2))
+    return score, rotation, insights, recommandations, anomalies
+
+
+def _detail_par_article(articles_qs, periode):
+    """Détail des 200 articles les mieux stockés, trié par CA de la période."""
+    detail = []
+    for art in articles_qs.select_related('categorie').order_by('-quantite_stock')[:200]:
+        qte_vente, qte_entree, qte_retour, nb_mouv = periode.mouvements_articles.get(art.id, (0, 0, 0, 0))
+        qte_vendue = abs(qte_vente)
+        detail.append({
+            'id': art.id,
+            'code': art.code,
+            'nom': art.nom,
+            'categorie': art.categorie.nom if art.categorie else '',
+            'devise': art.devise,
+            'prix_vente': float(art.prix_vente),
+            'prix_achat': float(art.prix_achat),
+            'stock_actuel': art.quantite_stock,
+            'valeur_stock_vente': round(art.quantite_stock * float(art.prix_vente), 2),
+            'valeur_stock_cout': round(art.quantite_stock * float(art.prix_achat), 2),
+            'qte_vendue_periode': qte_vendue,
+            'ca_periode': round(qte_vendue * float(art.prix_vente), 2),
+            'qte_entree_periode': qte_entree,
+            'qte_retour_periode': qte_retour,
+            'nb_mouvements': nb_mouv,
+            'alerte_stock': art.quantite_stock < 0
+        })
+    return sorted(detail, key=lambda x: x['ca_periode'], reverse=True)
@@ -0,0 +1,136 @@
+"""
+Projection « dernier approvisionnement » par article (DernierApprovisionnement).
+
+Le formulaire de facture d'approvisionnement pré-remplit chaque article avec sa
+dernière ligne d'achat (prix carton/unité, pièces par carton, devise). Au lieu de
+relire tout l'historique des LigneApprovisionnement, il lit cette projection en une
+requête indexée sur la boutique.
+
+- Nouvelle ligne: upsert direct (elle est forcément la plus récente).
+- Ligne modifiée ou supprimée: recalcul de la projection de son article.
+- Facture modifiée (devise, fournisseur, dépôt) ou supprimée: recalcul des articles
+  dont la projection provient de ses lignes (recalculer_facture).
+- Reconstruction complète (migration, commande reconstruire_derniers_approvisionnements):
+  SELECT DISTINCT ON (article_id) sur PostgreSQL, sous-requête corrélée ailleurs.
+"""
+from django.db import connection
+from django.db.models import OuterRef, Subquery
+
+from inventory.models import DernierApprovisionnement, LigneApprovisionnement
+
+CHAMPS_PROJECTION = [
+    'boutique', 'ligne', 'fournisseur', 'fournisseur_nom', 'type_quantite', 'nombre_cartons',
+    'pieces_par_carton', 'prix_achat_carton', 'prix_achat_unitaire', 'devise', 'date_approvisionnement',
+]
+
+
+def _projection(ligne):
+    facture = ligne.facture
+    return DernierApprovisionnement(
+        article_id=ligne.article_id,
+        boutique_id=facture.depot_id,
+        ligne_id=ligne.id,
+        fournisseur_id=facture.fournisseur_id,
+        fournisseur_nom=facture.fournisseur.nom if facture.fournisseur_id else facture.fournisseur_nom,
+        type_quantite=ligne.type_quantite,
+        nombre_cartons=ligne.nombre_cartons,
+        pieces_par_carton=ligne.pieces_par_carton,
+        prix_achat_carton=ligne.prix_achat_carton,
+        prix_achat_unitaire=ligne.prix_achat_unitaire,
+        devise=facture.devise,
+        date_approvisionnement=ligne.date_creation,
+    )
+
+
+def _upsert(projections):
+    """INSERT ... ON CONFLICT (article_id) DO UPDATE pour une liste de projections."""
+    DernierApprovisionnement.objects.bulk_create(
+        projections,
+        batch_size=500,
+        update_conflicts=True,
+        unique_fields=['article'],
+        update_fields=CHAMPS_PROJECTION,
+    )
+
+
+def _lignes_recentes():
+    return LigneApprovisionnement.objects.select_related('facture__fournisseur')
+
+
+def enregistrer_ligne(ligne, created):
+    """Appelé après l'enregistrement d'une LigneApprovisionnement."""
+    if created:
+        _upsert([_projection(ligne)])
+    else:
+        recalculer_article(ligne.article_id)
+
+
+def recalculer_article(article_id):
+    """Recalcule la projection d'un article depuis sa ligne la plus récente."""
+    ligne = _lignes_recentes().filter(article_id=article_id).order_by('-date_creation', '-id').first()
+    if ligne is None:
+        DernierApprovisionnement.objects.filter(article_id=article_id).delete()
+    else:
+        _upsert([_projection(ligne)])
+
+
+# Champs de la facture recopiés dans la projection
+CHAMPS_FACTURE = {'devise', 'fournisseur', 'fournisseur_nom', 'depot'}
+
+
+def recalculer_facture(facture, supprimee=False):
+    """Recalcule les projections issues des lignes de facture (devise, fournisseur recopiés)."""
+    if supprimee:
+        # Lignes supprimées avec la facture: leurs projections ont perdu leur ligne (SET_NULL)
+        projections = DernierApprovisionnement.objects.filter(boutique_id=facture.depot_id, ligne__isnull=True)
+    else:
+        projections = DernierApprovisionnement.objects.filter(ligne__facture=facture)
+    for article_id in projections.values_list('article_id', flat=True):
+        recalculer_article(article_id)
+
+
+def reconstruire(boutique=None):
+    """Reconstruit la projection (toute la base ou une boutique); retourne le nombre d'articles."""
+    lignes = _lignes_recentes()
+    if boutique is not None:
+        lignes = lignes.filter(facture__depot=boutique)
+    if connection.vendor == 'postgresql':
+        # SELECT DISTINCT ON (article_id) ... ORDER BY article_id, date_creation DESC, id DESC
+        dernieres = lignes.order_by('article_id', '-date_creation', '-id').distinct('article_id')
+    else:
+        plus_recente = LigneApprovisionnement.objects.filter(
+            article_id=OuterRef('article_id')
+        ).order_by('-date_creation', '-id').values('id')[:1]
+        dernieres = lignes.filter(id=Subquery(plus_recente))
+
+    total = 0
+    lot = []
+    for ligne in dernieres.iterator(chunk_size=1000):
+        lot.append(_projection(ligne))
+        if len(lot) >= 1000:
+            _upsert(lot)
+            total += len(lot)
+            lot = []
+    if lot:
+        _upsert(lot)
+        total += len(lot)
+    return total
+
+
+def derniers_approvisionnements(boutique):
+    """{article_id: données de pré-remplissage} pour le formulaire de facture (une requête)."""
+    return {
+        d['article_id']: {
+            'type_quantite': d['type_quantite'],
+            'nombre_cartons': d['nombre_cartons'],
+            'pieces_par_carton': d['pieces_par_carton'],
+            'prix_achat_carton': float(d['prix_achat_carton']),
+            'prix_achat_unitaire': float(d['prix_achat_unitaire']),
+            'devise_saisie': d['devise'],  # Devise utilisée lors du dernier appro
+            'fournisseur': d['fournisseur_nom'],
+        }
+        for d in DernierApprovisionnement.objects.filter(boutique=boutique).values(
+            'article_id', 'type_quantite', 'nombre_cartons', 'pieces_par_carton',
+            'prix_achat_carton', 'prix_achat_unitaire', 'devise', 'fournisseur_nom',
+        )
+    }
@@ -0,0 +1,117 @@
+"""
+Catalogue POS en colonnes (sync complète ou incrémentale des terminaux à faible débit).
+
+Le JSON de articles_list_simple répète chaque nom de champ pour chaque article et
+variante, envoie les prix en chaînes et une URL d'image absolue par article. Ici:
+
+- noms de champs envoyés une fois, une liste de valeurs par colonne;
+- catégories et URL d'images encodées par dictionnaire (index dans une table);
+  l'image envoyée est le dérivé redimensionné (services/images.py) quand il existe;
+- prix en nombres (entier quand le montant est rond);
+- variantes: seulement leurs champs propres (prix, devise, stock et catégorie
+  sont ceux de l'article parent, image = celle du parent si absente).
+
+Encodages (negociés par Accept, voir inventory/renderers.py): JSON ou MessagePack,
+compressés gzip ou brotli selon Accept-Encoding.
+Mesure: python manage.py benchmark_catalogue
+"""
+from decimal import Decimal
+
+from django.core.files.storage import default_storage
+
+from inventory.services.images import nom_image_sync
+
+FORMAT = 'colonnes/1'
+
+CHAMPS_ARTICLE = (
+    'id', 'code', 'nom', 'description', 'devise',
+    'prix_vente', 'prix_achat', 'prix_vente_usd', 'prix_achat_usd',
+    'categorie', 'quantite_stock', 'est_actif', 'est_valide_client', 'date_suppression', 'image', 'version',
+)
+CHAMPS_VARIANTE = (
+    'id', 'article', 'code_barre', 'nom_variante', 'type_attribut', 'quantite_stock', 'est_actif', 'image',
+)
+
+
+def _nombre(valeur):
+    if valeur is None:
+        return None
+    if isinstance(valeur, Decimal):
+        return int(valeur) if valeur == valeur.to_integral_value() else float(valeur)
+    return valeur
+
+
+class _Dictionnaire:
+    """Table de valeurs distinctes: chaque valeur est remplacée par son index."""
+
+    def __init__(self):
+        self.valeurs = []
+        self._index = {}
+
+    def index(self, valeur):
+        if valeur in (None, ''):
+            return None
+        if valeur not in self._index:
+            self._index[valeur] = len(self.valeurs)
+            self.valeurs.append(valeur)
+        return self._index[valeur]
+
+
+def _colonnes(champs, lignes):
+    colonnes = [[] for _ in champs]
+    for ligne in lignes:
+        for i, valeur in enumerate(ligne):
+            colonnes[i].append(valeur)
+    return {'champs': list(champs), 'colonnes': colonnes, 'lignes': len(lignes)}
+
+
+def catalogue_colonnes(articles, variantes, request=None):
+    """
+    Payload en colonnes.
+    articles: queryset d'Article (déjà filtré pour la sync), variantes: queryset de VarianteArticle.
+    """
+    categories = _Dictionnaire()
+    images = _Dictionnaire()
+    noms_categories = {}
+
+    lignes_articles = []
+    for (id_, code, nom, description, devise, pv, pa, pv_usd, pa_usd, categorie_id, categorie_nom,
+         stock, actif, valide, date_suppression, image, derives, version) in articles.values_list(
+        'id', 'code', 'nom', 'description', 'devise', 'prix_vente', 'prix_achat', 'prix_vente_usd',
+        'prix_achat_usd', 'categorie_id', 'categorie__nom', 'quantite_stock', 'est_actif',
+        'est_valide_client', 'date_suppression', 'image', 'image_derives', 'version',
+    ):
+        if categorie_id is not None:
+            noms_categories[categorie_id] = categorie_nom
+        lignes_articles.append((
+            id_, code, nom, description or '', devise,
+            _nombre(pv), _nombre(pa), _nombre(pv_usd), _nombre(pa_usd),
+            categories.index(categorie_id), stock, actif, valide,
+            date_suppression.isoformat() if date_suppression else None,
+            images.index(nom_image_sync(image, derives)), version,
+        ))
+
+    lignes_variantes = [
+        (id_, article_id, code_barre, nom_variante, type_attribut, stock, actif,
+         images.index(nom_image_sync(image, derives)))
+        for id_, article_id, code_barre, nom_variante, type_attribut, stock, actif, image, derives
+        in variantes.values_list(
+            'id', 'article_parent_id', 'code_barre', 'nom_variante', 'type_attribut',
+            'quantite_stock', 'est_actif', 'image', 'image_derives',
+        )
+    ]
+
+    # Une URL absolue par image distincte (et non par article)
+    urls = [default_storage.url(nom) for nom in images.valeurs]
+    if request is not None:
+        urls = [request.build_absolute_uri(url) for url in urls]
+
+    return {
+        'format': FORMAT,
+        'dictionnaires': {
+            'categories': [[cid, noms_categories[cid]] for cid in categories.valeurs],
+            'images': urls,
+        },
+        'articles': _colonnes(CHAMPS_ARTICLE, lignes_articles),
+        'variantes': _colonnes(CHAMPS_VARIANTE, lignes_variantes),
+    }
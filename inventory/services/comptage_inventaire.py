@@ -0,0 +1,290 @@
+"""
+Comptage d'inventaire par lots depuis les scanners MAUI (hors ligne).
+
+- Instantané: lignes de l'inventaire EN_COURS en colonnes (format du catalogue POS)
+  + codes-barres des variantes (un scan de variante compte l'article parent).
+  Avec `depuis`: seulement les lignes saisies depuis (historique des saisies).
+- Envoi: jusqu'à TAILLE_MAX_LOT comptages par requête, appliqués dans une transaction:
+  lignes lues et verrouillées en une requête, un bulk_update, un bulk_create de
+  HistoriqueSaisieInventaire, statistiques de l'inventaire mises à jour par delta (F())
+  au lieu de calculer_statistiques() qui relit toutes les lignes.
+- Comptages concurrents (plusieurs terminaux, envois différés), résolution déterministe
+  sur l'heure du comptage côté terminal (compte_le, bornée à l'heure du serveur):
+  * REMPLACER (comptage complet): le plus récent l'emporte; un comptage antérieur au
+    dernier comptage complet de la ligne (date_modification) est ignoré.
+  * AJOUTER (comptage partiel: même article sur plusieurs rayons): additionné s'il est
+    postérieur au dernier comptage complet. Un comptage complet plus ancien reçu après
+    des comptages partiels plus récents est appliqué, puis ces derniers sont ré-additionnés
+    depuis l'historique: le résultat ne dépend pas de l'ordre d'arrivée des lots.
+  Égalité exacte d'horodatage: le premier reçu est conservé (dans un lot: le dernier envoyé).
+  La saisie web passe par le même chemin (comptage complet à l'heure du serveur).
+"""
+import logging
+from collections import defaultdict
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import F, Q
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from inventory.models import Article, HistoriqueSaisieInventaire, Inventaire, LigneInventaire, VarianteArticle
+from inventory.services.catalogue import FORMAT, _colonnes, _nombre
+
+logger = logging.getLogger(__name__)
+
+TAILLE_MAX_LOT = 5000
+MODES = ('REMPLACER', 'AJOUTER')
+
+CHAMPS_LIGNE = ('id', 'article', 'code', 'nom', 'stock_theorique', 'stock_physique', 'date_modification')
+CHAMPS_CODE = ('code_barre', 'article')
+
+
+class InventaireFerme(Exception):
+    """L'inventaire n'est plus EN_COURS: les comptages ne sont plus acceptés."""
+
+
+def _iso(moment):
+    return timezone.localtime(moment).isoformat() if moment else None
+
+
+# ===== INSTANTANÉ =====
+
+def instantane(inventaire, depuis=None):
+    """Payload en colonnes des lignes (toutes, ou saisies depuis `depuis`) pour le terminal."""
+    genere_le = timezone.now()
+    lignes = inventaire.lignes.order_by('id')
+    if depuis is not None:
+        lignes = lignes.filter(id__in=HistoriqueSaisieInventaire.objects.filter(
+            inventaire=inventaire, date_saisie__gt=depuis,
+        ).values('ligne_inventaire_id'))
+    valeurs = [
+        (id_, article, code, nom, theorique, physique, _iso(modifie))
+        for id_, article, code, nom, theorique, physique, modifie in lignes.values_list(
+            'id', 'article_id', 'article__code', 'article__nom',
+            'stock_theorique', 'stock_physique', 'date_modification',
+        )
+    ]
+    payload = {
+        'format': FORMAT,
+        'inventaire': {
+            'id': inventaire.id,
+            'reference': inventaire.reference,
+            'statut': inventaire.statut,
+            'date_inventaire': inventaire.date_inventaire.isoformat(),
+            'nb_articles': inventaire.nb_articles,
+            'nb_ecarts': inventaire.nb_ecarts,
+            'valeur_ecart_positif': _nombre(inventaire.valeur_ecart_positif),
+            'valeur_ecart_negatif': _nombre(inventaire.valeur_ecart_negatif),
+        },
+        'genere_le': _iso(genere_le),
+        'depuis': _iso(depuis),
+        'lignes': _colonnes(CHAMPS_LIGNE, valeurs),
+    }
+    if depuis is None:
+        codes = VarianteArticle.objects.filter(
+            article_parent__lignes_inventaire__inventaire=inventaire, est_actif=True,
+        ).exclude(code_barre='').order_by('id').values_list('code_barre', 'article_parent_id')
+        payload['codes'] = _colonnes(CHAMPS_CODE, list(codes))
+    return payload
+
+
+# ===== APPLICATION DES COMPTAGES =====
+
+class _Comptage:
+    __slots__ = ('index', 'ligne_id', 'article_id', 'code', 'quantite', 'mode', 'compte_le', 'commentaire')
+
+
+def _lire(index, brut, maintenant):
+    """_Comptage validé, ou message d'erreur."""
+    if not isinstance(brut, dict):
+        return "comptage invalide"
+    c = _Comptage()
+    c.index = index
+    c.mode = str(brut.get('mode') or 'REMPLACER').upper()
+    if c.mode not in MODES:
+        return f"mode inconnu: {brut.get('mode')}"
+    try:
+        c.quantite = int(brut.get('quantite'))
+        c.ligne_id = int(brut['ligne_id']) if brut.get('ligne_id') is not None else None
+        c.article_id = int(brut['article_id']) if brut.get('article_id') is not None else None
+    except (TypeError, ValueError):
+        return "quantité ou identifiant invalide"
+    if c.quantite < 0:
+        return "quantité négative"
+    c.code = str(brut.get('code') or '').strip()
+    if c.ligne_id is None and c.article_id is None and not c.code:
+        return "ligne_id, article_id ou code requis"
+    compte_le = brut.get('compte_le')
+    compte_le = parse_datetime(compte_le) if isinstance(compte_le, str) else None
+    if compte_le is not None and timezone.is_naive(compte_le):
+        compte_le = timezone.make_aware(compte_le)
+    # Horloge du terminal en avance: borné à l'heure du serveur
+    c.compte_le = min(compte_le, maintenant) if compte_le else maintenant
+    c.commentaire = str(brut.get('commentaire') or '')
+    return c
+
+
+def _articles_par_code(boutique_id, codes):
+    """{code article ou code-barre de variante: article_id} (2 requêtes au plus)."""
+    if not codes:
+        return {}
+    resolus = dict(VarianteArticle.objects.filter(
+        article_parent__boutique_id=boutique_id, code_barre__in=codes,
+    ).values_list('code_barre', 'article_parent_id'))
+    # Le code article prime sur un code-barre de variante identique
+    resolus.update(Article.objects.filter(boutique_id=boutique_id, code__in=codes).values_list('code', 'id'))
+    return resolus
+
+
+def _contribution(ecart, valeur_ecart):
+    """(nb_ecarts, valeur_ecart_positif, valeur_ecart_negatif) d'une ligne."""
+    if ecart > 0:
+        return 1, valeur_ecart, Decimal('0')
+    if ecart < 0:
+        return 1, Decimal('0'), -valeur_ecart
+    return 0, Decimal('0'), Decimal('0')
+
+
+def appliquer_comptages(inventaire, comptages, numero_serie='', utilisateur=None, nom=''):
+    """
+    Applique un lot de comptages [{ligne_id|article_id|code, quantite, mode, compte_le, commentaire}].
+
+    Retourne {'appliques', 'ignores': [{index, raison}], 'stocks': {ligne_id: stock_physique}}.
+    Lève InventaireFerme si l'inventaire n'est plus EN_COURS.
+    """
+    maintenant = timezone.now()
+    ignores = []
+    valides = []
+    for index, brut in enumerate(comptages):
+        c = _lire(index, brut, maintenant)
+        if isinstance(c, str):
+            ignores.append({'index': index, 'raison': c})
+        else:
+            valides.append(c)
+
+    codes = _articles_par_code(
+        inventaire.boutique_id, {c.code for c in valides if c.ligne_id is None and c.article_id is None}
+    )
+
+    with transaction.atomic():
+        # Verrou sur l'inventaire: les lots d'un même inventaire s'appliquent l'un après l'autre
+        inv = Inventaire.objects.select_for_update().get(pk=inventaire.pk)
+        if inv.statut != 'EN_COURS':
+            raise InventaireFerme(inv.reference)
+
+        for c in valides:
+            if c.article_id is None and c.ligne_id is None:
+                c.article_id = codes.get(c.code)
+        filtre = Q(id__in={c.ligne_id for c in valides if c.ligne_id is not None})
+        filtre |= Q(article_id__in={c.article_id for c in valides if c.ligne_id is None and c.article_id is not None})
+        lignes = list(LigneInventaire.objects.select_for_update().filter(filtre, inventaire=inv).order_by())
+        par_id = {l.id: l for l in lignes}
+        par_article = {l.article_id: l for l in lignes}
+
+        par_ligne = defaultdict(list)
+        for c in valides:
+            ligne = par_id.get(c.ligne_id) if c.ligne_id is not None else par_article.get(c.article_id)
+            if ligne is None:
+                ignores.append({'index': c.index, 'raison': "article absent de l'inventaire"})
+            else:
+                par_ligne[ligne.id].append(c)
+
+        # Comptage complet retenu par ligne: le plus récent, postérieur au dernier connu
+        retenus = {}
+        for ligne_id, liste in par_ligne.items():
+            liste.sort(key=lambda c: (c.compte_le, c.index))
+            base = par_id[ligne_id].date_modification
+            complets = [c for c in liste if c.mode == 'REMPLACER' and (base is None or c.compte_le > base)]
+            if complets:
+                retenus[ligne_id] = complets[-1]
+
+        # Comptages partiels déjà reçus, postérieurs au nouveau comptage complet: ré-additionnés
+        partiels_connus = defaultdict(int)
+        if retenus:
+            for ligne_id, quantite, compte_le in HistoriqueSaisieInventaire.objects.filter(
+                ligne_inventaire_id__in=list(retenus), mode='AJOUTER',
+                compte_le__gt=min(c.compte_le for c in retenus.values()),
+            ).order_by().values_list('ligne_inventaire_id', 'stock_physique_saisi', 'compte_le'):
+                if compte_le > retenus[ligne_id].compte_le:
+                    partiels_connus[ligne_id] += quantite
+
+        modifiees, historique = [], []
+        delta = [0, Decimal('0'), Decimal('0')]
+        for ligne_id, liste in par_ligne.items():
+            ligne = par_id[ligne_id]
+            base = ligne.date_modification
+            complet = retenus.get(ligne_id)
+            reference = complet.compte_le if complet else base
+            acceptes = []
+            for c in liste:
+                limite = base if c.mode == 'REMPLACER' else reference
+                if limite is None or c.compte_le > limite:
+                    acceptes.append(c)
+                else:
+                    ignores.append({'index': c.index, 'raison': "antérieur au dernier comptage complet"})
+            if not acceptes:
+                continue
+
+            partiels = sum(c.quantite for c in acceptes if c.mode == 'AJOUTER')
+            if complet:
+                stock_physique = complet.quantite + partiels_connus[ligne_id] + partiels
+                ligne.date_modification = complet.compte_le
+            else:
+                stock_physique = (ligne.stock_physique or 0) + partiels
+
+            avant = _contribution(ligne.ecart, ligne.valeur_ecart)
+            ligne.stock_physique = stock_physique
+            ligne.ecart = stock_physique - ligne.stock_theorique
+            ligne.valeur_ecart = ligne.ecart * ligne.prix_unitaire
+            ligne.date_saisie = ligne.date_saisie or maintenant
+            ligne.saisi_par = utilisateur
+            ligne.assigne_a = nom[:100]
+            commentaire = next((c.commentaire for c in reversed(acceptes) if c.commentaire), '')
+            if commentaire:
+                ligne.commentaire = commentaire
+            apres = _contribution(ligne.ecart, ligne.valeur_ecart)
+            for i in range(3):
+                delta[i] += apres[i] - avant[i]
+            modifiees.append(ligne)
+
+            historique.extend(
+                HistoriqueSaisieInventaire(
+                    ligne_inventaire=ligne,
+                    article_id=ligne.article_id,
+                    inventaire=inv,
+                    stock_physique_saisi=c.quantite,
+                    stock_theorique_au_moment=ligne.stock_theorique,
+                    ecart_au_moment=stock_physique - ligne.stock_theorique,
+                    saisi_par=utilisateur,
+                    nom_saisi_par=nom[:150],
+                    commentaire=c.commentaire,
+                    mode=c.mode,
+                    compte_le=c.compte_le,
+                    numero_serie=numero_serie[:50],
+                )
+                for c in acceptes
+            )
+
+        if modifiees:
+            LigneInventaire.objects.bulk_update(modifiees, [
+                'stock_physique', 'ecart', 'valeur_ecart', 'date_saisie', 'date_modification',
+                'saisi_par', 'assigne_a', 'commentaire',
+            ], batch_size=500)
+            HistoriqueSaisieInventaire.objects.bulk_create(historique, batch_size=1000)
+            if any(delta):
+                Inventaire.objects.filter(pk=inv.pk).update(
+                    nb_ecarts=F('nb_ecarts') + delta[0],
+                    valeur_ecart_positif=F('valeur_ecart_positif') + delta[1],
+                    valeur_ecart_negatif=F('valeur_ecart_negatif') + delta[2],
+                )
+
+    logger.info(
+        "📋 Inventaire %s: %s comptage(s) appliqué(s) sur %s ligne(s), %s ignoré(s) [%s]",
+        inv.reference, len(historique), len(modifiees), len(ignores), numero_serie or nom,
+    )
+    return {
+        'appliques': len(historique),
+        'ignores': sorted(ignores, key=lambda i: i['index']),
+        'stocks': {l.id: l.stock_physique for l in modifiees},
+    }
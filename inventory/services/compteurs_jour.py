@@ -0,0 +1,186 @@
+"""
+Compteurs du jour par boutique (CA CDF/USD, nombre de ventes, dépenses, dernière vente).
+
+Les tuiles « CA du jour » du commerçant ne relisent plus les ventes de la journée à
+chaque rafraîchissement: chaque boutique a des compteurs journaliers dans le cache
+(Redis en production), incrémentés atomiquement (INCRBY) quand une vente est
+validée, modifiée ou annulée, puis poussés aux navigateurs abonnés
+(ws/commercant/compteurs/<boutique_id>/).
+
+- Montants stockés en centimes (entiers) pour rester incrémentables.
+- Les deltas sont calculés par les signaux (contribution avant/après enregistrement)
+  et appliqués après le COMMIT: une transaction annulée ne touche pas aux compteurs.
+- Compteurs absents (expiration, redémarrage du cache): reconstruits depuis la base
+  en deux requêtes agrégées, au premier accès.
+"""
+from datetime import datetime
+from decimal import Decimal
+
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Count, Max, Q, Sum
+from django.utils import timezone
+
+from inventory.models import RapportCaisse, Vente
+
+DUREE_COMPTEURS = 60 * 60 * 36  # Couvre la journée + le rattrapage des ventes tardives
+CHAMPS = ('ca_cdf', 'ca_usd', 'nb_cdf', 'nb_usd', 'depenses_cdf')
+# Colonnes lues par contribution_vente / contribution_depense (relecture avant modification)
+CHAMPS_VENTE = ('boutique_id', 'paye', 'est_annulee', 'date_vente', 'devise', 'montant_total')
+CHAMPS_DEPENSE = ('boutique_id', 'depense_appliquee', 'devise', 'date_rapport', 'depense')
+
+
+def _cle(boutique_id, jour, champ):
+    return f"compteurs_jour:{boutique_id}:{jour.isoformat()}:{champ}"
+
+
+def _centimes(montant):
+    return int((Decimal(montant or 0) * 100).to_integral_value())
+
+
+def _local(dt):
+    return timezone.localtime(dt) if timezone.is_aware(dt) else dt
+
+
+def _jour_local(dt):
+    return _local(dt).date()
+
+
+def contribution_vente(vente):
+    """Part d'une vente dans les compteurs: (boutique_id, jour, deltas) ou None."""
+    if (not vente.boutique_id or not vente.paye or vente.est_annulee or vente.devise not in ('CDF', 'USD')
+            or not isinstance(vente.date_vente, datetime)):
+        return None
+    devise = vente.devise.lower()
+    return vente.boutique_id, _jour_local(vente.date_vente), {
+        f'ca_{devise}': _centimes(vente.montant_total),
+        f'nb_{devise}': 1,
+    }
+
+
+def contribution_depense(rapport):
+    """Part d'un rapport de caisse (dépense appliquée en CDF) ou None."""
+    if (not rapport.boutique_id or not rapport.depense_appliquee or rapport.devise != 'CDF'
+            or not isinstance(rapport.date_rapport, datetime)):
+        return None
+    return rapport.boutique_id, _jour_local(rapport.date_rapport), {
+        'depenses_cdf': _centimes(rapport.depense),
+    }
+
+
+def _reconstruire(boutique_id, jour):
+    """Recalcule les compteurs d'un jour depuis la base et les remet en cache."""
+    ventes = Vente.objects.de_boutique(boutique_id).filter(
+        date_vente__date=jour, paye=True, est_annulee=False
+    ).aggregate(
+        ca_cdf=Sum('montant_total', filter=Q(devise='CDF')),
+        ca_usd=Sum('montant_total', filter=Q(devise='USD')),
+        nb_cdf=Count('id', filter=Q(devise='CDF')),
+        nb_usd=Count('id', filter=Q(devise='USD')),
+        derniere=Max('date_vente'),
+    )
+    depenses = RapportCaisse.objects.filter(
+        boutique_id=boutique_id, date_rapport__date=jour, depense_appliquee=True, devise='CDF'
+    ).aggregate(total=Sum('depense'))['total']
+
+    valeurs = {
+        'ca_cdf': _centimes(ventes['ca_cdf']),
+        'ca_usd': _centimes(ventes['ca_usd']),
+        'nb_cdf': ventes['nb_cdf'],
+        'nb_usd': ventes['nb_usd'],
+        'depenses_cdf': _centimes(depenses),
+    }
+    a_ecrire = {_cle(boutique_id, jour, champ): v for champ, v in valeurs.items()}
+    if ventes['derniere']:
+        valeurs['derniere_vente'] = _local(ventes['derniere']).isoformat()
+        a_ecrire[_cle(boutique_id, jour, 'derniere_vente')] = valeurs['derniere_vente']
+    cache.set_many(a_ecrire, DUREE_COMPTEURS)
+    return valeurs
+
+
+def _maj_derniere_vente(boutique_id, jour):
+    derniere = Vente.objects.de_boutique(boutique_id).filter(
+        date_vente__date=jour, paye=True, est_annulee=False
+    ).aggregate(derniere=Max('date_vente'))['derniere']
+    cle = _cle(boutique_id, jour, 'derniere_vente')
+    if derniere:
+        cache.set(cle, _local(derniere).isoformat(), DUREE_COMPTEURS)
+    else:
+        cache.delete(cle)
+
+
+def _lire(boutique_id, jour):
+    cles = {_cle(boutique_id, jour, champ): champ for champ in (*CHAMPS, 'derniere_vente')}
+    trouves = cache.get_many(list(cles))
+    valeurs = {cles[cle]: v for cle, v in trouves.items()}
+    if any(champ not in valeurs for champ in CHAMPS):
+        valeurs = _reconstruire(boutique_id, jour)
+    return valeurs
+
+
+def compteurs(boutique_id, jour=None):
+    """Compteurs d'une boutique pour un jour (aujourd'hui par défaut), prêts pour le JSON."""
+    jour = jour or timezone.localdate()
+    v = _lire(boutique_id, jour)
+    ca_cdf = v['ca_cdf'] / 100
+    depenses_cdf = v['depenses_cdf'] / 100
+    return {
+        'jour': jour.isoformat(),
+        'ca_cdf': ca_cdf,
+        'ca_cdf_net': round(ca_cdf - depenses_cdf, 2),
+        'ca_usd': v['ca_usd'] / 100,
+        'nb_ventes_cdf': v['nb_cdf'],
+        'nb_ventes_usd': v['nb_usd'],
+        'nb_ventes': v['nb_cdf'] + v['nb_usd'],
+        'depenses_cdf': depenses_cdf,
+        'derniere_vente_ts': v.get('derniere_vente'),
+    }
+
+
+def appliquer(boutique_id, jour, deltas, derniere_vente=None):
+    """Incrémente les compteurs d'un jour puis pousse l'état aux navigateurs (si aujourd'hui)."""
+    from inventory.websocket_utils import notify_compteurs_jour
+
+    try:
+        for champ, delta in deltas.items():
+            if delta:
+                cache.incr(_cle(boutique_id, jour, champ), delta)
+    except ValueError:
+        # Compteurs absents: la base (déjà commitée) inclut ce changement
+        _reconstruire(boutique_id, jour)
+    else:
+        if deltas.get('nb_cdf', 0) < 0 or deltas.get('nb_usd', 0) < 0:
+            # Vente annulée/supprimée: la dernière vente valide peut changer (cas rare)
+            _maj_derniere_vente(boutique_id, jour)
+        if derniere_vente is not None:
+            cle = _cle(boutique_id, jour, 'derniere_vente')
+            derniere_vente = _local(derniere_vente).isoformat()
+            actuelle = cache.get(cle)
+            if actuelle is None or actuelle < derniere_vente:
+                cache.set(cle, derniere_vente, DUREE_COMPTEURS)
+
+    if jour == timezone.localdate():
+        notify_compteurs_jour(boutique_id, compteurs(boutique_id, jour))
+
+
+def enregistrer_changement(avant, apres, derniere_vente=None):
+    """
+    Programme, après le COMMIT, l'application de la différence entre deux
+    contributions (avant/après enregistrement, None si l'objet ne compte pas).
+    """
+    par_jour = {}
+    for contribution, signe in ((avant, -1), (apres, 1)):
+        if contribution is None:
+            continue
+        boutique_id, jour, valeurs = contribution
+        deltas = par_jour.setdefault((boutique_id, jour), {})
+        for champ, valeur in valeurs.items():
+            deltas[champ] = deltas.get(champ, 0) + signe * valeur
+
+    for (boutique_id, jour), deltas in par_jour.items():
+        if not any(deltas.values()):
+            continue
+        ts = derniere_vente if apres is not None and apres[:2] == (boutique_id, jour) else None
+        transaction.on_commit(
+            lambda b=boutique_id, j=jour, d=deltas, t=ts: appliquer(b, j, d, t)
+        )
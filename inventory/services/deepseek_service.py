@@ -1,4 +1,3 @@
-import requests
 import json
 from django.conf import settings
 from django.core.cache import cache
@@ -10,6 +9,8 @@ class DeepSeekService:
     @staticmethod
     def _call_deepseek(prompt, use_json=True):
         """Appel générique à l'API DeepSeek"""
+        import requests  # importé à la demande (coûteux au démarrage du processus)
+
         try:
             payload = {
                 "model": settings.DEEPSEEK_MODEL,
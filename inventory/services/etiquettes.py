@@ -0,0 +1,177 @@
+"""
+Planches d'étiquettes (codes QR / codes-barres) d'une boutique.
+
+- Les symboles sont dessinés à la volée depuis Article.code (vectoriel ReportLab):
+  plus besoin des images Article.qr_code sur disque ni de PIL.
+- Un symbole dessiné est gardé dans un LRU par processus (TAILLE_LRU_SYMBOLES):
+  les planches successives d'un même catalogue ne recalculent pas les matrices QR.
+- La planche terminée est mise en cache DUREE_CACHE_PLANCHE secondes sous une clé
+  qui contient la portée (boutique, filtres, format) et l'empreinte du contenu imprimé
+  (id, code, nom de chaque article, une requête sur trois colonnes): un catalogue
+  inchangé n'est jamais re-rendu, et une correction faite par queryset.update(), qui ne
+  touche ni last_updated ni version, produit quand même une nouvelle clé.
+- Les articles sont lus par paquets (iterator) et les pages émises au fil du dessin
+  (showPage): la mémoire ne dépend pas de la taille du catalogue, seulement du PDF.
+"""
+import hashlib
+from functools import lru_cache
+from io import BytesIO
+
+from django.core.cache import cache
+from django.db.models import Q
+
+from inventory.models import Article
+
+DUREE_CACHE_PLANCHE = 60 * 60 * 24
+TAILLE_LRU_SYMBOLES = 4096
+TAILLE_PAQUET_ARTICLES = 500
+
+# Grille par format: colonnes x rangées sur une page A4
+FORMATS = {
+    'qr': {'colonnes': 2, 'rangees': 4, 'titre': "Catalogue des Codes QR"},
+    'code128': {'colonnes': 3, 'rangees': 8, 'titre': "Catalogue des codes-barres"},
+}
+
+
+def articles_etiquettes(boutique_ids=None, categorie_id=None, recherche='', actifs_seulement=True):
+    """Articles à étiqueter; boutique_ids=None: toutes les boutiques (super admin)"""
+    articles = Article.objects.all()
+    if boutique_ids is not None:
+        articles = articles.filter(boutique_id__in=boutique_ids)
+    if actifs_seulement:
+        articles = articles.filter(est_actif=True)
+    if categorie_id:
+        articles = articles.filter(categorie_id=categorie_id)
+    if recherche:
+        articles = articles.filter(Q(nom__icontains=recherche) | Q(code__icontains=recherche))
+    return articles.order_by('nom', 'id')
+
+
+def version_catalogue(articles):
+    """(nombre d'articles, empreinte de ce qui est imprimé) du catalogue filtré, en une requête"""
+    empreinte = hashlib.sha1()
+    nombre = 0
+    for article_id, code, nom in articles.values_list('id', 'code', 'nom').iterator(chunk_size=TAILLE_PAQUET_ARTICLES):
+        empreinte.update(f"{article_id}\x1f{code}\x1f{nom}\x1e".encode())
+        nombre += 1
+    return nombre, f"{nombre}:{empreinte.hexdigest()}"
+
+
+def planche_etiquettes(articles, format_etiquette='qr', titre=None):
+    """PDF (bytes) de la planche d'étiquettes; servi depuis le cache si le catalogue n'a pas changé"""
+    if format_etiquette not in FORMATS:
+        raise ValueError(f"Format d'étiquette inconnu: {format_etiquette}")
+    titre = titre or FORMATS[format_etiquette]['titre']
+    nombre, version = version_catalogue(articles)
+    portee = hashlib.sha1(f"{format_etiquette}|{titre}|{articles.query}".encode()).hexdigest()
+    cle = f"etiquettes:{portee}:{version}"
+
+    pdf = cache.get(cle)
+    if pdf is None:
+        lecture = articles.only('id', 'code', 'nom').iterator(chunk_size=TAILLE_PAQUET_ARTICLES)
+        pdf = rendre_planche(lecture, nombre, format_etiquette, titre)
+        cache.set(cle, pdf, DUREE_CACHE_PLANCHE)
+    return pdf
+
+
+@lru_cache(maxsize=TAILLE_LRU_SYMBOLES)
+def _symbole(format_etiquette, code, largeur, hauteur):
+    """Symbole vectoriel (QR ou Code128) de code, déjà développé et mis à l'échelle"""
+    from reportlab.graphics.barcode import createBarcodeDrawing
+    from reportlab.graphics.shapes import Drawing
+
+    if format_etiquette == 'qr':
+        modele = createBarcodeDrawing('QR', value=code)
+    else:
+        modele = createBarcodeDrawing('Code128', value=code, barHeight=hauteur, humanReadable=False)
+        largeur = min(largeur, modele.width)
+    # Widgets développés une fois: le rendu suivant ne recalcule ni matrice ni barres
+    dessin = Drawing(largeur, hauteur, transform=[largeur / modele.width, 0, 0, hauteur / modele.height, 0, 0])
+    dessin.add(modele.expandUserNodes())
+    return dessin
+
+
+def _tronquer(c, texte, police, taille, largeur_max):
+    if c.stringWidth(texte, police, taille) <= largeur_max:
+        return texte
+    while texte and c.stringWidth(texte + "...", police, taille) > largeur_max:
+        texte = texte[:-1]
+    return texte + "..."
+
+
+def rendre_planche(articles, nombre, format_etiquette='qr', titre=None):
+    """
+    Dessine la planche (itérable d'articles, nombre total pour la pagination).
+    Aucune métadonnée temporelle: un même catalogue produit toujours le même PDF.
+    """
+    # ReportLab importé à la demande (coûteux au démarrage du processus)
+    from reportlab.graphics import renderPDF
+    from reportlab.lib.pagesizes import A4
+    from reportlab.lib.units import cm
+    from reportlab.pdfgen import canvas
+
+    grille = FORMATS[format_etiquette]
+    titre = titre or grille['titre']
+    colonnes, rangees = grille['colonnes'], grille['rangees']
+    par_page = colonnes * rangees
+    total_pages = max(1, (nombre + par_page - 1) // par_page)
+
+    page_width, page_height = A4
+    margin = 1.5 * cm
+    entete = 3 * cm
+    largeur_case = (page_width - 2 * margin) / colonnes
+    hauteur_case = (page_height - entete - 2 * margin) / rangees
+    # Place réservée sous le symbole au nom et au code
+    hauteur_texte = 1.2 * cm
+    if format_etiquette == 'qr':
+        taille_symbole = (4 * cm, 4 * cm)
+    else:
+        taille_symbole = (largeur_case - 0.6 * cm, hauteur_case - hauteur_texte - 0.6 * cm)
+
+    buffer = BytesIO()
+    c = canvas.Canvas(buffer, pagesize=A4, invariant=1)
+    c._doc.info.producer = ''
+    c._doc.info.creator = ''
+    c._doc.info.title = titre
+    c._doc.info.author = ''
+    c._doc.info.subject = ''
+    c._doc.info.keywords = ''
+
+    def entete_page(page_num):
+        c.setFont("Helvetica-Bold", 18)
+        c.drawCentredString(page_width / 2, page_height - 2 * cm, titre)
+        c.setFont("Helvetica", 8)
+        c.drawRightString(page_width - margin, margin / 2, f"Page {page_num} / {total_pages}")
+
+    page_num = 1
+    position = 0
+    entete_page(page_num)
+    for article in articles:
+        if position == par_page:
+            c.showPage()
+            page_num += 1
+            position = 0
+            entete_page(page_num)
+
+        rangee, colonne = divmod(position, colonnes)
+        x = margin + colonne * largeur_case
+        y = page_height - entete - margin - (rangee + 1) * hauteur_case
+        c.setStrokeColorRGB(0.7, 0.7, 0.7)
+        c.rect(x, y, largeur_case, hauteur_case, stroke=1, fill=0)
+
+        symbole = _symbole(format_etiquette, article.code, *taille_symbole)
+        renderPDF.draw(symbole, c, x + (largeur_case - symbole.width) / 2, y + hauteur_texte + 0.2 * cm)
+
+        c.setFont("Helvetica-Bold", 9)
+        c.drawCentredString(x + largeur_case / 2, y + 0.7 * cm,
+                            _tronquer(c, article.nom, "Helvetica-Bold", 9, largeur_case - 0.4 * cm))
+        c.setFont("Helvetica-Oblique", 7)
+        c.drawCentredString(x + largeur_case / 2, y + 0.3 * cm, f"Code: {article.code}")
+        position += 1
+
+    if not nombre:
+        c.setFont("Helvetica", 12)
+        c.drawCentredString(page_width / 2, page_height / 2, "Aucun article trouvé.")
+
+    c.save()
+    return buffer.getvalue()
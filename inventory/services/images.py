@@ -0,0 +1,159 @@
+"""
+Dérivés des images d'articles et de variantes (miniatures pour les terminaux).
+
+Les photos prises au téléphone pèsent plusieurs Mo: la sync du catalogue POS les
+téléchargeait telles quelles. À l'enregistrement d'une nouvelle image (signal
+post_save), Pillow produit après commit des dérivés de taille fixe (TAILLES_DERIVES)
+stockés à côté de l'original:
+
+    derives/<dossier>/<nom>.<empreinte>.<taille>.webp
+
+- empreinte = début du SHA-256 du dérivé: l'URL change avec le contenu; le serveur
+  frontal sert /media/derives/ avec Cache-Control immutable (GUIDE_DEPLOIEMENT_SCALINGO.md),
+  Django ne sert pas les médias en production;
+- WebP, ou JPEG si Pillow est compilé sans WebP;
+- génération dans le worker Celery (tâche generer_derives_image) seulement s'il voit les
+  mêmes médias que le web (generation_dans_worker); sinon dans le processus web, là où
+  l'original a été écrit;
+- original inaccessible (OSError): rien n'est mémorisé, la tâche réessaie; seule une
+  image illisible par Pillow est mémorisée sans dérivé;
+- chemins mémorisés dans image_derives ({'source': nom de l'original, 'miniature': ..., 'moyenne': ...}):
+  les payloads de sync n'ouvrent aucun fichier et retombent sur l'original tant que
+  les dérivés ne correspondent pas à l'image courante.
+
+Rattrapage des images existantes: python manage.py generer_derives_images
+"""
+import hashlib
+import logging
+import posixpath
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import FileSystemStorage, default_storage
+from django.db.models import F
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+DOSSIER_DERIVES = 'derives'
+TAILLES_DERIVES = {'miniature': 160, 'moyenne': 480}
+TAILLE_SYNC = 'moyenne'
+QUALITE = 80
+
+
+def _format_sortie():
+    from PIL import features
+
+    return ('WEBP', 'webp') if features.check('webp') else ('JPEG', 'jpg')
+
+
+def generer_derives(nom_image):
+    """Crée les dérivés de l'image stockée sous nom_image; retourne image_derives"""
+    # Pillow importé à la demande (coûteux au démarrage du processus)
+    from PIL import Image, ImageOps
+
+    format_pil, extension = _format_sortie()
+    with default_storage.open(nom_image, 'rb') as fichier:
+        source = Image.open(fichier)
+        source.load()
+    source = ImageOps.exif_transpose(source)
+    mode = 'RGBA' if format_pil == 'WEBP' and source.mode in ('RGBA', 'LA', 'P') else 'RGB'
+    source = source.convert(mode)
+
+    dossier, nom = posixpath.split(nom_image)
+    racine = posixpath.splitext(nom)[0]
+    derives = {'source': nom_image}
+    for taille, cote in TAILLES_DERIVES.items():
+        image = source.copy()
+        image.thumbnail((cote, cote), Image.LANCZOS)
+        tampon = BytesIO()
+        image.save(tampon, format_pil, quality=QUALITE, optimize=True)
+        contenu = tampon.getvalue()
+        empreinte = hashlib.sha256(contenu).hexdigest()[:12]
+        chemin = posixpath.join(DOSSIER_DERIVES, dossier, f"{racine}.{empreinte}.{taille}.{extension}")
+        # Même contenu, même nom: un dérivé déjà présent n'est pas réécrit
+        if not default_storage.exists(chemin):
+            default_storage.save(chemin, ContentFile(contenu))
+        derives[taille] = chemin
+    return derives
+
+
+def generation_dans_worker():
+    """Le worker Celery peut-il ouvrir l'original et écrire des dérivés visibles du web?"""
+    if settings.CELERY_TASK_ALWAYS_EAGER or settings.MEDIAS_PARTAGES:
+        return True
+    # Stockage objet (S3...): partagé par construction; disque local: propre à chaque conteneur
+    return not isinstance(default_storage, FileSystemStorage)
+
+
+def derives_a_jour(objet):
+    """Les dérivés mémorisés correspondent-ils à l'image courante? (aucune requête)"""
+    nom = objet.image.name if objet.image else ''
+    return (objet.image_derives or {}).get('source', '') == nom
+
+
+def derives_pour(objet):
+    """image_derives pour l'image courante de objet (fichiers générés au besoin)"""
+    if not objet.image:
+        return {}
+    from PIL import UnidentifiedImageError
+
+    try:
+        return generer_derives(objet.image.name)
+    except UnidentifiedImageError as e:
+        erreur = e
+    except OSError:
+        # Original absent de ce conteneur, stockage indisponible: rien n'est mémorisé,
+        # l'image sera retraitée (nouvel essai de la tâche, generer_derives_images)
+        raise
+    except Exception as e:
+        erreur = e
+    # Image illisible: mémorisée sans dérivé (l'original reste servi), pas de nouvel
+    # essai à chaque enregistrement de l'article; generer_derives_images --forcer réessaie
+    logger.warning(f"⚠️ Dérivés non générés pour {objet._meta.model_name} {objet.pk} ({objet.image.name}): {erreur}")
+    return {'source': objet.image.name}
+
+
+def champs_derives(objet, derives):
+    """Champs à écrire avec de nouveaux dérivés: last_updated (et version pour un article)
+    avancés pour que la sync incrémentale renvoie la nouvelle URL"""
+    champs = {'image_derives': derives, 'last_updated': timezone.now()}
+    if hasattr(objet, 'version'):
+        champs['version'] = F('version') + 1
+    return champs
+
+
+def mettre_a_jour_derives(objet):
+    """
+    (Re)génère les dérivés de objet (Article ou VarianteArticle) si son image a changé.
+    Écrit par update(), sans signaux. Comme les originaux remplacés, les anciens
+    dérivés restent sur le stockage (un même fichier peut servir à plusieurs objets).
+    """
+    if derives_a_jour(objet):
+        return False
+    champs = champs_derives(objet, derives_pour(objet))
+    type(objet).objects.filter(pk=objet.pk).update(**champs)
+    objet.image_derives = champs['image_derives']
+    return True
+
+
+def nom_image_sync(image, image_derives, taille=TAILLE_SYNC):
+    """Nom (stockage) de l'image à envoyer aux terminaux: le dérivé si à jour, sinon l'original"""
+    nom = getattr(image, 'name', image) or ''
+    if not nom:
+        return None
+    derives = image_derives or {}
+    if derives.get('source') == nom and derives.get(taille):
+        return derives[taille]
+    return nom
+
+
+def url_image_sync(objet, request=None, taille=TAILLE_SYNC):
+    """URL (absolue si request) de l'image d'objet pour la sync, ou None"""
+    nom = nom_image_sync(objet.image, objet.image_derives, taille)
+    if not nom:
+        return None
+    url = default_storage.url(nom)
+    return request.build_absolute_uri(url) if request is not None else url
+
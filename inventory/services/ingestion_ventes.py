@@ -0,0 +1,465 @@
+"""
+Ingestion de lots de ventes multi-boutiques.
+
+Les dépôts qui vendent pour plusieurs points de vente et la réintégration des ventes
+rejetées envoient des lots mélangeant plusieurs boutiques; sync_ventes_simple les
+traitait vente par vente, chacune dans sa transaction.
+
+- Validation de tout le lot en mémoire avant la moindre écriture: ventes existantes,
+  boutiques, articles, variantes et sorties de stock déjà journalisées sont lus en
+  une requête chacun, quelle que soit la taille du lot.
+- Regroupement par boutique: chaque groupe est enregistré dans sa propre transaction.
+  Si elle échoue (vente insérée entre-temps par une caisse...), le groupe est rejoué
+  vente par vente pour que les autres ventes du groupe passent quand même.
+- Les groupes sont traités en parallèle par un pool borné de threads (PostgreSQL);
+  séquentiellement sur SQLite (un seul écrivain) ou dans une transaction englobante.
+- Résultat consolidé: une entrée par vente, dans l'ordre du lot.
+- API: POST /api/v2/simple/ventes/ingestion/ ; commande: python manage.py ingerer_ventes
+"""
+import logging
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from datetime import datetime
+from decimal import Decimal, InvalidOperation
+
+from django.db import IntegrityError, connection, connections, transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from inventory.models import Article, Boutique, LigneVente, MouvementStock, VarianteArticle, Vente, VenteRejetee
+from inventory.services.stock import (
+    cles_sortie_journalisee, enregistrer_sorties_vente, sortie_deja_journalisee,
+)
+
+logger = logging.getLogger(__name__)
+
+TAILLE_MAX_LOT = 2000
+# Chaque thread occupe une connexion: rester sous la taille du pool (DB_POOL_MAX_SIZE)
+WORKERS = 4
+
+
+def convertir_vente_maui(v):
+    """Vente au format MAUI (PascalCase ou snake_case) vers le format Django de sync_ventes_simple."""
+    vente_convertie = {
+        'numero_facture': v.get('VenteUid') or v.get('vente_uid') or v.get('numero_facture'),
+        'date_vente': v.get('Date') or v.get('date') or v.get('date_vente'),
+        'montant_total': v.get('Total') or v.get('total') or v.get('montant_total'),
+        'montant_total_usd': v.get('TotalUsd') or v.get('total_usd') or v.get('montant_total_usd'),
+        'devise': v.get('Devise') or v.get('devise', 'CDF'),
+        'mode_paiement': v.get('ModePaiement') or v.get('mode_paiement', 'CASH'),
+        'paye': v.get('Paye') if 'Paye' in v else v.get('paye', True),
+        'lignes': v.get('Items') or v.get('items') or v.get('lignes', [])
+    }
+    lignes_converties = []
+    for item in vente_convertie.get('lignes', []):
+        lignes_converties.append({
+            'article_id': item.get('ArticleId') if item.get('ArticleId') is not None else item.get('article_id'),
+            'variante_id': item.get('VarianteId') if item.get('VarianteId') is not None else item.get('variante_id'),
+            'quantite': item.get('Quantite') if item.get('Quantite') is not None else item.get('quantite'),
+            'prix_unitaire': item.get('PrixUnitaire') if item.get('PrixUnitaire') is not None else item.get('prix_unitaire'),
+            'prix_unitaire_usd': item.get('PrixUnitaireUsd') if item.get('PrixUnitaireUsd') is not None else item.get('prix_unitaire_usd'),
+            'devise': item.get('Devise') or item.get('devise') or vente_convertie.get('devise', 'CDF')
+        })
+    vente_convertie['lignes'] = lignes_converties
+    return vente_convertie
+
+
+def date_vente_corrigee(vente_data, numero_facture):
+    """
+    Date de la VENTE envoyée par la caisse (pas celle de la synchronisation), dans le
+    fuseau du serveur. Une date dans le futur (> 30 min) est un décalage d'horloge de
+    l'appareil: remplacée par l'heure serveur. Une date passée (sync retardée) est conservée.
+    """
+    date_str = vente_data.get('date_vente') or vente_data.get('date')
+    date_vente = parse_datetime(date_str) if isinstance(date_str, str) else None
+    if date_vente is None:
+        logger.warning(f"⚠️ Date absente ou invalide pour vente {numero_facture}: '{date_str}' → fallback timezone.now()")
+        return timezone.now()
+    if timezone.is_naive(date_vente):
+        # Date naïve: fuseau de Django (Africa/Kinshasa)
+        date_vente = timezone.make_aware(date_vente)
+    else:
+        date_vente = date_vente.astimezone(timezone.get_current_timezone())
+
+    now = timezone.now()
+    ecart_minutes = (date_vente - now).total_seconds() / 60
+    if ecart_minutes > 30:
+        logger.warning(
+            f"⏰ HORLOGE DÉCALÉE: Vente {numero_facture} datée {date_vente.strftime('%d/%m/%Y %H:%M')} "
+            f"mais serveur={now.strftime('%d/%m/%Y %H:%M')} (décalage +{ecart_minutes:.0f}min) "
+            f"→ AUTO-CORRECTION à {now.strftime('%H:%M')}")
+        return now
+    if date_vente.date() != now.date() and ecart_minutes < -60:
+        logger.debug("📅 SYNC RETARDÉE: Vente %s datée du %s (synchro %s jour(s) après) — date de vente conservée",
+                     numero_facture, date_vente, (now.date() - date_vente.date()).days)
+    return date_vente
+
+
+def detecter_negociation(ligne_data, article, prix_unitaire):
+    """(prix_original, est_negocie, motif_reduction) d'une ligne: négociée si le prix vendu diffère du prix original."""
+    prix_original = ligne_data.get('prix_original') or ligne_data.get('prixOriginal')
+    est_negocie = ligne_data.get('est_negocie') or ligne_data.get('estNegocie', False)
+    motif_reduction = ligne_data.get('motif_reduction') or ligne_data.get('motifReduction') or ''
+    if not prix_original:
+        prix_original = float(article.prix_vente)
+    try:
+        if abs(float(prix_original) - float(prix_unitaire)) > 0.01:
+            est_negocie = True
+            logger.debug("💰 Réduction détectée: article %s - Original: %s → Vendu: %s",
+                         article.id, prix_original, prix_unitaire)
+    except (ValueError, TypeError):
+        pass
+    return prix_original, est_negocie, motif_reduction
+
+
+@dataclass
+class _VentePreparee:
+    index: int
+    donnees: dict
+    numero_facture: str
+    boutique: Boutique
+    date_vente: datetime
+    lignes: list  # [(ligne_data, article, variante, quantite, prix_unitaire)]
+    terminal_id: int = None
+    deja_sortis: frozenset = frozenset()
+
+
+def _rejet(index, numero_facture, boutique_id, code, message, **details):
+    return {'index': index, 'numero_facture': numero_facture, 'boutique_id': boutique_id,
+            'status': 'rejected', 'code': code, 'message': message, **details}
+
+
+def _normaliser(vente):
+    if not isinstance(vente, dict):
+        return None
+    if 'VenteUid' in vente or 'Items' in vente:
+        donnees = convertir_vente_maui(vente)
+        donnees['boutique_id'] = vente.get('BoutiqueId', vente.get('boutique_id'))
+        return donnees
+    return vente
+
+
+def _entier(valeur):
+    try:
+        return int(valeur)
+    except (TypeError, ValueError):
+        return None
+
+
+def _decimal(valeur):
+    if valeur is None or valeur == '':
+        return None
+    try:
+        return Decimal(str(valeur))
+    except (InvalidOperation, ValueError):
+        return None
+
+
+def _preparer(ventes, commercant_id, terminal, resultats):
+    """
+    Validation en mémoire de tout le lot. Remplit `resultats` (rejets, déjà présentes),
+    retourne (ventes à créer, boutiques autorisées par id).
+    """
+    candidates = []
+    vus = set()
+    for index, brute in enumerate(ventes):
+        donnees = _normaliser(brute)
+        if donnees is None:
+            resultats[index] = _rejet(index, None, None, 'INVALID_FORMAT', 'Vente: objet JSON attendu')
+            continue
+        numero = donnees.get('numero_facture')
+        boutique_id = _entier(donnees.get('boutique_id') or (terminal.boutique_id if terminal else None))
+        if not numero:
+            resultats[index] = _rejet(index, None, boutique_id, 'INVALID_DATA', 'numero_facture requis')
+        elif numero in vus:
+            resultats[index] = _rejet(index, numero, boutique_id, 'DUPLICATE', 'Vente présente plusieurs fois dans le lot')
+        elif boutique_id is None:
+            resultats[index] = _rejet(index, numero, None, 'INVALID_DATA', 'boutique_id requis')
+        elif not isinstance(donnees.get('lignes'), list) or not donnees['lignes']:
+            resultats[index] = _rejet(index, numero, boutique_id, 'INVALID_DATA', 'Vente sans lignes')
+        else:
+            candidates.append((index, donnees, str(numero), boutique_id))
+        vus.add(numero)
+    if not candidates:
+        return [], {}
+
+    # Une requête par table pour tout le lot
+    existantes = dict(Vente.objects.filter(
+        numero_facture__in=[numero for _, _, numero, _ in candidates]
+    ).values_list('numero_facture', 'id'))
+    boutiques = Boutique.objects.filter(id__in={bid for _, _, _, bid in candidates})
+    if commercant_id is not None:
+        boutiques = boutiques.filter(commercant_id=commercant_id)
+    boutiques = {b.id: b for b in boutiques}
+
+    article_ids, variante_ids = set(), set()
+    for _, donnees, _, _ in candidates:
+        for ligne in donnees['lignes']:
+            if isinstance(ligne, dict):
+                article_ids.add(_entier(ligne.get('article_id')))
+                variante_ids.add(_entier(ligne.get('variante_id')))
+    articles = Article.objects.in_bulk(article_ids - {None}) if article_ids - {None} else {}
+    variantes = VarianteArticle.objects.filter(id__in=variante_ids - {None}, est_actif=True).in_bulk() if variante_ids - {None} else {}
+
+    preparees = []
+    for index, donnees, numero, boutique_id in candidates:
+        boutique = boutiques.get(boutique_id)
+        if numero in existantes:
+            resultats[index] = {'index': index, 'numero_facture': numero, 'boutique_id': boutique_id,
+                                'status': 'already_exists', 'id': existantes[numero]}
+            continue
+        if boutique is None:
+            code = 'BOUTIQUE_MISMATCH' if commercant_id is not None else 'BOUTIQUE_NOT_FOUND'
+            resultats[index] = _rejet(index, numero, boutique_id, code, f'Boutique {boutique_id} non autorisée ou inexistante')
+            continue
+
+        lignes, erreur = [], None
+        for ligne in donnees['lignes']:
+            ligne = ligne if isinstance(ligne, dict) else {}
+            article_id = _entier(ligne.get('article_id'))
+            article = articles.get(article_id)
+            if article is None or article.boutique_id != boutique.id or not article.est_actif:
+                erreur = _rejet(index, numero, boutique.id, 'ARTICLE_NOT_FOUND',
+                                f'Article {ligne.get("article_id")} non trouvé dans cette boutique', article_id=article_id)
+                break
+            quantite = _entier(ligne.get('quantite', 1))
+            prix_unitaire = _decimal(ligne.get('prix_unitaire') if ligne.get('prix_unitaire') is not None else article.prix_vente)
+            if quantite is None or quantite <= 0 or prix_unitaire is None:
+                erreur = _rejet(index, numero, boutique.id, 'INVALID_DATA',
+                                f'Quantité ou prix invalide pour l\'article {article.id}', article_id=article.id)
+                break
+            variante = variantes.get(_entier(ligne.get('variante_id')))
+            if ligne.get('variante_id') and (variante is None or variante.article_parent_id != article.id):
+                logger.warning("⚠️ Variante %s non trouvée pour article %s, vente sur article parent",
+                               ligne.get('variante_id'), article.id)
+                variante = None
+            lignes.append((ligne, article, variante, quantite, prix_unitaire))
+        if erreur:
+            resultats[index] = erreur
+            continue
+
+        terminal_id = terminal.id if terminal else _entier(donnees.get('terminal_id'))
+        preparees.append(_VentePreparee(index, donnees, numero, boutique, date_vente_corrigee(donnees, numero),
+                                        lignes, terminal_id))
+
+    # Sorties déjà journalisées (facture supprimée puis renvoyée): pas de second décrément
+    deja_sortis = defaultdict(set)
+    if preparees:
+        for numero, article_id, variante_id, commentaire in MouvementStock.objects.filter(
+            reference_document__in=[p.numero_facture for p in preparees], type_mouvement='VENTE'
+        ).values_list('reference_document', 'article_id', 'variante_id', 'commentaire'):
+            deja_sortis[numero] |= cles_sortie_journalisee(article_id, variante_id, commentaire)
+    for p in preparees:
+        p.deja_sortis = frozenset(deja_sortis.get(p.numero_facture, ()))
+    return preparees, boutiques
+
+
+def _creer_vente(p, contexte):
+    donnees = p.donnees
+    devise_vente = donnees.get('devise', 'CDF')
+    vente = Vente.objects.create(
+        numero_facture=p.numero_facture,
+        date_vente=p.date_vente,
+        montant_total=0,
+        montant_total_usd=0 if devise_vente == 'USD' else None,
+        devise=devise_vente,
+        mode_paiement=donnees.get('mode_paiement', 'CASH'),
+        paye=donnees.get('paye', True),
+        boutique=p.boutique,
+        client_maui_id=p.terminal_id,
+        adresse_ip_client=contexte['adresse_ip'],
+        version_app_maui=contexte['version_app'],
+    )
+
+    montant_total = Decimal('0')
+    montant_total_usd = Decimal('0')
+    lignes_vente, sorties = [], []
+    deja_sortis = set(p.deja_sortis)  # copie: le groupe peut être rejoué vente par vente
+    for ligne_data, article, variante, quantite, prix_unitaire in p.lignes:
+        prix_unitaire_usd = _decimal(ligne_data.get('prix_unitaire_usd') or article.prix_vente_usd)
+        prix_original, est_negocie, motif_reduction = detecter_negociation(ligne_data, article, prix_unitaire)
+        lignes_vente.append(LigneVente(
+            vente=vente,
+            article=article,
+            variante=variante,
+            quantite=quantite,
+            prix_unitaire=prix_unitaire,
+            prix_unitaire_usd=prix_unitaire_usd,
+            devise=ligne_data.get('devise', devise_vente),
+            prix_original=prix_original,
+            est_negocie=est_negocie,
+            motif_reduction=motif_reduction,
+        ))
+        montant_total += prix_unitaire * quantite
+        if prix_unitaire_usd:
+            montant_total_usd += prix_unitaire_usd * quantite
+
+        cle_sortie = (article.id, variante.id) if variante else article.id
+        if sortie_deja_journalisee(deja_sortis, article, variante):
+            contexte['doublons_mouvement'] += 1
+            continue
+        deja_sortis.update({article.id, cle_sortie})
+        if variante:
+            commentaire = f"Vente #{p.numero_facture} - Variante: {variante.nom_variante} - Prix: {prix_unitaire} CDF"
+        else:
+            commentaire = f"Vente #{p.numero_facture} - Prix: {prix_unitaire} CDF"
+        sorties.append({'article': article, 'variante': variante, 'quantite': quantite, 'commentaire': commentaire})
+
+    # Seul récepteur post_save de LigneVente: invalidation du jour, déjà faite par Vente.objects.create
+    LigneVente.objects.bulk_create(lignes_vente)
+
+    # Total envoyé par la caisse prioritaire au-delà d'une unité d'écart (prix modifié depuis la vente)
+    montant_maui = _decimal(donnees.get('montant_total'))
+    if montant_maui and montant_maui > 0 and abs(montant_total - montant_maui) > 1:
+        logger.warning("⚠️ ÉCART MONTANT: Vente %s — caisse=%s vs recalculé=%s → total caisse conservé",
+                       p.numero_facture, montant_maui, montant_total)
+        montant_total = montant_maui
+    vente.montant_total = montant_total
+    champs = ['montant_total']
+    if devise_vente == 'USD' and montant_total_usd:
+        vente.montant_total_usd = montant_total_usd
+        champs.append('montant_total_usd')
+    vente.save(update_fields=champs)
+
+    # Stock en dernier: l'UPDATE verrouille les articles parents jusqu'au commit du groupe
+    enregistrer_sorties_vente(vente, sorties, contexte['utilisateur'], boutique=p.boutique,
+                              terminal=contexte['terminal'])
+
+    return {
+        'index': p.index, 'numero_facture': p.numero_facture, 'boutique_id': p.boutique.id,
+        'status': 'created', 'id': vente.id, 'montant_total': str(vente.montant_total),
+        'lignes_count': len(lignes_vente), 'sorties': sorties,
+    }
+
+
+def _enregistrer_groupe(groupe, contexte):
+    """Ventes d'une boutique: une transaction pour le groupe, rejouée vente par vente si elle échoue."""
+    try:
+        with transaction.atomic():
+            return [_creer_vente(p, contexte) for p in groupe]
+    except Exception as e:
+        logger.warning("⚠️ Ingestion boutique %s: transaction du groupe annulée (%s), reprise vente par vente",
+                       groupe[0].boutique.id, e)
+
+    resultats = []
+    for p in groupe:
+        try:
+            with transaction.atomic():
+                resultats.append(_creer_vente(p, contexte))
+        except IntegrityError as e:
+            vente_id = Vente.objects.filter(numero_facture=p.numero_facture).values_list('id', flat=True).first()
+            if vente_id:
+                resultats.append({'index': p.index, 'numero_facture': p.numero_facture,
+                                  'boutique_id': p.boutique.id, 'status': 'already_exists', 'id': vente_id})
+            else:
+                resultats.append(_rejet(p.index, p.numero_facture, p.boutique.id, 'INTEGRITY_ERROR', str(e)))
+        except Exception as e:
+            logger.error("❌ Ingestion vente %s: %s", p.numero_facture, e)
+            resultats.append(_rejet(p.index, p.numero_facture, p.boutique.id, 'OTHER', str(e)))
+    return resultats
+
+
+def _enregistrer_groupe_thread(groupe, contexte):
+    try:
+        return _enregistrer_groupe(groupe, contexte)
+    finally:
+        # Connexions propres à ce thread: ne pas les laisser ouvertes dans le pool
+        connections.close_all()
+
+
+def _notifier(resultats):
+    from inventory.websocket_utils import notify_stock_updated
+
+    stocks = {}
+    for resultat in resultats:
+        for sortie in resultat.pop('sorties', ()):
+            article = sortie['article']
+            stocks[article.id] = article
+    for article in stocks.values():
+        notify_stock_updated(article.boutique_id, article.id, article.quantite_stock)
+    return [
+        {'article_id': a.id, 'boutique_id': a.boutique_id, 'code': a.code, 'nom': a.nom,
+         'stock_actuel': a.quantite_stock, 'prix_actuel': str(a.prix_vente)}
+        for a in stocks.values()
+    ]
+
+
+def ingerer_ventes(ventes, commercant_id=None, terminal=None, utilisateur='', adresse_ip=None, workers=WORKERS):
+    """
+    Enregistre un lot de ventes de plusieurs boutiques.
+
+    Args:
+        ventes: ventes au format de sync_ventes_simple (ou MAUI), chacune avec son boutique_id
+            (par défaut la boutique du terminal).
+        commercant_id: si fourni, seules les boutiques de ce commerçant sont acceptées.
+        terminal: terminal émetteur (client_maui des ventes, VenteRejetee des rejets).
+            Sans terminal (commande d'administration), 'terminal_id' de chaque vente est utilisé.
+
+    Returns:
+        {'resultats': une entrée par vente dans l'ordre du lot (status created /
+        already_exists / rejected), 'stock_updates': stock final des articles vendus,
+        'stats': compteurs}
+    """
+    resultats = [None] * len(ventes)
+    preparees, boutiques = _preparer(ventes, commercant_id, terminal, resultats)
+
+    groupes = defaultdict(list)
+    for p in preparees:
+        groupes[p.boutique.id].append(p)
+    contexte = {
+        'terminal': terminal,
+        'utilisateur': utilisateur or (terminal.nom_terminal if terminal else 'ingestion'),
+        'adresse_ip': adresse_ip,
+        'version_app': terminal.version_app_maui if terminal else '',
+        'doublons_mouvement': 0,
+    }
+
+    # SQLite: un seul écrivain; transaction englobante: les threads ne verraient pas ses écritures
+    parallele = (
+        workers > 1 and len(groupes) > 1 and connection.vendor != 'sqlite' and not connection.in_atomic_block
+    )
+    if parallele:
+        with ThreadPoolExecutor(max_workers=min(workers, len(groupes))) as executor:
+            par_groupe = list(executor.map(_enregistrer_groupe_thread, groupes.values(), [contexte] * len(groupes)))
+    else:
+        par_groupe = [_enregistrer_groupe(groupe, contexte) for groupe in groupes.values()]
+    for resultats_groupe in par_groupe:
+        for resultat in resultats_groupe:
+            resultats[resultat['index']] = resultat
+
+    stock_updates = _notifier(resultats)
+    rejets = [r for r in resultats if r['status'] == 'rejected']
+    if terminal is not None and rejets:
+        _journaliser_rejets(rejets, ventes, terminal, boutiques)
+
+    stats = defaultdict(int, recues=len(ventes), boutiques=len(groupes),
+                        doublons_mouvement=contexte['doublons_mouvement'])
+    for resultat in resultats:
+        stats[resultat['status']] += 1
+    logger.info("📦 Ingestion: %s vente(s), %s créée(s), %s déjà présente(s), %s rejetée(s), %s boutique(s)%s",
+                len(ventes), stats['created'], stats['already_exists'], stats['rejected'], len(groupes),
+                " en parallèle" if parallele else "")
+    return {'resultats': resultats, 'stock_updates': stock_updates, 'stats': dict(stats)}
+
+
+def _journaliser_rejets(rejets, ventes, terminal, boutiques):
+    """VenteRejetee pour chaque rejet (traçabilité, écran des ventes rejetées), en une insertion."""
+    raisons = dict(VenteRejetee.RAISONS_REJET)
+    try:
+        VenteRejetee.objects.bulk_create([
+            VenteRejetee(
+                vente_uid=str(r['numero_facture'] or f"UNKNOWN_{r['index']}")[:100],
+                terminal=terminal,
+                # Boutique validée si connue, sinon celle du terminal (boutique_id reçu non fiable)
+                boutique_id=r['boutique_id'] if r['boutique_id'] in boutiques else terminal.boutique_id,
+                donnees_vente=ventes[r['index']] if isinstance(ventes[r['index']], dict) else {'brut': str(ventes[r['index']])},
+                raison_rejet=r['code'] if r['code'] in raisons else 'OTHER',
+                message_erreur=r['message'],
+                article_concerne_id=r.get('article_id'),
+                action_requise='NOTIFY_USER',
+            )
+            for r in rejets if r['code'] != 'DUPLICATE'
+        ])
+    except Exception as e:
+        logger.warning(f"⚠️ Impossible de sauvegarder les rejets: {e}")
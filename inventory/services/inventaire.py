@@ -0,0 +1,258 @@
+"""
+Moteur d'inventaire en masse (ouverture et régularisation).
+
+- Ouverture: le stock théorique de tous les articles actifs est photographié en un
+  seul INSERT ... SELECT (au lieu d'un LigneInventaire.objects.create par article).
+- Régularisation: traitée par lots de TAILLE_LOT lignes, chaque lot dans sa propre
+  transaction (UPDATE ensemblistes + bulk_create des MouvementStock/NotificationStock).
+  Les lignes traitées passent à est_regularise=True: une régularisation interrompue
+  reprend simplement là où elle s'était arrêtée (nouvel appel, vue ou commande
+  `regulariser_inventaire`).
+- Journal: un seul impact JournalValeurStock (montant_inventaire) à la clôture, calculé
+  depuis les mouvements de l'inventaire, au lieu d'une valorisation par mouvement.
+
+⚠️ bulk_create ne déclenche pas les signaux post_save de MouvementStock: leurs effets
+(notifications, journal, inventaires en cours, valorisation en cache) sont reproduits
+ici en masse.
+"""
+import logging
+from decimal import Decimal
+
+from django.db import connection, transaction
+from django.db.models import Case, DecimalField, ExpressionWrapper, F, IntegerField, Sum, Value, When
+from django.utils import timezone
+
+from inventory import journal_valeur_stock as jvs
+from inventory.models import Article, Client, Inventaire, LigneInventaire, MouvementStock, NotificationStock
+from inventory.services.valeur_stock import invalider_valeur_stock
+
+logger = logging.getLogger(__name__)
+
+TAILLE_LOT = 500
+
+
+def reference_mouvements(inventaire):
+    return f"INV-{inventaire.id}"
+
+
+# ===== OUVERTURE =====
+
+def ouvrir_inventaire(boutique, cree_par, date_inventaire, notes=''):
+    """Crée un inventaire EN_COURS et une ligne par article actif (stock théorique figé)."""
+    with transaction.atomic():
+        inventaire = Inventaire.objects.create(
+            boutique=boutique,
+            date_inventaire=date_inventaire,
+            notes=notes,
+            cree_par=cree_par,
+            statut='EN_COURS'
+        )
+        inventaire.nb_articles = _photographier_stock(inventaire)
+        inventaire.save(update_fields=['nb_articles'])
+    return inventaire
+
+
+def _photographier_stock(inventaire):
+    """INSERT ... SELECT des lignes d'inventaire; prix d'achat, ou prix de vente s'il est nul."""
+    qn = connection.ops.quote_name
+    ligne, article = LigneInventaire._meta, Article._meta
+    colonnes = ['inventaire', 'article', 'stock_theorique', 'ecart', 'prix_unitaire',
+                'valeur_ecart', 'est_regularise', 'commentaire', 'assigne_a']
+    col = lambda nom: qn(article.get_field(nom).column)
+    sql = (
+        f"INSERT INTO {qn(ligne.db_table)} "
+        f"({', '.join(qn(ligne.get_field(c).column) for c in colonnes)}) "
+        f"SELECT %s, {qn(article.pk.column)}, {col('quantite_stock')}, 0, "
+        f"CASE WHEN {col('prix_achat')} > 0 THEN {col('prix_achat')} ELSE COALESCE({col('prix_vente')}, 0) END, "
+        f"0, %s, '', '' "
+        f"FROM {qn(article.db_table)} WHERE {col('boutique')} = %s AND {col('est_actif')} = %s"
+    )
+    with connection.cursor() as cursor:
+        cursor.execute(sql, [inventaire.id, False, inventaire.boutique_id, True])
+        return cursor.rowcount
+
+
+# ===== RÉGULARISATION =====
+
+def regulariser_par_lots(inventaire, taille_lot=TAILLE_LOT, progression=None):
+    """
+    Régularise un inventaire TERMINE par lots; reprend les lignes non encore régularisées.
+
+    Les articles saisis avec écart prennent le stock physique, les articles non saisis
+    sont mis à zéro. `progression(nb_traitees)` est appelée après chaque lot.
+    Retourne le nombre de lignes régularisées par cet appel.
+    """
+    total = 0
+    while True:
+        nb = _regulariser_lot(inventaire, taille_lot)
+        if nb is None:
+            break
+        total += nb
+        if progression:
+            progression(total)
+    _cloturer(inventaire)
+    return total
+
+
+def _regulariser_lot(inventaire, taille_lot):
+    """Traite un lot dans sa propre transaction; None quand il ne reste rien à traiter."""
+    with transaction.atomic():
+        # Verrou sur l'inventaire: deux régularisations concurrentes se succèdent
+        inv = Inventaire.objects.select_for_update().get(pk=inventaire.pk)
+        if inv.statut != 'TERMINE':
+            return None
+        lignes = list(
+            inv.lignes.filter(est_regularise=False)
+            .order_by('id')
+            .values('id', 'article_id', 'stock_physique', 'ecart')[:taille_lot]
+        )
+        if not lignes:
+            return None
+
+        article_ids = [l['article_id'] for l in lignes]
+        stocks = dict(
+            Article.objects.select_for_update()
+            .filter(id__in=article_ids)
+            .values_list('id', 'quantite_stock')
+        )
+
+        # Nouveau stock par article: stock physique si écart, 0 si non saisi (et stock > 0)
+        cibles = {}
+        for l in lignes:
+            stock_avant = stocks.get(l['article_id'])
+            if stock_avant is None:
+                continue
+            if l['stock_physique'] is not None:
+                if l['ecart'] != 0 and l['stock_physique'] != stock_avant:
+                    cibles[l['article_id']] = (stock_avant, l['stock_physique'], False)
+            elif stock_avant > 0:
+                cibles[l['article_id']] = (stock_avant, 0, True)
+
+        if cibles:
+            maintenant = timezone.now()
+            Article.objects.filter(id__in=list(cibles)).update(
+                quantite_stock=Case(
+                    *[When(id=aid, then=Value(apres)) for aid, (_, apres, _) in cibles.items()],
+                    output_field=IntegerField(),
+                ),
+                # Ce que faisait article.save(): version et horodatage pour la sync incrémentale MAUI
+                version=F('version') + 1,
+                last_updated=maintenant,
+                date_mise_a_jour=maintenant,
+            )
+            mouvements = MouvementStock.objects.bulk_create([
+                MouvementStock(
+                    article_id=aid,
+                    boutique_id=inv.boutique_id,
+                    type_mouvement='ENTREE' if apres > avant else 'SORTIE',
+                    quantite=abs(apres - avant),
+                    stock_avant=avant,
+                    stock_apres=apres,
+                    commentaire=(
+                        f"Régularisation inventaire {inv.reference} (article non saisi)" if non_saisi
+                        else f"Régularisation inventaire {inv.reference}"
+                    ),
+                    reference_document=reference_mouvements(inv),
+                )
+                for aid, (avant, apres, non_saisi) in cibles.items()
+            ])
+            _notifier_clients(inv.boutique, mouvements)
+            _synchroniser_inventaires_en_cours(inv.boutique, list(cibles))
+            transaction.on_commit(lambda: invalider_valeur_stock(inv.boutique_id))
+
+        inv.lignes.filter(id__in=[l['id'] for l in lignes]).update(est_regularise=True)
+
+    # Même décompte que l'ancienne boucle: lignes saisies avec écart + toutes les non saisies
+    return sum(1 for l in lignes if l['stock_physique'] is None or l['ecart'] != 0)
+
+
+def _cloturer(inventaire):
+    """Passe l'inventaire à REGULARISE et poste l'impact net unique dans le journal."""
+    with transaction.atomic():
+        inv = Inventaire.objects.select_for_update().get(pk=inventaire.pk)
+        if inv.statut != 'TERMINE' or inv.lignes.filter(est_regularise=False).exists():
+            return
+        impact = MouvementStock.objects.filter(
+            reference_document=reference_mouvements(inv),
+            type_mouvement__in=['ENTREE', 'SORTIE'],
+        ).aggregate(total=Sum(ExpressionWrapper(
+            (F('stock_apres') - F('stock_avant')) * F('article__prix_vente'),
+            output_field=DecimalField(max_digits=18, decimal_places=2),
+        )))['total'] or Decimal('0')
+        jvs.enregistrer_inventaire(inv.boutique, impact)
+
+        inv.statut = 'REGULARISE'
+        inv.date_regularisation = timezone.now()
+        inv.save(update_fields=['statut', 'date_regularisation'])
+        inventaire.statut, inventaire.date_regularisation = inv.statut, inv.date_regularisation
+    logger.info("📦 Inventaire %s régularisé (impact journal: %s)", inv.reference, impact)
+
+
+def _notifier_clients(boutique, mouvements):
+    """Équivalent en masse du signal creer_notification_stock pour les terminaux de la boutique."""
+    clients = list(Client.objects.filter(boutique=boutique, est_actif=True))
+    if not clients or not mouvements:
+        return
+    articles = Article.objects.select_related('categorie').in_bulk([m.article_id for m in mouvements])
+    notifications = []
+    for m in mouvements:
+        article = articles[m.article_id]
+        ajout = m.type_mouvement == 'ENTREE'
+        titre = f"{'Ajout' if ajout else 'Retrait'} de stock: {article.nom}"
+        message = (
+            f"L'article '{article.nom}' ({article.code}) a été {'ajouté au' if ajout else 'retiré du'} stock.\n"
+            f"Quantité {'ajoutée: +' if ajout else 'retirée: '}{m.quantite}\n"
+            f"Stock avant: {m.stock_avant}\n"
+            f"Stock actuel: {m.stock_apres}\n\n"
+            f"Commentaire: {m.commentaire}"
+        )
+        donnees_sup = {
+            'article_id': article.id,
+            'article_code': article.code,
+            'article_nom': article.nom,
+            'prix_vente': str(article.prix_vente),
+            'prix_ancien': None,
+            'devise': article.devise,
+            'categorie': article.categorie.nom if article.categorie else None,
+            'type_mouvement': m.type_mouvement,
+            'reference_document': m.reference_document,
+            'utilisateur': m.utilisateur,
+            'stock_avant': m.stock_avant,
+            'stock_apres': m.stock_apres,
+        }
+        for client in clients:
+            notifications.append(NotificationStock(
+                client=client,
+                boutique=boutique,
+                type_notification='STOCK_AJOUT' if ajout else 'STOCK_RETRAIT',
+                titre=titre,
+                message=message,
+                mouvement_stock=m,
+                article=article,
+                quantite_mouvement=m.quantite,
+                quantite_ajoutee=m.quantite if m.quantite > 0 else 0,
+                stock_avant=m.stock_avant,
+                stock_actuel=m.stock_apres,
+                donnees_supplementaires=donnees_sup,
+            ))
+    NotificationStock.objects.bulk_create(notifications, batch_size=1000)
+
+
+def _synchroniser_inventaires_en_cours(boutique, article_ids):
+    """Équivalent en masse du signal synchroniser_inventaire_en_cours."""
+    lignes = LigneInventaire.objects.filter(
+        inventaire__boutique=boutique,
+        inventaire__statut='EN_COURS',
+        article_id__in=article_ids,
+    )
+    if not lignes.exists():
+        return
+    stocks = dict(Article.objects.filter(id__in=article_ids).values_list('id', 'quantite_stock'))
+    lignes.update(stock_theorique=Case(
+        *[When(article_id=aid, then=Value(stock)) for aid, stock in stocks.items()],
+        output_field=IntegerField(),
+    ))
+    lignes.filter(stock_physique__isnull=False).update(
+        ecart=F('stock_physique') - F('stock_theorique'),
+        valeur_ecart=(F('stock_physique') - F('stock_theorique')) * F('prix_unitaire'),
+    )
@@ -0,0 +1,231 @@
+"""
+Cache à deux niveaux des paramètres Boutique/Commercant et des droits d'accès.
+
+Les décorateurs (commercant_required, boutique_access_required) et les résolveurs de
+l'API POS lisent à chaque requête les mêmes réglages: boutique active, POS autorisé,
+devise, seuil d'alerte, taux du dollar, commerçant actif, boutiques d'un collaborateur.
+
+- Niveau 1: LRU en mémoire du processus, servi sans aller-retour réseau pendant
+  DUREE_LOCALE secondes.
+- Niveau 2: cache partagé (Redis en production), clé suffixée par un numéro de
+  version (boutique ou utilisateur).
+- Boutique.save / Commercant.save / Collaborateur (et ses boutiques autorisées)
+  incrémentent la version (immédiatement et après le COMMIT): les autres processus
+  voient la modification au plus tard DUREE_LOCALE secondes après.
+"""
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from decimal import Decimal
+from typing import FrozenSet, Optional
+
+from django.core.cache import cache
+from django.db import transaction
+
+TAILLE_LRU = 2048
+DUREE_LOCALE = 5
+DUREE_PARTAGEE = 60 * 60
+
+
+@dataclass(frozen=True)
+class ParametresBoutique:
+    """Réglages d'une boutique et de son commerçant lus à chaque requête."""
+    id: int
+    nom: str
+    commercant_id: int
+    commercant_actif: bool
+    est_active: bool
+    est_depot: bool
+    pos_autorise: bool
+    devise: str
+    alerte_stock_bas: int
+    taux_dollar: Decimal
+    taux_dollar_commercant: Decimal
+
+
+@dataclass(frozen=True)
+class AccesUtilisateur:
+    """Profil d'un utilisateur web: commerçant, collaborateur ou aucun des deux."""
+    user_id: int
+    commercant_id: Optional[int] = None
+    est_commercant: bool = False
+    collaborateur_id: Optional[int] = None
+    actif: bool = False
+    # None = toutes les boutiques du commerçant
+    boutiques_autorisees: Optional[FrozenSet[int]] = None
+
+    @property
+    def a_un_profil(self):
+        return self.commercant_id is not None
+
+    def peut_acceder(self, parametres):
+        """Profil actif et boutique appartenant au commerçant."""
+        return parametres is not None and self.actif and parametres.commercant_id == self.commercant_id
+
+    def peut_acceder_boutique(self, parametres):
+        """peut_acceder, limité aux boutiques_autorisees pour un collaborateur restreint."""
+        return self.peut_acceder(parametres) and (
+            self.boutiques_autorisees is None or parametres.id in self.boutiques_autorisees
+        )
+
+
+class _LRU:
+    """LRU thread-safe: clé -> (version, expiration, valeur)."""
+
+    def __init__(self, taille):
+        self.taille = taille
+        self._donnees = OrderedDict()
+        self._verrou = threading.Lock()
+
+    def get(self, cle):
+        with self._verrou:
+            entree = self._donnees.get(cle)
+            if entree is not None:
+                self._donnees.move_to_end(cle)
+            return entree
+
+    def set(self, cle, version, valeur):
+        with self._verrou:
+            self._donnees[cle] = (version, time.monotonic() + DUREE_LOCALE, valeur)
+            self._donnees.move_to_end(cle)
+            while len(self._donnees) > self.taille:
+                self._donnees.popitem(last=False)
+
+    def pop(self, cle):
+        with self._verrou:
+            self._donnees.pop(cle, None)
+
+    def clear(self):
+        with self._verrou:
+            self._donnees.clear()
+
+
+_local = _LRU(TAILLE_LRU)
+
+
+def _cle_version(type_objet, objet_id):
+    return f"parametres_version:{type_objet}:{objet_id}"
+
+
+def _version_initiale():
+    # Horodatage: une version évincée du cache ne peut pas revenir à une valeur déjà servie
+    return time.time_ns()
+
+
+def _lire(type_objet, objet_id, charger):
+    """Niveau 1, puis version + niveau 2, puis base (charger)."""
+    entree = _local.get((type_objet, objet_id))
+    if entree is not None and entree[1] > time.monotonic():
+        return entree[2]
+
+    version = cache.get_or_set(_cle_version(type_objet, objet_id), _version_initiale, None)
+    if entree is not None and entree[0] == version:
+        _local.set((type_objet, objet_id), version, entree[2])
+        return entree[2]
+
+    cle = f"parametres:{type_objet}:{objet_id}:v{version}"
+    valeur = cache.get(cle)
+    if valeur is None:
+        valeur = charger(objet_id)
+        cache.set(cle, valeur, DUREE_PARTAGEE)
+    _local.set((type_objet, objet_id), version, valeur)
+    return valeur
+
+
+def _charger_boutique(boutique_id):
+    from inventory.models import Boutique
+
+    b = Boutique.objects.filter(id=boutique_id).values(
+        'id', 'nom', 'commercant_id', 'commercant__est_actif', 'est_active', 'est_depot', 'pos_autorise',
+        'devise', 'alerte_stock_bas', 'taux_dollar', 'commercant__taux_dollar',
+    ).first()
+    if b is None:
+        return False  # « inconnue » est aussi mis en cache (None = absence de cache)
+    return ParametresBoutique(
+        id=b['id'], nom=b['nom'], commercant_id=b['commercant_id'], commercant_actif=b['commercant__est_actif'],
+        est_active=b['est_active'], est_depot=b['est_depot'], pos_autorise=b['pos_autorise'],
+        devise=b['devise'], alerte_stock_bas=b['alerte_stock_bas'], taux_dollar=b['taux_dollar'],
+        taux_dollar_commercant=b['commercant__taux_dollar'],
+    )
+
+
+def _charger_utilisateur(user_id, user=None):
+    from inventory.models import Collaborateur, Commercant
+
+    if user is not None:
+        # Passe par user.profil_commercant: l'instance reste en cache sur request.user pour la vue
+        try:
+            commercant = user.profil_commercant
+            commercant = {'id': commercant.id, 'est_actif': commercant.est_actif}
+        except Commercant.DoesNotExist:
+            commercant = None
+    else:
+        commercant = Commercant.objects.filter(user_id=user_id).values('id', 'est_actif').first()
+    if commercant is not None:
+        return AccesUtilisateur(
+            user_id=user_id, commercant_id=commercant['id'], est_commercant=True, actif=commercant['est_actif']
+        )
+    collaborateur = Collaborateur.objects.filter(user_id=user_id).values('id', 'commercant_id', 'est_actif').first()
+    if collaborateur is None:
+        return AccesUtilisateur(user_id=user_id)
+    boutiques = frozenset(
+        Collaborateur.boutiques_autorisees.through.objects.filter(
+            collaborateur_id=collaborateur['id']
+        ).values_list('boutique_id', flat=True)
+    )
+    return AccesUtilisateur(
+        user_id=user_id, commercant_id=collaborateur['commercant_id'], collaborateur_id=collaborateur['id'],
+        actif=collaborateur['est_actif'], boutiques_autorisees=boutiques or None,
+    )
+
+
+def parametres_boutique(boutique_id):
+    """ParametresBoutique de la boutique, ou None si elle n'existe pas."""
+    try:
+        boutique_id = int(boutique_id)
+    except (TypeError, ValueError):
+        return None
+    return _lire('boutique', boutique_id, _charger_boutique) or None
+
+
+def acces_utilisateur(user_id, user=None):
+    """AccesUtilisateur d'un utilisateur authentifié (user: instance optionnelle, ex. request.user)."""
+    return _lire('user', user_id, lambda objet_id: _charger_utilisateur(objet_id, user))
+
+
+def _incrementer(type_objet, objet_id):
+    _local.pop((type_objet, objet_id))
+    try:
+        cache.incr(_cle_version(type_objet, objet_id))
+    except ValueError:
+        cache.set(_cle_version(type_objet, objet_id), _version_initiale(), None)
+
+
+def _apres_commit(type_objet, objet_id):
+    if objet_id is None:
+        return
+    # Tout de suite (ce processus ne sert plus l'ancienne valeur) puis après le COMMIT
+    # (une relecture concurrente avant le COMMIT a pu remettre l'ancienne valeur en cache)
+    _incrementer(type_objet, objet_id)
+    transaction.on_commit(lambda: _incrementer(type_objet, objet_id))
+
+
+def vider_cache_local():
+    """Vide le niveau 1 de ce processus (tests, commandes longues)."""
+    _local.clear()
+
+
+def invalider_boutique(boutique_id):
+    _apres_commit('boutique', boutique_id)
+
+
+def invalider_utilisateur(user_id):
+    _apres_commit('user', user_id)
+
+
+def invalider_commercant(commercant):
+    """Commerçant modifié (taux du dollar, statut): ses boutiques et son compte."""
+    for boutique_id in commercant.boutiques.values_list('id', flat=True):
+        invalider_boutique(boutique_id)
+    invalider_utilisateur(commercant.user_id)
@@ -0,0 +1,202 @@
+"""
+Partitionnement mensuel PostgreSQL (PARTITION BY RANGE) des journaux volumineux.
+
+Tables concernées: MouvementStock (date_mouvement) et NotificationStock (date_creation),
+journaux en ajout seul interrogés presque toujours par période. Une partition par
+mois (heure de Kinshasa) + une partition par défaut de secours.
+
+- Conversion: migration 0069 si PARTITIONNEMENT_MENSUEL=True, sinon à la demande
+  (python manage.py partitions_mensuelles --convertir), en fenêtre de maintenance
+  (verrou exclusif pendant la copie, voir convertir). Table recréée partitionnée,
+  données recopiées, index et clés étrangères sortantes recréés; clé primaire
+  (id, colonne de partition) imposée par PostgreSQL.
+- Partitions à venir: créées MOIS_AVANCE mois à l'avance (release, tâche Celery
+  maintenir_partitions planifiée par le processus beat du Procfile, commande
+  partitions_mensuelles).
+- Rétention: purge_mouvements_stock supprime les mois entiers par DROP de partition
+  (au lieu d'un DELETE massif), le reste du mois limite par DELETE.
+- Vente / LigneVente ne sont pas partitionnées: l'unicité globale de
+  Vente.numero_facture (dédoublonnage des ventes hors ligne) et les clés étrangères
+  vers Vente ne peuvent pas être portées par une table partitionnée.
+- SQLite (développement): tables normales, toutes les fonctions sont sans effet.
+"""
+import logging
+import re
+
+from django.db import connection, transaction
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+# table: colonne de partition
+PARTITIONS = {
+    'inventory_mouvementstock': 'date_mouvement',
+    'inventory_notificationstock': 'date_creation',
+}
+# Lignes à supprimer avant de supprimer une partition (on_delete=CASCADE côté ORM,
+# sans contrainte en base): table: [(table dépendante, colonne)]
+DEPENDANCES = {
+    'inventory_mouvementstock': [('inventory_notificationstock', 'mouvement_stock_id')],
+}
+MOIS_AVANCE = 3
+
+
+def debut_mois(moment):
+    return timezone.localtime(moment).replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+
+
+def mois_suivant(debut):
+    annee, mois = divmod(debut.month, 12)
+    return debut.replace(year=debut.year + annee, month=mois + 1)
+
+
+def nom_partition(table, debut):
+    return f'{table}_p{debut:%Y%m}'
+
+
+def _defaut(table):
+    return f'{table}_defaut'
+
+
+def est_partitionnee(table, connexion=connection):
+    if connexion.vendor != 'postgresql':
+        return False
+    with connexion.cursor() as cursor:
+        cursor.execute("SELECT relkind FROM pg_class WHERE oid = to_regclass(%s)", [table])
+        ligne = cursor.fetchone()
+    return ligne is not None and ligne[0] == 'p'
+
+
+def partitions(table, connexion=connection):
+    """[(nom, début du mois)] des partitions mensuelles existantes, de la plus ancienne à la plus récente."""
+    if not est_partitionnee(table, connexion):
+        return []
+    with connexion.cursor() as cursor:
+        cursor.execute(
+            "SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid "
+            "WHERE i.inhparent = to_regclass(%s)", [table]
+        )
+        noms = [nom for (nom,) in cursor.fetchall()]
+    motif = re.compile(rf'^{re.escape(table)}_p(\d{{4}})(\d{{2}})$')
+    resultat = []
+    for nom in noms:
+        m = motif.match(nom)
+        if m:
+            debut = debut_mois(timezone.now()).replace(year=int(m.group(1)), month=int(m.group(2)))
+            resultat.append((nom, debut))
+    return sorted(resultat, key=lambda p: p[1])
+
+
+def creer_partitions(table, depuis=None, mois_avance=MOIS_AVANCE, connexion=connection):
+    """Crée les partitions mensuelles manquantes de `depuis` (défaut: ce mois) à +mois_avance; renvoie leurs noms."""
+    if not est_partitionnee(table, connexion):
+        return []
+    q = connexion.ops.quote_name
+    colonne = PARTITIONS[table]
+    existantes = {nom for nom, _ in partitions(table, connexion)}
+    debut = debut_mois(depuis or timezone.now())
+    fin = debut_mois(timezone.now())
+    for _ in range(mois_avance + 1):
+        fin = mois_suivant(fin)
+
+    creees = []
+    with transaction.atomic(using=connexion.alias), connexion.cursor() as cursor:
+        cursor.execute("SELECT to_regclass(%s) IS NOT NULL", [_defaut(table)])
+        a_defaut = cursor.fetchone()[0]
+        while debut < fin:
+            suivant = mois_suivant(debut)
+            nom = nom_partition(table, debut)
+            if nom not in existantes:
+                bornes = f"FROM ('{debut.isoformat()}') TO ('{suivant.isoformat()}')"
+                deplacer = False
+                if a_defaut:
+                    cursor.execute(
+                        f"SELECT EXISTS (SELECT 1 FROM {q(_defaut(table))} WHERE {q(colonne)} >= %s AND {q(colonne)} < %s)",
+                        [debut, suivant],
+                    )
+                    deplacer = cursor.fetchone()[0]
+                if deplacer:
+                    # Lignes du mois tombées dans la partition par défaut: détacher, créer, recopier
+                    cursor.execute(f"ALTER TABLE {q(table)} DETACH PARTITION {q(_defaut(table))}")
+                    cursor.execute(f"CREATE TABLE {q(nom)} PARTITION OF {q(table)} FOR VALUES {bornes}")
+                    filtre = f"WHERE {q(colonne)} >= %s AND {q(colonne)} < %s"
+                    cursor.execute(f"INSERT INTO {q(table)} SELECT * FROM {q(_defaut(table))} {filtre}", [debut, suivant])
+                    cursor.execute(f"DELETE FROM {q(_defaut(table))} {filtre}", [debut, suivant])
+                    cursor.execute(f"ALTER TABLE {q(table)} ATTACH PARTITION {q(_defaut(table))} DEFAULT")
+                else:
+                    cursor.execute(f"CREATE TABLE {q(nom)} PARTITION OF {q(table)} FOR VALUES {bornes}")
+                creees.append(nom)
+            debut = suivant
+    if creees:
+        logger.info("🗂️ Partitions créées pour %s: %s", table, ', '.join(creees))
+    return creees
+
+
+def supprimer_partitions(table, avant, simuler=False, connexion=connection):
+    """Supprime les partitions entièrement antérieures à `avant` (DETACH + DROP); renvoie leurs noms."""
+    q = connexion.ops.quote_name
+    anciennes = [nom for nom, debut in partitions(table, connexion) if mois_suivant(debut) <= avant]
+    if simuler or not anciennes:
+        return anciennes
+    for nom in anciennes:
+        with transaction.atomic(using=connexion.alias), connexion.cursor() as cursor:
+            for dependante, colonne in DEPENDANCES.get(table, []):
+                cursor.execute(f"DELETE FROM {q(dependante)} WHERE {q(colonne)} IN (SELECT id FROM {q(nom)})")
+            cursor.execute(f"ALTER TABLE {q(table)} DETACH PARTITION {q(nom)}")
+            cursor.execute(f"DROP TABLE {q(nom)}")
+        logger.warning("🗑️ Partition supprimée: %s", nom)
+    return anciennes
+
+
+def convertir(table, connexion=connection):
+    """
+    Convertit une table existante en table partitionnée par mois (une transaction). False si rien à faire.
+
+    ⚠️ Réécrit toute la table sous verrou exclusif (ACCESS EXCLUSIVE): ventes et mouvements
+    bloqués pendant la copie. À lancer en fenêtre de maintenance
+    (partitions_mensuelles --convertir), jamais dans un déploiement ordinaire: ne laisser
+    PARTITIONNEMENT_MENSUEL=True que pour le déploiement de la migration 0069.
+    """
+    if connexion.vendor != 'postgresql' or est_partitionnee(table, connexion):
+        return False
+    q = connexion.ops.quote_name
+    colonne = PARTITIONS[table]
+    ancienne = f'{table}_avant_partition'
+    sequence = f'{table}_part_id_seq'
+
+    with transaction.atomic(using=connexion.alias), connexion.cursor() as cursor:
+        # Définitions à recréer sur la nouvelle table (lues avant le renommage)
+        cursor.execute(
+            "SELECT pg_get_indexdef(indexrelid) FROM pg_index WHERE indrelid = to_regclass(%s) AND NOT indisunique",
+            [table],
+        )
+        index = [definition for (definition,) in cursor.fetchall()]
+        cursor.execute(
+            "SELECT conname, pg_get_constraintdef(oid) FROM pg_constraint "
+            "WHERE conrelid = to_regclass(%s) AND contype = 'f'", [table]
+        )
+        cles_etrangeres = cursor.fetchall()
+        cursor.execute(f"SELECT min({q(colonne)}), max(id) FROM {q(table)}")
+        plus_ancien, dernier_id = cursor.fetchone()
+
+        cursor.execute(f"ALTER TABLE {q(table)} RENAME TO {q(ancienne)}")
+        cursor.execute(
+            f"CREATE TABLE {q(table)} (LIKE {q(ancienne)} INCLUDING DEFAULTS INCLUDING CONSTRAINTS) "
+            f"PARTITION BY RANGE ({q(colonne)})"
+        )
+        cursor.execute(f"CREATE SEQUENCE {q(sequence)} OWNED BY {q(table)}.id")
+        cursor.execute(f"ALTER TABLE {q(table)} ALTER COLUMN id SET DEFAULT nextval('{sequence}')")
+        cursor.execute(f"CREATE TABLE {q(_defaut(table))} PARTITION OF {q(table)} DEFAULT")
+        creer_partitions(table, depuis=plus_ancien, connexion=connexion)
+
+        cursor.execute(f"INSERT INTO {q(table)} SELECT * FROM {q(ancienne)}")
+        cursor.execute("SELECT setval(%s, %s, %s)", [sequence, dernier_id or 1, dernier_id is not None])
+        cursor.execute(f"DROP TABLE {q(ancienne)}")
+
+        cursor.execute(f"ALTER TABLE {q(table)} ADD PRIMARY KEY (id, {q(colonne)})")
+        for nom, definition in cles_etrangeres:
+            cursor.execute(f"ALTER TABLE {q(table)} ADD CONSTRAINT {q(nom)} {definition}")
+        for definition in index:
+            cursor.execute(definition)
+    logger.warning("🗂️ Table %s partitionnée par mois (%s)", table, colonne)
+    return True
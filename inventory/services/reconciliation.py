@@ -0,0 +1,184 @@
+"""
+Réconciliation du stock des articles avec le journal MouvementStock.
+
+Pour une boutique: UNE requête GROUP BY article_id calcule le stock selon le journal
+de tous ses articles, la comparaison avec quantite_stock se fait en mémoire et les
+corrections sont écrites en bulk_update (version et last_updated incrémentés pour que
+les terminaux récupèrent le stock corrigé à la prochaine sync incrémentale).
+
+- Le journal fait foi: le stock corrigé est la somme des variations des mouvements
+  (services.stock.variation_mouvement). Les articles sans aucun mouvement ne sont pas
+  modifiés (stock initial jamais journalisé).
+- Journal tronqué: purge_mouvements_stock (et le DROP des partitions) supprime les
+  mouvements plus anciens que RETENTION_MOUVEMENTS_STOCK_JOURS. Le journal d'un article
+  n'est réputé complet que s'il a été créé après cette limite, ou si son plus ancien
+  mouvement restant part d'un stock nul (solde d'ouverture). Les autres écarts sont
+  rapportés (journal_complet=False) mais jamais corrigés.
+- Corrections: variations de variantes en attente reportées, articles en écart
+  verrouillés (select_for_update) et journal relu pour ceux-ci dans la transaction,
+  une vente concurrente ne peut pas être écrasée.
+- Rapport: stock comparé au journal = quantite_stock + variations de variantes pas
+  encore reportées (services.stock.stocks_effectifs).
+- Plusieurs boutiques: traitées en parallèle dans des processus séparés (PostgreSQL).
+- Commande: python manage.py reconcilier_stock
+"""
+import logging
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connections, transaction
+from django.db.models import F, OuterRef, Subquery, Sum
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from inventory.models import Article, MouvementStock
+from inventory.services.stock import reporter_variations_variantes, variation_mouvement
+from inventory.services.valeur_stock import invalider_valeur_stock
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class Ecart:
+    article_id: int
+    code: str
+    nom: str
+    stock: int
+    journal: int
+    journal_complet: bool = True
+
+    @property
+    def ecart(self):
+        return self.stock - self.journal
+
+
+@dataclass
+class RapportReconciliation:
+    boutique_id: int
+    nb_articles: int = 0
+    nb_sans_journal: int = 0
+    ecarts: list = field(default_factory=list)
+    nb_corriges: int = 0
+    erreur: str = ''
+
+    @property
+    def derive_totale(self):
+        """Somme des écarts (stock stocké - journal), en unités."""
+        return sum(e.ecart for e in self.ecarts)
+
+    @property
+    def nb_journal_incomplet(self):
+        """Écarts non corrigeables: mouvements anciens purgés, pas de solde d'ouverture."""
+        return sum(not e.journal_complet for e in self.ecarts)
+
+
+def totaux_journal(article_ids=None, boutique_id=None):
+    """{article_id: stock selon le journal} en une requête GROUP BY article_id."""
+    qs = MouvementStock.objects.all()
+    if boutique_id is not None:
+        qs = qs.filter(article__boutique_id=boutique_id)
+    if article_ids is not None:
+        qs = qs.filter(article_id__in=article_ids)
+    return dict(
+        qs.order_by().values('article_id').annotate(total=Sum(variation_mouvement())).values_list('article_id', 'total')
+    )
+
+
+def limite_retention():
+    """Date avant laquelle les mouvements de stock ont pu être purgés."""
+    return timezone.now() - timedelta(days=settings.RETENTION_MOUVEMENTS_STOCK_JOURS)
+
+
+def stock_ouverture():
+    """Sous-requête: stock_avant du plus ancien mouvement restant de l'article (OuterRef pk)."""
+    return Subquery(
+        MouvementStock.objects.filter(article_id=OuterRef('pk')).order_by('date_mouvement', 'id').values('stock_avant')[:1]
+    )
+
+
+def journal_complet(date_creation, ouverture, limite):
+    """Vrai si la somme du journal restant donne le stock réel de l'article."""
+    return date_creation >= limite or ouverture == 0
+
+
+def _corriger(boutique_id, ecarts):
+    """Applique les corrections sous verrou; renvoie le nombre d'articles corrigés."""
+    with transaction.atomic():
+        reporter_variations_variantes([e.article_id for e in ecarts])
+        articles = list(
+            Article.objects.select_for_update().filter(
+                id__in=[e.article_id for e in ecarts if e.journal_complet]
+            ).order_by('id')
+        )
+        # Relu sous verrou: une vente passée depuis l'analyse est prise en compte
+        totaux = totaux_journal([a.id for a in articles])
+        maintenant = timezone.now()
+        a_corriger = []
+        for article in articles:
+            journal = totaux.get(article.id)
+            if journal is None or journal == article.quantite_stock:
+                continue
+            article.quantite_stock = journal
+            article.version = F('version') + 1
+            article.last_updated = maintenant
+            a_corriger.append(article)
+        Article.objects.bulk_update(a_corriger, ['quantite_stock', 'version', 'last_updated'], batch_size=500)
+        transaction.on_commit(lambda: invalider_valeur_stock(boutique_id))
+    return len(a_corriger)
+
+
+def reconcilier_boutique(boutique_id, appliquer=False):
+    """Compare le stock de tous les articles d'une boutique au journal (et corrige si appliquer)."""
+    rapport = RapportReconciliation(boutique_id=boutique_id)
+    totaux = totaux_journal(boutique_id=boutique_id)
+    limite = limite_retention()
+    articles = Article.objects.filter(boutique_id=boutique_id).annotate(
+        ouverture=stock_ouverture(), attente=Coalesce(Sum('variantes__variation_en_attente'), 0)
+    )
+    for article_id, code, nom, stock, attente, date_creation, ouverture in articles.values_list(
+        'id', 'code', 'nom', 'quantite_stock', 'attente', 'date_creation', 'ouverture'
+    ):
+        rapport.nb_articles += 1
+        stock += attente
+        journal = totaux.get(article_id)
+        if journal is None:
+            rapport.nb_sans_journal += 1
+        elif journal != stock:
+            rapport.ecarts.append(Ecart(
+                article_id, code, nom, stock, journal, journal_complet(date_creation, ouverture, limite)
+            ))
+
+    if appliquer and rapport.nb_journal_incomplet < len(rapport.ecarts):
+        rapport.nb_corriges = _corriger(boutique_id, rapport.ecarts)
+        logger.warning("🔧 Réconciliation boutique %s: %s article(s) corrigé(s)", boutique_id, rapport.nb_corriges)
+    return rapport
+
+
+def _initialiser_processus():
+    import django
+    django.setup()
+    # Connexions héritées du parent (fork): chaque processus ouvre les siennes
+    connections.close_all()
+
+
+def _reconcilier_processus(boutique_id, appliquer):
+    try:
+        return reconcilier_boutique(boutique_id, appliquer)
+    except Exception as e:
+        logger.exception("❌ Réconciliation boutique %s: %s", boutique_id, e)
+        return RapportReconciliation(boutique_id=boutique_id, erreur=str(e))
+
+
+def reconcilier(boutique_ids, appliquer=False, processus=1):
+    """Réconcilie plusieurs boutiques, en parallèle si processus > 1; rapports dans l'ordre des ids."""
+    boutique_ids = list(boutique_ids)
+    # SQLite: un seul écrivain à la fois, les processus se bloqueraient mutuellement
+    if processus <= 1 or len(boutique_ids) <= 1 or connections['default'].vendor == 'sqlite':
+        return [_reconcilier_processus(bid, appliquer) for bid in boutique_ids]
+
+    connections.close_all()
+    with ProcessPoolExecutor(max_workers=min(processus, len(boutique_ids)),
+                             initializer=_initialiser_processus) as executor:
+        return list(executor.map(_reconcilier_processus, boutique_ids, [appliquer] * len(boutique_ids)))
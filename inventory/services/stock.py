@@ -0,0 +1,339 @@
+"""
+Mutations atomiques du stock article.
+
+Le stock est modifié directement en base (UPDATE ... SET quantite_stock = quantite_stock - n
+RETURNING) au lieu du schéma select_for_update().get() → calcul Python → save().
+Une vente produit UN seul UPDATE pour tous ses articles : le verrou de ligne n'est pris
+qu'au moment de l'écriture, et les valeurs stock_avant/stock_apres nécessaires à
+MouvementStock et AlerteStock sont déduites des valeurs renvoyées.
+
+⭐ Le stock est TOUJOURS porté par l'article parent (les variantes n'ont pas de stock propre).
+Une vente de variante ne touche pas la ligne du parent: elle décrémente le compteur
+variation_en_attente de la variante (verrou sur la seule variante), et le parent reçoit
+l'agrégat de ces compteurs après commit (reporter_variations_variantes, transaction courte
+hors vente; tâche périodique en filet de sécurité). Stock réel d'un parent:
+quantite_stock + somme des variation_en_attente de ses variantes (stocks_effectifs).
+"""
+from collections import defaultdict
+
+from django.db import connection, transaction
+from django.db.models import Case, F, Sum, Value, When
+from django.db.models.functions import Coalesce
+from django.db.models.signals import post_save
+
+from inventory.models import Article, AlerteStock, MouvementStock, VarianteArticle
+
+
+def variation_mouvement():
+    """
+    Expression: effet d'un MouvementStock sur le stock. stock_apres - stock_avant quand
+    renseignés (les SORTIE de régularisation d'inventaire ont une quantité positive),
+    sinon quantite (signée).
+    """
+    return Coalesce(F('stock_apres') - F('stock_avant'), F('quantite'))
+
+
+def cles_sortie_journalisee(article_id, variante_id, commentaire):
+    """
+    Clés de dédoublonnage d'une sortie VENTE déjà journalisée: article_id, plus
+    (article_id, variante_id). Les mouvements antérieurs à la migration 0065 n'ont pas de
+    variante_id: leur variante est lue dans le commentaire « Variante: <nom> - Prix: ... ».
+    """
+    cles = {article_id}
+    if variante_id:
+        cles.add((article_id, variante_id))
+    elif commentaire and 'Variante: ' in commentaire:
+        cles.add((article_id, commentaire.split('Variante: ', 1)[1].split(' - Prix:', 1)[0]))
+    return cles
+
+
+def sortie_deja_journalisee(deja_sortis, article, variante=None):
+    """La sortie (article, variante) figure-t-elle dans les clés de cles_sortie_journalisee?"""
+    if variante is None:
+        return article.id in deja_sortis
+    return (article.id, variante.id) in deja_sortis or (article.id, variante.nom_variante) in deja_sortis
+
+
+class StockInsuffisant(Exception):
+    """Levée en mode strict quand un article n'a pas assez de stock (ou n'existe pas)."""
+
+    def __init__(self, article_ids):
+        self.article_ids = sorted(article_ids)
+        super().__init__(f"Stock insuffisant pour les articles {self.article_ids}")
+
+
+def _colonnes():
+    table = connection.ops.quote_name(Article._meta.db_table)
+    pk = connection.ops.quote_name(Article._meta.pk.column)
+    stock = connection.ops.quote_name(Article._meta.get_field('quantite_stock').column)
+    boutique = connection.ops.quote_name(Article._meta.get_field('boutique').column)
+    return table, pk, stock, boutique
+
+
+def _update_returning_disponible():
+    """UPDATE ... RETURNING: PostgreSQL et SQLite >= 3.35 (ni MySQL/MariaDB, ni la syntaxe Oracle)."""
+    if connection.vendor == 'postgresql':
+        return True
+    if connection.vendor == 'sqlite':
+        return connection.Database.sqlite_version_info >= (3, 35)
+    return False
+
+
+def _update_returning(totaux, boutique_id, strict):
+    """Un seul UPDATE ... RETURNING pour tous les articles; renvoie {id: stock_apres}."""
+    table, pk, stock, boutique = _colonnes()
+    ids = sorted(totaux)
+    cas = ' '.join('WHEN %s THEN %s' for _ in ids)
+    params = [v for aid in ids for v in (aid, totaux[aid])]
+
+    conditions = [f"{pk} IN ({', '.join(['%s'] * len(ids))})"]
+    params_where = list(ids)
+    if boutique_id is not None:
+        conditions.append(f"{boutique} = %s")
+        params_where.append(boutique_id)
+    if strict:
+        # UPDATE conditionnel: la ligne n'est modifiée que si le stock suffit
+        conditions.append(f"{stock} >= CASE {pk} {cas} END")
+        params_where.extend(params)
+
+    sql = (
+        f"UPDATE {table} SET {stock} = {stock} - CASE {pk} {cas} END "
+        f"WHERE {' AND '.join(conditions)} RETURNING {pk}, {stock}"
+    )
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params + params_where)
+        return dict(cursor.fetchall())
+
+
+def _update_par_article(totaux, boutique_id, strict):
+    """Repli sans RETURNING: un UPDATE F() conditionnel puis une relecture par article."""
+    apres = {}
+    for aid in sorted(totaux):
+        qs = Article.objects.filter(id=aid)
+        if boutique_id is not None:
+            qs = qs.filter(boutique_id=boutique_id)
+        if strict:
+            qs = qs.filter(quantite_stock__gte=totaux[aid])
+        if qs.update(quantite_stock=F('quantite_stock') - totaux[aid]):
+            apres[aid] = Article.objects.values_list('quantite_stock', flat=True).get(id=aid)
+    return apres
+
+
+def _ramener_a_zero(article_ids):
+    table, pk, stock, _ = _colonnes()
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"UPDATE {table} SET {stock} = 0 WHERE {pk} IN ({', '.join(['%s'] * len(article_ids))}) AND {stock} < 0",
+            list(article_ids),
+        )
+
+
+def decrementer_stocks(lignes, boutique_id=None, plancher_zero=False, strict=False):
+    """
+    Décrémente le stock des articles d'une vente en une seule requête.
+
+    Args:
+        lignes: liste de (article_id, quantite), dans l'ordre des lignes de la vente.
+            Un même article peut apparaître plusieurs fois (ex: 2 variantes d'un parent).
+        boutique_id: si fourni, seuls les articles de cette boutique sont modifiés.
+        plancher_zero: le stock ne descend pas sous 0 (stock_apres ramené à 0).
+        strict: aucun article n'est modifié si l'un d'eux n'a pas assez de stock
+            (StockInsuffisant levée, aucun décrément appliqué).
+
+    Returns:
+        liste de (stock_avant, stock_apres) alignée sur `lignes`, calculée comme si
+        les lignes avaient été appliquées l'une après l'autre.
+
+    Raises:
+        Article.DoesNotExist si un article est introuvable (hors mode strict).
+    """
+    totaux = defaultdict(int)
+    for article_id, quantite in lignes:
+        totaux[article_id] += quantite
+    if not totaux:
+        return []
+
+    if _update_returning_disponible():
+        apres = _update_returning(totaux, boutique_id, strict)
+    else:
+        apres = _update_par_article(totaux, boutique_id, strict)
+
+    manquants = set(totaux) - set(apres)
+    if manquants:
+        if strict:
+            # Tout ou rien: annuler les décréments déjà appliqués
+            for aid in apres:
+                Article.objects.filter(id=aid).update(quantite_stock=F('quantite_stock') + totaux[aid])
+            raise StockInsuffisant(manquants)
+        raise Article.DoesNotExist(f"Articles introuvables: {sorted(manquants)}")
+
+    if plancher_zero:
+        negatifs = [aid for aid, stock in apres.items() if stock < 0]
+        if negatifs:
+            _ramener_a_zero(negatifs)
+
+    # Rejouer les lignes dans l'ordre à partir du stock avant le décrément global
+    courant = {aid: apres[aid] + totaux[aid] for aid in totaux}
+    resultats = []
+    for article_id, quantite in lignes:
+        avant = courant[article_id]
+        nouveau = avant - quantite
+        if plancher_zero:
+            nouveau = max(0, nouveau)
+        courant[article_id] = nouveau
+        resultats.append((avant, nouveau))
+    return resultats
+
+
+def decrementer_stock(article_id, quantite, **options):
+    """Raccourci pour un seul article: renvoie (stock_avant, stock_apres)."""
+    return decrementer_stocks([(article_id, quantite)], **options)[0]
+
+
+def stocks_effectifs(article_ids):
+    """{article_id: stock réel} = quantite_stock + variations de variantes pas encore reportées."""
+    return {
+        aid: stock + attente
+        for aid, stock, attente in Article.objects.filter(id__in=article_ids).annotate(
+            attente=Coalesce(Sum('variantes__variation_en_attente'), 0)
+        ).values_list('id', 'quantite_stock', 'attente')
+    }
+
+
+def _decrementer_variantes(totaux, boutique_id):
+    """Un seul UPDATE des compteurs des variantes vendues ({variante_id: quantité})."""
+    qs = VarianteArticle.objects.filter(id__in=totaux)
+    if boutique_id is not None:
+        qs = qs.filter(article_parent__boutique_id=boutique_id)
+    modifiees = qs.update(variation_en_attente=F('variation_en_attente') - Case(
+        *(When(id=vid, then=Value(quantite)) for vid, quantite in totaux.items())
+    ))
+    if modifiees != len(totaux):
+        raise VarianteArticle.DoesNotExist(f"Variantes introuvables parmi {sorted(totaux)}")
+
+
+def reporter_variations_variantes(article_ids=None):
+    """
+    Reporte sur quantite_stock des parents les variations en attente de leurs variantes
+    (tous les parents concernés si article_ids est None). Transaction courte, hors de la
+    vente: le verrou du parent n'est tenu que le temps de ce report. Renvoie {article_id: variation}.
+    """
+    with transaction.atomic():
+        qs = VarianteArticle.objects.select_for_update().exclude(variation_en_attente=0)
+        if article_ids is not None:
+            qs = qs.filter(article_parent_id__in=article_ids)
+        attentes = list(qs.order_by('id').values_list('id', 'article_parent_id', 'variation_en_attente'))
+        if not attentes:
+            return {}
+        variations = defaultdict(int)
+        for _, article_id, variation in attentes:
+            variations[article_id] += variation
+        VarianteArticle.objects.filter(id__in=[vid for vid, _, _ in attentes]).update(variation_en_attente=0)
+        for article_id in sorted(variations):
+            Article.objects.filter(id=article_id).update(quantite_stock=F('quantite_stock') + variations[article_id])
+    return dict(variations)
+
+
+def enregistrer_sorties_vente(vente, sorties, utilisateur, boutique=None, terminal=None):
+    """
+    Applique les sorties de stock d'une vente: un UPDATE pour les articles vendus sans
+    variante, un UPDATE des compteurs des variantes vendues, puis les MouvementStock (un seul
+    INSERT) et une AlerteStock quand le stock ne couvrait pas la quantité vendue (la vente
+    reste acceptée, le stock devient négatif).
+
+    Les lignes avec variante ne verrouillent que la ligne de leur variante: deux caisses
+    vendant deux tailles d'un même parent ne s'attendent pas. Le stock du parent reçoit
+    l'agrégat après commit (reporter_variations_variantes). À appeler en dernier dans la
+    transaction de la vente (lignes et montant déjà écrits), notifications après commit
+    (on_commit), pour que les verrous ne soient tenus que le temps de ces écritures.
+
+    Args:
+        sorties: liste de dicts {'article', 'variante', 'quantite', 'commentaire'}
+            (variante optionnelle). article.quantite_stock est mis à jour en mémoire.
+        boutique: requise pour créer les AlerteStock (sinon aucune alerte).
+
+    Returns:
+        les sorties complétées de 'stock_avant' et 'stock_apres'.
+    """
+    boutique_id = boutique.id if boutique else None
+    sans_variante = [(s['article'].id, s['quantite']) for s in sorties if s.get('variante') is None]
+    par_variante = defaultdict(int)
+    for sortie in sorties:
+        if sortie.get('variante') is not None:
+            par_variante[sortie['variante'].id] += sortie['quantite']
+
+    resultats = decrementer_stocks(sans_variante, boutique_id=boutique_id)
+    if par_variante:
+        _decrementer_variantes(par_variante, boutique_id)
+        parents = {s['article'].id for s in sorties if s.get('variante') is not None}
+        transaction.on_commit(lambda: reporter_variations_variantes(parents))
+        # Stock réel après la vente (variations en attente comprises), rejoué ligne par ligne
+        totaux = defaultdict(int)
+        for sortie in sorties:
+            totaux[sortie['article'].id] += sortie['quantite']
+        courant = {aid: stock + totaux[aid] for aid, stock in stocks_effectifs(totaux).items()}
+        resultats = []
+        for sortie in sorties:
+            avant = courant[sortie['article'].id]
+            courant[sortie['article'].id] = avant - sortie['quantite']
+            resultats.append((avant, avant - sortie['quantite']))
+
+    mouvements = []
+    alertes = []
+    for sortie, (stock_avant, stock_apres) in zip(sorties, resultats):
+        article = sortie['article']
+        quantite = sortie['quantite']
+        article.quantite_stock = stock_apres
+        sortie['stock_avant'] = stock_avant
+        sortie['stock_apres'] = stock_apres
+
+        mouvements.append(MouvementStock(
+            article=article,
+            boutique_id=article.boutique_id,
+            variante=sortie.get('variante'),
+            type_mouvement='VENTE',
+            quantite=-quantite,
+            stock_avant=stock_avant,
+            stock_apres=stock_apres,
+            reference_document=vente.numero_facture,
+            utilisateur=utilisateur,
+            commentaire=sortie['commentaire'],
+        ))
+
+        if boutique is not None and stock_avant < quantite:
+            alertes.append(AlerteStock(
+                vente=vente,
+                boutique=boutique,
+                terminal=terminal,
+                article=article,
+                variante=sortie.get('variante'),
+                quantite_vendue=quantite,
+                stock_serveur_avant=stock_avant,
+                stock_serveur_apres=stock_apres,
+                ecart=stock_avant - quantite,
+                numero_facture=vente.numero_facture,
+            ))
+
+    # bulk_create: signaux post_save envoyés comme par create() (journal de valeur, inventaires en cours...)
+    MouvementStock.objects.bulk_create(mouvements)
+    for mouvement in mouvements:
+        post_save.send(sender=MouvementStock, instance=mouvement, created=True, raw=False,
+                       using=mouvement._state.db, update_fields=None)
+    # Rares (stock insuffisant): save() calcule type d'alerte et action suggérée
+    for alerte in alertes:
+        alerte.save()
+    return sorties
+
+
+def notifier_stocks_apres_commit(boutique_id, sorties):
+    """Pousse aux caisses (WebSocket) le stock des articles vendus, après le commit de la vente."""
+    from inventory.websocket_utils import notify_stock_updated
+
+    stocks = {sortie['article'].id: sortie['article'].quantite_stock for sortie in sorties}
+
+    def notifier():
+        for article_id, stock in stocks.items():
+            notify_stock_updated(boutique_id, article_id, stock)
+
+    if stocks:
+        transaction.on_commit(notifier)
@@ -0,0 +1,190 @@
+"""
+Valorisation du stock (coût et prix de vente, par devise et par catégorie).
+
+Une seule requête groupée (boutique, devise, catégorie) pour un ensemble quelconque de
+boutiques, au lieu des boucles Python et des agrégats séparés par devise et par
+boutique. Les montants CDF et USD ne sont jamais mélangés.
+
+- Seuls les articles actifs à stock positif sont valorisés (un stock négatif est une
+  anomalie, il ne diminue pas la valeur).
+- Résultat par boutique mis en cache DUREE_CACHE secondes; les signaux Article et
+  MouvementStock l'invalident (invalider_valeur_stock), les traitements en masse
+  (bulk_create) l'invalident explicitement.
+- valeur_stock_a_date: stock reconstitué depuis le journal MouvementStock (bilans).
+- Commande: python manage.py valeur_stock
+"""
+from dataclasses import dataclass, field
+from decimal import Decimal
+
+from django.core.cache import cache
+from django.db.models import (
+    Case, Count, DecimalField, ExpressionWrapper, F, OuterRef, QuerySet, Subquery, Sum, Value, When,
+)
+from django.db.models.functions import Coalesce
+
+from inventory.models import Article, Boutique, MouvementStock
+from inventory.services.stock import variation_mouvement
+
+DUREE_CACHE = 60 * 10
+MONTANT = DecimalField(max_digits=20, decimal_places=2)
+
+
+@dataclass
+class Valeur:
+    """Valeur d'un ensemble d'articles dans une devise."""
+    nb_articles: int = 0
+    quantite: int = 0
+    achat: Decimal = Decimal('0')
+    vente: Decimal = Decimal('0')
+
+    @property
+    def marge_potentielle(self):
+        return self.vente - self.achat
+
+    def ajouter(self, autre):
+        self.nb_articles += autre.nb_articles
+        self.quantite += autre.quantite
+        self.achat += autre.achat
+        self.vente += autre.vente
+
+
+@dataclass
+class Valorisation:
+    """Valorisation d'une boutique (ou d'un ensemble de boutiques fusionnées)."""
+    par_devise: dict = field(default_factory=dict)     # devise -> Valeur
+    par_categorie: dict = field(default_factory=dict)  # categorie_id -> {'nom', 'par_devise': {devise: Valeur}}
+
+    def devise(self, devise='CDF'):
+        return self.par_devise.get(devise) or Valeur()
+
+    def achat(self, devise='CDF'):
+        return self.devise(devise).achat
+
+    def vente(self, devise='CDF'):
+        return self.devise(devise).vente
+
+    def _ajouter_ligne(self, devise, categorie_id, categorie_nom, valeur):
+        self.par_devise.setdefault(devise, Valeur()).ajouter(valeur)
+        categorie = self.par_categorie.setdefault(
+            categorie_id, {'nom': categorie_nom or 'Sans catégorie', 'par_devise': {}}
+        )
+        categorie['par_devise'].setdefault(devise, Valeur()).ajouter(valeur)
+
+    def fusionner(self, autre):
+        for categorie_id, categorie in autre.par_categorie.items():
+            for devise, valeur in categorie['par_devise'].items():
+                self._ajouter_ligne(devise, categorie_id, categorie['nom'], valeur)
+        return self
+
+
+def _cle(boutique_id):
+    return f"valeur_stock:{boutique_id}"
+
+
+def invalider_valeur_stock(boutique_id):
+    if boutique_id:
+        cache.delete(_cle(boutique_id))
+
+
+def _ids(boutiques):
+    if isinstance(boutiques, (Boutique, int)):
+        boutiques = [boutiques]
+    if isinstance(boutiques, QuerySet):
+        return list(boutiques.values_list('id', flat=True))
+    return [b.id if isinstance(b, Boutique) else int(b) for b in boutiques]
+
+
+def _quantite_a_date(a_date):
+    """Stock à a_date = stock actuel - variations postérieures du journal MouvementStock."""
+    depuis = MouvementStock.objects.filter(
+        article_id=OuterRef('pk'), date_mouvement__gte=a_date
+    ).order_by().values('article_id').annotate(total=Sum(variation_mouvement())).values('total')
+    return F('quantite_stock') - Coalesce(Subquery(depuis), Value(0))
+
+
+def _calculer(boutique_ids, a_date=None):
+    """{boutique_id: Valorisation} en une requête groupée."""
+    quantite = F('quantite_stock') if a_date is None else _quantite_a_date(a_date)
+    lignes = (
+        Article.objects.filter(boutique_id__in=boutique_ids, est_actif=True)
+        .annotate(qte_valorisee=quantite)
+        .filter(qte_valorisee__gt=0)
+        .order_by()
+        .values('boutique_id', 'devise', 'categorie_id', 'categorie__nom')
+        .annotate(
+            nb_articles=Count('id'),
+            quantite=Sum('qte_valorisee'),
+            achat=Sum(ExpressionWrapper(F('qte_valorisee') * F('prix_achat'), output_field=MONTANT)),
+            vente=Sum(ExpressionWrapper(F('qte_valorisee') * F('prix_vente'), output_field=MONTANT)),
+        )
+    )
+    resultats = {bid: Valorisation() for bid in boutique_ids}
+    for ligne in lignes:
+        resultats[ligne['boutique_id']]._ajouter_ligne(
+            ligne['devise'], ligne['categorie_id'], ligne['categorie__nom'],
+            Valeur(
+                nb_articles=ligne['nb_articles'], quantite=ligne['quantite'] or 0,
+                achat=ligne['achat'] or Decimal('0'), vente=ligne['vente'] or Decimal('0'),
+            ),
+        )
+    return resultats
+
+
+def valoriser(boutiques, utiliser_cache=True):
+    """{boutique_id: Valorisation} pour des boutiques (instances, ids ou queryset)."""
+    ids = _ids(boutiques)
+    if not ids:
+        return {}
+    if not utiliser_cache:
+        return _calculer(ids)
+    en_cache = cache.get_many([_cle(bid) for bid in ids])
+    resultats = {bid: en_cache[_cle(bid)] for bid in ids if _cle(bid) in en_cache}
+    manquants = [bid for bid in ids if bid not in resultats]
+    if manquants:
+        calcules = _calculer(manquants)
+        cache.set_many({_cle(bid): v for bid, v in calcules.items()}, DUREE_CACHE)
+        resultats.update(calcules)
+    return resultats
+
+
+def valeur_stock(boutique, utiliser_cache=True):
+    """Valorisation d'une boutique."""
+    return valoriser([boutique], utiliser_cache)[_ids(boutique)[0]]
+
+
+def valeur_totale(boutiques, utiliser_cache=True):
+    """Valorisation fusionnée d'un ensemble de boutiques."""
+    total = Valorisation()
+    for valorisation in valoriser(boutiques, utiliser_cache).values():
+        total.fusionner(valorisation)
+    return total
+
+
+def valeur_stock_a_date(boutiques, a_date):
+    """Valorisation fusionnée du stock tel qu'il était à a_date (non mise en cache)."""
+    total = Valorisation()
+    for valorisation in _calculer(_ids(boutiques), a_date).values():
+        total.fusionner(valorisation)
+    return total
+
+
+def articles_par_valeur(boutiques, base='vente', devise=None, seuil=None, limite=None):
+    """
+    Articles classés par valeur de stock décroissante (requête triée en base).
+    base: 'vente' (quantite × prix_vente) ou 'achat' (quantite × prix_achat, prix_vente si
+    prix_achat = 0: articles transférés depuis un dépôt).
+    """
+    prix = F('prix_vente')
+    if base == 'achat':
+        prix = Case(When(prix_achat=0, then=F('prix_vente')), default=F('prix_achat'))
+    qs = (
+        Article.objects.filter(boutique_id__in=_ids(boutiques), est_actif=True, quantite_stock__gt=0)
+        .annotate(valeur=ExpressionWrapper(F('quantite_stock') * prix, output_field=MONTANT))
+        .order_by('-valeur', 'nom')
+    )
+    if devise:
+        qs = qs.filter(devise=devise)
+    if seuil is not None:
+        qs = qs.filter(valeur__gte=seuil)
+    qs = qs.values('id', 'code', 'nom', 'devise', 'quantite_stock', 'prix_achat', 'prix_vente', 'valeur', 'boutique__nom')
+    return list(qs[:limite] if limite else qs)
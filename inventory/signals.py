@@ -1,8 +1,19 @@
+from datetime import datetime
 from decimal import Decimal
-from django.db.models.signals import post_save, pre_save
+from types import SimpleNamespace
+from django.db import transaction
+from django.db.models.signals import m2m_changed, post_delete, post_init, post_save, pre_save
 from django.dispatch import receiver
-from .models import MouvementStock, NotificationStock, Client, Article, Inventaire, LigneInventaire
+from django.utils import timezone
+from .models import (
+    MouvementStock, NotificationStock, Client, Article, LigneInventaire, Vente, LigneVente,
+    FactureApprovisionnement, LigneApprovisionnement, RapportCaisse, Boutique, Commercant, Collaborateur,
+    VarianteArticle,
+)
 from . import journal_valeur_stock as jvs
+from .services.analyse_mouvements import invalider_jour
+from .services import approvisionnement, compteurs_jour, images, parametres
+from .services.valeur_stock import invalider_valeur_stock
 import logging
 
 logger = logging.getLogger(__name__)
@@ -121,12 +132,17 @@ def creer_notification_stock(sender, instance, created, **kwargs):
 _prix_article_avant_save = {}
 
 
+def _prix_hors_update_fields(update_fields):
+    """save(update_fields=...) sans prix_vente/devise: le prix ne peut pas changer, pas de relecture."""
+    return update_fields is not None and not {'prix_vente', 'devise'} & set(update_fields)
+
+
 @receiver(pre_save, sender=Article)
 def capturer_prix_avant_modification(sender, instance, **kwargs):
     """
     Capture le prix avant modification pour détecter les ajustements de prix.
     """
-    if instance.pk:
+    if instance.pk and not _prix_hors_update_fields(kwargs.get('update_fields')):
         try:
             ancien_article = Article.objects.get(pk=instance.pk)
             _prix_article_avant_save[instance.pk] = {
@@ -304,36 +320,29 @@ def synchroniser_inventaire_en_cours(sender, instance, created, **kwargs):
     met à jour le stock_theorique des lignes d'inventaire EN_COURS
     pour que l'inventaire reste synchronisé avec les ventes.
     """
-    if not created:
+    if not created or not instance.boutique_id:
         return
 
-    article = instance.article
-    if not article or not article.boutique:
-        return
-
-    # Trouver les inventaires en cours pour cette boutique
-    inventaires_en_cours = Inventaire.objects.filter(
-        boutique=article.boutique,
-        statut='EN_COURS'
-    )
-
-    for inventaire in inventaires_en_cours:
-        lignes = LigneInventaire.objects.filter(
-            inventaire=inventaire,
-            article=article
+    # Lignes de l'article dans les inventaires en cours de sa boutique (sans passer par Article)
+    lignes = LigneInventaire.objects.filter(
+        inventaire__boutique_id=instance.boutique_id,
+        inventaire__statut='EN_COURS',
+        article_id=instance.article_id
+    ).select_related('inventaire')
+
+    for ligne in lignes:
+        article = instance.article
+        # Mettre à jour le stock théorique avec le stock actuel de l'article
+        ligne.stock_theorique = article.quantite_stock
+        # Recalculer l'écart si stock physique déjà saisi
+        if ligne.stock_physique is not None:
+            ligne.ecart = ligne.stock_physique - ligne.stock_theorique
+            ligne.valeur_ecart = ligne.ecart * ligne.prix_unitaire
+        ligne.save(update_fields=['stock_theorique', 'ecart', 'valeur_ecart'])
+        logger.info(
+            f"[Inventaire] Stock théorique mis à jour pour {article.nom}: "
+            f"{ligne.stock_theorique} (inventaire {ligne.inventaire.reference})"
         )
-        for ligne in lignes:
-            # Mettre à jour le stock théorique avec le stock actuel de l'article
-            ligne.stock_theorique = article.quantite_stock
-            # Recalculer l'écart si stock physique déjà saisi
-            if ligne.stock_physique is not None:
-                ligne.ecart = ligne.stock_physique - ligne.stock_theorique
-                ligne.valeur_ecart = ligne.ecart * ligne.prix_unitaire
-            ligne.save(update_fields=['stock_theorique', 'ecart', 'valeur_ecart'])
-            logger.info(
-                f"[Inventaire] Stock théorique mis à jour pour {article.nom}: "
-                f"{ligne.stock_theorique} (inventaire {inventaire.reference})"
-            )
 
 
 # Stockage temporaire du prix_vente avant modification
@@ -343,7 +352,7 @@ _prix_vente_avant_save = {}
 @receiver(pre_save, sender=Article)
 def capturer_prix_vente_avant_modification(sender, instance, **kwargs):
     """Capture le prix de vente avant modification pour calculer l'impact sur la valeur du stock."""
-    if instance.pk:
+    if instance.pk and not _prix_hors_update_fields(kwargs.get('update_fields')):
         try:
             ancien = Article.objects.get(pk=instance.pk)
             _prix_vente_avant_save[instance.pk] = ancien.prix_vente
@@ -382,3 +391,186 @@ def enregistrer_impact_modification_prix_vente(sender, instance, created, **kwar
         )
     except Exception as e:
         logger.error(f"[JournalValeurStock] Erreur impact prix vente article {instance.pk}: {e}")
+
+
+def _invalider_jour_apres_commit(boutique_id, moment):
+    """Invalide le jour clos après commit: un lecteur concurrent ne remet pas en cache l'état d'avant."""
+    if not boutique_id or not isinstance(moment, datetime):
+        return
+    jour = timezone.localdate(moment) if timezone.is_aware(moment) else moment.date()
+    transaction.on_commit(lambda: invalider_jour(boutique_id, jour))
+
+
+@receiver(post_save, sender=Vente)
+@receiver(post_save, sender=LigneVente)
+@receiver(post_delete, sender=Vente)
+@receiver(post_delete, sender=LigneVente)
+def invalider_analyse_jour_clos(sender, instance, **kwargs):
+    """
+    Une vente synchronisée, annulée ou supprimée après coup sur un jour passé invalide
+    les agrégats journaliers mis en cache par l'analyse des mouvements.
+    """
+    if sender is Vente:
+        vente = instance
+    elif isinstance(kwargs.get('origin'), Vente):
+        # Lignes supprimées avec leur vente: la vente invalide elle-même son jour
+        return
+    elif LigneVente.vente.is_cached(instance):
+        vente = instance.vente
+    else:
+        vente = Vente.objects.filter(pk=instance.vente_id).only('boutique_id', 'date_vente').first()
+        if vente is None:
+            return
+    _invalider_jour_apres_commit(vente.boutique_id, vente.date_vente)
+
+
+@receiver(post_save, sender=MouvementStock)
+@receiver(post_delete, sender=MouvementStock)
+def invalider_analyse_jour_clos_mouvement(sender, instance, **kwargs):
+    """Mouvement enregistré ou supprimé sur un jour passé: agrégats de ce jour périmés."""
+    _invalider_jour_apres_commit(instance.boutique_id, instance.date_mouvement)
+
+
+@receiver(post_save, sender=LigneApprovisionnement)
+def maj_dernier_approvisionnement(sender, instance, created, **kwargs):
+    """Tient à jour la projection DernierApprovisionnement de l'article."""
+    approvisionnement.enregistrer_ligne(instance, created)
+
+
+@receiver(post_delete, sender=LigneApprovisionnement)
+def recalculer_dernier_approvisionnement(sender, instance, **kwargs):
+    approvisionnement.recalculer_article(instance.article_id)
+
+
+@receiver(post_save, sender=FactureApprovisionnement)
+def maj_dernier_approvisionnement_facture(sender, instance, created, update_fields=None, **kwargs):
+    """Devise ou fournisseur de la facture modifiés: projections de ses articles recalculées."""
+    if created or (update_fields is not None and not approvisionnement.CHAMPS_FACTURE & set(update_fields)):
+        return
+    approvisionnement.recalculer_facture(instance)
+
+
+@receiver(post_delete, sender=FactureApprovisionnement)
+def recalculer_dernier_approvisionnement_facture(sender, instance, **kwargs):
+    approvisionnement.recalculer_facture(instance, supprimee=True)
+
+
+# Compteurs du jour (tuiles CA temps réel): contribution avant enregistrement, par (modèle, pk)
+_contribution_avant_save = {}
+
+
+def _regles_compteurs(sender):
+    if sender is Vente:
+        return compteurs_jour.CHAMPS_VENTE, compteurs_jour.contribution_vente
+    return compteurs_jour.CHAMPS_DEPENSE, compteurs_jour.contribution_depense
+
+
+def _memoriser_etat_compteurs(sender, instance):
+    """Copie des colonnes utiles (sans requête) pour calculer la contribution avant modification."""
+    champs, _ = _regles_compteurs(sender)
+    valeurs = instance.__dict__
+    if all(champ in valeurs for champ in champs):  # pas de champ différé
+        instance._etat_compteurs = SimpleNamespace(**{champ: valeurs[champ] for champ in champs})
+
+
+@receiver(post_init, sender=Vente)
+@receiver(post_init, sender=RapportCaisse)
+def memoriser_etat_compteurs(sender, instance, **kwargs):
+    if instance.pk is not None:
+        _memoriser_etat_compteurs(sender, instance)
+
+
+@receiver(pre_save, sender=Vente)
+@receiver(pre_save, sender=RapportCaisse)
+def capturer_contribution_compteurs(sender, instance, **kwargs):
+    if instance._state.adding or not instance.pk:
+        return
+    champs, contribuer = _regles_compteurs(sender)
+    ancien = getattr(instance, '_etat_compteurs', None)
+    if ancien is None:
+        ancien = sender.objects.filter(pk=instance.pk).only(*champs).first()
+    if ancien is not None:
+        _contribution_avant_save[(sender, instance.pk)] = contribuer(ancien)
+
+
+@receiver(post_save, sender=Vente)
+@receiver(post_save, sender=RapportCaisse)
+def maj_compteurs_jour(sender, instance, created, **kwargs):
+    """Répercute sur les compteurs du jour une vente/dépense créée, modifiée ou annulée."""
+    avant = _contribution_avant_save.pop((sender, instance.pk), None)
+    _, contribuer = _regles_compteurs(sender)
+    apres = contribuer(instance)
+    derniere_vente = instance.date_vente if sender is Vente and apres else None
+    compteurs_jour.enregistrer_changement(avant, apres, derniere_vente)
+    _memoriser_etat_compteurs(sender, instance)
+
+
+@receiver(post_delete, sender=Vente)
+@receiver(post_delete, sender=RapportCaisse)
+def retirer_des_compteurs_jour(sender, instance, **kwargs):
+    _, contribuer = _regles_compteurs(sender)
+    compteurs_jour.enregistrer_changement(contribuer(instance), None)
+
+
+# Cache des paramètres (services.parametres): Boutique.save / Commercant.save invalident eux-mêmes
+@receiver(post_save, sender=Collaborateur)
+@receiver(post_delete, sender=Collaborateur)
+@receiver(post_delete, sender=Commercant)
+def invalider_acces_utilisateur(sender, instance, **kwargs):
+    parametres.invalider_utilisateur(instance.user_id)
+
+
+@receiver(post_delete, sender=Boutique)
+def invalider_parametres_boutique(sender, instance, **kwargs):
+    parametres.invalider_boutique(instance.pk)
+
+
+@receiver(m2m_changed, sender=Collaborateur.boutiques_autorisees.through)
+def invalider_boutiques_autorisees(sender, instance, action, reverse, pk_set, **kwargs):
+    if not action.startswith('post_'):
+        return
+    if not reverse:
+        parametres.invalider_utilisateur(instance.user_id)
+        return
+    # Côté boutique: tous les collaborateurs concernés (pk_set None pour un clear)
+    collaborateurs = Collaborateur.objects.all() if pk_set is None else Collaborateur.objects.filter(pk__in=pk_set)
+    if pk_set is None:
+        collaborateurs = collaborateurs.filter(commercant_id=instance.commercant_id)
+    for user_id in collaborateurs.values_list('user_id', flat=True):
+        parametres.invalider_utilisateur(user_id)
+
+
+@receiver(post_save, sender=Article)
+@receiver(post_delete, sender=Article)
+@receiver(post_save, sender=MouvementStock)
+def invalider_valorisation_stock(sender, instance, **kwargs):
+    """Stock ou prix modifié: la valorisation en cache de la boutique est périmée (après commit,
+    sinon un lecteur concurrent remettrait en cache l'état d'avant la transaction)."""
+    boutique_id = instance.boutique_id
+    transaction.on_commit(lambda: invalider_valeur_stock(boutique_id))
+
+
+@receiver(post_save, sender=Article)
+@receiver(post_save, sender=VarianteArticle)
+def generer_derives_image(sender, instance, update_fields=None, **kwargs):
+    """Nouvelle image: miniatures générées après commit, par Celery si les médias sont partagés (services/images.py)."""
+    if update_fields is not None and 'image' not in update_fields:
+        return
+    if {'image', 'image_derives'} & instance.get_deferred_fields():
+        return
+    if not images.derives_a_jour(instance):
+        if not images.generation_dans_worker():
+            # Médias locaux au conteneur web: le worker ne verrait ni l'original ni ses dérivés
+            transaction.on_commit(lambda: _derives_locaux(instance))
+            return
+        # Pillow dans le worker Celery: la réponse de l'envoi n'attend pas le redimensionnement
+        from .tasks import generer_derives_image as tache
+
+        transaction.on_commit(lambda: tache.delay(sender._meta.model_name, instance.pk))
+
+
+def _derives_locaux(instance):
+    try:
+        images.mettre_a_jour_derives(instance)
+    except OSError as e:
+        logger.warning(f"⚠️ Dérivés différés pour {instance._meta.model_name} {instance.pk}: {e}")
@@ -9,9 +9,9 @@ from django.utils import timezone
 from decimal import Decimal
 from inventory.models import (
     Vente, LigneVente, Article, Boutique, Client,
-    VenteRejetee, AlerteStock, MouvementStock
+    VenteRejetee, MouvementStock
 )
-from inventory.websocket_utils import notify_stock_updated
+from inventory.services.stock import enregistrer_sorties_vente, notifier_stocks_apres_commit
 
 logger = logging.getLogger(__name__)
 
@@ -74,6 +74,16 @@ def process_vente_async(self, vente_data, boutique_id, terminal_id):
                 commercant=boutique.commercant
             )
             
+            # Articles de la vente en une requête (stock décrémenté ensuite en un seul UPDATE)
+            articles = {
+                str(a.id): a for a in Article.objects.filter(
+                    id__in=[l.get('article_id') or l.get('ArticleId') for l in lignes_data],
+                    boutique=boutique,
+                    est_actif=True
+                )
+            }
+            sorties = []
+
             # Traiter chaque ligne
             for ligne_data in lignes_data:
                 article_id = ligne_data.get('article_id') or ligne_data.get('ArticleId')
@@ -81,17 +91,12 @@ def process_vente_async(self, vente_data, boutique_id, terminal_id):
                 prix_unitaire = Decimal(str(ligne_data.get('prix_unitaire') or ligne_data.get('PrixUnitaire', 0)))
                 prix_negocie = ligne_data.get('prix_negocie') or ligne_data.get('PrixNegocie')
                 
-                try:
-                    article = Article.objects.select_for_update().get(
-                        id=article_id,
-                        boutique=boutique,
-                        est_actif=True
-                    )
-                except Article.DoesNotExist:
+                article = articles.get(str(article_id))
+                if article is None:
                     raise ValueError(f"Article {article_id} introuvable")
                 
-                # ⭐ JOURNAL: Dedup — évite double réduction de stock
-                if MouvementStock.objects.filter(
+                # ⭐ JOURNAL: Dedup — évite double réduction de stock (lignes du lot comprises)
+                if any(sortie['article'].id == article.id for sortie in sorties) or MouvementStock.objects.filter(
                     reference_document=numero_facture,
                     article=article,
                     type_mouvement='VENTE'
@@ -99,11 +104,6 @@ def process_vente_async(self, vente_data, boutique_id, terminal_id):
                     logger.warning(f"⚠️ Doublon MouvementStock task: {numero_facture} / {article.nom} — skip")
                     continue
 
-                # Avertissement stock insuffisant — vente acceptée quand même
-                stock_sera_negatif = article.quantite_stock < quantite
-                if stock_sera_negatif:
-                    logger.warning(f"⚠️ Stock insuffisant (task): {article.nom} dispo={article.quantite_stock} demandé={quantite} → accepté")
-
                 # Créer ligne de vente
                 LigneVente.objects.create(
                     vente=vente,
@@ -112,42 +112,24 @@ def process_vente_async(self, vente_data, boutique_id, terminal_id):
                     prix_unitaire=prix_unitaire,
                     prix_negocie=Decimal(str(prix_negocie)) if prix_negocie else None
                 )
+                sorties.append({
+                    'article': article,
+                    'quantite': quantite,
+                    'commentaire': f"Vente #{numero_facture} (async task)",
+                })
 
-                # Mettre à jour le stock
-                ancien_stock = article.quantite_stock
-                article.quantite_stock -= quantite
-                article.save(update_fields=['quantite_stock'])
-
-                # Journal de stock
-                MouvementStock.objects.create(
-                    article=article,
-                    type_mouvement='VENTE',
-                    quantite=-quantite,
-                    stock_avant=ancien_stock,
-                    stock_apres=article.quantite_stock,
-                    reference_document=numero_facture,
-                    utilisateur=terminal.nom_terminal if hasattr(terminal, 'nom_terminal') else str(terminal.id),
-                    commentaire=f"Vente #{numero_facture} (async task)"
-                )
+            # Mettre à jour le stock (un seul UPDATE) + journal de stock + AlerteStock si stock négatif
+            utilisateur = terminal.nom_terminal if hasattr(terminal, 'nom_terminal') else str(terminal.id)
+            enregistrer_sorties_vente(vente, sorties, utilisateur, boutique=boutique, terminal=terminal)
+            # Notifier changement de stock via WebSocket, après commit (hors verrou des articles)
+            notifier_stocks_apres_commit(boutique_id, sorties)
 
-                # ⚠️ AlerteStock si stock négatif
-                if stock_sera_negatif:
-                    AlerteStock.objects.create(
-                        vente=vente,
-                        boutique=boutique,
-                        terminal=terminal,
-                        article=article,
-                        quantite_vendue=quantite,
-                        stock_serveur_avant=ancien_stock,
-                        stock_serveur_apres=article.quantite_stock,
-                        ecart=ancien_stock - quantite,
-                        numero_facture=numero_facture
-                    )
-
-                # Notifier changement de stock via WebSocket
-                notify_stock_updated(boutique_id, article.id, article.quantite_stock)
-                
-                logger.info(f"✅ Stock mis à jour: {article.nom} {ancien_stock} → {article.quantite_stock}")
+            for sortie in sorties:
+                article = sortie['article']
+                if sortie['stock_avant'] < sortie['quantite']:
+                    # Avertissement stock insuffisant — vente acceptée quand même
+                    logger.warning(f"⚠️ Stock insuffisant (task): {article.nom} dispo={sortie['stock_avant']} demandé={sortie['quantite']} → accepté")
+                logger.info(f"✅ Stock mis à jour: {article.nom} {sortie['stock_avant']} → {sortie['stock_apres']}")
         
         logger.info(f"✅ [Task {self.request.id}] Vente {numero_facture} traitée avec succès")
         
@@ -294,3 +276,44 @@ def send_daily_report(boutique_id):
             'success': False,
             'error': str(e)
         }
+
+
+@shared_task
+def maintenir_partitions():
+    """
+    Crée les partitions mensuelles à venir des journaux partitionnés (PostgreSQL).
+    Tâche périodique (CELERY_BEAT_SCHEDULE), sans effet sur SQLite.
+    """
+    from inventory.services.partitions import PARTITIONS, creer_partitions
+
+    creees = {table: creer_partitions(table) for table in PARTITIONS}
+    return {
+        'success': True,
+        'partitions_creees': {table: noms for table, noms in creees.items() if noms}
+    }
+
+
+@shared_task(ignore_result=True)
+def reporter_variations_stock():
+    """
+    Reporte sur les parents les ventes de variantes restées en attente (report après commit
+    interrompu: processus arrêté entre le COMMIT et le rappel). Tâche périodique (CELERY_BEAT_SCHEDULE).
+    """
+    from inventory.services.stock import reporter_variations_variantes
+
+    reporter_variations_variantes()
+
+
+@shared_task(ignore_result=True, autoretry_for=(OSError,), retry_backoff=30, max_retries=5)
+def generer_derives_image(modele, objet_id):
+    """
+    Génère les miniatures d'une image d'article ou de variante (services/images.py).
+    Envoyée après commit par le signal post_save: Pillow ne tourne pas dans la requête web.
+    Original inaccessible (OSError): nouvel essai, rien n'est mémorisé entre-temps.
+    """
+    from django.apps import apps
+    from inventory.services.images import mettre_a_jour_derives
+
+    objet = apps.get_model('inventory', modele).objects.filter(pk=objet_id).first()
+    if objet is not None:
+        mettre_a_jour_derives(objet)
@@ -0,0 +1,67 @@
+from datetime import timedelta
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.test import TestCase
+from django.utils import timezone
+from inventory.models import Article, Boutique, Categorie, Commercant, LigneVente, MouvementStock, Vente
+from inventory.services.analyse_mouvements import agregats_periode, analyser_mouvements
+
+
+class AnalyseMouvementsTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+        user = User.objects.create_user(username='am', password='x')
+        commercant = Commercant.objects.create(
+            nom_entreprise='AM', nom_responsable='AM', email='am@example.com', user=user
+        )
+        self.boutique = Boutique.objects.create(nom='Analyse', commercant=commercant)
+        categorie = Categorie.objects.create(nom='Catégorie Test')
+        self.article = Article.objects.create(
+            code='SAV', nom='Savon', prix_vente=1000, prix_achat=600,
+            categorie=categorie, boutique=self.boutique, quantite_stock=50,
+        )
+        self.aujourd_hui = timezone.localdate()
+        self.hier = self.aujourd_hui - timedelta(days=1)
+
+    def _vendre(self, numero, jour, quantite, prix=1000):
+        date_vente = timezone.make_aware(timezone.datetime.combine(jour, timezone.datetime.min.time())) + timedelta(hours=10)
+        vente = Vente.objects.create(
+            numero_facture=numero, montant_total=quantite * prix, paye=True,
+            boutique=self.boutique, date_vente=date_vente,
+        )
+        LigneVente.objects.create(vente=vente, article=self.article, quantite=quantite, prix_unitaire=prix)
+        MouvementStock.objects.create(article=self.article, type_mouvement='VENTE', quantite=-quantite)
+        return vente
+
+    def test_fusion_jours_et_resultat(self):
+        """Jour clos + jour en cours fusionnés; mouvements et top articles cohérents"""
+        self._vendre('F-1', self.hier, 2)
+        self._vendre('F-2', self.aujourd_hui, 3)
+
+        analyse = analyser_mouvements(self.boutique, self.hier, self.aujourd_hui)
+
+        self.assertEqual(analyse.ca_cdf, 5000)
+        self.assertEqual(analyse.nb_ventes, 2)
+        self.assertEqual(analyse.nb_jours, 2)
+        self.assertEqual(analyse.mouvement('VENTE', absval=True), {'nb': 2, 'total_qte': 5})
+        self.assertEqual(analyse.top_articles[0]['code'], 'SAV')
+        self.assertEqual(analyse.top_articles[0]['qte_vendue'], 5)
+
+    def test_jour_clos_en_cache_et_invalidation(self):
+        """Un jour clos n'est plus recalculé, sauf après une vente tardive sur ce jour"""
+        self._vendre('F-1', self.hier, 2)
+        self.assertEqual(agregats_periode(self.boutique, self.hier, self.hier).ca_cdf, 2000)
+
+        with self.assertNumQueries(0):
+            agregats_periode(self.boutique, self.hier, self.hier)
+
+        # Synchronisée hors-ligne après coup: invalidée au commit, pas avant
+        with self.captureOnCommitCallbacks(execute=True):
+            tardive = self._vendre('F-2', self.hier, 1)
+            self.assertEqual(agregats_periode(self.boutique, self.hier, self.hier).ca_cdf, 2000)
+        self.assertEqual(agregats_periode(self.boutique, self.hier, self.hier).ca_cdf, 3000)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            tardive.delete()
+        self.assertEqual(agregats_periode(self.boutique, self.hier, self.hier).ca_cdf, 2000)
@@ -0,0 +1,34 @@
+import json
+import logging
+
+from django.test import TestCase
+from inventory.api_logging import JsonFormatter, ResumeRequete
+
+
+class ApiLoggingTestCase(TestCase):
+    def test_resume_un_seul_enregistrement(self):
+        """Les compteurs d'un appel sont émis en un seul enregistrement de synthèse"""
+        resume = ResumeRequete('sync_ventes_simple')
+        resume.ajouter(boutique_id=3)
+        resume.incr('lignes', 4)
+        resume.erreur('STOCK_INSUFFISANT')
+
+        with self.assertLogs('inventory.api', level='INFO') as logs:
+            resume.emettre(statut=200)
+
+        self.assertEqual(len(logs.records), 1)
+        record = logs.records[0]
+        self.assertEqual(record.levelno, logging.INFO)
+        self.assertEqual(record.donnees['lignes'], 4)
+        self.assertEqual(record.donnees['erreurs'], {'STOCK_INSUFFISANT': 1})
+
+    def test_format_json(self):
+        """JsonFormatter inclut les champs extra"""
+        resume = ResumeRequete('create_vente_simple')
+        with self.assertLogs('inventory.api', level='INFO') as logs:
+            resume.emettre(statut=500)
+
+        data = json.loads(JsonFormatter().format(logs.records[0]))
+        self.assertEqual(data['niveau'], 'ERROR')
+        self.assertEqual(data['endpoint'], 'create_vente_simple')
+        self.assertEqual(data['statut'], 500)
@@ -0,0 +1,57 @@
+import gzip
+import json
+
+import msgpack
+from django.contrib.auth.models import User
+from django.test import TestCase
+from django.urls import reverse
+from inventory.models import Article, Boutique, Categorie, Client, Commercant, VarianteArticle
+from inventory.renderers import CatalogueJSONRenderer, CatalogueMsgpackRenderer
+
+
+class CatalogueColonnesTestCase(TestCase):
+    def setUp(self):
+        user = User.objects.create_user(username='cat', password='x')
+        commercant = Commercant.objects.create(
+            nom_entreprise='Cat', nom_responsable='Cat', email='cat@example.com', user=user
+        )
+        boutique = Boutique.objects.create(nom='Catalogue', commercant=commercant)
+        Client.objects.create(nom_terminal='POS', numero_serie='CAT-1', boutique=boutique, compte_proprietaire=user)
+        boissons = Categorie.objects.create(nom='Boissons')
+        self.jus = Article.objects.create(
+            code='JUS', nom='Jus', prix_vente=1500, prix_achat='999.50', categorie=boissons, boutique=boutique,
+            est_valide_client=True, image='articles/jus.jpg',
+        )
+        Article.objects.create(
+            code='EAU', nom='Eau', prix_vente=500, categorie=boissons, boutique=boutique,
+            est_valide_client=True, image='articles/jus.jpg',
+        )
+        VarianteArticle.objects.create(article_parent=self.jus, code_barre='JUS-O', nom_variante='Orange')
+
+    def _get(self, accept, **extra):
+        return self.client.get(
+            reverse('api_v2_simple:articles_list'), HTTP_X_DEVICE_SERIAL='CAT-1', HTTP_ACCEPT=accept, **extra
+        )
+
+    def test_colonnes_json_gzip(self):
+        """Champs une fois, catégories et images en dictionnaire, prix numériques"""
+        reponse = self._get(CatalogueJSONRenderer.media_type, HTTP_ACCEPT_ENCODING='gzip')
+        self.assertEqual(reponse['Content-Encoding'], 'gzip')
+        data = json.loads(gzip.decompress(reponse.content))
+
+        articles = dict(zip(data['articles']['champs'], data['articles']['colonnes']))
+        self.assertEqual(articles['code'], ['EAU', 'JUS'])
+        self.assertEqual(articles['prix_vente'], [500, 1500])
+        self.assertEqual(articles['prix_achat'][1], 999.5)
+        self.assertEqual(articles['categorie'], [0, 0])
+        self.assertEqual(articles['image'], [0, 0])
+        self.assertEqual(data['dictionnaires']['images'], ['http://testserver/media/articles/jus.jpg'])
+        variantes = dict(zip(data['variantes']['champs'], data['variantes']['colonnes']))
+        self.assertEqual(variantes['article'], [self.jus.id])
+
+    def test_msgpack_et_json_par_defaut(self):
+        """MessagePack sur demande; le JSON actuel reste le format par défaut"""
+        data = msgpack.unpackb(self._get(CatalogueMsgpackRenderer.media_type).content)
+        self.assertEqual(data['count'], 2)
+        self.assertEqual(data['format'], 'colonnes/1')
+        self.assertEqual(len(self._get('application/json').json()['articles']), 2)
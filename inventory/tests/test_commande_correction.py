@@ -0,0 +1,60 @@
+import os
+import tempfile
+from io import StringIO
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import TestCase
+from inventory.management.commands.recalculer_total_ventes import Command as RecalculerTotalVentes
+from inventory.models import Article, Boutique, Commercant, LigneVente, Vente
+
+
+class CommandeCorrectionTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+        user = User.objects.create_user(username='fix', password='x')
+        commercant = Commercant.objects.create(
+            nom_entreprise='FIX', nom_responsable='FIX', email='fix@example.com', user=user
+        )
+        boutique = Boutique.objects.create(nom='Correction', commercant=commercant)
+        article = Article.objects.create(code='F1', nom='Article', prix_achat=100, prix_vente=150,
+                                         quantite_stock=10, boutique=boutique)
+        self.ventes = []
+        for i in range(5):
+            vente = Vente.objects.create(numero_facture=f'FIX-{i}', montant_total=999, boutique=boutique)
+            LigneVente.objects.create(vente=vente, article=article, quantite=i + 1, prix_unitaire=150)
+            self.ventes.append(vente)
+        self.reprise = os.path.join(tempfile.mkdtemp(), 'reprise.json')
+
+    def totaux(self):
+        return list(Vente.objects.order_by('pk').values_list('montant_total', flat=True))
+
+    def test_simulation_puis_reprise(self):
+        """--dry-run n'écrit rien; une correction interrompue reprend au lot suivant"""
+        sortie = StringIO()
+        call_command('recalculer_total_ventes', '--all', '--dry-run', '--taille-lot', '2', stdout=sortie)
+        self.assertIn('montant_total: 999.00 → 150', sortie.getvalue())
+        self.assertEqual(self.totaux(), [999] * 5)
+
+        # Interruption pendant le 2e lot: le 1er lot reste écrit, le point de reprise le mémorise
+        original = RecalculerTotalVentes.corriger_lot
+        appels = []
+
+        def interrompre(commande, lot, options):
+            appels.append([v.pk for v in lot])
+            if len(appels) == 2:
+                raise KeyboardInterrupt
+            return original(commande, lot, options)
+
+        with mock.patch.object(RecalculerTotalVentes, 'corriger_lot', interrompre), self.assertRaises(KeyboardInterrupt):
+            call_command('recalculer_total_ventes', '--all', '--taille-lot', '2', '--reprise', self.reprise, stdout=StringIO())
+        self.assertEqual(self.totaux(), [150, 300, 999, 999, 999])
+        self.assertTrue(os.path.exists(self.reprise))
+
+        sortie = StringIO()
+        call_command('recalculer_total_ventes', '--all', '--taille-lot', '2', '--reprise', self.reprise, stdout=sortie)
+        self.assertIn(f'Reprise après pk={self.ventes[1].pk}', sortie.getvalue())
+        self.assertEqual(self.totaux(), [150, 300, 450, 600, 750])
+        self.assertFalse(os.path.exists(self.reprise))
@@ -0,0 +1,87 @@
+from datetime import timedelta
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+from inventory.models import Article, Boutique, Client, Commercant, HistoriqueSaisieInventaire, Inventaire
+from inventory.services.comptage_inventaire import appliquer_comptages
+from inventory.services.inventaire import ouvrir_inventaire
+
+
+class ComptageInventaireTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+        user = User.objects.create_user(username='cpt', password='x')
+        commercant = Commercant.objects.create(
+            nom_entreprise='CPT', nom_responsable='CPT', email='cpt@example.com', user=user
+        )
+        self.boutique = Boutique.objects.create(nom='Comptage', commercant=commercant)
+        Client.objects.create(
+            nom_terminal='Scanner', numero_serie='SCAN-1', boutique=self.boutique, compte_proprietaire=user
+        )
+        self.articles = [
+            Article.objects.create(
+                code=f'C{i}', nom=f'Article {i}', prix_achat=100, prix_vente=150,
+                quantite_stock=10, boutique=self.boutique,
+            )
+            for i in range(4)
+        ]
+        self.inventaire = ouvrir_inventaire(self.boutique, user, timezone.now().date())
+
+    def test_ordre_arrivee_indifferent(self):
+        """Complet le plus récent + partiels postérieurs, quel que soit l'ordre des lots; stats par delta"""
+        t0 = timezone.now() - timedelta(hours=1)
+        complet_ancien = {'code': 'C0', 'quantite': 3, 'compte_le': t0.isoformat()}
+        complet_recent = {'code': 'C0', 'quantite': 5, 'compte_le': (t0 + timedelta(minutes=10)).isoformat()}
+        partiel = {'code': 'C0', 'quantite': 2, 'mode': 'AJOUTER', 'compte_le': (t0 + timedelta(minutes=20)).isoformat()}
+        partiel_perime = {'code': 'C0', 'quantite': 9, 'mode': 'AJOUTER', 'compte_le': (t0 + timedelta(minutes=5)).isoformat()}
+
+        # Partiel reçu avant le comptage complet qu'il complète, puis un complet plus ancien (ignoré)
+        appliquer_comptages(self.inventaire, [partiel, {'code': 'C1', 'quantite': 12}], numero_serie='A')
+        appliquer_comptages(self.inventaire, [complet_recent], numero_serie='B')
+        resultat = appliquer_comptages(self.inventaire, [complet_ancien, partiel_perime, {'code': 'X', 'quantite': 1}])
+        self.assertEqual([i['index'] for i in resultat['ignores']], [0, 1, 2])
+
+        lignes = dict(self.inventaire.lignes.values_list('article__code', 'stock_physique'))
+        self.assertEqual((lignes['C0'], lignes['C1']), (7, 12))
+
+        # Statistiques par delta identiques au recalcul complet
+        self.inventaire.refresh_from_db()
+        incremental = (self.inventaire.nb_ecarts, self.inventaire.valeur_ecart_positif, self.inventaire.valeur_ecart_negatif)
+        self.inventaire.calculer_statistiques()
+        self.assertEqual(incremental, (2, 200, 300))
+        self.assertEqual(incremental, (self.inventaire.nb_ecarts, self.inventaire.valeur_ecart_positif,
+                                       self.inventaire.valeur_ecart_negatif))
+
+        # Requêtes constantes quelle que soit la taille du lot
+        with self.assertNumQueries(8):
+            appliquer_comptages(self.inventaire, [
+                {'article_id': a.id, 'quantite': 1} for a in self.articles
+            ])
+
+    def test_api_instantane_et_lot(self):
+        """Instantané en colonnes, lot appliqué puis rejoué tel quel sur reprise"""
+        reponse = self.client.get(reverse('api_v2_simple:inventaire_en_cours'), HTTP_X_DEVICE_SERIAL='SCAN-1')
+        self.assertEqual(reponse.status_code, 200)
+        instantane = reponse.json()
+        self.assertEqual(instantane['inventaire']['id'], self.inventaire.id)
+        self.assertEqual(instantane['lignes']['lignes'], 4)
+
+        lot = {
+            'inventaire_id': self.inventaire.id,
+            'lot_uid': 'lot-1',
+            'comptages': [{'ligne_id': l, 'quantite': 8} for l in instantane['lignes']['colonnes'][0]],
+        }
+        for _ in range(2):
+            reponse = self.client.post(reverse('api_v2_simple:envoyer_comptages'), lot,
+                                       content_type='application/json', HTTP_X_DEVICE_SERIAL='SCAN-1')
+            self.assertEqual(reponse.status_code, 200)
+            self.assertEqual(reponse.json()['appliques'], 4)
+        self.assertEqual(HistoriqueSaisieInventaire.objects.filter(numero_serie='SCAN-1').count(), 4)
+        self.assertEqual(Inventaire.objects.get(pk=self.inventaire.pk).nb_ecarts, 4)
+
+        delta = self.client.get(reverse('api_v2_simple:inventaire_en_cours'),
+                                {'depuis': instantane['genere_le']}, HTTP_X_DEVICE_SERIAL='SCAN-1').json()
+        self.assertEqual(delta['lignes']['colonnes'][5], [8, 8, 8, 8])
@@ -0,0 +1,85 @@
+from decimal import Decimal
+
+from asgiref.sync import async_to_sync
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.test import TestCase
+from django.urls import reverse
+from inventory.consumers import CompteursJourConsumer
+from inventory.models import Boutique, Client, Collaborateur, Commercant, RapportCaisse, Vente
+from inventory.services.compteurs_jour import compteurs
+
+
+class CompteursJourTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+        user = User.objects.create_user(username='cj', password='x')
+        self.commercant = Commercant.objects.create(
+            nom_entreprise='CJ', nom_responsable='CJ', email='cj@example.com', user=user
+        )
+        self.boutique = Boutique.objects.create(nom='Compteurs', commercant=self.commercant)
+        self.terminal = Client.objects.create(
+            nom_terminal='POS', numero_serie='CJ-1', boutique=self.boutique, compte_proprietaire=user
+        )
+
+    def _vendre(self, numero, montant, devise='CDF'):
+        with self.captureOnCommitCallbacks(execute=True):
+            return Vente.objects.create(
+                numero_facture=numero, montant_total=montant, devise=devise, paye=True, boutique=self.boutique
+            )
+
+    def test_increments_et_annulation(self):
+        """Vente CDF/USD puis annulation: compteurs tenus sans relire les ventes"""
+        self.assertEqual(compteurs(self.boutique.id)['nb_ventes'], 0)  # amorçage depuis la base
+        self._vendre('F-1', Decimal('1500.50'))
+        vente_usd = self._vendre('F-2', 12, devise='USD')
+
+        with self.assertNumQueries(0):
+            etat = compteurs(self.boutique.id)
+        self.assertEqual(etat['ca_cdf'], 1500.5)
+        self.assertEqual(etat['ca_usd'], 12)
+        self.assertEqual(etat['nb_ventes'], 2)
+        self.assertIsNotNone(etat['derniere_vente_ts'])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            vente_usd.est_annulee = True
+            vente_usd.save(update_fields=['est_annulee'])
+        with self.captureOnCommitCallbacks(execute=True):
+            RapportCaisse.objects.create(
+                boutique=self.boutique, terminal=self.terminal, detail='Transport', depense=500, depense_appliquee=True
+            )
+        self.assertEqual(compteurs(self.boutique.id)['ca_usd'], 0)
+        self.assertEqual(compteurs(self.boutique.id)['nb_ventes_usd'], 0)
+
+        # Reconstruction depuis la base identique aux compteurs incrémentaux
+        attendu = compteurs(self.boutique.id)
+        cache.clear()
+        self.assertEqual(compteurs(self.boutique.id), attendu)
+        self.assertEqual(attendu['ca_cdf_net'], 1000.5)
+
+    def test_endpoint_repli(self):
+        self._vendre('F-1', 2000)
+        self.client.force_login(User.objects.get(username='cj'))
+        reponse = self.client.get(
+            reverse('inventory:api_ca_jour_boutique', args=[self.boutique.id]), HTTP_HOST='localhost'
+        )
+        self.assertEqual(reponse.status_code, 200)
+        self.assertEqual(reponse.json()['ca_cdf'], 2000)
+        self.assertEqual(reponse.json()['nb_ventes'], 1)
+
+    def test_websocket_refuse_collaborateur_restreint(self):
+        """Un collaborateur limité à une autre boutique ne reçoit pas le CA de celle-ci"""
+        autre = Boutique.objects.create(nom='Autre', commercant=self.commercant)
+        user = User.objects.create_user(username='caissier', password='x')
+        collaborateur = Collaborateur.objects.create(commercant=self.commercant, user=user, nom_complet='Caissier')
+
+        def autorise(boutique):
+            consumer = CompteursJourConsumer()
+            consumer.scope = {'user': user}
+            consumer.boutique_id = boutique.id
+            return async_to_sync(consumer.check_authorization)()
+
+        self.assertTrue(autorise(self.boutique))
+        collaborateur.boutiques_autorisees.set([autre])
+        self.assertFalse(autorise(self.boutique))
+        self.assertTrue(autorise(autre))
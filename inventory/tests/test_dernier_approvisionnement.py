@@ -0,0 +1,73 @@
+from datetime import date
+
+from django.contrib.auth.models import User
+from django.test import TestCase
+from inventory.models import (
+    Article, Boutique, Categorie, Commercant, DernierApprovisionnement, FactureApprovisionnement,
+    Fournisseur, LigneApprovisionnement,
+)
+from inventory.services.approvisionnement import derniers_approvisionnements, reconstruire
+
+
+class DernierApprovisionnementTestCase(TestCase):
+    def setUp(self):
+        user = User.objects.create_user(username='appro', password='x')
+        commercant = Commercant.objects.create(
+            nom_entreprise='Appro', nom_responsable='Appro', email='appro@example.com', user=user
+        )
+        self.depot = Boutique.objects.create(nom='Dépôt', commercant=commercant, est_depot=True)
+        self.fournisseur = Fournisseur.objects.create(nom='Grossiste', commercant=commercant)
+        categorie = Categorie.objects.create(nom='Catégorie Test')
+        self.article = Article.objects.create(
+            code='RIZ', nom='Riz', prix_vente=1500, prix_achat=1000, categorie=categorie, boutique=self.depot
+        )
+
+    def _ligne(self, numero, prix_carton, devise='CDF'):
+        facture = FactureApprovisionnement.objects.create(
+            numero_facture=numero, fournisseur=self.fournisseur, depot=self.depot,
+            date_facture=date.today(), devise=devise,
+        )
+        return LigneApprovisionnement.objects.create(
+            facture=facture, article=self.article, type_quantite='CARTON', nombre_cartons=2,
+            pieces_par_carton=10, quantite_unites=20, prix_achat_carton=prix_carton,
+            prix_achat_unitaire=0, prix_achat_total=0,
+        )
+
+    def test_projection_suit_la_derniere_ligne(self):
+        """Nouvelle ligne = projection; suppression de la dernière = retour à la précédente"""
+        self._ligne('F-1', 10000)
+        derniere = self._ligne('F-2', 12000, devise='USD')
+
+        appros = derniers_approvisionnements(self.depot)
+        self.assertEqual(appros[self.article.id]['prix_achat_carton'], 12000)
+        self.assertEqual(appros[self.article.id]['prix_achat_unitaire'], 1200)
+        self.assertEqual(appros[self.article.id]['devise_saisie'], 'USD')
+        self.assertEqual(appros[self.article.id]['fournisseur'], 'Grossiste')
+
+        derniere.facture.delete()
+        self.assertEqual(derniers_approvisionnements(self.depot)[self.article.id]['prix_achat_carton'], 10000)
+
+    def test_reconstruction(self):
+        """La reconstruction (sans DISTINCT ON sous SQLite) retrouve la ligne la plus récente"""
+        self._ligne('F-1', 10000)
+        ligne = self._ligne('F-2', 11000)
+        DernierApprovisionnement.objects.all().delete()
+
+        self.assertEqual(reconstruire(), 1)
+        self.assertEqual(DernierApprovisionnement.objects.get(article=self.article).ligne_id, ligne.id)
+
+    def test_facture_modifiee(self):
+        """Devise ou fournisseur de la facture modifiés après coup: la projection suit"""
+        ligne = self._ligne('F-1', 10000)
+        facture = ligne.facture
+        facture.devise = 'USD'
+        facture.fournisseur = None
+        facture.fournisseur_nom = 'Marché central'
+        facture.save()
+
+        appro = derniers_approvisionnements(self.depot)[self.article.id]
+        self.assertEqual(appro['devise_saisie'], 'USD')
+        self.assertEqual(appro['fournisseur'], 'Marché central')
+
+        facture.delete()
+        self.assertEqual(derniers_approvisionnements(self.depot), {})
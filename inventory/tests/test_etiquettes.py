@@ -0,0 +1,75 @@
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.test import TestCase
+from django.urls import reverse
+from inventory.models import Article, Boutique, Collaborateur, Commercant
+from inventory.services import etiquettes
+
+
+class EtiquettesTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='etiq', password='x')
+        self.commercant = Commercant.objects.create(
+            nom_entreprise='ETIQ', nom_responsable='ETIQ', email='etiq@example.com', user=self.user
+        )
+        self.boutique = Boutique.objects.create(nom='Etiquettes', commercant=self.commercant)
+        self.autre = Boutique.objects.create(nom='Autre', commercant=self.commercant)
+        for i in range(3):
+            Article.objects.create(code=f'ET-{i}', nom=f'Article {i}', prix_achat=100, prix_vente=150,
+                                   quantite_stock=5, boutique=self.boutique)
+        Article.objects.create(code='AUTRE', nom='Ailleurs', prix_achat=1, prix_vente=2,
+                               quantite_stock=1, boutique=self.autre)
+
+    def test_planche_en_cache_tant_que_le_catalogue_ne_change_pas(self):
+        """Un catalogue inchangé n'est jamais re-rendu; une modification d'article invalide la planche"""
+        articles = etiquettes.articles_etiquettes([self.boutique.id])
+        with mock.patch.object(etiquettes, 'rendre_planche', wraps=etiquettes.rendre_planche) as rendu:
+            pdf = etiquettes.planche_etiquettes(articles)
+            self.assertTrue(pdf.startswith(b'%PDF'))
+            self.assertEqual(etiquettes.planche_etiquettes(articles), pdf)
+            self.assertEqual(rendu.call_count, 1)
+
+            # Autre format ou autres filtres: autre planche
+            etiquettes.planche_etiquettes(articles, 'code128')
+            etiquettes.planche_etiquettes(etiquettes.articles_etiquettes([self.boutique.id], recherche='ET-1'))
+            self.assertEqual(rendu.call_count, 3)
+
+            article = Article.objects.get(code='ET-0')
+            article.nom = 'Renommé'
+            article.save()
+            etiquettes.planche_etiquettes(articles)
+            self.assertEqual(rendu.call_count, 4)
+
+            # Correction en masse par update(): ni last_updated ni version ne bougent
+            Article.objects.filter(code='ET-1').update(code='ET-1B')
+            etiquettes.planche_etiquettes(articles)
+            self.assertEqual(rendu.call_count, 5)
+
+    def test_vue_limitee_a_la_boutique(self):
+        """La vue web sert la planche de la boutique demandée, avec les articles de cette boutique seulement"""
+        self.client.force_login(self.user)
+        with mock.patch.object(etiquettes, 'rendre_planche', wraps=etiquettes.rendre_planche) as rendu:
+            reponse = self.client.get(reverse('inventory:generer_qr_codes_pdf'), {'boutique': self.boutique.id})
+        self.assertEqual(reponse.status_code, 200)
+        self.assertTrue(b''.join(reponse.streaming_content).startswith(b'%PDF'))
+        # 3 articles de la boutique, pas celui de l'autre boutique
+        self.assertEqual(rendu.call_args.args[1], 3)
+
+        # Collaborateur limité à cette boutique: planche servie, l'autre boutique refusée
+        caissier = User.objects.create_user(username='caissier', password='x')
+        collaborateur = Collaborateur.objects.create(commercant=self.commercant, user=caissier, nom_complet='Caissier')
+        collaborateur.boutiques_autorisees.set([self.boutique])
+        self.client.force_login(caissier)
+        reponse = self.client.get(reverse('inventory:generer_qr_codes_pdf'), {'boutique': self.boutique.id})
+        self.assertEqual(reponse.status_code, 200)
+        reponse = self.client.get(reverse('inventory:generer_qr_codes_pdf'), {'boutique': self.autre.id})
+        self.assertEqual(reponse.status_code, 404)
+
+        intrus = User.objects.create_user(username='intrus', password='x')
+        Commercant.objects.create(nom_entreprise='INTRUS', nom_responsable='I', email='i@example.com', user=intrus)
+        self.client.force_login(intrus)
+        reponse = self.client.get(reverse('inventory:generer_qr_codes_pdf'), {'boutique': self.boutique.id})
+        self.assertEqual(reponse.status_code, 404)
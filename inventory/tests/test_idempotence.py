@@ -0,0 +1,88 @@
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.test import TestCase
+from django.urls import reverse
+from inventory.models import Article, Boutique, Categorie, Client, Commercant, MouvementStock, ReponseIdempotente, Vente
+
+
+class IdempotenceTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+        user = User.objects.create_user(username='idem', password='x')
+        commercant = Commercant.objects.create(
+            nom_entreprise='Idem', nom_responsable='Idem', email='idem@example.com', user=user
+        )
+        self.boutique = Boutique.objects.create(nom='Idempotence', commercant=commercant)
+        Client.objects.create(
+            nom_terminal='POS', numero_serie='IDEM-1', boutique=self.boutique, compte_proprietaire=user
+        )
+        self.article = Article.objects.create(
+            code='SAV', nom='Savon', prix_vente=1000, quantite_stock=10,
+            categorie=Categorie.objects.create(nom='Hygiène'), boutique=self.boutique,
+        )
+
+    def _vendre(self, **entetes):
+        return self.client.post(
+            reverse('api_v2_simple:create_vente'),
+            {'numero_facture': 'F-IDEM-1', 'lignes': [{'article_id': self.article.id, 'quantite': 2}]},
+            content_type='application/json', HTTP_X_DEVICE_SERIAL='IDEM-1', **entetes,
+        )
+
+    def test_reprise_rejoue_la_reponse(self):
+        """Une reprise reçoit la réponse d'origine sans nouvelle vente ni nouvelle sortie de stock"""
+        premiere = self._vendre()
+        self.assertEqual(premiere.status_code, 201)
+
+        with self.assertNumQueries(0):
+            reprise = self._vendre()
+        self.assertEqual(reprise.status_code, 201)
+        self.assertEqual(reprise['Idempotent-Replayed'], 'true')
+        self.assertEqual(reprise.json(), premiere.json())
+
+        # Cache perdu: la table fait référence
+        cache.clear()
+        self.assertEqual(self._vendre().json(), premiere.json())
+        self.assertEqual(Vente.objects.count(), 1)
+        self.assertEqual(MouvementStock.objects.filter(type_mouvement='VENTE').count(), 1)
+        self.assertEqual(ReponseIdempotente.objects.get().boutique_id, self.boutique.id)
+
+    def test_cle_client(self):
+        """La clé Idempotency-Key du client prime sur la clé dérivée"""
+        self.assertEqual(self._vendre(HTTP_IDEMPOTENCY_KEY='cle-1').status_code, 201)
+        self.assertEqual(self._vendre(HTTP_IDEMPOTENCY_KEY='cle-1').status_code, 201)
+        # Autre clé: la vente est retraitée et reconnue comme doublon
+        self.assertTrue(self._vendre(HTTP_IDEMPOTENCY_KEY='cle-2').json()['already_exists'])
+
+    def test_numero_de_serie_du_corps(self):
+        """Clé rattachée au terminal de la vente: numero_serie du corps avant les en-têtes"""
+        reponse = self.client.post(
+            reverse('api_v2_simple:create_vente'),
+            {'numero_facture': 'F-IDEM-2', 'numero_serie': 'IDEM-1',
+             'lignes': [{'article_id': self.article.id, 'quantite': 1}]},
+            content_type='application/json', HTTP_X_DEVICE_SERIAL='AUTRE-CAISSE',
+        )
+        self.assertEqual(reponse.status_code, 201)
+        self.assertEqual(ReponseIdempotente.objects.get().numero_serie, 'IDEM-1')
+
+    def test_lot_avec_rejets_non_conserve(self):
+        """Un lot partiellement rejeté est retraité à la reprise; un lot complet est conservé"""
+        def synchroniser(lot):
+            return self.client.post(
+                reverse('api_v2_simple:sync_ventes'), lot,
+                content_type='application/json', HTTP_X_DEVICE_SERIAL='IDEM-1',
+            )
+
+        lot = [
+            {'numero_facture': 'F-LOT-1', 'lignes': [{'article_id': self.article.id, 'quantite': 1}]},
+            {'numero_facture': 'F-LOT-2', 'lignes': [{'article_id': 999999, 'quantite': 1}]},
+        ]
+        premiere = synchroniser(lot)
+        self.assertEqual(premiere.status_code, 201)
+        self.assertEqual(len(premiere.json()['rejected']), 1)
+        self.assertFalse(ReponseIdempotente.objects.exists())
+        self.assertNotIn('Idempotent-Replayed', synchroniser(lot))
+
+        # F-LOT-1 déjà enregistrée: doublon définitif, la réponse est conservée
+        self.assertEqual(synchroniser(lot[:1]).status_code, 201)
+        self.assertEqual(ReponseIdempotente.objects.get().boutique_id, self.boutique.id)
+        self.assertEqual(synchroniser(lot[:1])['Idempotent-Replayed'], 'true')
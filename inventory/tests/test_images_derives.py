@@ -0,0 +1,100 @@
+import shutil
+import tempfile
+from io import BytesIO, StringIO
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.test import RequestFactory, TestCase, override_settings
+from inventory import tasks
+from inventory.models import Article, Boutique, Commercant
+from inventory.serializers import ArticleAvecVariantesSerializer
+from PIL import Image
+
+
+def photo(nom='photo.jpg', taille=(2000, 1500)):
+    tampon = BytesIO()
+    Image.new('RGB', taille, (200, 30, 30)).save(tampon, 'JPEG')
+    return SimpleUploadedFile(nom, tampon.getvalue(), content_type='image/jpeg')
+
+
+class ImagesDerivesTestCase(TestCase):
+    def setUp(self):
+        self.media = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media, ignore_errors=True)
+        reglages = override_settings(MEDIA_ROOT=self.media)
+        reglages.enable()
+        self.addCleanup(reglages.disable)
+
+        user = User.objects.create_user(username='img', password='x')
+        commercant = Commercant.objects.create(
+            nom_entreprise='IMG', nom_responsable='IMG', email='img@example.com', user=user
+        )
+        self.boutique = Boutique.objects.create(nom='Images', commercant=commercant)
+
+    def test_miniatures_generees_a_l_envoi(self):
+        """Image envoyée: dérivés à empreinte générés par Celery, exposés dans la sync à la place de l'original"""
+        with self.captureOnCommitCallbacks(execute=True):
+            article = Article.objects.create(code='IMG1', nom='Photo', prix_achat=1, prix_vente=2,
+                                             boutique=self.boutique, image=photo())
+        article.refresh_from_db()
+        self.assertEqual(article.image_derives['source'], article.image.name)
+        self.assertEqual(article.version, 2)
+        with default_storage.open(article.image_derives['moyenne']) as fichier:
+            self.assertLessEqual(max(Image.open(fichier).size), 480)
+
+        request = RequestFactory().get('/')
+        donnees = ArticleAvecVariantesSerializer(article, context={'request': request}).data
+        self.assertIn(article.image_derives['moyenne'], donnees['image_url'])
+        self.assertIn(article.image_derives['miniature'], donnees['image_miniature_url'])
+
+        # Génération confiée au worker Celery après commit, pas faite dans la requête
+        with mock.patch.object(tasks.generer_derives_image, 'delay') as envoi:
+            with self.captureOnCommitCallbacks(execute=True):
+                autre = Article.objects.create(code='IMG3', nom='Autre', prix_achat=1, prix_vente=2,
+                                               boutique=self.boutique, image=photo('autre.jpg'))
+        envoi.assert_called_once_with('article', autre.pk)
+        self.assertEqual(Article.objects.get(pk=autre.pk).image_derives, {})
+
+        # Enregistrement sans changement d'image: rien n'est régénéré
+        with mock.patch.object(tasks.generer_derives_image, 'delay') as envoi:
+            with self.captureOnCommitCallbacks(execute=True):
+                article.quantite_stock = 4
+                article.save()
+        envoi.assert_not_called()
+
+    def test_rattrapage_des_images_existantes(self):
+        """generer_derives_images traite les images envoyées avant le pipeline"""
+        with self.captureOnCommitCallbacks(execute=False):
+            article = Article.objects.create(code='IMG2', nom='Ancienne', prix_achat=1, prix_vente=2,
+                                             boutique=self.boutique, image=photo('ancienne.jpg'))
+        self.assertEqual(Article.objects.get(pk=article.pk).image_derives, {})
+
+        call_command('generer_derives_images', '--dry-run', stdout=StringIO())
+        self.assertEqual(Article.objects.get(pk=article.pk).image_derives, {})
+
+        sortie = StringIO()
+        call_command('generer_derives_images', '--recommencer', stdout=sortie)
+        article.refresh_from_db()
+        self.assertIn('1 objet(s) corrigé(s)', sortie.getvalue())
+        self.assertTrue(default_storage.exists(article.image_derives['miniature']))
+
+    @override_settings(CELERY_TASK_ALWAYS_EAGER=False, MEDIAS_PARTAGES=False)
+    def test_medias_locaux_et_original_absent(self):
+        """Médias locaux au web: dérivés générés sans Celery; original absent: rien n'est mémorisé"""
+        with mock.patch.object(tasks.generer_derives_image, 'delay') as envoi:
+            with self.captureOnCommitCallbacks(execute=True):
+                article = Article.objects.create(code='IMG4', nom='Locale', prix_achat=1, prix_vente=2,
+                                                 boutique=self.boutique, image=photo('locale.jpg'))
+        envoi.assert_not_called()
+        self.assertTrue(default_storage.exists(Article.objects.get(pk=article.pk).image_derives['miniature']))
+
+        # Original absent (autre conteneur, stockage indisponible): pas de marqueur, image retraitée
+        with self.captureOnCommitCallbacks(execute=True):
+            article.image = 'articles/absente.jpg'
+            article.save()
+        self.assertEqual(Article.objects.get(pk=article.pk).image_derives['source'], 'articles/locale.jpg')
+        with self.assertRaises(OSError):
+            tasks.generer_derives_image.run('article', article.pk)
@@ -0,0 +1,81 @@
+from io import StringIO
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import TestCase
+from django.urls import reverse
+from inventory.models import Article, Boutique, Client, Commercant, MouvementStock, Vente, VenteRejetee
+
+
+class IngestionVentesTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+        user = User.objects.create_user(username='depot', password='x')
+        commercant = Commercant.objects.create(
+            nom_entreprise='DEPOT', nom_responsable='DEPOT', email='depot@example.com', user=user
+        )
+        self.depot = Boutique.objects.create(nom='Dépôt', commercant=commercant)
+        self.point_vente = Boutique.objects.create(nom='Point de vente', commercant=commercant)
+        autre = Commercant.objects.create(
+            nom_entreprise='AUTRE', nom_responsable='AUTRE', email='autre@example.com',
+            user=User.objects.create_user(username='autre', password='x'),
+        )
+        self.etrangere = Boutique.objects.create(nom='Étrangère', commercant=autre)
+        self.terminal = Client.objects.create(
+            nom_terminal='Caisse dépôt', numero_serie='DEPOT-1', boutique=self.depot, compte_proprietaire=user
+        )
+        self.articles = {
+            b.id: Article.objects.create(code=f'A{b.id}', nom=f'Article {b.nom}', prix_achat=100,
+                                         prix_vente=150, quantite_stock=10, boutique=b)
+            for b in (self.depot, self.point_vente, self.etrangere)
+        }
+        Vente.objects.create(numero_facture='F-EXISTE', montant_total=150, boutique=self.depot)
+
+    def vente(self, numero, boutique, quantite=1, article=None):
+        article = article or self.articles[boutique.id]
+        return {'numero_facture': numero, 'boutique_id': boutique.id, 'date_vente': '2025-11-20T10:00:00',
+                'lignes': [{'article_id': article.id, 'quantite': quantite, 'prix_unitaire': 150}]}
+
+    def test_lot_multi_boutiques(self):
+        """Validation de tout le lot, une transaction par boutique, un résultat par vente dans l'ordre"""
+        ventes = [
+            self.vente('F-1', self.depot, 2),
+            self.vente('F-2', self.point_vente, 3),
+            {'VenteUid': 'F-3', 'BoutiqueId': self.point_vente.id, 'Total': 150,
+             'Items': [{'ArticleId': self.articles[self.point_vente.id].id, 'Quantite': 1, 'PrixUnitaire': 150}]},
+            self.vente('F-4', self.etrangere),
+            self.vente('F-EXISTE', self.depot),
+            self.vente('F-5', self.depot, article=self.articles[self.point_vente.id]),
+            self.vente('F-1', self.depot),
+        ]
+        reponse = self.client.post(reverse('api_v2_simple:ingestion_ventes'), {'ventes': ventes},
+                                   content_type='application/json', HTTP_X_DEVICE_SERIAL='DEPOT-1')
+        self.assertEqual(reponse.status_code, 200)
+        resultats = reponse.json()['resultats']
+        self.assertEqual([r['index'] for r in resultats], list(range(7)))
+        self.assertEqual(
+            [r.get('code', r['status']) for r in resultats],
+            ['created', 'created', 'created', 'BOUTIQUE_MISMATCH', 'already_exists', 'ARTICLE_NOT_FOUND', 'DUPLICATE'],
+        )
+
+        stocks = dict(Article.objects.values_list('boutique_id', 'quantite_stock'))
+        self.assertEqual((stocks[self.depot.id], stocks[self.point_vente.id], stocks[self.etrangere.id]), (8, 6, 10))
+        self.assertEqual(MouvementStock.objects.filter(type_mouvement='VENTE').count(), 3)
+        self.assertEqual(Vente.objects.get(numero_facture='F-3').client_maui, self.terminal)
+        # Rejets tracés (le doublon interne au lot n'en est pas un)
+        self.assertEqual(set(VenteRejetee.objects.values_list('vente_uid', flat=True)), {'F-4', 'F-5'})
+
+    def test_reintegration_des_rejets(self):
+        """La commande réintègre les ventes rejetées et marque toutes leurs tentatives traitées"""
+        for _ in range(2):
+            VenteRejetee.objects.create(
+                vente_uid='F-R', terminal=self.terminal, boutique=self.point_vente,
+                donnees_vente=self.vente('F-R', self.point_vente, 4), raison_rejet='OTHER',
+            )
+        call_command('ingerer_ventes', '--rejets', '--boutique', str(self.point_vente.id), stdout=StringIO())
+
+        vente = Vente.objects.get(numero_facture='F-R')
+        self.assertEqual((vente.boutique, vente.client_maui, vente.montant_total), (self.point_vente, self.terminal, 600))
+        self.assertEqual(Article.objects.get(boutique=self.point_vente).quantite_stock, 6)
+        self.assertFalse(VenteRejetee.objects.filter(traitee=False).exists())
@@ -0,0 +1,53 @@
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from inventory import instrumentation
+
+
+@override_settings(PERF_METRICS_ENABLED=True, PERF_METRICS_SAMPLE_RATE=1.0, ALLOWED_HOSTS=['*'])
+class InstrumentationTestCase(TestCase):
+    def setUp(self):
+        instrumentation.metriques.reset()
+        instrumentation.definir_taux_echantillonnage(None)
+
+    def test_requete_enregistree_par_vue(self):
+        """Une requête API est agrégée sous le nom de sa vue avec ses requêtes SQL"""
+        self.client.get('/api/v2/simple/boutiques/')
+
+        stats = instrumentation.metriques.snapshot()['vues']['api_v2_simple:boutiques_list']
+        self.assertEqual(stats['count'], 1)
+        self.assertGreaterEqual(stats['queries'], 1)
+        self.assertEqual(sum(stats['buckets']), 1)
+
+    def test_echantillonnage_nul(self):
+        """Avec un taux de 0, aucune métrique n'est collectée"""
+        instrumentation.definir_taux_echantillonnage(0)
+        self.client.get('/api/v2/simple/boutiques/')
+        self.assertEqual(instrumentation.metriques.snapshot()['vues'], {})
+
+    def test_fusion_snapshots(self):
+        """Les snapshots de plusieurs processus sont additionnés"""
+        snap = {'vues': {'v': {
+            'count': 2, 'total_ms': 30.0, 'max_ms': 20.0, 'queries': 4,
+            'max_queries': 2, 'sql_ms': 5.0, 'buckets': [1, 1] + [0] * 8,
+        }}, 'plus_lentes': []}
+        vues, _ = instrumentation.fusionner_snapshots([snap, snap])
+        self.assertEqual(vues[0]['count'], 4)
+        self.assertEqual(vues[0]['moyenne_ms'], 15.0)
+        self.assertEqual(vues[0]['p95_ms'], 25)
+
+    def test_publication_par_processus(self):
+        """Chaque processus publie sous son propre emplacement; la réinitialisation les vide"""
+        cache.clear()
+        processus = [instrumentation.MetriquesProcessus() for _ in range(2)]
+        for numero, p in enumerate(processus):
+            p.identifiant = f'hote:{numero}'
+            p.enregistrer('v', 10.0, 1, 1.0, [])
+            p.flush()
+        processus[0].flush()
+
+        publies = {s['processus'] for s in instrumentation.lire_snapshots()}
+        self.assertTrue({'hote:0', 'hote:1'} <= publies)
+        self.assertEqual(len({p.cle_cache for p in processus}), 2)
+
+        instrumentation.reinitialiser()
+        self.assertFalse({'hote:0', 'hote:1'} & {s['processus'] for s in instrumentation.lire_snapshots()})
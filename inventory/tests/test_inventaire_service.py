@@ -0,0 +1,56 @@
+from django.contrib.auth.models import User
+from django.test import TestCase
+from django.utils import timezone
+from inventory.models import Article, Boutique, Categorie, Commercant, JournalValeurStock, MouvementStock
+from inventory.services.inventaire import ouvrir_inventaire, regulariser_par_lots
+
+
+class InventaireServiceTestCase(TestCase):
+    def setUp(self):
+        user = User.objects.create_user(username='inv', password='x')
+        commercant = Commercant.objects.create(
+            nom_entreprise='Inv', nom_responsable='Inv', email='inv@example.com', user=user
+        )
+        self.boutique = Boutique.objects.create(nom='Dépôt', commercant=commercant)
+        categorie = Categorie.objects.create(nom='Catégorie Test')
+        self.articles = [
+            Article.objects.create(
+                code=f'A{i}', nom=f'Article {i}', prix_vente=100, prix_achat=0 if i == 0 else 60,
+                categorie=categorie, boutique=self.boutique, quantite_stock=10,
+            )
+            for i in range(3)
+        ]
+        self.user = user
+
+    def test_ouverture_photographie_stock(self):
+        """Une ligne par article actif, prix d'achat ou prix de vente s'il est nul"""
+        inventaire = ouvrir_inventaire(self.boutique, self.user, timezone.now().date())
+
+        self.assertEqual(inventaire.nb_articles, 3)
+        prix = dict(inventaire.lignes.values_list('article__code', 'prix_unitaire'))
+        self.assertEqual(prix['A0'], 100)
+        self.assertEqual(prix['A1'], 60)
+
+    def test_regularisation_par_lots(self):
+        """Écart saisi appliqué, article non saisi mis à zéro, un seul impact journal"""
+        inventaire = ouvrir_inventaire(self.boutique, self.user, timezone.now().date())
+        ligne = inventaire.lignes.get(article=self.articles[0])
+        ligne.stock_physique = 7
+        ligne.save()
+        ligne = inventaire.lignes.get(article=self.articles[1])
+        ligne.stock_physique = 10
+        ligne.save()
+        inventaire.statut = 'TERMINE'
+        inventaire.save()
+
+        nb = regulariser_par_lots(inventaire, taille_lot=2)
+
+        self.assertEqual(nb, 2)
+        self.assertEqual(inventaire.statut, 'REGULARISE')
+        stocks = dict(Article.objects.values_list('code', 'quantite_stock'))
+        self.assertEqual(stocks, {'A0': 7, 'A1': 10, 'A2': 0})
+        self.assertEqual(
+            MouvementStock.objects.filter(boutique=self.boutique, reference_document=f'INV-{inventaire.id}').count(), 2
+        )
+        journal = JournalValeurStock.objects.get(boutique=self.boutique)
+        self.assertEqual(journal.montant_inventaire, -1300)
@@ -0,0 +1,66 @@
+from decimal import Decimal
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.test import TestCase
+from django.urls import reverse
+from inventory.models import ApprovisionnementCredit, Boutique, Collaborateur, Commercant, StockCredit
+from inventory.services.parametres import acces_utilisateur, parametres_boutique, vider_cache_local
+
+
+class ParametresCacheTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+        vider_cache_local()
+        self.user = User.objects.create_user(username='param', password='x')
+        self.commercant = Commercant.objects.create(
+            nom_entreprise='Param', nom_responsable='Param', email='param@example.com', user=self.user
+        )
+        self.boutique = Boutique.objects.create(nom='Centre', commercant=self.commercant)
+        self.autre = Boutique.objects.create(nom='Marché', commercant=self.commercant)
+
+    def test_parametres_en_cache_et_versions(self):
+        """Lecture sans requête en régime établi; save() périme les paramètres"""
+        self.assertEqual(parametres_boutique(self.boutique.id).taux_dollar_commercant, Decimal('2800'))
+        self.assertTrue(acces_utilisateur(self.user.pk).est_commercant)
+        with self.assertNumQueries(0):
+            parametres_boutique(self.boutique.id)
+            acces_utilisateur(self.user.pk)
+
+        self.commercant.taux_dollar = Decimal('2900')
+        self.commercant.save(update_fields=['taux_dollar'])
+        self.boutique.pos_autorise = False
+        self.boutique.save()
+
+        parametres = parametres_boutique(self.boutique.id)
+        self.assertEqual(parametres.taux_dollar_commercant, Decimal('2900'))
+        self.assertFalse(parametres.pos_autorise)
+        self.assertIsNone(parametres_boutique(999999))
+
+    def test_collaborateur_boutiques_autorisees(self):
+        user = User.objects.create_user(username='collab', password='x')
+        collaborateur = Collaborateur.objects.create(user=user, commercant=self.commercant, nom_complet='Collab')
+        self.assertTrue(collaborateur.peut_acceder_boutique(self.autre))
+
+        collaborateur.boutiques_autorisees.add(self.boutique)
+        self.assertTrue(collaborateur.peut_acceder_boutique(self.boutique))
+        self.assertFalse(collaborateur.peut_acceder_boutique(self.autre))
+
+    def test_decorateur_boutique_access(self):
+        self.client.force_login(self.user)
+        url = reverse('inventory:api_ca_jour_boutique', args=[self.boutique.id])
+        self.assertEqual(self.client.get(url, HTTP_HOST='localhost').status_code, 200)
+
+        intrus = User.objects.create_user(username='intrus', password='x')
+        Commercant.objects.create(nom_entreprise='Intrus', nom_responsable='I', email='i@example.com', user=intrus)
+        self.client.force_login(intrus)
+        self.assertEqual(self.client.get(url, HTTP_HOST='localhost').status_code, 404)
+
+    def test_approvisionnement_credit(self):
+        """Un flash de crédit s'enregistre et alimente le stock (ce n'est pas un paramètre)"""
+        ApprovisionnementCredit.objects.create(
+            boutique=self.boutique, operateur='VODACOM', unites=10000, cout_achat=9500
+        )
+        stock = StockCredit.objects.get(boutique=self.boutique, operateur='VODACOM')
+        self.assertEqual(stock.unites_disponibles, 10000)
+        self.assertEqual(stock.cout_total_achats, 9500)
@@ -0,0 +1,35 @@
+from datetime import datetime, timedelta
+from io import StringIO
+
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.test import TestCase
+from django.utils import timezone
+from inventory.models import Article, Boutique, Commercant, MouvementStock
+from inventory.services.partitions import debut_mois, est_partitionnee, mois_suivant, nom_partition
+
+
+class PartitionsMensuellesTestCase(TestCase):
+    def test_bornes_mensuelles(self):
+        """Mois en heure de Kinshasa, passage d'année"""
+        debut = debut_mois(timezone.make_aware(datetime(2026, 12, 31, 23, 30)))
+        self.assertEqual((debut.year, debut.month, debut.day, debut.hour), (2026, 12, 1, 0))
+        self.assertEqual(mois_suivant(debut).date().isoformat(), '2027-01-01')
+        self.assertEqual(nom_partition('inventory_mouvementstock', debut), 'inventory_mouvementstock_p202612')
+
+    def test_purge_sans_partitionnement(self):
+        """SQLite: tables normales, la purge reste un DELETE des mouvements de plus de 3 mois"""
+        user = User.objects.create_user(username='part', password='x')
+        commercant = Commercant.objects.create(
+            nom_entreprise='P', nom_responsable='P', email='part@example.com', user=user
+        )
+        boutique = Boutique.objects.create(nom='Partitions', commercant=commercant)
+        article = Article.objects.create(code='P1', nom='P1', prix_achat=1, prix_vente=2, boutique=boutique)
+        MouvementStock.objects.all().delete()
+        ancien = MouvementStock.objects.create(article=article, type_mouvement='ENTREE', quantite=5)
+        MouvementStock.objects.filter(id=ancien.id).update(date_mouvement=timezone.now() - timedelta(days=120))
+        MouvementStock.objects.create(article=article, type_mouvement='ENTREE', quantite=3)
+
+        self.assertFalse(est_partitionnee(MouvementStock._meta.db_table))
+        call_command('purge_mouvements_stock', stdout=StringIO())
+        self.assertEqual(list(MouvementStock.objects.values_list('quantite', flat=True)), [3])
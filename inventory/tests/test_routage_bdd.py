@@ -0,0 +1,40 @@
+from unittest import mock
+
+from django.conf import settings
+from django.test import SimpleTestCase
+from inventory.models import Vente
+from inventory.routage_bdd import RouteurReporting, lecture_replique, requete_routee
+
+
+class RoutageBddTestCase(SimpleTestCase):
+    routeur = RouteurReporting()
+
+    def lecture(self):
+        return self.routeur.db_for_read(Vente)
+
+    def test_sans_replique(self):
+        """Sans alias 'reporting' configuré, les vues marquées lisent sur 'default'"""
+        with mock.patch.dict(settings.DATABASES):
+            settings.DATABASES.pop('reporting', None)
+            with lecture_replique():
+                self.assertEqual(self.lecture(), 'default')
+
+    def test_replique_collante_apres_ecriture(self):
+        """Opt-in vers la réplique, retour sur 'default' après une écriture de la même requête"""
+        @lecture_replique
+        def rapport():
+            return self.lecture()
+
+        with mock.patch.dict(settings.DATABASES, reporting=settings.DATABASES['default']):
+            self.assertEqual(self.lecture(), 'default')
+            self.assertEqual(rapport(), 'reporting')
+
+            with requete_routee():
+                self.assertEqual(rapport(), 'reporting')
+                self.assertEqual(self.routeur.db_for_write(Vente), 'default')
+                self.assertEqual(rapport(), 'default')
+
+            # Requête suivante: l'écriture précédente ne compte plus
+            with requete_routee():
+                self.assertEqual(rapport(), 'reporting')
+            self.assertFalse(self.routeur.allow_migrate('reporting', 'inventory'))
@@ -0,0 +1,118 @@
+from unittest import mock
+
+from django.db import connection
+from django.db.models.signals import post_save
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from inventory.api_views_v2_simple import sorties_deja_journalisees
+from inventory.models import Article, Categorie, MouvementStock, VarianteArticle, Vente
+from inventory.services.stock import (
+    decrementer_stocks, enregistrer_sorties_vente, notifier_stocks_apres_commit, sortie_deja_journalisee,
+    stocks_effectifs, StockInsuffisant,
+)
+
+
+class DecrementStockTestCase(TestCase):
+    def setUp(self):
+        categorie = Categorie.objects.create(nom='Catégorie Test')
+        self.pain = Article.objects.create(
+            code='PAIN', nom='Pain', prix_vente=500, prix_achat=300, categorie=categorie, quantite_stock=10
+        )
+        self.carte = Article.objects.create(
+            code='CARTE', nom='Carte', prix_vente=1000, prix_achat=900, categorie=categorie, quantite_stock=1
+        )
+
+    def test_lot_avec_article_repete(self):
+        """Un article présent sur deux lignes (2 variantes) est décrémenté ligne après ligne"""
+        resultats = decrementer_stocks([(self.pain.id, 3), (self.carte.id, 2), (self.pain.id, 4)])
+
+        self.assertEqual(resultats, [(10, 7), (1, -1), (7, 3)])
+        self.pain.refresh_from_db()
+        self.carte.refresh_from_db()
+        self.assertEqual(self.pain.quantite_stock, 3)
+        self.assertEqual(self.carte.quantite_stock, -1)
+
+    def test_plancher_zero(self):
+        """Le stock ne descend pas sous 0 et stock_avant reste exact"""
+        resultats = decrementer_stocks([(self.carte.id, 3)], plancher_zero=True)
+
+        self.assertEqual(resultats, [(1, 0)])
+        self.carte.refresh_from_db()
+        self.assertEqual(self.carte.quantite_stock, 0)
+
+    def test_strict_tout_ou_rien(self):
+        """En mode strict, un stock insuffisant n'applique aucun décrément"""
+        with self.assertRaises(StockInsuffisant) as ctx:
+            decrementer_stocks([(self.pain.id, 1), (self.carte.id, 2)], strict=True)
+
+        self.assertEqual(ctx.exception.article_ids, [self.carte.id])
+        self.pain.refresh_from_db()
+        self.assertEqual(self.pain.quantite_stock, 10)
+
+    def test_repli_sans_returning(self):
+        """Base sans UPDATE ... RETURNING (MySQL, SQLite < 3.35): mêmes résultats par article"""
+        with mock.patch.object(connection, 'vendor', 'mysql'):
+            resultats = decrementer_stocks([(self.pain.id, 3), (self.carte.id, 2), (self.pain.id, 4)])
+
+        self.assertEqual(resultats, [(10, 7), (1, -1), (7, 3)])
+        self.pain.refresh_from_db()
+        self.assertEqual(self.pain.quantite_stock, 3)
+
+
+class SortiesVenteTestCase(TestCase):
+    def test_variantes_du_meme_parent(self):
+        """Deux variantes d'un parent: compteurs de variantes, parent non verrouillé par la vente, report après commit"""
+        parent = Article.objects.create(code='TSHIRT', nom='T-shirt', prix_vente=5000, prix_achat=3000, quantite_stock=10)
+        rouge, bleu = (
+            VarianteArticle.objects.create(article_parent=parent, code_barre=f'TS-{nom}', nom_variante=nom)
+            for nom in ('Rouge', 'Bleu')
+        )
+        vente = Vente.objects.create(numero_facture='VAR-1', montant_total=15000)
+        sorties = [
+            {'article': parent, 'variante': rouge, 'quantite': 1, 'commentaire': 'Rouge'},
+            {'article': parent, 'variante': bleu, 'quantite': 2, 'commentaire': 'Bleu'},
+        ]
+        recepteur = mock.Mock()
+        post_save.connect(recepteur, sender=MouvementStock)
+        self.addCleanup(post_save.disconnect, recepteur, sender=MouvementStock)
+
+        with mock.patch('inventory.websocket_utils.notify_stock_updated') as notification:
+            with self.captureOnCommitCallbacks(execute=True):
+                with CaptureQueriesContext(connection) as requetes:
+                    enregistrer_sorties_vente(vente, sorties, 'caisse')
+                    notifier_stocks_apres_commit(1, sorties)
+                # Dans la transaction de la vente: un UPDATE des variantes, aucun sur le parent
+                self.assertEqual(stocks_effectifs([parent.id]), {parent.id: 7})
+                self.assertEqual(Article.objects.get(pk=parent.pk).quantite_stock, 10)
+
+        ecritures = [q['sql'].split(' SET ')[0] for q in requetes if q['sql'].startswith(('UPDATE', 'INSERT'))]
+        self.assertEqual(ecritures.count('UPDATE "inventory_variantearticle"'), 1)
+        self.assertNotIn('UPDATE "inventory_article"', ecritures)
+        self.assertEqual(len([e for e in ecritures if e.startswith('INSERT INTO "inventory_mouvementstock"')]), 1)
+        self.assertEqual(recepteur.call_count, 2)
+        self.assertEqual([(s['stock_avant'], s['stock_apres']) for s in sorties], [(10, 9), (9, 7)])
+        self.assertEqual(
+            sorted(MouvementStock.objects.filter(reference_document='VAR-1').values_list('variante_id', 'quantite')),
+            sorted([(rouge.id, -1), (bleu.id, -2)]),
+        )
+        # Après commit: agrégat reporté sur le parent, compteurs remis à zéro
+        self.assertEqual(Article.objects.get(pk=parent.pk).quantite_stock, 7)
+        self.assertFalse(VarianteArticle.objects.exclude(variation_en_attente=0).exists())
+        notification.assert_called_once_with(1, parent.id, 7)
+
+    def test_sortie_journalisee_avant_variante_id(self):
+        """Mouvement antérieur à la migration 0065 (variante_id NULL): variante retrouvée par le commentaire"""
+        parent = Article.objects.create(code='PAGNE', nom='Pagne', prix_vente=5000, prix_achat=3000, quantite_stock=10)
+        rouge, bleu = (
+            VarianteArticle.objects.create(article_parent=parent, code_barre=f'PG-{nom}', nom_variante=nom)
+            for nom in ('Rouge', 'Bleu')
+        )
+        MouvementStock.objects.create(
+            article=parent, type_mouvement='VENTE', quantite=-1, reference_document='ANC-1',
+            commentaire="Vente #ANC-1 - Variante: Rouge - Prix: 5000 CDF",
+        )
+
+        deja = sorties_deja_journalisees('ANC-1')
+        self.assertTrue(sortie_deja_journalisee(deja, parent, rouge))
+        self.assertFalse(sortie_deja_journalisee(deja, parent, bleu))
+        self.assertTrue(sortie_deja_journalisee(deja, parent))
@@ -0,0 +1,74 @@
+from datetime import timedelta
+from decimal import Decimal
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.test import TestCase
+from django.utils import timezone
+from inventory.models import Article, Boutique, Categorie, Commercant, MouvementStock
+from inventory.services.valeur_stock import articles_par_valeur, valeur_stock, valeur_stock_a_date
+
+
+class ValeurStockTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+        user = User.objects.create_user(username='vs', password='x')
+        commercant = Commercant.objects.create(
+            nom_entreprise='VS', nom_responsable='VS', email='vs@example.com', user=user
+        )
+        self.boutique = Boutique.objects.create(nom='Valeur', commercant=commercant)
+        boissons = Categorie.objects.create(nom='Boissons')
+        epicerie = Categorie.objects.create(nom='Épicerie')
+        self.riz = Article.objects.create(
+            code='RIZ', nom='Riz', prix_achat=1000, prix_vente=1500, quantite_stock=10,
+            categorie=epicerie, boutique=self.boutique,
+        )
+        Article.objects.create(
+            code='JUS', nom='Jus', prix_achat=2, prix_vente=3, quantite_stock=5, devise='USD',
+            categorie=boissons, boutique=self.boutique,
+        )
+        Article.objects.create(
+            code='NEG', nom='Négatif', prix_achat=100, prix_vente=200, quantite_stock=-4,
+            categorie=epicerie, boutique=self.boutique,
+        )
+
+    def test_valorisation_par_devise_et_categorie(self):
+        """CDF et USD séparés, stock négatif ignoré, détail par catégorie"""
+        valorisation = valeur_stock(self.boutique)
+        self.assertEqual(valorisation.achat('CDF'), Decimal('10000'))
+        self.assertEqual(valorisation.vente('CDF'), Decimal('15000'))
+        self.assertEqual(valorisation.vente('USD'), Decimal('15'))
+        self.assertEqual(valorisation.devise('CDF').nb_articles, 1)
+        noms = {c['nom']: c['par_devise'] for c in valorisation.par_categorie.values()}
+        self.assertEqual(noms['Boissons']['USD'].achat, Decimal('10'))
+        self.assertEqual(articles_par_valeur(self.boutique, seuil=1000)[0]['code'], 'RIZ')
+
+    def test_cache_invalide_par_les_changements_de_stock(self):
+        """Deuxième lecture servie par le cache; un mouvement de stock l'invalide"""
+        valeur_stock(self.boutique)
+        with self.assertNumQueries(0):
+            self.assertEqual(valeur_stock(self.boutique).vente('CDF'), Decimal('15000'))
+
+        # Invalidation après commit: dans la transaction, la valeur en cache reste servie
+        with self.captureOnCommitCallbacks(execute=True):
+            self.riz.quantite_stock = 20
+            self.riz.save()
+            with self.assertNumQueries(0):
+                valeur_stock(self.boutique)
+        self.assertEqual(valeur_stock(self.boutique).vente('CDF'), Decimal('30000'))
+
+        valeur_stock(self.boutique)
+        with self.captureOnCommitCallbacks(execute=True):
+            MouvementStock.objects.create(article=self.riz, type_mouvement='AJUSTEMENT', quantite=0)
+        with self.assertNumQueries(1):
+            valeur_stock(self.boutique)
+
+    def test_valeur_a_date(self):
+        """Le stock passé est reconstitué depuis les mouvements postérieurs"""
+        avant = timezone.now() - timedelta(minutes=1)
+        MouvementStock.objects.create(
+            article=self.riz, type_mouvement='SORTIE', quantite=4, stock_avant=14, stock_apres=10
+        )
+        MouvementStock.objects.create(article=self.riz, type_mouvement='ENTREE', quantite=2)
+        # 10 actuels - (-4) - 2 = 12 unités à la date
+        self.assertEqual(valeur_stock_a_date([self.boutique], avant).achat('CDF'), Decimal('12000'))
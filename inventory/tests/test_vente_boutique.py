@@ -0,0 +1,31 @@
+from django.contrib.auth.models import User
+from django.test import TestCase
+from inventory.models import Boutique, Client, Commercant, Vente
+
+
+class VenteBoutiqueTestCase(TestCase):
+    def setUp(self):
+        user = User.objects.create_user(username='vb', password='x')
+        commercant = Commercant.objects.create(
+            nom_entreprise='VB', nom_responsable='VB', email='vb@example.com', user=user
+        )
+        self.boutique = Boutique.objects.create(nom='Centre', commercant=commercant)
+        self.autre = Boutique.objects.create(nom='Marché', commercant=commercant)
+        self.terminal = Client.objects.create(
+            compte_proprietaire=user, boutique=self.boutique, nom_terminal='Caisse 1', numero_serie='VB-001'
+        )
+
+    def test_boutique_deduite_du_terminal(self):
+        """Une vente créée sans boutique prend celle de son terminal MAUI"""
+        vente = Vente.objects.create(numero_facture='F-1', montant_total=1000, client_maui=self.terminal)
+
+        self.assertEqual(vente.boutique_id, self.boutique.id)
+        self.assertEqual(Vente.objects.get(pk=vente.pk).boutique_id, self.boutique.id)
+
+    def test_de_boutique(self):
+        """Filtre par boutique unique ou par liste de boutiques"""
+        Vente.objects.create(numero_facture='F-1', montant_total=1000, client_maui=self.terminal)
+        Vente.objects.create(numero_facture='F-2', montant_total=500, boutique=self.autre)
+
+        self.assertEqual(list(Vente.objects.de_boutique(self.boutique).values_list('numero_facture', flat=True)), ['F-1'])
+        self.assertEqual(Vente.objects.de_boutique(Boutique.objects.all()).count(), 2)
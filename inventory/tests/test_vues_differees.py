@@ -0,0 +1,25 @@
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import SimpleTestCase
+from django.urls import get_resolver
+from inventory.vues_differees import VueDifferee
+
+
+class VuesDiffereesTestCase(SimpleTestCase):
+    def test_vues_differees_existent(self):
+        """Chaque vue différée de inventory.urls existe (faute de frappe = échec ici, pas au premier appel)"""
+        resolver = get_resolver()
+        differees = [
+            p.callback for inclus in resolver.url_patterns if getattr(inclus, 'urlconf_name', None)
+            for p in getattr(inclus, 'url_patterns', []) if isinstance(p.callback, VueDifferee)
+        ]
+        self.assertGreater(len(differees), 100)
+        for vue in differees:
+            self.assertTrue(callable(vue.charger()), repr(vue))
+
+    def test_demarrage_sans_dependances_lourdes(self):
+        """Processus neuf: ni ReportLab, ni openpyxl, ni PIL importés par setup + URLs"""
+        sortie = StringIO()
+        call_command('temps_imports', '--prefixe', 'inventory', stdout=sortie)
+        self.assertIn('inventory.models', sortie.getvalue())
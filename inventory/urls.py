@@ -1,15 +1,18 @@
 from django.urls import path
-from . import views
-from . import admin_views
-from . import views_commercant
-from . import views_mobile_money
-from . import views_bilan
-from . import views_collaborateurs
-from . import views_pin_login
-from . import views_auto_assign
-from . import views_modifier_vente
-from . import views_reset_inventaire
-from . import views_credit
+from .vues_differees import module_differe
+
+# Modules de vues importés au premier appel (voir vues_differees.py)
+views = module_differe('inventory.views')
+admin_views = module_differe('inventory.admin_views')
+views_commercant = module_differe('inventory.views_commercant')
+views_mobile_money = module_differe('inventory.views_mobile_money')
+views_bilan = module_differe('inventory.views_bilan')
+views_collaborateurs = module_differe('inventory.views_collaborateurs')
+views_pin_login = module_differe('inventory.views_pin_login')
+views_auto_assign = module_differe('inventory.views_auto_assign')
+views_modifier_vente = module_differe('inventory.views_modifier_vente')
+views_reset_inventaire = module_differe('inventory.views_reset_inventaire')
+views_credit = module_differe('inventory.views_credit')
 
 app_name = 'inventory'
 
@@ -66,6 +69,7 @@ urlpatterns = [
     path('superadmin/boutiques/<int:boutique_id>/toggle-pos/', admin_views.toggle_boutique_pos_admin, name='admin_toggle_boutique_pos'),
     path('superadmin/diagnostic-api/', admin_views.diagnostic_api, name='admin_diagnostic_api'),
     path('superadmin/statistiques-systeme/', admin_views.statistiques_systeme, name='admin_statistiques_systeme'),
+    path('superadmin/performance/', admin_views.performance_systeme, name='admin_performance_systeme'),
     path('superadmin/erreurs-transactions/', admin_views.liste_erreurs_transactions, name='admin_liste_erreurs_transactions'),
     path('superadmin/erreurs-transactions/<int:erreur_id>/', admin_views.detail_erreur_transaction, name='admin_detail_erreur_transaction'),
     path('superadmin/ventes-rejetees/', admin_views.admin_ventes_rejetees, name='admin_ventes_rejetees'),
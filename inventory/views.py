@@ -4,18 +4,19 @@ from django.contrib.auth import authenticate, login, logout, update_session_auth
 from django.contrib.auth.decorators import login_required, user_passes_test
 from django.contrib.auth.forms import PasswordChangeForm
 from django.contrib.auth.models import User
-from django.http import HttpResponse, JsonResponse
+from django.http import FileResponse, Http404, HttpResponse, JsonResponse
 from django.views.decorators.csrf import csrf_exempt
 from django.views.decorators.http import require_http_methods
 from .models import Categorie, Article, Vente, LigneVente, MouvementStock, Client, SessionClientMaui, Boutique, Commercant
 from django.db.models import Sum, Count, F
 from datetime import datetime, timedelta
+from io import BytesIO
 from .forms import ArticleForm, CategorieForm
 from .user_forms import UserCreateForm, UserEditForm
-from .utils import generate_qr_codes_pdf
 from django.core.paginator import Paginator
 from django.utils import timezone
 from .services.deepseek_service import DeepSeekService
+from .services.parametres import acces_utilisateur
 
 # Create your views here.
 
@@ -446,18 +447,50 @@ def change_password(request):
 
 @login_required
 def generate_qr_pdf(request):
-    """Vue pour générer un PDF contenant tous les codes QR des articles avec leur nom."""
-    # Récupérer tous les articles
-    articles = Article.objects.all().order_by('nom')
-    
-    # Générer le PDF
-    pdf = generate_qr_codes_pdf(articles)
-    
-    # Créer la réponse HTTP avec le contenu PDF
-    response = HttpResponse(pdf, content_type='application/pdf')
-    response['Content-Disposition'] = 'attachment; filename="catalogue_codes_qr.pdf"'
-    
-    return response
+    """
+    Planche PDF des codes QR (ou codes-barres: ?format=code128) des articles.
+    Filtres GET: boutique, categorie, search, inactifs=1. Sans boutique: toutes les
+    boutiques accessibles (toutes pour le super admin).
+    """
+    from .services.etiquettes import FORMATS, articles_etiquettes, planche_etiquettes
+
+    boutique_id = request.GET.get('boutique')
+    if request.user.is_superuser:
+        boutiques = Boutique.objects.all()
+    else:
+        # Commerçant: ses boutiques; collaborateur actif: celles du commerçant (boutiques_autorisees)
+        acces = acces_utilisateur(request.user.pk, request.user)
+        if acces.a_un_profil and acces.actif:
+            boutiques = Boutique.objects.filter(commercant_id=acces.commercant_id)
+            if acces.boutiques_autorisees is not None:
+                boutiques = boutiques.filter(id__in=acces.boutiques_autorisees)
+        else:
+            boutiques = Boutique.objects.none()
+    if boutique_id:
+        if not boutique_id.isdigit():
+            raise Http404("Boutique introuvable")
+        boutique = get_object_or_404(boutiques, id=boutique_id)
+        boutique_ids = [boutique.id]
+    else:
+        boutique = None
+        boutique_ids = None if request.user.is_superuser else list(boutiques.values_list('id', flat=True))
+
+    format_etiquette = request.GET.get('format', 'qr')
+    if format_etiquette not in FORMATS:
+        format_etiquette = 'qr'
+    categorie_id = request.GET.get('categorie', '')
+    articles = articles_etiquettes(
+        boutique_ids,
+        categorie_id=categorie_id if categorie_id.isdigit() else None,
+        recherche=request.GET.get('search', '').strip(),
+        actifs_seulement=request.GET.get('inactifs') != '1',
+    )
+    titre = f"{FORMATS[format_etiquette]['titre']} - {boutique.nom}" if boutique else None
+    pdf = planche_etiquettes(articles, format_etiquette, titre)
+
+    # Envoi par blocs (FileResponse): la planche peut peser plusieurs Mo
+    nom_fichier = 'catalogue_codes_qr.pdf' if format_etiquette == 'qr' else 'catalogue_codes_barres.pdf'
+    return FileResponse(BytesIO(pdf), as_attachment=True, filename=nom_fichier, content_type='application/pdf')
 
 
 @login_required
@@ -4,10 +4,11 @@
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
-from django.http import JsonResponse, HttpResponse
+from django.http import JsonResponse, HttpResponse, HttpResponseForbidden, Http404
 from django.db.models import Q, Sum, Count, F, Avg, Max, Min, Prefetch, ExpressionWrapper, DecimalField as OrmDecimalField
 from django.db import transaction
 from django.utils import timezone
+from django.utils.functional import SimpleLazyObject
 from django.core.paginator import Paginator, PageNotAnInteger, EmptyPage
 from django.views.decorators.http import require_POST
 from django.core.cache import cache
@@ -16,11 +17,17 @@ from datetime import datetime, timedelta
 import json
 import csv
 from io import BytesIO
-from reportlab.lib.pagesizes import A4
-from reportlab.pdfgen import canvas
-from reportlab.lib.units import cm
 from .models import Commercant, Boutique, Article, Vente, LigneVente, MouvementStock, Client, RapportCaisse, ArticleNegocie, RetourArticle, VenteRejetee, TransfertStock, VarianteArticle, Fournisseur, FactureApprovisionnement, LigneApprovisionnement, Categorie, Inventaire, LigneInventaire, AlerteStock, JournalValeurStock, HistoriqueSaisieInventaire, TelechargementRapportMensuel
 from .forms import BoutiqueForm, ArticleForm, VarianteArticleForm
+from .services.inventaire import ouvrir_inventaire, regulariser_par_lots
+from .services.comptage_inventaire import InventaireFerme, appliquer_comptages
+from .services.analyse_mouvements import analyser_mouvements, invalider_analyse
+from .services.approvisionnement import derniers_approvisionnements
+from .services.compteurs_jour import compteurs as compteurs_jour
+from .services.parametres import acces_utilisateur, parametres_boutique
+from .services.valeur_stock import invalider_valeur_stock, valoriser
+from .services.images import url_image_sync
+from .routage_bdd import lecture_replique
 import json
 import io
 
@@ -37,45 +44,34 @@ def commercant_required(view_func):
         if not request.user.is_authenticated:
             return redirect('inventory:login_commercant')
         
-        try:
-            # Essayer d'abord comme commerçant
-            commercant = request.user.profil_commercant
-            if not commercant.est_actif:
-                messages.error(request, "Votre compte commerçant est désactivé.")
-                return redirect('inventory:login_commercant')
-            return view_func(request, *args, **kwargs)
-        except Commercant.DoesNotExist:
-            # Si pas commerçant, vérifier si c'est un collaborateur
-            try:
-                from .models import Collaborateur
-                collaborateur = Collaborateur.objects.get(user=request.user, est_actif=True)
-                # Les collaborateurs ont accès
-                return view_func(request, *args, **kwargs)
-            except Collaborateur.DoesNotExist:
-                messages.error(request, "Vous n'avez pas de profil commerçant ou collaborateur.")
-                return redirect('inventory:login_commercant')
+        # Profil lu dans le cache des paramètres (aucune requête en régime établi)
+        acces = acces_utilisateur(request.user.pk, request.user)
+        if acces.est_commercant and not acces.actif:
+            messages.error(request, "Votre compte commerçant est désactivé.")
+            return redirect('inventory:login_commercant')
+        if not acces.actif:
+            messages.error(request, "Vous n'avez pas de profil commerçant ou collaborateur.")
+            return redirect('inventory:login_commercant')
+        return view_func(request, *args, **kwargs)
     return wrapper
 
 def boutique_access_required(view_func):
     """Décorateur pour vérifier l'accès à une boutique spécifique (commerçant ou collaborateur)"""
     def wrapper(request, boutique_id, *args, **kwargs):
-        try:
-            # Essayer d'abord comme commerçant
-            commercant = request.user.profil_commercant
-            boutique = get_object_or_404(Boutique, id=boutique_id, commercant=commercant)
-            request.boutique = boutique
-            return view_func(request, boutique_id, *args, **kwargs)
-        except Commercant.DoesNotExist:
-            # Si pas commerçant, essayer comme collaborateur
-            try:
-                from .models import Collaborateur
-                collaborateur = Collaborateur.objects.get(user=request.user, est_actif=True)
-                boutique = get_object_or_404(Boutique, id=boutique_id, commercant=collaborateur.commercant)
-                request.boutique = boutique
-                request.collaborateur = collaborateur  # Ajouter le collaborateur à la requête
-                return view_func(request, boutique_id, *args, **kwargs)
-            except Collaborateur.DoesNotExist:
-                return HttpResponseForbidden("Accès non autorisé")
+        acces = acces_utilisateur(request.user.pk, request.user)
+        if not acces.a_un_profil or (not acces.est_commercant and not acces.actif):
+            return HttpResponseForbidden("Accès non autorisé")
+        parametres = parametres_boutique(boutique_id)
+        if parametres is None or parametres.commercant_id != acces.commercant_id:
+            raise Http404("Boutique introuvable")
+        
+        # Autorisation et réglages depuis le cache; l'instance n'est chargée que si la vue l'utilise
+        request.parametres_boutique = parametres
+        request.boutique = SimpleLazyObject(lambda: Boutique.objects.get(pk=parametres.id))
+        if not acces.est_commercant:
+            from .models import Collaborateur
+            request.collaborateur = SimpleLazyObject(lambda: Collaborateur.objects.get(pk=acces.collaborateur_id))
+        return view_func(request, boutique_id, *args, **kwargs)
     return wrapper
 
 # ===== AUTHENTIFICATION =====
@@ -130,17 +126,14 @@ def dashboard_commercant(request):
     
     # Ajouter les statistiques pour chaque dépôt
     depots_list = list(depots)
+    # Valorisation de toutes les boutiques et dépôts (une requête groupée, en cache)
+    valorisations = valoriser(depots_list + boutiques_list)
     for depot in depots_list:
         articles_depot = depot.articles.filter(est_actif=True)
         depot.nb_articles = articles_depot.count()
-        # Valeur stock en CDF (articles avec devise CDF)
-        depot.valeur_stock_cdf = articles_depot.filter(devise='CDF').aggregate(
-            total=Sum(F('quantite_stock') * F('prix_achat'))
-        )['total'] or 0
-        # Valeur stock en USD (articles avec devise USD)
-        depot.valeur_stock_usd = articles_depot.filter(devise='USD').aggregate(
-            total=Sum(F('quantite_stock') * F('prix_achat'))
-        )['total'] or 0
+        # Valeur stock au prix d'achat, CDF et USD séparés
+        depot.valeur_stock_cdf = valorisations[depot.id].achat('CDF')
+        depot.valeur_stock_usd = valorisations[depot.id].achat('USD')
         # Valeur totale pour compatibilité
         depot.valeur_stock = depot.valeur_stock_cdf
         depot.nb_transferts_mois = TransfertStock.objects.filter(
@@ -170,12 +163,11 @@ def dashboard_commercant(request):
 
     for boutique in boutiques:
         try:
-            ventes_boutique = Vente.objects.filter(
-                Q(boutique=boutique) | Q(client_maui__boutique=boutique),
+            ventes_boutique = Vente.objects.de_boutique(boutique).filter(
                 date_vente__gte=date_debut,
                 paye=True,
                 est_annulee=False
-            ).distinct()
+            )
             nb_ventes = ventes_boutique.count()
             # CDF et USD séparés — ne jamais mélanger
             ca_cdf = ventes_boutique.filter(devise='CDF').aggregate(total=Sum('montant_total'))['total'] or 0
@@ -186,17 +178,8 @@ def dashboard_commercant(request):
             ca_usd = 0
 
         # Valeur stock de cette boutique (prix_vente, identique au dashboard PDV)
-        try:
-            arts = boutique.articles.filter(est_actif=True, quantite_stock__gt=0)
-            boutique.stock_cdf = arts.filter(devise='CDF').aggregate(
-                total=Sum(F('quantite_stock') * F('prix_vente'))
-            )['total'] or 0
-            boutique.stock_usd = arts.filter(devise='USD').aggregate(
-                total=Sum(F('quantite_stock') * F('prix_vente'))
-            )['total'] or 0
-        except Exception:
-            boutique.stock_cdf = 0
-            boutique.stock_usd = 0
+        boutique.stock_cdf = valorisations[boutique.id].vente('CDF')
+        boutique.stock_usd = valorisations[boutique.id].vente('USD')
 
         # Annoter l'objet boutique pour l'utiliser directement dans le template
         boutique.ca_30j_cdf = ca_cdf
@@ -215,12 +198,11 @@ def dashboard_commercant(request):
         total_ventes += nb_ventes
     
     # Recette du jour - Séparation CDF et USD
-    ventes_jour = Vente.objects.filter(
-        Q(boutique__in=boutiques) | Q(client_maui__boutique__in=boutiques),
+    ventes_jour = Vente.objects.de_boutique(boutiques).filter(
         date_vente__date=aujourd_hui,
         paye=True,
         est_annulee=False
-    ).distinct()
+    )
     
     # Recette CDF du jour (ventes en CDF uniquement)
     ventes_jour_cdf = ventes_jour.filter(devise='CDF')
@@ -235,12 +217,11 @@ def dashboard_commercant(request):
     ca_jour = ca_jour_cdf
     
     # Recette 30 jours - Séparation CDF et USD
-    ventes_30j = Vente.objects.filter(
-        Q(boutique__in=boutiques) | Q(client_maui__boutique__in=boutiques),
+    ventes_30j = Vente.objects.de_boutique(boutiques).filter(
         date_vente__gte=date_debut,
         paye=True,
         est_annulee=False
-    ).distinct()
+    )
     
     # Recette CDF 30 jours
     ventes_30j_cdf = ventes_30j.filter(devise='CDF')
@@ -253,31 +234,12 @@ def dashboard_commercant(request):
     # Valeur stock PDV — CDF et USD séparés, jamais mélangés
     # Utilise prix_vente (identique au dashboard PDV par boutique)
     # Les articles transférés depuis dépôt ont prix_achat=0, donc prix_vente est la référence correcte
-    stock_pdv_base = Article.objects.filter(
-        boutique__commercant=commercant,
-        boutique__est_depot=False,
-        est_actif=True,
-        quantite_stock__gt=0,
-    )
-    valeur_pdv_cdf = stock_pdv_base.filter(devise='CDF').aggregate(
-        total=Sum(F('quantite_stock') * F('prix_vente'))
-    )['total'] or 0
-    valeur_pdv_usd = stock_pdv_base.filter(devise='USD').aggregate(
-        total=Sum(F('quantite_stock') * F('prix_vente'))
-    )['total'] or 0
+    valeur_pdv_cdf = sum(valorisations[b.id].vente('CDF') for b in boutiques_list)
+    valeur_pdv_usd = sum(valorisations[b.id].vente('USD') for b in boutiques_list)
 
-    # Valeur stock Dépôts — CDF et USD séparés
-    stock_depots_base = Article.objects.filter(
-        boutique__commercant=commercant,
-        boutique__est_depot=True,
-        est_actif=True,
-    )
-    valeur_depots_cdf = stock_depots_base.filter(devise='CDF').aggregate(
-        total=Sum(F('quantite_stock') * F('prix_achat'))
-    )['total'] or 0
-    valeur_depots_usd = stock_depots_base.filter(devise='USD').aggregate(
-        total=Sum(F('quantite_stock') * F('prix_achat'))
-    )['total'] or 0
+    # Valeur stock Dépôts (prix d'achat) — CDF et USD séparés
+    valeur_depots_cdf = sum(d.valeur_stock_cdf for d in depots_list)
+    valeur_depots_usd = sum(d.valeur_stock_usd for d in depots_list)
 
     # Dépenses totales de toutes les boutiques (rapports de caisse en CDF) sur le mois en cours
     depenses_qs = RapportCaisse.objects.filter(
@@ -297,7 +259,7 @@ def dashboard_commercant(request):
     # 💰 NÉGOCIATIONS - Statistiques des prix négociés ce mois
     from .models import LigneVente
     lignes_negociees_mois = LigneVente.objects.filter(
-        Q(vente__boutique__in=boutiques) | Q(vente__client_maui__boutique__in=boutiques),
+        vente__boutique__in=boutiques,
         vente__date_vente__gte=debut_mois,
         est_negocie=True
     ).aggregate(
@@ -420,12 +382,11 @@ def detail_boutique(request, boutique_id):
     
     # Récupérer les ventes — via FK boutique directe OU via client_maui (exclure annulées)
     try:
-        ventes_recentes = Vente.objects.filter(
-            Q(boutique=boutique) | Q(client_maui__boutique=boutique),
+        ventes_recentes = Vente.objects.de_boutique(boutique).filter(
             date_vente__gte=date_debut,
             paye=True,
             est_annulee=False
-        ).distinct()
+        )
     except (ValueError, TypeError):
         ventes_recentes = Vente.objects.none()
 
@@ -647,7 +608,7 @@ def articles_search_ajax(request, boutique_id):
             'quantite_stock': art.stock_total,  # Utiliser stock_total pour inclure les variantes
             'a_variantes': art.a_variantes,
             'nb_variantes': art.nb_variantes if art.a_variantes else 0,
-            'image_url': art.image.url if art.image else None,
+            'image_url': url_image_sync(art, taille='miniature'),
             'description': art.description[:100] if art.description else '',
             'est_valide_client': art.est_valide_client,
             'quantite_envoyee': art.quantite_envoyee,
@@ -789,11 +750,10 @@ def api_stats_boutique(request, boutique_id):
         # Statistiques d'aujourd'hui
         aujourd_hui = timezone.now().date()
         try:
-            ventes_aujourd_hui = Vente.objects.filter(
-                Q(boutique=boutique) | Q(client_maui__boutique=boutique),
+            ventes_aujourd_hui = Vente.objects.de_boutique(boutique).filter(
                 date_vente__date=aujourd_hui,
                 paye=True
-            ).distinct()
+            )
         except (ValueError, TypeError):
             ventes_aujourd_hui = Vente.objects.none()
         
@@ -836,66 +796,14 @@ def api_stats_boutique(request, boutique_id):
 @boutique_access_required
 def api_ca_jour_boutique(request, boutique_id):
     """
-    Endpoint léger : CA du jour en temps réel pour un point de vente.
-    - Sépare CDF et USD
-    - Renvoie le timestamp de la dernière vente pour détection de changement côté client
-    - Conçu pour le polling intelligent (Visibility API + backoff exponentiel)
+    Endpoint de repli : compteurs du jour d'un point de vente (CDF/USD séparés).
+    - Les mises à jour sont poussées par WebSocket (ws/commercant/compteurs/<id>/) ;
+      cet endpoint ne sert qu'à la reconnexion / au navigateur sans WebSocket
+    - Lit les compteurs en cache (aucune requête sur les ventes tant qu'ils existent)
     """
-    boutique = request.boutique
-    aujourd_hui = timezone.now().date()
-
-    ventes_qs = Vente.objects.filter(
-        Q(boutique=boutique) | Q(client_maui__boutique=boutique),
-        date_vente__date=aujourd_hui,
-        paye=True,
-        est_annulee=False,
-    ).distinct()
-
-    # Agrégats CDF
-    agg_cdf = ventes_qs.filter(devise='CDF').aggregate(
-        total=Sum('montant_total'),
-        nb=Count('id'),
-    )
-    ca_cdf = float(agg_cdf['total'] or 0)
-    nb_cdf = int(agg_cdf['nb'] or 0)
-
-    # Agrégats USD
-    # Pour les ventes USD, montant_total contient le montant en $ (montant_total_usd peut être NULL)
-    agg_usd = ventes_qs.filter(devise='USD').aggregate(
-        total=Sum('montant_total'),
-        nb=Count('id'),
-    )
-    ca_usd = float(agg_usd['total'] or 0)
-    nb_usd = int(agg_usd['nb'] or 0)
-
-    # Dépenses du jour appliquées (rapports de caisse CDF)
-    depenses_cdf = float(
-        RapportCaisse.objects.filter(
-            boutique=boutique,
-            date_rapport__date=aujourd_hui,
-            depense_appliquee=True,
-            devise='CDF',
-        ).aggregate(total=Sum('depense'))['total'] or 0
-    )
-
-    # Timestamp de la dernière vente → permet au client de savoir si les données ont changé
-    derniere_vente_ts = (
-        ventes_qs.order_by('-date_vente')
-        .values_list('date_vente', flat=True)
-        .first()
-    )
-
-    return JsonResponse({
-        'ca_cdf':        ca_cdf,
-        'ca_cdf_net':    round(ca_cdf - depenses_cdf, 2),
-        'ca_usd':        ca_usd,
-        'nb_ventes_cdf': nb_cdf,
-        'nb_ventes_usd': nb_usd,
-        'nb_ventes':     nb_cdf + nb_usd,
-        'depenses_cdf':  depenses_cdf,
-        'derniere_vente_ts': derniere_vente_ts.isoformat() if derniere_vente_ts else None,
-        'heure_serveur': timezone.now().strftime('%H:%M:%S'),
-    })
+    data = compteurs_jour(request.parametres_boutique.id)
+    data['heure_serveur'] = timezone.localtime().strftime('%H:%M:%S')
+    return JsonResponse(data)
 
 
 # ===== GESTION AVANCÉE DES BOUTIQUES =====
@@ -942,9 +850,7 @@ def supprimer_boutique(request, boutique_id):
     
     total_articles = Article.objects.filter(boutique=boutique).count()
     total_categories = Categorie.objects.filter(boutique=boutique).count()
-    ventes_boutique_qs = Vente.objects.filter(
-        Q(boutique=boutique) | Q(client_maui__boutique=boutique)
-    ).distinct()
+    ventes_boutique_qs = Vente.objects.de_boutique(boutique)
     total_ventes = ventes_boutique_qs.count()
     chiffre_affaires = ventes_boutique_qs.aggregate(
         total=Sum('montant_total')
@@ -1094,7 +1000,7 @@ def entrer_boutique(request, boutique_id):
     try:
         date_7_jours = timezone.now() - timezone.timedelta(days=7)
         mouvements_recents = MouvementStock.objects.filter(
-            article__boutique=boutique,
+            boutique=boutique,
             date_mouvement__gte=date_7_jours
         ).count()
     except:
@@ -1102,8 +1008,7 @@ def entrer_boutique(request, boutique_id):
     
     # Ventes récentes (exclure les ventes annulées)
     try:
-        ventes_recentes = Vente.objects.filter(
-            client_maui__boutique=boutique,
+        ventes_recentes = Vente.objects.de_boutique(boutique).filter(
             est_annulee=False
         ).order_by('-date_vente')[:10]
     except:
@@ -1360,6 +1265,7 @@ def rapport_ca_quotidien(request, boutique_id):
 @login_required
 @commercant_required
 @boutique_access_required
+@lecture_replique
 def rapport_ca_mensuel(request, boutique_id):
     """Afficher le rapport du chiffre d'affaires mensuel"""
     boutique = request.boutique
@@ -1900,6 +1806,7 @@ def supprimer_rapport_caisse(request, boutique_id, rapport_id):
 @login_required
 @commercant_required
 @boutique_access_required
+@lecture_replique
 def exporter_ca_quotidien_pdf(request, boutique_id):
     """Exporter le chiffre d'affaires quotidien en PDF"""
     from django.http import HttpResponse
@@ -2004,6 +1911,7 @@ def exporter_ca_quotidien_pdf(request, boutique_id):
 @login_required
 @commercant_required
 @boutique_access_required
+@lecture_replique
 def exporter_ca_mensuel_pdf(request, boutique_id):
     """Exporter le chiffre d'affaires mensuel en PDF"""
     from django.http import HttpResponse
@@ -3584,8 +3492,7 @@ def ventes_refusees_boutique(request, boutique_id):
             pass
     
     # Recette normale du jour (ventes payées)
-    recette_jour = Vente.objects.filter(
-        client_maui__boutique=boutique,
+    recette_jour = Vente.objects.de_boutique(boutique).filter(
         date_vente__date=aujourd_hui,
         paye=True
     ).aggregate(total=Sum('montant_total'))['total'] or Decimal('0')
@@ -4492,6 +4399,7 @@ def importer_excel_depot(request, depot_id):
                         Article.objects.bulk_create(articles_to_create, batch_size=200)
                     if articles_to_update:
                         Article.objects.bulk_update(articles_to_update, ['prix_achat', 'prix_vente', 'categorie', 'description'], batch_size=200)
+                invalider_valeur_stock(depot.id)  # prix/catégories modifiés sans signaux
                 
                 # Messages de résultat
                 if articles_importes > 0:
@@ -4618,7 +4526,7 @@ def importer_excel_depot(request, depot_id):
                     articles_to_update.append(article)
                     if data['stock'] > 0:
                         mouvements_to_create.append(MouvementStock(
-                            article=article, type_mouvement='ENTREE',
+                            article=article, boutique=depot, type_mouvement='ENTREE',
                             quantite=data['stock'], stock_avant=stock_avant,
                             stock_apres=article.quantite_stock,
                             commentaire="Import Excel - Mise à jour stock",
@@ -4645,7 +4553,7 @@ def importer_excel_depot(request, depot_id):
                     for art, (_, stock_val) in zip(created_arts, articles_to_create):
                         if stock_val > 0:
                             mouvements_to_create.append(MouvementStock(
-                                article=art, type_mouvement='ENTREE',
+                                article=art, boutique=depot, type_mouvement='ENTREE',
                                 quantite=stock_val, stock_avant=0, stock_apres=stock_val,
                                 commentaire="Import Excel - Nouvel article",
                                 reference_document=f"IMPORT-EXCEL-{depot.id}",
@@ -4653,6 +4561,8 @@ def importer_excel_depot(request, depot_id):
                             ))
                 if mouvements_to_create:
                     MouvementStock.objects.bulk_create(mouvements_to_create, batch_size=200)
+            # bulk_update/bulk_create ne déclenchent pas les signaux: valorisation à recalculer
+            invalider_valeur_stock(depot.id)
             
             # Messages de résultat
             if articles_importes > 0:
@@ -4936,6 +4846,7 @@ def valider_transferts_multiples(request, depot_id):
 @login_required
 @commercant_required
 @boutique_access_required
+@lecture_replique
 def historique_mouvements_stock(request, boutique_id):
     """Historique des mouvements de stock d'une boutique"""
     boutique = request.boutique
@@ -4949,7 +4860,7 @@ def historique_mouvements_stock(request, boutique_id):
     
     # Récupérer les mouvements de stock pour les articles de cette boutique
     mouvements = MouvementStock.objects.filter(
-        article__boutique=boutique
+        boutique=boutique
     ).select_related('article', 'article__categorie').order_by('-date_mouvement')
     
     # Appliquer les filtres
@@ -5052,25 +4963,8 @@ def approvisionner_facture(request, depot_id):
     categories = Categorie.objects.filter(boutique=depot)
     articles_existants = Article.objects.filter(boutique=depot, est_actif=True).order_by('nom')
     
-    # Récupérer les dernières données d'approvisionnement par article (pour pré-remplissage)
-    derniers_appros = {}
-    last_lignes = LigneApprovisionnement.objects.filter(
-        article__in=articles_existants
-    ).select_related('article', 'facture').order_by('article_id', '-date_creation')
-    seen_ids = set()
-    for ligne in last_lignes:
-        if ligne.article_id not in seen_ids:
-            seen_ids.add(ligne.article_id)
-            # Devise de la facture: CDF = FC, USD = USD
-            devise_facture = ligne.facture.devise if ligne.facture else 'CDF'
-            derniers_appros[ligne.article_id] = {
-                'type_quantite': ligne.type_quantite,
-                'nombre_cartons': ligne.nombre_cartons,
-                'pieces_par_carton': ligne.pieces_par_carton,
-                'prix_achat_carton': float(ligne.prix_achat_carton),
-                'prix_achat_unitaire': float(ligne.prix_achat_unitaire),
-                'devise_saisie': devise_facture,  # Devise utilisée lors du dernier appro
-            }
+    # Dernières données d'approvisionnement par article (pré-remplissage): projection indexée
+    derniers_appros = derniers_approvisionnements(depot)
     
     if request.method == 'POST':
         try:
@@ -5282,25 +5176,8 @@ def approvisionner_facture_boutique(request, boutique_id):
     categories = Categorie.objects.filter(boutique=boutique)
     articles_existants = Article.objects.filter(boutique=boutique, est_actif=True).order_by('nom')
     
-    # Récupérer les dernières données d'approvisionnement par article (pour pré-remplissage)
-    derniers_appros = {}
-    last_lignes = LigneApprovisionnement.objects.filter(
-        article__in=articles_existants
-    ).select_related('article', 'facture').order_by('article_id', '-date_creation')
-    seen_ids = set()
-    for ligne in last_lignes:
-        if ligne.article_id not in seen_ids:
-            seen_ids.add(ligne.article_id)
-            # Devise de la facture: CDF = FC, USD = USD
-            devise_facture = ligne.facture.devise if ligne.facture else 'CDF'
-            derniers_appros[ligne.article_id] = {
-                'type_quantite': ligne.type_quantite,
-                'nombre_cartons': ligne.nombre_cartons,
-                'pieces_par_carton': ligne.pieces_par_carton,
-                'prix_achat_carton': float(ligne.prix_achat_carton),
-                'prix_achat_unitaire': float(ligne.prix_achat_unitaire),
-                'devise_saisie': devise_facture,
-            }
+    # Dernières données d'approvisionnement par article (pré-remplissage): projection indexée
+    derniers_appros = derniers_approvisionnements(boutique)
     
     if request.method == 'POST':
         try:
@@ -6109,31 +5986,9 @@ def nouvel_inventaire(request, depot_id):
         date_inventaire = request.POST.get('date_inventaire', timezone.now().date())
         notes = request.POST.get('notes', '')
         
-        # Créer l'inventaire
-        inventaire = Inventaire.objects.create(
-            boutique=depot,
-            date_inventaire=date_inventaire,
-            notes=notes,
-            cree_par=request.user,
-            statut='EN_COURS'
-        )
-        
-        # Créer les lignes pour tous les articles du dépôt
-        articles = Article.objects.filter(boutique=depot, est_actif=True)
-        lignes_creees = 0
-        for article in articles:
-            # Utiliser le prix de vente si le prix d'achat est 0 ou None
-            prix_unitaire = article.prix_achat if article.prix_achat and article.prix_achat > 0 else article.prix_vente
-            LigneInventaire.objects.create(
-                inventaire=inventaire,
-                article=article,
-                stock_theorique=article.quantite_stock,
-                prix_unitaire=prix_unitaire or 0
-            )
-            lignes_creees += 1
-        
-        inventaire.nb_articles = lignes_creees
-        inventaire.save()
+        # Inventaire + une ligne par article actif (stock théorique photographié en une requête)
+        inventaire = ouvrir_inventaire(depot, request.user, date_inventaire, notes)
+        lignes_creees = inventaire.nb_articles
         
         messages.success(request, f"Inventaire {inventaire.reference} créé avec {lignes_creees} articles")
         return redirect('inventory:saisir_inventaire', depot_id=depot.id, inventaire_id=inventaire.id)
@@ -6183,6 +6038,20 @@ def detail_inventaire(request, depot_id, inventaire_id):
     return render(request, 'inventory/commercant/detail_inventaire.html', context)
 
 
+def _comptages_formulaire(post):
+    """Champs stock_physique_<ligne_id> (et commentaire_<ligne_id>) renseignés → comptages complets."""
+    comptages = []
+    for key, value in post.items():
+        if key.startswith('stock_physique_') and value.strip():
+            ligne_id = key.replace('stock_physique_', '')
+            comptages.append({
+                'ligne_id': ligne_id,
+                'quantite': value.strip(),
+                'commentaire': post.get(f'commentaire_{ligne_id}', ''),
+            })
+    return comptages
+
+
 @login_required
 @commercant_required
 def saisir_inventaire(request, depot_id, inventaire_id):
@@ -6192,43 +6061,14 @@ def saisir_inventaire(request, depot_id, inventaire_id):
     inventaire = get_object_or_404(Inventaire, id=inventaire_id, boutique=depot, statut='EN_COURS')
     
     if request.method == 'POST':
-        lignes_mises_a_jour = 0
-        for key, value in request.POST.items():
-            if key.startswith('stock_physique_'):
-                ligne_id = key.replace('stock_physique_', '')
-                try:
-                    ligne = LigneInventaire.objects.select_related('article').get(id=ligne_id, inventaire=inventaire)
-                    if value.strip():
-                        stock_physique_val = int(value)
-                        commentaire_val = request.POST.get(f'commentaire_{ligne_id}', '')
-                        user_nom = request.user.get_full_name() or request.user.username
-                        
-                        ligne.stock_physique = stock_physique_val
-                        if commentaire_val:
-                            ligne.commentaire = commentaire_val
-                        ligne.saisi_par = request.user
-                        ligne.save()
-                        
-                        # Tracer dans l'historique
-                        HistoriqueSaisieInventaire.objects.create(
-                            ligne_inventaire=ligne,
-                            article=ligne.article,
-                            inventaire=inventaire,
-                            stock_physique_saisi=stock_physique_val,
-                            stock_theorique_au_moment=ligne.stock_theorique,
-                            ecart_au_moment=stock_physique_val - ligne.stock_theorique,
-                            saisi_par=request.user,
-                            nom_saisi_par=user_nom,
-                            commentaire=commentaire_val,
-                        )
-                        lignes_mises_a_jour += 1
-                except (LigneInventaire.DoesNotExist, ValueError):
-                    pass
-        
-        messages.success(request, f"{lignes_mises_a_jour} lignes mises à jour")
-        
-        # Recalculer les statistiques
-        inventaire.calculer_statistiques()
+        user_nom = request.user.get_full_name() or request.user.username
+        try:
+            resultat = appliquer_comptages(
+                inventaire, _comptages_formulaire(request.POST), utilisateur=request.user, nom=user_nom
+            )
+            messages.success(request, f"{resultat['appliques']} lignes mises à jour")
+        except InventaireFerme:
+            messages.error(request, "Cet inventaire n'est plus en cours")
         
         if 'continuer' in request.POST:
             return redirect('inventory:saisir_inventaire', depot_id=depot.id, inventaire_id=inventaire.id)
@@ -6310,62 +6150,9 @@ def regulariser_inventaire(request, depot_id, inventaire_id):
     inventaire = get_object_or_404(Inventaire, id=inventaire_id, boutique=depot, statut='TERMINE')
     
     if request.method == 'POST':
-        with transaction.atomic():
-            lignes_regularisees = 0
-            
-            # Régulariser les articles saisis avec écart
-            for ligne in inventaire.lignes.filter(stock_physique__isnull=False, est_regularise=False):
-                if ligne.ecart != 0:
-                    article = ligne.article
-                    stock_avant = article.quantite_stock
-                    
-                    article.quantite_stock = ligne.stock_physique
-                    article.save()
-                    
-                    type_mvt = 'ENTREE' if ligne.ecart > 0 else 'SORTIE'
-                    MouvementStock.objects.create(
-                        article=article,
-                        type_mouvement=type_mvt,
-                        quantite=abs(ligne.ecart),
-                        stock_avant=stock_avant,
-                        stock_apres=article.quantite_stock,
-                        commentaire=f"Régularisation inventaire {inventaire.reference}",
-                        reference_document=f"INV-{inventaire.id}"
-                    )
-                    
-                    ligne.est_regularise = True
-                    ligne.save()
-                    lignes_regularisees += 1
-            
-            # Mettre les articles non saisis à zéro
-            lignes_non_saisises = inventaire.lignes.filter(stock_physique__isnull=True, est_regularise=False)
-            for ligne in lignes_non_saisises:
-                article = ligne.article
-                stock_avant = article.quantite_stock
-                
-                if stock_avant > 0:
-                    article.quantite_stock = 0
-                    article.save()
-                    
-                    MouvementStock.objects.create(
-                        article=article,
-                        type_mouvement='SORTIE',
-                        quantite=stock_avant,
-                        stock_avant=stock_avant,
-                        stock_apres=0,
-                        commentaire=f"Régularisation inventaire {inventaire.reference} (article non saisi)",
-                        reference_document=f"INV-{inventaire.id}"
-                    )
-                
-                ligne.est_regularise = True
-                ligne.save()
-                lignes_regularisees += 1
-            
-            inventaire.statut = 'REGULARISE'
-            inventaire.date_regularisation = timezone.now()
-            inventaire.save()
-            
-            messages.success(request, f"Inventaire régularisé: {lignes_regularisees} articles ajustés")
+        # Par lots (une transaction par lot): un nouvel envoi reprend une régularisation interrompue
+        lignes_regularisees = regulariser_par_lots(inventaire)
+        messages.success(request, f"Inventaire régularisé: {lignes_regularisees} articles ajustés")
         
         return redirect('inventory:detail_inventaire', depot_id=depot.id, inventaire_id=inventaire.id)
     
@@ -6424,29 +6211,9 @@ def nouvel_inventaire_boutique(request, boutique_id):
         date_inventaire = request.POST.get('date_inventaire', timezone.now().date())
         notes = request.POST.get('notes', '')
         
-        inventaire = Inventaire.objects.create(
-            boutique=boutique,
-            date_inventaire=date_inventaire,
-            notes=notes,
-            cree_par=request.user,
-            statut='EN_COURS'
-        )
-        
-        articles = Article.objects.filter(boutique=boutique, est_actif=True)
-        lignes_creees = 0
-        for article in articles:
-            # Utiliser le prix de vente si le prix d'achat est 0 ou None
-            prix_unitaire = article.prix_achat if article.prix_achat and article.prix_achat > 0 else article.prix_vente
-            LigneInventaire.objects.create(
-                inventaire=inventaire,
-                article=article,
-                stock_theorique=article.quantite_stock,
-                prix_unitaire=prix_unitaire or 0
-            )
-            lignes_creees += 1
-        
-        inventaire.nb_articles = lignes_creees
-        inventaire.save()
+        # Inventaire + une ligne par article actif (stock théorique photographié en une requête)
+        inventaire = ouvrir_inventaire(boutique, request.user, date_inventaire, notes)
+        lignes_creees = inventaire.nb_articles
         
         messages.success(request, f"Inventaire {inventaire.reference} créé avec {lignes_creees} articles")
         return redirect('inventory:saisir_inventaire_boutique', boutique_id=boutique.id, inventaire_id=inventaire.id)
@@ -6507,18 +6274,22 @@ def saisir_inventaire_boutique(request, boutique_id, inventaire_id):
         prix_modifies = 0
         
         # Traiter les modifications de prix de vente
+        nouveaux_prix = {}
         for key, value in request.POST.items():
             if key.startswith('prix_vente_'):
-                ligne_id = key.replace('prix_vente_', '')
                 try:
-                    ligne = LigneInventaire.objects.get(id=ligne_id, inventaire=inventaire)
-                    nouveau_prix = Decimal(value.strip())
-                    if nouveau_prix != ligne.article.prix_vente and nouveau_prix > 0:
-                        ligne.article.prix_vente = nouveau_prix
-                        ligne.article.save(update_fields=['prix_vente'])
-                        prix_modifies += 1
-                except (LigneInventaire.DoesNotExist, ValueError, InvalidOperation):
+                    nouveaux_prix[int(key.replace('prix_vente_', ''))] = Decimal(value.strip())
+                except (ValueError, InvalidOperation):
                     pass
+        if nouveaux_prix:
+            for ligne in LigneInventaire.objects.select_related('article').filter(
+                id__in=list(nouveaux_prix), inventaire=inventaire
+            ):
+                nouveau_prix = nouveaux_prix[ligne.id]
+                if nouveau_prix != ligne.article.prix_vente and nouveau_prix > 0:
+                    ligne.article.prix_vente = nouveau_prix
+                    ligne.article.save(update_fields=['prix_vente'])
+                    prix_modifies += 1
         
         # Nom d'affichage du collaborateur connecté
         if hasattr(request.user, 'profil_collaborateur'):
@@ -6526,42 +6297,14 @@ def saisir_inventaire_boutique(request, boutique_id, inventaire_id):
         else:
             user_nom_batch = request.user.get_full_name() or request.user.username
 
-        # Traiter les stocks et autres données
-        for key, value in request.POST.items():
-            if key.startswith('stock_physique_'):
-                ligne_id = key.replace('stock_physique_', '')
-                try:
-                    ligne = LigneInventaire.objects.select_related('article').get(id=ligne_id, inventaire=inventaire)
-                    if value.strip():
-                        stock_physique_val = int(value)
-                        commentaire_val = request.POST.get(f'commentaire_{ligne_id}', '')
-                        
-                        ligne.stock_physique = stock_physique_val
-                        if commentaire_val:
-                            ligne.commentaire = commentaire_val
-
-                        # Traçabilité : enregistrer qui a saisi et quand
-                        ligne.saisi_par = request.user
-                        ligne.assigne_a = user_nom_batch
-                        ligne.date_modification = timezone.now()
-
-                        ligne.save()
-                        
-                        # Tracer dans l'historique
-                        HistoriqueSaisieInventaire.objects.create(
-                            ligne_inventaire=ligne,
-                            article=ligne.article,
-                            inventaire=inventaire,
-                            stock_physique_saisi=stock_physique_val,
-                            stock_theorique_au_moment=ligne.stock_theorique,
-                            ecart_au_moment=stock_physique_val - ligne.stock_theorique,
-                            saisi_par=request.user,
-                            nom_saisi_par=user_nom_batch,
-                            commentaire=commentaire_val,
-                        )
-                        lignes_mises_a_jour += 1
-                except (LigneInventaire.DoesNotExist, ValueError):
-                    pass
+        # Stocks: un seul lot (lignes lues en une requête, historique et statistiques en masse)
+        try:
+            resultat = appliquer_comptages(
+                inventaire, _comptages_formulaire(request.POST), utilisateur=request.user, nom=user_nom_batch
+            )
+            lignes_mises_a_jour = resultat['appliques']
+        except InventaireFerme:
+            messages.error(request, "Cet inventaire n'est plus en cours")
         
         msg_parts = []
         if lignes_mises_a_jour > 0:
@@ -6572,8 +6315,6 @@ def saisir_inventaire_boutique(request, boutique_id, inventaire_id):
         if msg_parts:
             messages.success(request, " | ".join(msg_parts))
         
-        inventaire.calculer_statistiques()
-        
         if 'continuer' in request.POST:
             return redirect('inventory:saisir_inventaire_boutique', boutique_id=boutique.id, inventaire_id=inventaire.id)
         return redirect('inventory:detail_inventaire_boutique', boutique_id=boutique.id, inventaire_id=inventaire.id)
@@ -6704,25 +6445,12 @@ def saisir_ligne_inventaire_ajax(request, boutique_id, inventaire_id):
     else:
         user_nom_ajax = request.user.get_full_name() or request.user.username
 
-    ancien_stock_physique = ligne.stock_physique
-    ligne.stock_physique = stock_physique
-    ligne.saisi_par = request.user
-    ligne.assigne_a = user_nom_ajax
-    ligne.date_modification = timezone.now()
-    ligne.save()
-
-    # Tracer la saisie dans l'historique
-    HistoriqueSaisieInventaire.objects.create(
-        ligne_inventaire=ligne,
-        article=ligne.article,
-        inventaire=inventaire,
-        stock_physique_saisi=stock_physique,
-        stock_theorique_au_moment=ligne.stock_theorique,
-        ecart_au_moment=stock_physique - ligne.stock_theorique,
-        saisi_par=request.user,
-        nom_saisi_par=user_nom_ajax,
-        commentaire=data.get('commentaire', ''),
-    )
+    try:
+        appliquer_comptages(inventaire, [{
+            'ligne_id': ligne.id, 'quantite': stock_physique, 'commentaire': data.get('commentaire', ''),
+        }], utilisateur=request.user, nom=user_nom_ajax)
+    except InventaireFerme:
+        return JsonResponse({'success': False, 'error': "Cet inventaire n'est plus en cours"}, status=409)
 
     article_fields_updated = []
 
@@ -6751,8 +6479,6 @@ def saisir_ligne_inventaire_ajax(request, boutique_id, inventaire_id):
     if article_fields_updated:
         ligne.article.save(update_fields=article_fields_updated)
 
-    inventaire.calculer_statistiques()
-
     ecart = stock_physique - (ligne.stock_theorique or 0)
     nb_saisis = inventaire.lignes.filter(stock_physique__isnull=False).count()
     nb_total = inventaire.lignes.count()
@@ -6989,62 +6715,9 @@ def regulariser_inventaire_boutique(request, boutique_id, inventaire_id):
     inventaire = get_object_or_404(Inventaire, id=inventaire_id, boutique=boutique, statut='TERMINE')
     
     if request.method == 'POST':
-        with transaction.atomic():
-            lignes_regularisees = 0
-            
-            # Régulariser les articles saisis avec écart
-            for ligne in inventaire.lignes.filter(stock_physique__isnull=False, est_regularise=False):
-                if ligne.ecart != 0:
-                    article = ligne.article
-                    stock_avant = article.quantite_stock
-                    
-                    article.quantite_stock = ligne.stock_physique
-                    article.save()
-                    
-                    type_mvt = 'ENTREE' if ligne.ecart > 0 else 'SORTIE'
-                    MouvementStock.objects.create(
-                        article=article,
-                        type_mouvement=type_mvt,
-                        quantite=abs(ligne.ecart),
-                        stock_avant=stock_avant,
-                        stock_apres=article.quantite_stock,
-                        commentaire=f"Régularisation inventaire {inventaire.reference}",
-                        reference_document=f"INV-{inventaire.id}"
-                    )
-                    
-                    ligne.est_regularise = True
-                    ligne.save()
-                    lignes_regularisees += 1
-            
-            # Mettre les articles non saisis à zéro
-            lignes_non_saisises = inventaire.lignes.filter(stock_physique__isnull=True, est_regularise=False)
-            for ligne in lignes_non_saisises:
-                article = ligne.article
-                stock_avant = article.quantite_stock
-                
-                if stock_avant > 0:
-                    article.quantite_stock = 0
-                    article.save()
-                    
-                    MouvementStock.objects.create(
-                        article=article,
-                        type_mouvement='SORTIE',
-                        quantite=stock_avant,
-                        stock_avant=stock_avant,
-                        stock_apres=0,
-                        commentaire=f"Régularisation inventaire {inventaire.reference} (article non saisi)",
-                        reference_document=f"INV-{inventaire.id}"
-                    )
-                
-                ligne.est_regularise = True
-                ligne.save()
-                lignes_regularisees += 1
-            
-            inventaire.statut = 'REGULARISE'
-            inventaire.date_regularisation = timezone.now()
-            inventaire.save()
-            
-            messages.success(request, f"Inventaire régularisé: {lignes_regularisees} articles ajustés")
+        # Par lots (une transaction par lot): un nouvel envoi reprend une régularisation interrompue
+        lignes_regularisees = regulariser_par_lots(inventaire)
+        messages.success(request, f"Inventaire régularisé: {lignes_regularisees} articles ajustés")
         
         return redirect('inventory:detail_inventaire_boutique', boutique_id=boutique.id, inventaire_id=inventaire.id)
     
@@ -7320,9 +6993,8 @@ def alertes_stock_boutique(request, boutique_id):
 def analyse_ia_mouvements(request, boutique_id):
     """
     🧠 Dashboard d'analyse intelligente des mouvements de stock.
-    Calcule le score de santé, les insights, les anomalies et les recommandations.
+    Score de santé, insights, anomalies et recommandations: services.analyse_mouvements.
     """
-    from django.db.models import ExpressionWrapper, DecimalField
 
     boutique = get_object_or_404(Boutique, id=boutique_id)
     if not request.user.is_superuser:
@@ -7363,231 +7035,80 @@ def analyse_ia_mouvements(request, boutique_id):
                     regularise_par=request.user,
                     notes_regularisation=notes
                 )
+                invalider_analyse(boutique.id)
                 messages.success(request, f"✅ Stock de « {article.nom} » ajusté : +{qte} unités")
         except (Article.DoesNotExist, ValueError):
             messages.error(request, "Erreur lors de la régularisation")
         return redirect('inventory:analyse_ia_mouvements', boutique_id=boutique_id)
 
-    # --- Plage de dates ---
-    maintenant = timezone.now()
-    debut_mois = maintenant.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
-
-    debut_str = request.GET.get('debut', '')
-    fin_str   = request.GET.get('fin',   '')
-
+    # --- Plage de dates (jours locaux) ---
+    aujourd_hui = timezone.localdate()
     try:
-        debut = timezone.make_aware(datetime.strptime(debut_str, '%Y-%m-%d')) if debut_str else debut_mois
+        debut = datetime.strptime(request.GET.get('debut', ''), '%Y-%m-%d').date()
     except ValueError:
-        debut = debut_mois
+        debut = aujourd_hui.replace(day=1)
     try:
-        fin = timezone.make_aware(datetime.strptime(fin_str, '%Y-%m-%d').replace(
-            hour=23, minute=59, second=59)) if fin_str else maintenant
+        fin = datetime.strptime(request.GET.get('fin', ''), '%Y-%m-%d').date()
     except ValueError:
-        fin = maintenant
-
-    nb_jours = max(1, (fin - debut).days + 1)
-
-    # --- QuerySets ---
-    articles_qs  = Article.objects.filter(boutique=boutique, est_actif=True)
-    mouvements_qs = MouvementStock.objects.filter(
-        article__boutique=boutique, date_mouvement__gte=debut, date_mouvement__lte=fin)
-    ventes_qs = Vente.objects.filter(
-        boutique=boutique, date_vente__gte=debut, date_vente__lte=fin, est_annulee=False)
-    alertes_qs = AlerteStock.objects.filter(boutique=boutique, statut='EN_ATTENTE')
-
-    # --- 1. Résumé financier ---
-    def ca_devise(devise):
-        return float(
-            LigneVente.objects.filter(
-                vente__boutique=boutique,
-                vente__date_vente__gte=debut, vente__date_vente__lte=fin,
-                vente__est_annulee=False, devise=devise
-            ).aggregate(
-                ca=Sum(ExpressionWrapper(F('quantite') * F('prix_unitaire'),
-                                         output_field=DecimalField()))
-            )['ca'] or 0
-        )
-
-    ca_cdf = ca_devise('CDF')
-    ca_usd = ca_devise('USD')
-    ca_negocie = float(
-        LigneVente.objects.filter(
-            vente__boutique=boutique,
-            vente__date_vente__gte=debut, vente__date_vente__lte=fin,
-            vente__est_annulee=False, est_negocie=True
-        ).aggregate(
-            ca=Sum(ExpressionWrapper(F('quantite') * F('prix_unitaire'),
-                                     output_field=DecimalField()))
-        )['ca'] or 0
-    )
+        fin = aujourd_hui
 
-    agg_stock = articles_qs.aggregate(
-        val_vente=Sum(ExpressionWrapper(F('quantite_stock') * F('prix_vente'),
-                                        output_field=DecimalField())),
-        val_cout=Sum(ExpressionWrapper(F('quantite_stock') * F('prix_achat'),
-                                       output_field=DecimalField()))
-    )
-    stock_val_vente = float(agg_stock['val_vente'] or 0)
-    stock_val_cout  = float(agg_stock['val_cout'] or 0)
-
-    # --- 2. Mouvements par type ---
-    from django.db.models import Count
-    mouv_raw = mouvements_qs.values('type_mouvement').annotate(
-        nb=Count('id'), total_qte=Sum('quantite'))
-    mouv = {m['type_mouvement']: m for m in mouv_raw}
-
-    def gm(typ, abs_val=False):
-        d = mouv.get(typ, {})
-        q = d.get('total_qte', 0) or 0
-        return {'nb': d.get('nb', 0) or 0, 'total_qte': abs(q) if abs_val else q}
-
-    mouvements_resume = {
-        'entrees':     gm('ENTREE'),
-        'sorties':     gm('SORTIE', True),
-        'ventes':      gm('VENTE', True),
-        'retours':     gm('RETOUR'),
-        'ajustements': gm('AJUSTEMENT'),
+    with lecture_replique():
+        analyse = analyser_mouvements(boutique, debut, fin)
+
+    # Présentation web (couleurs Bootstrap / icônes Font Awesome)
+    couleurs = {'CRITIQUE': 'danger', 'ALERTE': 'danger', 'WARNING': 'warning', 'INFO': 'info'}
+    icones = {
+        'ROTATION_FAIBLE': 'fa-sync-alt', 'ROTATION_ELEVEE': 'fa-check-circle',
+        'STOCK_NEGATIF': 'fa-exclamation-circle', 'PRIX_NEGOCIE': 'fa-tag',
+        'ALERTES_EN_ATTENTE': 'fa-bell', 'AJUSTEMENTS_EXCESSIFS': 'fa-random',
+        'VENTES_SANS_MOUVEMENT': 'fa-unlink', 'REGULARISER_STOCK_NEGATIF': 'fa-first-aid',
+        'VERIFIER_NEGOCIATIONS': 'fa-shield-alt', 'TRAITER_ALERTES': 'fa-tools',
     }
-
-    # --- 3. Alertes & stocks négatifs ---
-    articles_negatifs = list(
-        articles_qs.filter(quantite_stock__lt=0)
-        .select_related('categorie').order_by('quantite_stock')[:30]
-    )
-
-    alertes_list = list(alertes_qs.select_related('article', 'vente').order_by('-date_creation')[:100])
-    alertes_par_art = {}
-    for al in alertes_list:
-        aid = al.article_id
-        if aid not in alertes_par_art:
-            alertes_par_art[aid] = {
-                'article': al.article,
-                'nb_alertes': 0,
-                'qte_ecart': 0,
-                'ventes': []
-            }
-        alertes_par_art[aid]['nb_alertes'] += 1
-        alertes_par_art[aid]['qte_ecart'] += abs(al.ecart)
-        if al.numero_facture not in alertes_par_art[aid]['ventes']:
-            alertes_par_art[aid]['ventes'].append(al.numero_facture)
-
-    articles_a_regulariser = sorted(
-        alertes_par_art.values(), key=lambda x: x['nb_alertes'], reverse=True)[:20]
-
-    pertes_estimees = sum(
-        abs(a.quantite_stock) * float(a.prix_achat) for a in articles_negatifs)
-    nb_alertes_total = alertes_qs.count()
-
-    # --- 4. Top articles vendus ---
-    top_articles = list(
-        LigneVente.objects.filter(
-            vente__boutique=boutique,
-            vente__date_vente__gte=debut, vente__date_vente__lte=fin,
-            vente__est_annulee=False
-        )
-        .values('article__id', 'article__nom', 'article__code', 'article__devise')
-        .annotate(
-            total_qte=Sum('quantite'),
-            ca=Sum(ExpressionWrapper(F('quantite') * F('prix_unitaire'),
-                                     output_field=DecimalField())),
-            nb_ventes=Count('vente', distinct=True)
-        ).order_by('-ca')[:10]
-    )
-
-    # --- 5. Analyse IA ---
-    score = 100
-    insights = []
-    recommandations = []
-    anomalies = []
-
-    total_articles = articles_qs.count()
-    nb_neg = len(articles_negatifs)
-
-    if total_articles > 0:
-        score -= min(40, round(nb_neg / total_articles * 100 * 2))
-    score -= min(20, round(nb_alertes_total * 0.5))
-
-    rotation = 0
-    if stock_val_vente > 0 and ca_cdf > 0:
-        rotation = (ca_cdf / stock_val_vente) * (365 / nb_jours)
-        if rotation < 2:
-            score -= 10
-            insights.append({'type': 'ROTATION_FAIBLE', 'niveau': 'warning',
-                'icon': 'fa-sync-alt', 'color': 'warning',
-                'message': f"Rotation stock faible : {rotation:.1f}×/an — marchandise immobilisée."})
-        elif rotation >= 12:
-            insights.append({'type': 'ROTATION_ELEVEE', 'niveau': 'success',
-                'icon': 'fa-check-circle', 'color': 'success',
-                'message': f"Excellente rotation : {rotation:.1f}×/an — stock bien géré."})
-
-    score = max(0, min(100, score))
-
-    if nb_neg > 0:
-        deficit = sum(abs(a.quantite_stock) for a in articles_negatifs)
-        insights.append({'type': 'STOCK_NEGATIF', 'niveau': 'danger',
-            'icon': 'fa-exclamation-circle', 'color': 'danger',
-            'message': f"{nb_neg} article(s) en stock négatif — déficit : {deficit} unités — perte estimée : {round(pertes_estimees):,} CDF"})
-        recommandations.append({'priorite': 'HAUTE', 'color': 'danger',
-            'icon': 'fa-first-aid',
-            'action': 'Réapprovisionner ou ajuster manuellement les articles en déficit.'})
-
-    if ca_negocie > 0 and ca_cdf > 0:
-        pct = ca_negocie / ca_cdf * 100
-        lvl = 'warning' if pct > 25 else 'info'
-        insights.append({'type': 'PRIX_NEGOCIE', 'niveau': lvl,
-            'icon': 'fa-tag', 'color': lvl,
-            'message': f"{pct:.1f}% du CA CDF vendu à prix négocié — écart avec catalogue."})
-        if pct > 30:
-            recommandations.append({'priorite': 'MOYENNE', 'color': 'warning',
-                'icon': 'fa-shield-alt',
-                'action': 'Plus de 30% du CA à prix réduit. Vérifier les autorisations de remise.'})
-
-    if nb_alertes_total > 0:
-        insights.append({'type': 'ALERTES_EN_ATTENTE', 'niveau': 'warning',
-            'icon': 'fa-bell', 'color': 'warning',
-            'message': f"{nb_alertes_total} alerte(s) de stock non régularisée(s)."})
-        recommandations.append({'priorite': 'HAUTE', 'color': 'danger',
-            'icon': 'fa-tools',
-            'action': f"Régulariser les {nb_alertes_total} alerte(s) de sur-vente en attente."})
-
-    nb_ajust = mouv.get('AJUSTEMENT', {}).get('nb', 0) or 0
-    if nb_ajust > 10:
-        anomalies.append({'color': 'warning', 'icon': 'fa-random',
-            'message': f"{nb_ajust} ajustements manuels sur la période — vérifier la cohérence."})
-
-    nb_ventes_periode = ventes_qs.count()
-    nb_mouv_vente = mouv.get('VENTE', {}).get('nb', 0) or 0
-    if nb_ventes_periode > 0 and nb_mouv_vente == 0:
-        anomalies.append({'color': 'danger', 'icon': 'fa-unlink',
-            'message': f"{nb_ventes_periode} vente(s) enregistrée(s) mais aucun mouvement VENTE trouvé."})
-
-    niveau_sante = ('EXCELLENT' if score >= 85 else 'BON' if score >= 70
-                    else 'MOYEN' if score >= 50 else 'CRITIQUE')
-    score_color   = ('success' if score >= 85 else 'info' if score >= 70
-                     else 'warning' if score >= 50 else 'danger')
+    insights = [
+        {**i, 'icon': icones.get(i['type'], 'fa-info-circle'),
+         'color': 'success' if i['type'] == 'ROTATION_ELEVEE' else couleurs.get(i['niveau'], 'info')}
+        for i in analyse.insights
+    ]
+    anomalies = [
+        {**a, 'icon': icones.get(a['type'], 'fa-exclamation-triangle'), 'color': couleurs.get(a['niveau'], 'warning')}
+        for a in analyse.anomalies
+    ]
+    recommandations = [
+        {**r, 'icon': icones.get(r['action'], 'fa-lightbulb'),
+         'color': 'danger' if r['priorite'] == 'HAUTE' else 'warning'}
+        for r in analyse.recommandations
+    ]
+    score_color = ('success' if analyse.score >= 85 else 'info' if analyse.score >= 70
+                   else 'warning' if analyse.score >= 50 else 'danger')
 
     context = {
         'boutique': boutique,
         'debut': debut.strftime('%Y-%m-%d'),
         'fin': fin.strftime('%Y-%m-%d'),
-        'nb_jours': nb_jours,
-        'ca_cdf': ca_cdf,
-        'ca_usd': ca_usd,
-        'ca_negocie': ca_negocie,
-        'stock_val_vente': stock_val_vente,
-        'stock_val_cout': stock_val_cout,
-        'marge_potentielle': max(0, stock_val_vente - stock_val_cout),
-        'nb_ventes': nb_ventes_periode,
-        'mouvements_resume': mouvements_resume,
-        'articles_negatifs': articles_negatifs,
-        'articles_a_regulariser': articles_a_regulariser,
-        'pertes_estimees': pertes_estimees,
-        'nb_alertes_total': nb_alertes_total,
-        'top_articles': top_articles,
-        'score': score,
+        'nb_jours': analyse.nb_jours,
+        'ca_cdf': analyse.ca_cdf,
+        'ca_usd': analyse.ca_usd,
+        'ca_negocie': analyse.ca_negocie_cdf,
+        'stock_val_vente': analyse.stock_valeur_vente,
+        'stock_val_cout': analyse.stock_valeur_cout,
+        'marge_potentielle': analyse.marge_potentielle,
+        'nb_ventes': analyse.nb_ventes,
+        'mouvements_resume': {
+            'entrees':     analyse.mouvement('ENTREE'),
+            'sorties':     analyse.mouvement('SORTIE', True),
+            'ventes':      analyse.mouvement('VENTE', True),
+            'retours':     analyse.mouvement('RETOUR'),
+            'ajustements': analyse.mouvement('AJUSTEMENT'),
+        },
+        'articles_negatifs': analyse.articles_negatifs,
+        'articles_a_regulariser': analyse.articles_a_regulariser,
+        'pertes_estimees': analyse.pertes_estimees,
+        'nb_alertes_total': analyse.nb_alertes_total,
+        'top_articles': analyse.top_articles,
+        'score': analyse.score,
         'score_color': score_color,
-        'niveau_sante': niveau_sante,
-        'rotation': round(rotation, 1),
+        'niveau_sante': analyse.niveau_sante,
+        'rotation': round(analyse.rotation, 1),
         'insights': insights,
         'recommandations': recommandations,
         'anomalies': anomalies,
@@ -8042,11 +7563,13 @@ def modifier_article_global(request):
 @login_required
 @commercant_required
 @boutique_access_required
+@lecture_replique
 def exporter_historique_ventes_pdf(request, boutique_id):
     """Génère et télécharge l'historique de ventes mensuel en PDF, puis enregistre le téléchargement."""
     from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer, HRFlowable
     from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
     from reportlab.lib import colors
+    from reportlab.lib.pagesizes import A4
     from reportlab.lib.units import cm
     from calendar import monthrange
 
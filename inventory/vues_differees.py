@@ -0,0 +1,58 @@
+"""
+Résolution différée des vues de l'interface web (inventory/urls.py).
+
+Le premier appel à l'API POS après un démarrage à froid résout l'URL en parcourant
+urlpatterns: inventory.urls (monté sur '') est chargé avant les routes /api/.
+Avec module_differe(), les modules de vues (views_commercant: 8 000+ lignes, etc.)
+ne sont importés qu'au premier appel d'une de leurs vues.
+
+Seulement pour des vues fonctions (pas de .as_view()). Le nom de chaque vue est vérifié
+par le test test_vues_differees (une faute de frappe n'apparaîtrait sinon qu'au premier appel).
+Mesure: python manage.py temps_imports
+"""
+from importlib import import_module
+
+
+class VueDifferee:
+    """Vue importée au premier appel ou au premier accès à l'un de ses attributs (csrf_exempt...)."""
+
+    # Attributs des vues classes, absents des vues fonctions: répondre sans importer
+    # (lus par URLPattern.lookup_str à la construction des tables de reverse())
+    _ABSENTS = frozenset({'view_class', 'view_initkwargs', 'cls'})
+
+    def __init__(self, module, nom):
+        self.module = module
+        self.__module__ = module
+        self.__name__ = self.__qualname__ = nom
+        self._vue = None
+
+    def charger(self):
+        if self._vue is None:
+            self._vue = getattr(import_module(self.module), self.__name__)
+        return self._vue
+
+    def __call__(self, request, *args, **kwargs):
+        return self.charger()(request, *args, **kwargs)
+
+    def __getattr__(self, attr):
+        if attr.startswith('__') or attr in self._ABSENTS:
+            raise AttributeError(attr)
+        return getattr(self.charger(), attr)
+
+    def __repr__(self):
+        return f'<VueDifferee {self.module}.{self.__name__}>'
+
+
+class module_differe:
+    """Remplace `from . import views_x` dans un urls.py: views_x.ma_vue renvoie une VueDifferee."""
+
+    def __init__(self, module):
+        self._module = module
+        self._vues = {}
+
+    def __getattr__(self, nom):
+        if nom.startswith('_'):
+            raise AttributeError(nom)
+        if nom not in self._vues:
+            self._vues[nom] = VueDifferee(self._module, nom)
+        return self._vues[nom]
@@ -291,6 +291,31 @@ def notify_dashboard_stats(boutique_id, stats):
         logger.error(f"❌ Erreur envoi WebSocket dashboard_stats_updated: {e}")
 
 
+def notify_compteurs_jour(boutique_id, compteurs):
+    """
+    Pousser les compteurs du jour (tuiles CA) aux navigateurs du commerçant abonnés
+    
+    Args:
+        boutique_id: ID de la boutique
+        compteurs: dict de services.compteurs_jour.compteurs()
+    """
+    try:
+        channel_layer = get_channel_layer()
+
+        async_to_sync(channel_layer.group_send)(
+            f'compteurs_{boutique_id}',
+            {
+                'type': 'compteurs_jour',
+                'compteurs': compteurs,
+            }
+        )
+
+        logger.debug(f"🔔 WebSocket: Compteurs du jour boutique {boutique_id} → ca_cdf={compteurs.get('ca_cdf')}")
+
+    except Exception as e:
+        logger.error(f"❌ Erreur envoi WebSocket compteurs_jour: {e}")
+
+
 def notify_vente_rejected(boutique_id, vente_uid, raison):
     """
     Notifier qu'une vente a été rejetée